@@ -0,0 +1,65 @@
+"""Add the search_documents and search_terms tables
+
+Revision ID: 3c1e2f8a6d5b
+Revises: 7e2a4d1c9b3f
+Create Date: 2018-12-03 10:21:12.734025
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e2f8a6d5b'
+down_revision = '7e2a4d1c9b3f'
+
+
+def upgrade():
+    ''' Create the search_documents and search_terms tables used by the
+    full-text search of the issues and pull-requests.
+    '''
+    op.create_table(
+        'search_documents',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column(
+            'project_id',
+            sa.Integer,
+            sa.ForeignKey(
+                'projects.id', onupdate='CASCADE', ondelete='CASCADE'),
+            nullable=False,
+            index=True),
+        sa.Column('obj_type', sa.String(32), nullable=False),
+        sa.Column('obj_uid', sa.String(32), nullable=False),
+        sa.Column('title', sa.Text, nullable=False),
+        sa.Column('content', sa.Text, nullable=False),
+        sa.UniqueConstraint('obj_type', 'obj_uid'),
+    )
+    op.create_table(
+        'search_terms',
+        sa.Column(
+            'document_id',
+            sa.Integer,
+            sa.ForeignKey(
+                'search_documents.id', onupdate='CASCADE',
+                ondelete='CASCADE'),
+            primary_key=True),
+        sa.Column('term', sa.String(64), primary_key=True, index=True),
+        sa.Column('title_count', sa.Integer, nullable=False),
+        sa.Column('content_count', sa.Integer, nullable=False),
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE INDEX search_documents_tsvector_idx ON search_documents "
+            "USING gin ((setweight(to_tsvector('simple'::regconfig, title), "
+            "'A') || setweight(to_tsvector('simple'::regconfig, content), "
+            "'B')))"
+        )
+
+
+def downgrade():
+    ''' Drop the search_documents and search_terms tables.
+    '''
+    op.drop_table('search_terms')
+    op.drop_table('search_documents')
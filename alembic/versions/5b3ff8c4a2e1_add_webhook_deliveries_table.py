@@ -0,0 +1,53 @@
+"""Add the webhook_deliveries table
+
+Revision ID: 5b3ff8c4a2e1
+Revises: 9cb4580e269a
+Create Date: 2018-11-26 10:12:31.512348
+
+"""
+
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b3ff8c4a2e1'
+down_revision = '9cb4580e269a'
+
+
+def upgrade():
+    """ Create the webhook_deliveries table storing the attempts made at
+    delivering the web-hook notifications.
+    """
+    op.create_table(
+        'webhook_deliveries',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column(
+            'project_id',
+            sa.Integer,
+            sa.ForeignKey(
+                'projects.id', onupdate='CASCADE', ondelete='CASCADE'),
+            nullable=False,
+            index=True),
+        sa.Column('url', sa.Text, nullable=False),
+        sa.Column('msg_id', sa.String(255), nullable=False),
+        sa.Column('topic', sa.Text, nullable=False),
+        sa.Column('attempt', sa.Integer, nullable=False),
+        sa.Column('success', sa.Boolean, nullable=False),
+        sa.Column('status_code', sa.Integer, nullable=True),
+        sa.Column('error', sa.Text, nullable=True),
+        sa.Column('latency', sa.Integer, nullable=False),
+        sa.Column(
+            'date_created',
+            sa.DateTime,
+            nullable=False,
+            default=datetime.datetime.utcnow,
+            index=True),
+    )
+
+
+def downgrade():
+    """ Drop the webhook_deliveries table. """
+    op.drop_table('webhook_deliveries')
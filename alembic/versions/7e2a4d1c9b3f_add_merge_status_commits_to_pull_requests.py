@@ -0,0 +1,37 @@
+"""Add the merge_status_target and merge_status_head to pull_requests
+
+Revision ID: 7e2a4d1c9b3f
+Revises: 5b3ff8c4a2e1
+Create Date: 2018-11-28 14:03:47.219581
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2a4d1c9b3f'
+down_revision = '5b3ff8c4a2e1'
+
+
+def upgrade():
+    ''' Add the columns merge_status_target and merge_status_head to the
+    table pull_requests.
+    '''
+    op.add_column(
+        'pull_requests',
+        sa.Column('merge_status_target', sa.Text, nullable=True)
+    )
+    op.add_column(
+        'pull_requests',
+        sa.Column('merge_status_head', sa.Text, nullable=True)
+    )
+
+
+def downgrade():
+    ''' Remove the columns merge_status_target and merge_status_head from
+    the table pull_requests.
+    '''
+    op.drop_column('pull_requests', 'merge_status_head')
+    op.drop_column('pull_requests', 'merge_status_target')
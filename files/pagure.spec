@@ -70,7 +70,7 @@ Requires:           python%{python_pkgversion}-openid-teams
 Requires:           python%{python_pkgversion}-redis
 Requires:           python%{python_pkgversion}-requests
 Requires:           python%{python_pkgversion}-six
-Requires:           python%{python_pkgversion}-sqlalchemy >= 0.8
+Requires:           python%{python_pkgversion}-sqlalchemy >= 1.2
 Requires:           python%{python_pkgversion}-straight-plugin
 Requires:           python%{python_pkgversion}-wtforms
 %endif
@@ -139,7 +139,7 @@ This is useful for example to allow commenting on a ticket by email.
 Summary:            EventSource server for pagure
 BuildArch:          noarch
 Requires:           %{name} = %{version}-%{release}
-Requires:           python%{python_pkgversion}-trololio
+Requires:           python%{python_pkgversion}-redis
 %{?systemd_requires}
 %description        ev
 Pagure comes with an eventsource server allowing live update of the pages
@@ -259,6 +259,14 @@ install -p -m 644 files/pagure_worker.service \
 install -p -m 644 files/pagure_gitolite_worker.service \
     $RPM_BUILD_ROOT/%{_unitdir}/pagure_gitolite_worker.service
 
+# Install the systemd file for the hook daemon
+install -p -m 644 files/pagure_hookd.service \
+    $RPM_BUILD_ROOT/%{_unitdir}/pagure_hookd.service
+
+# Install the systemd file for the email worker
+install -p -m 644 files/pagure_email.service \
+    $RPM_BUILD_ROOT/%{_unitdir}/pagure_email.service
+
 # Install the systemd file for the web-hook
 install -p -m 644 files/pagure_webhook.service \
     $RPM_BUILD_ROOT/%{_unitdir}/pagure_webhook.service
@@ -334,6 +342,8 @@ sed -e "s/pythonX.Y/python%{python3_version}/g" -i $RPM_BUILD_ROOT/%{_sysconfdir
 %post
 %systemd_post pagure_worker.service
 %systemd_post pagure_gitolite_worker.service
+%systemd_post pagure_hookd.service
+%systemd_post pagure_email.service
 %systemd_post pagure_api_key_expire_mail.timer
 %post milters
 %systemd_post pagure_milter.service
@@ -353,6 +363,8 @@ sed -e "s/pythonX.Y/python%{python3_version}/g" -i $RPM_BUILD_ROOT/%{_sysconfdir
 %preun
 %systemd_preun pagure_worker.service
 %systemd_preun pagure_gitolite_worker.service
+%systemd_preun pagure_hookd.service
+%systemd_preun pagure_email.service
 %systemd_preun pagure_api_key_expire_mail.timer
 %preun milters
 %systemd_preun pagure_milter.service
@@ -372,6 +384,8 @@ sed -e "s/pythonX.Y/python%{python3_version}/g" -i $RPM_BUILD_ROOT/%{_sysconfdir
 %postun
 %systemd_postun_with_restart pagure_worker.service
 %systemd_postun_with_restart pagure_gitolite_worker.service
+%systemd_postun_with_restart pagure_hookd.service
+%systemd_postun_with_restart pagure_email.service
 %systemd_postun pagure_api_key_expire_mail.timer
 %postun milters
 %systemd_postun_with_restart pagure_milter.service
@@ -412,6 +426,8 @@ sed -e "s/pythonX.Y/python%{python3_version}/g" -i $RPM_BUILD_ROOT/%{_sysconfdir
 %{_bindir}/pagure-admin
 %{_unitdir}/pagure_worker.service
 %{_unitdir}/pagure_gitolite_worker.service
+%{_unitdir}/pagure_hookd.service
+%{_unitdir}/pagure_email.service
 %{_unitdir}/pagure_api_key_expire_mail.service
 %{_unitdir}/pagure_api_key_expire_mail.timer
 
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
 """
- (c) 2015-2017 - Copyright Red Hat Inc
+ (c) 2015-2018 - Copyright Red Hat Inc
 
  Authors:
    Pierre-Yves Chibon <pingou@pingoured.fr>
@@ -11,6 +11,10 @@ Streaming server for pagure's eventsource feature
 This server takes messages sent to redis and publish them at the specified
 endpoint
 
+All the messages are received over a single subscription to redis and
+pushed to the clients waiting for the object they concern. The server
+reports the number of clients and the message rates on the EV_STATS_PORT.
+
 To test, run this script and in another terminal
 nc localhost 8080
   HELLO
@@ -19,16 +23,16 @@ nc localhost 8080
 
 """
 
-from __future__ import unicode_literals
-
+import asyncio
+import collections
+import json
 import logging
 import os
-
+import threading
+import time
+from urllib.parse import urlparse
 
 import redis
-from trololio import asyncio as trololio
-
-from six.moves.urllib.parse import urlparse
 
 log = logging.getLogger(__name__)
 
@@ -41,10 +45,25 @@ if 'PAGURE_CONFIG' not in os.environ \
 
 import pagure  # noqa: E402
 import pagure.lib.query  # noqa: E402
+import pagure.lib.render_cache  # noqa: E402
 from pagure.exceptions import PagureEvException  # noqa: E402
 
+# Number of seconds after which a ping is sent to a client without messages
+PING_INTERVAL = 5
+# Number of messages kept for a client before it is dropped as too slow
+CLIENT_QUEUE_SIZE = 100
+# Number and lifetime in seconds of the paths resolved kept in the cache
+PATH_CACHE_SIZE = 10000
+PATH_CACHE_TTL = 60
+# Number of seconds over which the message rates are measured
+RATE_INTERVAL = 60
+# Number of seconds to wait before subscribing again to redis
+REDIS_RETRY_DELAY = 5
+
 SERVER = None
+HUB = None
 SESSION = None
+PATH_CACHE = pagure.lib.render_cache.MemoryCache(PATH_CACHE_SIZE)
 POOL = redis.ConnectionPool(
     host=pagure.config.config['REDIS_HOST'],
     port=pagure.config.config['REDIS_PORT'],
@@ -180,40 +199,173 @@ def get_obj_from_path(path):
     return getfunc(repo, objid)
 
 
-@trololio.coroutine
-def handle_client(client_reader, client_writer):
+def resolve_path(path):
+    """ Return the uid of the Ticket or Request at the path provided, the
+    paths recently resolved being cached.
+    """
+    uid = PATH_CACHE.get(path)
+    if uid is None:
+        uid = get_obj_from_path(path).uid
+        PATH_CACHE.set(path, uid, ttl=PATH_CACHE_TTL)
+    return uid
+
+
+def _resolve_path_in_thread(path):
+    """ Resolve the path from a thread of the executor, with the session
+    of this thread.
+    """
+    try:
+        return resolve_path(path)
+    finally:
+        _get_session().remove()
+
+
+class Client(object):
+    """ A browser waiting for the messages about an object. """
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+    def push(self, data):
+        """ Queue the message for the client, dropping the client if it
+        does not read them fast enough. Return whether it was queued.
+        """
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+
+class Hub(object):
+    """ Fan-out the messages published on redis to the clients waiting for
+    them.
+
+    A single pattern-subscription receives the messages about all the
+    objects, they are read from a thread and handed to the event loop,
+    which pushes them to the clients of the object they concern.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.clients = collections.defaultdict(set)
+        self.started = time.time()
+        self.counters = collections.Counter()
+        self.rates = {}
+        self._last_counters = collections.Counter()
+
+    def subscribe(self, uid):
+        """ Return a new client waiting for the messages about the object.
+        """
+        client = Client()
+        self.clients[uid].add(client)
+        self.counters['connections'] += 1
+        return client
+
+    def unsubscribe(self, uid, client):
+        """ Stop sending the messages about the object to the client. """
+        clients = self.clients.get(uid)
+        if clients is None:
+            return
+        clients.discard(client)
+        if not clients:
+            del self.clients[uid]
+
+    def dispatch(self, channel, data):
+        """ Push the message received on the redis channel to the clients
+        of the object it concerns.
+        """
+        self.counters['received'] += 1
+        uid = channel.decode().split('.', 1)[-1]
+        for client in list(self.clients.get(uid, ())):
+            if not client.push(data.decode()):
+                log.info("Dropping a client not reading its messages")
+                self.counters['dropped'] += 1
+                self.unsubscribe(uid, client)
+
+    def _listen(self):
+        while True:
+            try:
+                conn = redis.Redis(connection_pool=POOL)
+                subscriber = conn.pubsub(ignore_subscribe_messages=True)
+                subscriber.psubscribe('pagure.*')
+                for msg in subscriber.listen():
+                    self.loop.call_soon_threadsafe(
+                        self.dispatch, msg['channel'], msg['data'])
+            except redis.exceptions.RedisError:
+                log.exception("ERROR: Lost the subscription to redis")
+                time.sleep(REDIS_RETRY_DELAY)
+
+    def start(self):
+        """ Start receiving the messages published on redis. """
+        thread = threading.Thread(target=self._listen, name='redis')
+        thread.daemon = True
+        thread.start()
+        self.loop.create_task(self._measure_rates())
+
+    async def _measure_rates(self):
+        while True:
+            await asyncio.sleep(RATE_INTERVAL)
+            for key in ['received', 'sent']:
+                self.rates[key] = (
+                    self.counters[key] - self._last_counters[key]
+                ) / float(RATE_INTERVAL)
+            self._last_counters = self.counters.copy()
+
+    def stats(self):
+        """ Return the metrics of the server. """
+        return {
+            'clients': sum(len(clients) for clients in self.clients.values()),
+            'objects': len(self.clients),
+            'connections_total': self.counters['connections'],
+            'messages_received': self.counters['received'],
+            'messages_sent': self.counters['sent'],
+            'messages_dropped': self.counters['dropped'],
+            'received_per_second': self.rates.get('received', 0.0),
+            'sent_per_second': self.rates.get('sent', 0.0),
+            'uptime': int(time.time() - self.started),
+        }
+
+
+async def handle_client(client_reader, client_writer):
     data = None
-    while True:
-        # give client a chance to respond, timeout after 10 seconds
-        line = yield trololio.From(trololio.wait_for(
-            client_reader.readline(),
-            timeout=10.0))
-        if not line.decode().strip():
-            break
-        line = line.decode().rstrip()
-        if data is None:
-            data = line
+    try:
+        while True:
+            # give client a chance to respond, timeout after 10 seconds
+            line = await asyncio.wait_for(
+                client_reader.readline(), timeout=10.0)
+            if not line.decode().strip():
+                break
+            if data is None:
+                data = line.decode().rstrip()
+    except (asyncio.TimeoutError, ConnectionError):
+        log.info("Client did not send its request")
+        client_writer.close()
+        return
 
     if data is None:
         log.warning("Expected ticket uid, received None")
+        client_writer.close()
         return
 
-    data = data.decode().rstrip().split()
+    data = data.split()
     log.info("Received %s", data)
-    if not data:
-        log.warning("No URL provided: %s" % data)
-        return
-
-    if '/' not in data[1]:
-        log.warning("Invalid URL provided: %s" % data[1])
+    if len(data) < 2 or '/' not in data[1]:
+        log.warning("Invalid URL provided: %s" % data)
+        client_writer.close()
         return
 
     url = urlparse(data[1])
 
     try:
-        obj = get_obj_from_path(url.path)
+        uid = await asyncio.get_event_loop().run_in_executor(
+            None, _resolve_path_in_thread, url.path)
     except PagureEvException as err:
-        log.warning(err.message)
+        log.warning(err)
+        client_writer.close()
         return
 
     origin = pagure.config.config.get('APP_URL')
@@ -228,98 +380,88 @@ def handle_client(client_reader, client_writer):
         "Access-Control-Allow-Origin: %s\n\n" % origin
     ).encode())
 
-
-    conn = redis.Redis(connection_pool=POOL)
-    subscriber = conn.pubsub(ignore_subscribe_messages=True)
-
+    client = HUB.subscribe(uid)
     try:
-        subscriber.subscribe('pagure.%s' % obj.uid)
-
-        # Inside a while loop, wait for incoming events.
-        oncall = 0
+        # Wait for the messages about the object, sending a ping to see if
+        # the client is still alive when there are none
         while True:
-            msg = subscriber.get_message()
-            if msg is None:
-                # Send a ping to see if the client is still alive
-                if oncall >= 5:
-                    # Only send a ping once every 5 seconds
-                    client_writer.write(('event: ping\n\n').encode())
-                    oncall = 0
-                oncall += 1
-                yield trololio.From(client_writer.drain())
-                yield trololio.From(trololio.sleep(1))
+            try:
+                msg = await asyncio.wait_for(
+                    client.queue.get(), timeout=PING_INTERVAL)
+            except asyncio.TimeoutError:
+                client_writer.write(('event: ping\n\n').encode())
             else:
-                log.info("Sending %s", msg['data'])
-                client_writer.write(('data: %s\n\n' % msg['data']).encode())
-                yield trololio.From(client_writer.drain())
-
-    except OSError:
+                if msg is None:
+                    break
+                log.info("Sending %s", msg)
+                client_writer.write(('data: %s\n\n' % msg).encode())
+                HUB.counters['sent'] += 1
+            await client_writer.drain()
+
+    except ConnectionError:
         log.info("Client closed connection")
-    except trololio.ConnectionResetError as err:
-        log.exception("ERROR: ConnectionResetError in handle_client")
     except Exception as err:
         log.exception("ERROR: Exception in handle_client")
         log.info(type(err))
     finally:
         # Wathever happens, close the connection.
         log.info("Client left. Goodbye!")
-        subscriber.close()
+        HUB.unsubscribe(uid, client)
         client_writer.close()
 
 
-@trololio.coroutine
-def stats(client_reader, client_writer):
+async def stats(client_reader, client_writer):
 
     try:
-        log.info('Clients: %s', SERVER.active_count)
+        output = HUB.stats()
+        log.info('Clients: %s', output['clients'])
         client_writer.write((
             "HTTP/1.0 200 OK\n"
+            "Content-Type: application/json\n"
             "Cache: nocache\n\n"
         ).encode())
-        client_writer.write(('data: %s\n\n' % SERVER.active_count).encode())
-        yield trololio.From(client_writer.drain())
+        client_writer.write(json.dumps(output, sort_keys=True).encode())
+        await client_writer.drain()
 
-    except trololio.ConnectionResetError as err:
+    except ConnectionError as err:
         log.info(err)
     finally:
         client_writer.close()
-    return
 
 
 def main():
-    global SERVER
+    global SERVER, HUB
     _get_session()
+    stats_server = None
 
     try:
-        loop = trololio.get_event_loop()
-        coro = trololio.start_server(
+        loop = asyncio.get_event_loop()
+        HUB = Hub(loop)
+        HUB.start()
+        coro = asyncio.start_server(
             handle_client,
             host=None,
-            port=pagure.config.config['EVENTSOURCE_PORT'],
-            loop=loop)
+            port=pagure.config.config['EVENTSOURCE_PORT'])
         SERVER = loop.run_until_complete(coro)
         log.info(
             'Serving server at {}'.format(SERVER.sockets[0].getsockname()))
         if pagure.config.config.get('EV_STATS_PORT'):
-            stats_coro = trololio.start_server(
+            stats_coro = asyncio.start_server(
                 stats,
                 host=None,
-                port=pagure.config.config.get('EV_STATS_PORT'),
-                loop=loop)
+                port=pagure.config.config.get('EV_STATS_PORT'))
             stats_server = loop.run_until_complete(stats_coro)
             log.info('Serving stats  at {}'.format(
                 stats_server.sockets[0].getsockname()))
         loop.run_forever()
     except KeyboardInterrupt:
         pass
-    except trololio.ConnectionResetError as err:
-        log.exception("ERROR: ConnectionResetError in main")
     except Exception:
         log.exception("ERROR: Exception in main")
     finally:
         # Close the server
         SERVER.close()
-        if pagure.config.config.get('EV_STATS_PORT'):
+        if stats_server is not None:
             stats_server.close()
         log.info("End Connection")
         loop.run_until_complete(SERVER.wait_closed())
@@ -35,7 +35,7 @@ import pagure.lib.tasks  # noqa: E402
 from pagure.config import config as pagure_config  # noqa: E402
 from pagure.doc_utils import load_doc, modify_rst, modify_html  # noqa: E402
 from pagure.exceptions import APIError  # noqa: E402
-from pagure.utils import authenticated  # noqa: E402
+from pagure.utils import authenticated, is_true  # noqa: E402
 
 
 _log = logging.getLogger(__name__)
@@ -314,6 +314,41 @@ def get_per_page():
     return per_page
 
 
+def get_cursor(order_key=None, key_cursor="cursor"):
+    """ Returns the position encoded in the cursor specified in the request
+    for the keyset pagination, an empty list if the cursor is empty, ie:
+    for the first page, or None if the keyset pagination isn't requested.
+    raises APIERROR.EINVALIDREQ if the cursor provided is invalid
+    """
+    if key_cursor not in flask.request.values:
+        return None
+
+    cursor = flask.request.values.get(key_cursor)
+    if not cursor:
+        return []
+
+    keyset = pagure.lib.query.decode_cursor(cursor, order_key=order_key)
+    if keyset is None:
+        raise pagure.exceptions.APIError(400, error_code=APIERROR.EINVALIDREQ)
+    return keyset
+
+
+def get_count():
+    """ Returns whether the total number of results should be returned
+    when using the keyset pagination.
+    Defaults to False.
+    """
+    return is_true(flask.request.values.get("count", False))
+
+
+def get_compact():
+    """ Returns whether the projects nested in the objects listed should be
+    returned as stubs rather than in full.
+    Defaults to False.
+    """
+    return is_true(flask.request.values.get("compact", False))
+
+
 if pagure_config.get("ENABLE_TICKETS", True):
     from pagure.api import issue  # noqa: E402
 from pagure.api import fork  # noqa: E402
@@ -581,6 +616,7 @@ def api():
     if pagure_config.get("ENABLE_TICKETS", True):
         issues.append(load_doc(issue.api_new_issue))
         issues.append(load_doc(issue.api_view_issues))
+        issues.append(load_doc(issue.api_export_issues))
         issues.append(load_doc(issue.api_view_issue))
         issues.append(load_doc(issue.api_view_issue_comment))
         issues.append(load_doc(issue.api_comment_issue))
@@ -598,6 +634,7 @@ def api():
             ci_doc.append(load_doc(jenkins.jenkins_ci_notification))
 
     api_pull_request_views_doc = load_doc(fork.api_pull_request_views)
+    api_pull_request_export_doc = load_doc(fork.api_pull_request_export)
     api_pull_request_view_doc = load_doc(fork.api_pull_request_view)
     api_pull_request_diffstats_doc = load_doc(fork.api_pull_request_diffstats)
     api_pull_request_by_uid_view_doc = load_doc(
@@ -663,6 +700,7 @@ def api():
         issues=issues,
         requests=[
             api_pull_request_views_doc,
+            api_pull_request_export_doc,
             api_pull_request_view_doc,
             api_pull_request_diffstats_doc,
             api_pull_request_by_uid_view_doc,
@@ -18,7 +18,10 @@ from sqlalchemy.exc import SQLAlchemyError
 
 import pagure
 import pagure.exceptions
+import pagure.lib.export
+import pagure.lib.pr_diff_cache
 import pagure.lib.query
+import pagure.lib.serializers
 import pagure.lib.tasks
 from pagure.api import (
     API,
@@ -29,6 +32,9 @@ from pagure.api import (
     get_request_data,
     get_page,
     get_per_page,
+    get_cursor,
+    get_count,
+    get_compact,
 )
 from pagure.config import config as pagure_config
 from pagure.utils import (
@@ -85,6 +91,34 @@ def api_pull_request_views(repo, username=None, namespace=None):
     | ``author``    | string   | Optional     | | Filter the author of     |
     |               |          |              |   pull requests            |
     +---------------+----------+--------------+----------------------------+
+    | ``page``      | int      | Optional     | | Specifies which page to  |
+    |               |          |              |   return (defaults to: 1)  |
+    +---------------+----------+--------------+----------------------------+
+    | ``per_page``  | int      | Optional     | | The number of pull       |
+    |               |          |              |   requests to return per   |
+    |               |          |              |   page. The maximum is 100.|
+    +---------------+----------+--------------+----------------------------+
+    | ``cursor``    | string   | Optional     | | Paginate using the       |
+    |               |          |              |   cursor returned as       |
+    |               |          |              |   ``next_cursor``, empty   |
+    |               |          |              |   for the first page,      |
+    |               |          |              |   rather than ``page``     |
+    +---------------+----------+--------------+----------------------------+
+    | ``count``     | boolean  | Optional     | | Whether to return the    |
+    |               |          |              |   total number of pull     |
+    |               |          |              |   requests when using      |
+    |               |          |              |   ``cursor``               |
+    |               |          |              |   (defaults to: false)     |
+    +---------------+----------+--------------+----------------------------+
+    | ``compact``   | boolean  | Optional     | | Whether to return only   |
+    |               |          |              |   the ``id``, ``name``,    |
+    |               |          |              |   ``namespace``,           |
+    |               |          |              |   ``fullname`` and         |
+    |               |          |              |   ``url_path`` of the      |
+    |               |          |              |   projects of the pull     |
+    |               |          |              |   requests                 |
+    |               |          |              |   (defaults to: false)     |
+    +---------------+----------+--------------+----------------------------+
 
     Sample response
     ^^^^^^^^^^^^^^^
@@ -163,60 +197,157 @@ def api_pull_request_views(repo, username=None, namespace=None):
     author = flask.request.args.get("author", None)
 
     status_text = ("%s" % status).lower()
-    requests = []
+    params = {
+        "session": flask.g.session,
+        "project_id": repo.id,
+        "assignee": assignee,
+        "author": author,
+    }
     if status_text in ["0", "false", "closed"]:
-        requests = pagure.lib.query.search_pull_requests(
-            flask.g.session,
-            project_id=repo.id,
-            status=False,
-            assignee=assignee,
-            author=author,
-        )
-
+        params["status"] = False
     elif status_text == "all":
-        requests = pagure.lib.query.search_pull_requests(
-            flask.g.session,
-            project_id=repo.id,
-            status=None,
-            assignee=assignee,
-            author=author,
-        )
-
+        params["status"] = None
     else:
-        requests = pagure.lib.query.search_pull_requests(
-            flask.g.session,
-            project_id=repo.id,
-            assignee=assignee,
-            author=author,
-            status=status,
-        )
+        params["status"] = status
 
-    page = get_page()
     per_page = get_per_page()
-
-    pagination_metadata = pagure.lib.query.get_pagination_metadata(
-        flask.request, page, per_page, len(requests)
-    )
-    start = (page - 1) * per_page
-    if start + per_page > len(requests):
-        requests_page = requests[start:]
+    cursor = get_cursor()
+    compact = get_compact()
+    load_plan = pagure.lib.serializers.pull_request_load_plan(compact=compact)
+    if cursor is None:
+        page = get_page()
+        requests_cnt = pagure.lib.query.search_pull_requests(
+            count=True, **params
+        )
+        pagination_metadata = pagure.lib.query.get_pagination_metadata(
+            flask.request, page, per_page, requests_cnt
+        )
+        requests_page = pagure.lib.query.search_pull_requests(
+            offset=(page - 1) * per_page,
+            limit=per_page,
+            load_plan=load_plan,
+            **params
+        )
     else:
-        requests_page = requests[start : (start + per_page)]
+        requests_cnt = None
+        if get_count():
+            requests_cnt = pagure.lib.query.search_pull_requests(
+                count=True, **params
+            )
+        requests_page = pagure.lib.query.search_pull_requests(
+            limit=per_page + 1, keyset=cursor, load_plan=load_plan, **params
+        )
+        pagination_metadata = pagure.lib.query.get_keyset_pagination_metadata(
+            flask.request, per_page, requests_page, total=requests_cnt
+        )
+        requests_page = requests_page[:per_page]
 
+    serializer = pagure.lib.serializers.Serializer(
+        public=True, api=True, compact=compact
+    )
     jsonout = {
-        "total_requests": len(requests),
+        "total_requests": requests_cnt,
         "requests": [
-            request.to_json(public=True, api=True) for request in requests_page
+            serializer.pull_request(request) for request in requests_page
         ],
         "args": {"status": status, "assignee": assignee, "author": author},
     }
     if pagination_metadata:
-        jsonout["args"]["page"] = page
+        if cursor is None:
+            jsonout["args"]["page"] = page
         jsonout["args"]["per_page"] = per_page
         jsonout["pagination"] = pagination_metadata
     return flask.jsonify(jsonout)
 
 
+@API.route("/<repo>/pull-requests/export")
+@API.route("/<namespace>/<repo>/pull-requests/export")
+@API.route("/fork/<username>/<repo>/pull-requests/export")
+@API.route("/fork/<username>/<namespace>/<repo>/pull-requests/export")
+@api_method
+def api_pull_request_export(repo, username=None, namespace=None):
+    """
+    Export project's Pull-Requests
+    ------------------------------
+    Export all the pull requests of a project, with their comments, as
+    newline-delimited JSON: one pull request per line, from the least
+    recently updated to the most recently updated.
+    The pull requests are streamed as they are retrieved, making this
+    endpoint suitable to synchronize the pull requests of large projects.
+
+    ::
+
+        GET /api/0/<repo>/pull-requests/export
+        GET /api/0/<namespace>/<repo>/pull-requests/export
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/pull-requests/export
+        GET /api/0/fork/<username>/<namespace>/<repo>/pull-requests/export
+
+    Parameters
+    ^^^^^^^^^^
+
+    +-------------------+--------+-------------+---------------------------+
+    | Key               | Type   | Optionality | Description               |
+    +===================+========+=============+===========================+
+    | ``updated_after`` | string | Optional    | | Only export the pull    |
+    |                   |        |             |   requests updated after  |
+    |                   |        |             |   this date, as a         |
+    |                   |        |             |   timestamp or in ISO     |
+    |                   |        |             |   8601 format. The        |
+    |                   |        |             |   ``last_updated`` field  |
+    |                   |        |             |   of the last pull        |
+    |                   |        |             |   request exported can be |
+    |                   |        |             |   used to retrieve the    |
+    |                   |        |             |   pull requests updated   |
+    |                   |        |             |   since the previous      |
+    |                   |        |             |   export.                 |
+    +-------------------+--------+-------------+---------------------------+
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {"assignee": null, "branch": "master", "branch_from": "master", ...}
+        {"assignee": null, "branch": "master", "branch_from": "feature", ...}
+
+    """
+
+    repo = get_authorized_api_project(
+        flask.g.session, repo, user=username, namespace=namespace
+    )
+
+    if repo is None:
+        raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOPROJECT)
+
+    if not repo.settings.get("pull_requests", True):
+        raise pagure.exceptions.APIError(
+            404, error_code=APIERROR.EPULLREQUESTSDISABLED
+        )
+
+    updated_after = flask.request.args.get("updated_after", None)
+    if updated_after:
+        try:
+            updated_after = pagure.lib.export.parse_updated_after(
+                updated_after
+            )
+        except ValueError:
+            raise pagure.exceptions.APIError(
+                400, error_code=APIERROR.EDATETIME
+            )
+
+    return flask.Response(
+        flask.stream_with_context(
+            pagure.lib.export.iter_pull_requests(
+                flask.g.session, repo, updated_after=updated_after
+            )
+        ),
+        mimetype="application/x-ndjson",
+    )
+
+
 @API.route("/pull-requests/<uid>")
 @api_method
 def api_pull_request_by_uid_view(uid):
@@ -1445,7 +1576,6 @@ def api_pull_request_diffstats(repo, requestid, username=None, namespace=None):
     orig_repo = pygit2.Repository(parentpath)
 
     diff_commits = []
-    diff = None
     # Closed pull-request
     if request.status != "Open":
         commitid = request.commit_stop
@@ -1457,28 +1587,10 @@ def api_pull_request_diffstats(repo, requestid, username=None, namespace=None):
         except KeyError:
             # This happens when repo.walk() cannot find commitid
             pass
-
-        if diff_commits:
-            # Ensure the first commit in the PR as a parent, otherwise
-            # point to it
-            start = diff_commits[-1].oid.hex
-            if diff_commits[-1].parents:
-                start = diff_commits[-1].parents[0].oid.hex
-
-            # If the start and the end commits are the same, it means we are,
-            # dealing with one commit that has no parent, so just diff that
-            # one commit
-            if start == diff_commits[0].oid.hex:
-                diff = diff_commits[0].tree.diff_to_tree(swap=True)
-            else:
-                diff = repo_obj.diff(
-                    repo_obj.revparse_single(start),
-                    repo_obj.revparse_single(diff_commits[0].oid.hex),
-                )
     else:
         try:
-            diff_commits, diff = pagure.lib.git.diff_pull_request(
-                flask.g.session, request, repo_obj, orig_repo
+            diff_commits = pagure.lib.git.diff_pull_request(
+                flask.g.session, request, repo_obj, orig_repo, with_diff=False
             )
         except pagure.exceptions.PagureException as err:
             flask.flash("%s" % err, "error")
@@ -1489,52 +1601,11 @@ def api_pull_request_diffstats(repo, requestid, username=None, namespace=None):
                 "Could not update this pull-request in the database", "error"
             )
 
-    if diff:
-        diff.find_similar()
-
-    output = {}
-    if diff:
-        for patch in diff:
-            linesadded = patch.line_stats[1]
-            linesremoved = patch.line_stats[2]
-            if hasattr(patch, "new_file_path"):
-                # Older pygit2
-                status = patch.status
-                if patch.new_file_path != patch.old_file_path:
-                    status = "R"
-                output[patch.new_file_path] = {
-                    "status": patch.status,
-                    "old_path": patch.old_file_path,
-                    "lines_added": linesadded,
-                    "lines_removed": linesremoved,
-                }
-            elif hasattr(patch, "delta"):
-                # Newer pygit2
-                if (
-                    patch.delta.new_file.mode == 0
-                    and patch.delta.old_file.mode in [33188, 33261]
-                ):
-                    status = "D"
-                elif (
-                    patch.delta.new_file.mode in [33188, 33261]
-                    and patch.delta.old_file.mode == 0
-                ):
-                    status = "A"
-                elif patch.delta.new_file.mode in [
-                    33188,
-                    33261,
-                ] and patch.delta.old_file.mode in [33188, 33261]:
-                    status = "M"
-                if patch.delta.new_file.path != patch.delta.old_file.path:
-                    status = "R"
-                output[patch.delta.new_file.path] = {
-                    "status": status,
-                    "old_path": patch.delta.old_file.path,
-                    "lines_added": linesadded,
-                    "lines_removed": linesremoved,
-                }
-    else:
+    # Only compute the diff if it is not cached
+    diff = pagure.lib.pr_diff_cache.get_diff(request, orig_repo, diff_commits)
+    if not diff:
         raise pagure.exceptions.APIError(400, error_code=APIERROR.ENOPRSTATS)
 
+    output = pagure.lib.pr_diff_cache.get_diff_stats(diff)
     jsonout = flask.jsonify(output)
     return jsonout
@@ -18,7 +18,9 @@ import arrow
 from sqlalchemy.exc import SQLAlchemyError
 
 import pagure.exceptions
+import pagure.lib.export
 import pagure.lib.query
+import pagure.lib.serializers
 from pagure.api import (
     API,
     api_method,
@@ -29,6 +31,8 @@ from pagure.api import (
     get_request_data,
     get_page,
     get_per_page,
+    get_cursor,
+    get_count,
 )
 from pagure.config import config as pagure_config
 from pagure.utils import (
@@ -438,6 +442,17 @@ def api_view_issues(repo, username=None, namespace=None):
     |               |          |             |   to return per page.     |
     |               |          |             |   The maximum is 100.     |
     +---------------+----------+-------------+---------------------------+
+    | ``cursor``    | string   | Optional    | | Paginate using the      |
+    |               |          |             |   cursor returned as      |
+    |               |          |             |   ``next_cursor``, empty  |
+    |               |          |             |   for the first page,     |
+    |               |          |             |   rather than ``page``    |
+    +---------------+----------+-------------+---------------------------+
+    | ``count``     | boolean  | Optional    | | Whether to return the   |
+    |               |          |             |   total number of issues  |
+    |               |          |             |   when using ``cursor``   |
+    |               |          |             |   (defaults to: false)    |
+    +---------------+----------+-------------+---------------------------+
 
     Sample response
     ^^^^^^^^^^^^^^^
@@ -587,25 +602,42 @@ def api_view_issues(repo, username=None, namespace=None):
 
     params.update({"updated_after": updated_after})
 
-    page = get_page()
     per_page = get_per_page()
-    params["count"] = True
-    issue_cnt = pagure.lib.query.search_issues(**params)
-    pagination_metadata = pagure.lib.query.get_pagination_metadata(
-        flask.request, page, per_page, issue_cnt
-    )
-    query_start = (page - 1) * per_page
-    query_limit = per_page
-
-    params["count"] = False
-    params["limit"] = query_limit
-    params["offset"] = query_start
-    issues = pagure.lib.query.search_issues(**params)
+    cursor = get_cursor()
+    if cursor is None:
+        page = get_page()
+        params["count"] = True
+        issue_cnt = pagure.lib.query.search_issues(**params)
+        pagination_metadata = pagure.lib.query.get_pagination_metadata(
+            flask.request, page, per_page, issue_cnt
+        )
+        query_start = (page - 1) * per_page
+        query_limit = per_page
+
+        params["count"] = False
+        params["limit"] = query_limit
+        params["offset"] = query_start
+        params["load_plan"] = pagure.lib.serializers.issue_load_plan()
+        issues = pagure.lib.query.search_issues(**params)
+    else:
+        issue_cnt = None
+        if get_count():
+            issue_cnt = pagure.lib.query.search_issues(count=True, **params)
+
+        params["limit"] = per_page + 1
+        params["keyset"] = cursor
+        params["load_plan"] = pagure.lib.serializers.issue_load_plan()
+        issues = pagure.lib.query.search_issues(**params)
+        pagination_metadata = pagure.lib.query.get_keyset_pagination_metadata(
+            flask.request, per_page, issues, total=issue_cnt
+        )
+        issues = issues[:per_page]
 
+    serializer = pagure.lib.serializers.Serializer(public=True, api=True)
     jsonout = flask.jsonify(
         {
             "total_issues": len(issues),
-            "issues": [issue.to_json(public=True) for issue in issues],
+            "issues": [serializer.issue(issue) for issue in issues],
             "args": {
                 "assignee": assignee,
                 "author": author,
@@ -623,6 +655,94 @@ def api_view_issues(repo, username=None, namespace=None):
     return jsonout
 
 
+@API.route("/<repo>/issues/export")
+@API.route("/<namespace>/<repo>/issues/export")
+@API.route("/fork/<username>/<repo>/issues/export")
+@API.route("/fork/<username>/<namespace>/<repo>/issues/export")
+@api_login_optional()
+@api_method
+def api_export_issues(repo, username=None, namespace=None):
+    """
+    Export project's issues
+    -----------------------
+    Export all the issues of a project, with their comments, as
+    newline-delimited JSON: one issue per line, from the least recently
+    updated to the most recently updated.
+    The issues are streamed as they are retrieved, making this endpoint
+    suitable to synchronize the issues of large projects.
+
+    ::
+
+        GET /api/0/<repo>/issues/export
+        GET /api/0/<namespace>/<repo>/issues/export
+
+    ::
+
+        GET /api/0/fork/<username>/<repo>/issues/export
+        GET /api/0/fork/<username>/<namespace>/<repo>/issues/export
+
+    Parameters
+    ^^^^^^^^^^
+
+    +-------------------+--------+-------------+---------------------------+
+    | Key               | Type   | Optionality | Description               |
+    +===================+========+=============+===========================+
+    | ``updated_after`` | string | Optional    | | Only export the issues  |
+    |                   |        |             |   updated after this      |
+    |                   |        |             |   date, as a timestamp or |
+    |                   |        |             |   in ISO 8601 format. The |
+    |                   |        |             |   ``last_updated`` field  |
+    |                   |        |             |   of the last issue       |
+    |                   |        |             |   exported can be used to |
+    |                   |        |             |   retrieve the issues     |
+    |                   |        |             |   updated since the       |
+    |                   |        |             |   previous export.        |
+    +-------------------+--------+-------------+---------------------------+
+
+    Sample response
+    ^^^^^^^^^^^^^^^
+
+    ::
+
+        {"assignee": null, "blocks": [], "close_status": null, ...}
+        {"assignee": null, "blocks": [], "close_status": null, ...}
+
+    """
+    repo = _get_repo(repo, username, namespace)
+    _check_issue_tracker(repo)
+    _check_token(repo)
+
+    updated_after = flask.request.args.get("updated_after", None)
+    if updated_after:
+        try:
+            updated_after = pagure.lib.export.parse_updated_after(
+                updated_after
+            )
+        except ValueError:
+            raise pagure.exceptions.APIError(
+                400, error_code=APIERROR.EDATETIME
+            )
+
+    # Same rules as when listing the issues for the private ones
+    private = False
+    if api_authenticated():
+        private = flask.g.fas_user.username
+    if is_repo_committer(repo):
+        private = None
+
+    return flask.Response(
+        flask.stream_with_context(
+            pagure.lib.export.iter_issues(
+                flask.g.session,
+                repo,
+                updated_after=updated_after,
+                private=private,
+            )
+        ),
+        mimetype="application/x-ndjson",
+    )
+
+
 @API.route("/<repo>/issue/<issueid>")
 @API.route("/<namespace>/<repo>/issue/<issueid>")
 @API.route("/fork/<username>/<repo>/issue/<issueid>")
@@ -22,6 +22,7 @@ import pagure.forms
 import pagure.exceptions
 import pagure.lib.git
 import pagure.lib.query
+import pagure.lib.serializers
 import pagure.utils
 from pagure.api import (
     API,
@@ -33,6 +34,9 @@ from pagure.api import (
     get_request_data,
     get_page,
     get_per_page,
+    get_cursor,
+    get_count,
+    get_compact,
 )
 from pagure.config import config as pagure_config
 
@@ -365,6 +369,27 @@ def api_projects():
     |               |          |               |   to return per page.    |
     |               |          |               |   The maximum is 100.    |
     +---------------+----------+---------------+--------------------------+
+    | ``cursor``    | string   | Optional      | | Paginate using the     |
+    |               |          |               |   cursor returned as     |
+    |               |          |               |   ``next_cursor``,       |
+    |               |          |               |   empty for the first    |
+    |               |          |               |   page, rather than      |
+    |               |          |               |   ``page``               |
+    +---------------+----------+---------------+--------------------------+
+    | ``count``     | boolean  | Optional      | | Whether to return the  |
+    |               |          |               |   total number of        |
+    |               |          |               |   projects when using    |
+    |               |          |               |   ``cursor``             |
+    |               |          |               |   (defaults to: false)   |
+    +---------------+----------+---------------+--------------------------+
+    | ``compact``   | boolean  | Optional      | | Whether to return only |
+    |               |          |               |   the ``id``, ``name``,  |
+    |               |          |               |   ``namespace``,         |
+    |               |          |               |   ``fullname`` and       |
+    |               |          |               |   ``url_path`` of the    |
+    |               |          |               |   parent projects        |
+    |               |          |               |   (defaults to: false)   |
+    +---------------+----------+---------------+--------------------------+
 
     Sample response
     ^^^^^^^^^^^^^^^
@@ -476,39 +501,51 @@ def api_projects():
     if pagure.utils.authenticated() and username == flask.g.fas_user.username:
         private = flask.g.fas_user.username
 
-    project_count = pagure.lib.query.search_projects(
-        flask.g.session,
-        username=username,
-        fork=fork,
-        tags=tags,
-        pattern=pattern,
-        private=private,
-        namespace=namespace,
-        owner=owner,
-        count=True,
-    )
+    params = {
+        "session": flask.g.session,
+        "username": username,
+        "fork": fork,
+        "tags": tags,
+        "pattern": pattern,
+        "private": private,
+        "namespace": namespace,
+        "owner": owner,
+    }
 
-    # Pagination code inspired by Flask-SQLAlchemy
-    page = get_page()
     per_page = get_per_page()
-    pagination_metadata = pagure.lib.query.get_pagination_metadata(
-        flask.request, page, per_page, project_count
-    )
-    query_start = (page - 1) * per_page
-    query_limit = per_page
-
-    projects = pagure.lib.query.search_projects(
-        flask.g.session,
-        username=username,
-        fork=fork,
-        tags=tags,
-        pattern=pattern,
-        private=private,
-        namespace=namespace,
-        owner=owner,
-        limit=query_limit,
-        start=query_start,
-    )
+    cursor = get_cursor()
+    compact = get_compact()
+    load_plan = None
+    if not short:
+        load_plan = pagure.lib.serializers.project_load_plan(compact=compact)
+    if cursor is None:
+        project_count = pagure.lib.query.search_projects(count=True, **params)
+
+        # Pagination code inspired by Flask-SQLAlchemy
+        page = get_page()
+        pagination_metadata = pagure.lib.query.get_pagination_metadata(
+            flask.request, page, per_page, project_count
+        )
+        query_start = (page - 1) * per_page
+        query_limit = per_page
+
+        projects = pagure.lib.query.search_projects(
+            limit=query_limit, start=query_start, load_plan=load_plan, **params
+        )
+    else:
+        project_count = None
+        if get_count():
+            project_count = pagure.lib.query.search_projects(
+                count=True, **params
+            )
+
+        projects = pagure.lib.query.search_projects(
+            limit=per_page + 1, keyset=cursor, load_plan=load_plan, **params
+        )
+        pagination_metadata = pagure.lib.query.get_keyset_pagination_metadata(
+            flask.request, per_page, projects, total=project_count
+        )
+        projects = projects[:per_page]
 
     # prepare the output json
     jsonout = {
@@ -526,7 +563,10 @@ def api_projects():
     }
 
     if not short:
-        projects = [p.to_json(api=True, public=True) for p in projects]
+        serializer = pagure.lib.serializers.Serializer(
+            public=True, api=True, compact=compact
+        )
+        projects = [serializer.project(p) for p in projects]
     else:
         projects = [
             {
@@ -542,7 +582,8 @@ def api_projects():
 
     jsonout["projects"] = projects
     if pagination_metadata:
-        jsonout["args"]["page"] = page
+        if cursor is None:
+            jsonout["args"]["page"] = page
         jsonout["args"]["per_page"] = per_page
         jsonout["pagination"] = pagination_metadata
     return flask.jsonify(jsonout)
@@ -20,7 +20,17 @@ import six
 import pagure
 import pagure.exceptions
 import pagure.lib.query
-from pagure.api import API, api_method, APIERROR, get_page, get_per_page
+import pagure.lib.serializers
+from pagure.api import (
+    API,
+    api_method,
+    APIERROR,
+    get_page,
+    get_per_page,
+    get_cursor,
+    get_count,
+    get_compact,
+)
 from pagure.utils import is_true
 
 
@@ -33,6 +43,50 @@ def _get_user(username):
         raise pagure.exceptions.APIError(404, error_code=APIERROR.ENOUSER)
 
 
+def _get_user_projects(username, fork, per_page, key_page, key_cursor):
+    """ Return the projects or the forks of the specified user and their
+    pagination metadata, paginating them using the cursor specified in
+    `key_cursor` if there is one and the page specified in `key_page`
+    otherwise.
+    """
+    cursor = get_cursor(key_cursor=key_cursor)
+    if cursor is not None:
+        projects = pagure.lib.query.search_projects(
+            flask.g.session,
+            username=username,
+            fork=fork,
+            keyset=cursor,
+            limit=per_page + 1,
+        )
+        pagination = pagure.lib.query.get_keyset_pagination_metadata(
+            flask.request, per_page, projects, key_cursor=key_cursor
+        )
+        return projects[:per_page], pagination
+
+    page = flask.request.args.get(key_page, 1)
+    try:
+        page = int(page)
+    except ValueError:
+        page = 1
+
+    projects_cnt = pagure.lib.query.search_projects(
+        flask.g.session, username=username, fork=fork, count=True
+    )
+
+    pagination = pagure.lib.query.get_pagination_metadata(
+        flask.request, page, per_page, projects_cnt, key_page=key_page
+    )
+
+    projects = pagure.lib.query.search_projects(
+        flask.g.session,
+        username=username,
+        fork=fork,
+        start=(page - 1) * per_page,
+        limit=per_page,
+    )
+    return projects, pagination
+
+
 @API.route("/user/<username>")
 @api_method
 def api_view_user(username):
@@ -69,6 +123,22 @@ def api_view_user(username):
     |               |          |               |   to return per page.    |
     |               |          |               |   The maximum is 100.    |
     +---------------+----------+---------------+--------------------------+
+    | ``repocursor``| string   | Optional      | | Paginate the projects  |
+    |               |          |               |   using the cursor       |
+    |               |          |               |   returned as            |
+    |               |          |               |   ``next_cursor``, empty |
+    |               |          |               |   for the first page,    |
+    |               |          |               |   rather than            |
+    |               |          |               |   ``repopage``           |
+    +---------------+----------+---------------+--------------------------+
+    | ``forkcursor``| string   | Optional      | | Paginate the forks     |
+    |               |          |               |   using the cursor       |
+    |               |          |               |   returned as            |
+    |               |          |               |   ``next_cursor``, empty |
+    |               |          |               |   for the first page,    |
+    |               |          |               |   rather than            |
+    |               |          |               |   ``forkpage``           |
+    +---------------+----------+---------------+--------------------------+
 
     Sample response
     ^^^^^^^^^^^^^^^
@@ -123,52 +193,11 @@ def api_view_user(username):
     user = _get_user(username=username)
 
     per_page = get_per_page()
-    repopage = flask.request.args.get("repopage", 1)
-    try:
-        repopage = int(repopage)
-    except ValueError:
-        repopage = 1
-
-    forkpage = flask.request.args.get("forkpage", 1)
-    try:
-        forkpage = int(forkpage)
-    except ValueError:
-        forkpage = 1
-
-    repos_cnt = pagure.lib.query.search_projects(
-        flask.g.session, username=username, fork=False, count=True
-    )
-
-    pagination_metadata_repo = pagure.lib.query.get_pagination_metadata(
-        flask.request, repopage, per_page, repos_cnt, key_page="repopage"
-    )
-    repopage_start = (repopage - 1) * per_page
-    repopage_limit = per_page
-
-    repos = pagure.lib.query.search_projects(
-        flask.g.session,
-        username=username,
-        fork=False,
-        start=repopage_start,
-        limit=repopage_limit,
-    )
-
-    forks_cnt = pagure.lib.query.search_projects(
-        flask.g.session, username=username, fork=True, count=True
+    repos, pagination_metadata_repo = _get_user_projects(
+        username, False, per_page, "repopage", "repocursor"
     )
-
-    pagination_metadata_fork = pagure.lib.query.get_pagination_metadata(
-        flask.request, forkpage, per_page, forks_cnt, key_page="forkpage"
-    )
-    forkpage_start = (forkpage - 1) * per_page
-    forkpage_limit = per_page
-
-    forks = pagure.lib.query.search_projects(
-        flask.g.session,
-        username=username,
-        fork=True,
-        start=forkpage_start,
-        limit=forkpage_limit,
+    forks, pagination_metadata_fork = _get_user_projects(
+        username, True, per_page, "forkpage", "forkcursor"
     )
 
     output["user"] = user.to_json(public=True)
@@ -182,6 +211,43 @@ def api_view_user(username):
     return jsonout
 
 
+def _get_user_issues(params, page, per_page, order_key, key_cursor):
+    """ Return the issues matching the specified parameters, their number
+    and their pagination metadata, paginating them using the cursor
+    specified in `key_cursor` if there is one.
+    """
+    cursor = get_cursor(order_key=order_key, key_cursor=key_cursor)
+    count_params = dict(
+        params, offset=None, limit=None, count=True, load_plan=None
+    )
+    if cursor is None:
+        issues = pagure.lib.query.search_issues(**params)
+        issues_cnt = pagure.lib.query.search_issues(**count_params)
+        pagination = pagure.lib.query.get_pagination_metadata(
+            flask.request, page, per_page, issues_cnt
+        )
+        return issues, issues_cnt, pagination
+
+    if order_key not in [None, "date_created", "last_updated"]:
+        raise pagure.exceptions.APIError(400, error_code=APIERROR.EINVALIDREQ)
+
+    issues_cnt = None
+    if get_count():
+        issues_cnt = pagure.lib.query.search_issues(**count_params)
+    issues = pagure.lib.query.search_issues(
+        **dict(params, offset=None, limit=per_page + 1, keyset=cursor)
+    )
+    pagination = pagure.lib.query.get_keyset_pagination_metadata(
+        flask.request,
+        per_page,
+        issues,
+        order_key=order_key,
+        total=issues_cnt,
+        key_cursor=key_cursor,
+    )
+    return issues[:per_page], issues_cnt, pagination
+
+
 @API.route("/user/<username>/issues")
 @api_method
 def api_view_user_issues(username):
@@ -258,6 +324,36 @@ def api_view_user_issues(username):
     |               |         |              |   created by this user or |
     |               |         |              |   not. Defaults to True   |
     +---------------+---------+--------------+---------------------------+
+    | ``created_``  | string  | Optional     | | Paginate the issues     |
+    | ``cursor``    |         |              |   created using the       |
+    |               |         |              |   cursor returned as      |
+    |               |         |              |   ``next_cursor``, empty  |
+    |               |         |              |   for the first page,     |
+    |               |         |              |   rather than ``page``.   |
+    |               |         |              |   Only for the            |
+    |               |         |              |   ``date_created`` and    |
+    |               |         |              |   ``last_updated`` keys.  |
+    +---------------+---------+--------------+---------------------------+
+    | ``assigned_`` | string  | Optional     | | Paginate the issues     |
+    | ``cursor``    |         |              |   assigned using the      |
+    |               |         |              |   cursor returned as      |
+    |               |         |              |   ``next_cursor``, empty  |
+    |               |         |              |   for the first page,     |
+    |               |         |              |   rather than ``page``    |
+    +---------------+---------+--------------+---------------------------+
+    | ``count``     | boolean | Optional     | | Whether to return the   |
+    |               |         |              |   total number of issues  |
+    |               |         |              |   when using the cursors  |
+    |               |         |              |   (defaults to: false)    |
+    +---------------+---------+--------------+---------------------------+
+    | ``compact``   | boolean | Optional     | | Whether to return only  |
+    |               |         |              |   the ``id``, ``name``,   |
+    |               |         |              |   ``namespace``,          |
+    |               |         |              |   ``fullname`` and        |
+    |               |         |              |   ``url_path`` of the     |
+    |               |         |              |   projects of the issues  |
+    |               |         |              |   (defaults to: false)    |
+    +---------------+---------+--------------+---------------------------+
 
     Sample response
     ^^^^^^^^^^^^^^^
@@ -384,6 +480,7 @@ def api_view_user_issues(username):
 
     offset = (page - 1) * per_page
     limit = per_page
+    compact = get_compact()
 
     params = {
         "session": flask.g.session,
@@ -394,6 +491,9 @@ def api_view_user_issues(username):
         "no_milestones": no_stones,
         "offset": offset,
         "limit": limit,
+        "load_plan": pagure.lib.serializers.issue_load_plan(
+            with_project=True, compact=compact
+        ),
     }
 
     if status is not None:
@@ -436,11 +536,12 @@ def api_view_user_issues(username):
         # Issues authored by this user
         params_created = params.copy()
         params_created.update({"author": username})
-        issues_created = pagure.lib.query.search_issues(**params_created)
-        params_created.update({"offset": None, "limit": None, "count": True})
-        issues_created_cnt = pagure.lib.query.search_issues(**params_created)
-        pagination_issues_created = pagure.lib.query.get_pagination_metadata(
-            flask.request, page, per_page, issues_created_cnt
+        (
+            issues_created,
+            issues_created_cnt,
+            pagination_issues_created,
+        ) = _get_user_issues(
+            params_created, page, per_page, order_key, "created_cursor"
         )
 
     issues_assigned = []
@@ -451,13 +552,17 @@ def api_view_user_issues(username):
         # Issues assigned to this user
         params_assigned = params.copy()
         params_assigned.update({"assignee": username})
-        issues_assigned = pagure.lib.query.search_issues(**params_assigned)
-        params_assigned.update({"offset": None, "limit": None, "count": True})
-        issues_assigned_cnt = pagure.lib.query.search_issues(**params_assigned)
-        pagination_issues_assigned = pagure.lib.query.get_pagination_metadata(
-            flask.request, page, per_page, issues_assigned_cnt
+        (
+            issues_assigned,
+            issues_assigned_cnt,
+            pagination_issues_assigned,
+        ) = _get_user_issues(
+            params_assigned, page, per_page, order_key, "assigned_cursor"
         )
 
+    serializer = pagure.lib.serializers.Serializer(
+        public=True, api=True, compact=compact
+    )
     jsonout = flask.jsonify(
         {
             "pagination_issues_created": pagination_issues_created,
@@ -467,11 +572,11 @@ def api_view_user_issues(username):
             "total_issues_created": issues_created_cnt,
             "total_issues_assigned": issues_assigned_cnt,
             "issues_created": [
-                issue.to_json(public=True, with_project=True)
+                serializer.issue(issue, with_project=True)
                 for issue in issues_created
             ],
             "issues_assigned": [
-                issue.to_json(public=True, with_project=True)
+                serializer.issue(issue, with_project=True)
                 for issue in issues_assigned
             ],
             "args": {
@@ -771,10 +876,31 @@ def api_view_user_requests_filed(username):
     | ``page``      | integer  | Mandatory    | | The page requested.      |
     |               |          |              |   Defaults to 1.           |
     +---------------+----------+--------------+----------------------------+
+    | ``cursor``    | string   | Optional     | | Paginate using the       |
+    |               |          |              |   cursor returned as       |
+    |               |          |              |   ``next_cursor``, empty   |
+    |               |          |              |   for the first page,      |
+    |               |          |              |   rather than ``page``     |
+    +---------------+----------+--------------+----------------------------+
+    | ``count``     | boolean  | Optional     | | Whether to return the    |
+    |               |          |              |   total number of pull     |
+    |               |          |              |   requests when using      |
+    |               |          |              |   ``cursor``               |
+    |               |          |              |   (defaults to: false)     |
+    +---------------+----------+--------------+----------------------------+
     | ``per_page``  | int      | Optional     | | The number of items  to  |
     |               |          |              |   return per page.         |
     |               |          |              |   The maximum is 100.      |
     +---------------+----------+--------------+----------------------------+
+    | ``compact``   | boolean  | Optional     | | Whether to return only   |
+    |               |          |              |   the ``id``, ``name``,    |
+    |               |          |              |   ``namespace``,           |
+    |               |          |              |   ``fullname`` and         |
+    |               |          |              |   ``url_path`` of the      |
+    |               |          |              |   projects of the pull     |
+    |               |          |              |   requests                 |
+    |               |          |              |   (defaults to: false)     |
+    +---------------+----------+--------------+----------------------------+
 
 
     Sample response
@@ -926,10 +1052,10 @@ def api_view_user_requests_filed(username):
     """  # noqa
     status = flask.request.args.get("status", "open")
 
-    page = get_page()
     per_page = get_per_page()
-    offset = (page - 1) * per_page
-    limit = per_page
+    cursor = get_cursor()
+    compact = get_compact()
+    load_plan = pagure.lib.serializers.pull_request_load_plan(compact=compact)
 
     orig_status = status
     if status.lower() == "all":
@@ -937,25 +1063,57 @@ def api_view_user_requests_filed(username):
     else:
         status = status.capitalize()
 
-    pullrequests_cnt = pagure.lib.query.get_pull_request_of_user(
-        flask.g.session, username=username, status=status, count=True
-    )
-    pagination = pagure.lib.query.get_pagination_metadata(
-        flask.request, page, per_page, pullrequests_cnt
-    )
+    if cursor is None:
+        page = get_page()
+        offset = (page - 1) * per_page
+        limit = per_page
 
-    pullrequests = pagure.lib.query.get_pull_request_of_user(
-        flask.g.session,
-        username=username,
-        status=status,
-        filed=username,
-        offset=offset,
-        limit=limit,
-    )
+        pullrequests_cnt = pagure.lib.query.get_pull_request_of_user(
+            flask.g.session, username=username, status=status, count=True
+        )
+        pagination = pagure.lib.query.get_pagination_metadata(
+            flask.request, page, per_page, pullrequests_cnt
+        )
 
-    pullrequestslist = [
-        pr.to_json(public=True, api=True) for pr in pullrequests
-    ]
+        pullrequests = pagure.lib.query.get_pull_request_of_user(
+            flask.g.session,
+            username=username,
+            status=status,
+            filed=username,
+            offset=offset,
+            limit=limit,
+            load_plan=load_plan,
+        )
+    else:
+        page = None
+        pullrequests_cnt = None
+        if get_count():
+            pullrequests_cnt = pagure.lib.query.get_pull_request_of_user(
+                flask.g.session,
+                username=username,
+                status=status,
+                filed=username,
+                count=True,
+            )
+
+        pullrequests = pagure.lib.query.get_pull_request_of_user(
+            flask.g.session,
+            username=username,
+            status=status,
+            filed=username,
+            keyset=cursor,
+            limit=per_page + 1,
+            load_plan=load_plan,
+        )
+        pagination = pagure.lib.query.get_keyset_pagination_metadata(
+            flask.request, per_page, pullrequests, total=pullrequests_cnt
+        )
+        pullrequests = pullrequests[:per_page]
+
+    serializer = pagure.lib.serializers.Serializer(
+        public=True, api=True, compact=compact
+    )
+    pullrequestslist = [serializer.pull_request(pr) for pr in pullrequests]
 
     return flask.jsonify(
         {
@@ -1002,6 +1160,18 @@ def api_view_user_requests_actionable(username):
     | ``page``      | integer  | Mandatory    | | The page requested.      |
     |               |          |              |   Defaults to 1.           |
     +---------------+----------+--------------+----------------------------+
+    | ``cursor``    | string   | Optional     | | Paginate using the       |
+    |               |          |              |   cursor returned as       |
+    |               |          |              |   ``next_cursor``, empty   |
+    |               |          |              |   for the first page,      |
+    |               |          |              |   rather than ``page``     |
+    +---------------+----------+--------------+----------------------------+
+    | ``count``     | boolean  | Optional     | | Whether to return the    |
+    |               |          |              |   total number of pull     |
+    |               |          |              |   requests when using      |
+    |               |          |              |   ``cursor``               |
+    |               |          |              |   (defaults to: false)     |
+    +---------------+----------+--------------+----------------------------+
     | ``status``    | string   | Optional     | | Filter the status of     |
     |               |          |              |   pull requests. Default:  |
     |               |          |              |   ``Open`` (open pull      |
@@ -1014,6 +1184,15 @@ def api_view_user_requests_actionable(username):
     |               |          |              |   ``All`` returns closed,  |
     |               |          |              |   merged and open requests.|
     +---------------+----------+--------------+----------------------------+
+    | ``compact``   | boolean  | Optional     | | Whether to return only   |
+    |               |          |              |   the ``id``, ``name``,    |
+    |               |          |              |   ``namespace``,           |
+    |               |          |              |   ``fullname`` and         |
+    |               |          |              |   ``url_path`` of the      |
+    |               |          |              |   projects of the pull     |
+    |               |          |              |   requests                 |
+    |               |          |              |   (defaults to: false)     |
+    +---------------+----------+--------------+----------------------------+
 
     Sample response
     ^^^^^^^^^^^^^^^
@@ -1164,10 +1343,10 @@ def api_view_user_requests_actionable(username):
     """  # noqa
     status = flask.request.args.get("status", "open")
 
-    page = get_page()
     per_page = get_per_page()
-    offset = (page - 1) * per_page
-    limit = per_page
+    cursor = get_cursor()
+    compact = get_compact()
+    load_plan = pagure.lib.serializers.pull_request_load_plan(compact=compact)
 
     orig_status = status
     if status.lower() == "all":
@@ -1175,25 +1354,57 @@ def api_view_user_requests_actionable(username):
     else:
         status = status.capitalize()
 
-    pullrequests_cnt = pagure.lib.query.get_pull_request_of_user(
-        flask.g.session, username=username, status=status, count=True
-    )
-    pagination = pagure.lib.query.get_pagination_metadata(
-        flask.request, page, per_page, pullrequests_cnt
-    )
+    if cursor is None:
+        page = get_page()
+        offset = (page - 1) * per_page
+        limit = per_page
 
-    pullrequests = pagure.lib.query.get_pull_request_of_user(
-        flask.g.session,
-        username=username,
-        status=status,
-        actionable=username,
-        offset=offset,
-        limit=limit,
-    )
+        pullrequests_cnt = pagure.lib.query.get_pull_request_of_user(
+            flask.g.session, username=username, status=status, count=True
+        )
+        pagination = pagure.lib.query.get_pagination_metadata(
+            flask.request, page, per_page, pullrequests_cnt
+        )
 
-    pullrequestslist = [
-        pr.to_json(public=True, api=True) for pr in pullrequests
-    ]
+        pullrequests = pagure.lib.query.get_pull_request_of_user(
+            flask.g.session,
+            username=username,
+            status=status,
+            actionable=username,
+            offset=offset,
+            limit=limit,
+            load_plan=load_plan,
+        )
+    else:
+        page = None
+        pullrequests_cnt = None
+        if get_count():
+            pullrequests_cnt = pagure.lib.query.get_pull_request_of_user(
+                flask.g.session,
+                username=username,
+                status=status,
+                actionable=username,
+                count=True,
+            )
+
+        pullrequests = pagure.lib.query.get_pull_request_of_user(
+            flask.g.session,
+            username=username,
+            status=status,
+            actionable=username,
+            keyset=cursor,
+            limit=per_page + 1,
+            load_plan=load_plan,
+        )
+        pagination = pagure.lib.query.get_keyset_pagination_metadata(
+            flask.request, per_page, pullrequests, total=pullrequests_cnt
+        )
+        pullrequests = pullrequests[:per_page]
+
+    serializer = pagure.lib.serializers.Serializer(
+        public=True, api=True, compact=compact
+    )
+    pullrequestslist = [serializer.pull_request(pr) for pr in pullrequests]
 
     return flask.jsonify(
         {
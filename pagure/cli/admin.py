@@ -29,8 +29,10 @@ if "PAGURE_CONFIG" not in os.environ and os.path.exists(
 
 import pagure.config  # noqa: E402
 import pagure.exceptions  # noqa: E402
+import pagure.lib.export  # noqa: E402
 import pagure.lib.git  # noqa: E402
 import pagure.lib.query  # noqa: E402
+import pagure.lib.search  # noqa: E402
 import pagure.lib.tasks_utils  # noqa: E402
 from pagure.flask_app import generate_user_key_files  # noqa: E402
 
@@ -386,6 +388,62 @@ def _parser_ensure_project_hooks(subparser):
     local_parser.set_defaults(func=do_ensure_project_hooks)
 
 
+def _parser_search_index(subparser):
+    """ Set up the CLI argument parser for the search-index action.
+
+    :arg subparser: an argparse subparser allowing to have action's specific
+        arguments
+
+     """
+    local_parser = subparser.add_parser(
+        "search-index",
+        help="Index the issues and pull-requests for the full-text search",
+    )
+    local_parser.add_argument(
+        "--project",
+        default=None,
+        help="Only index the issues and pull-requests of this project",
+    )
+    local_parser.set_defaults(func=do_search_index)
+
+
+def _parser_export(subparser):
+    """ Set up the CLI argument parser for the export action.
+
+    :arg subparser: an argparse subparser allowing to have action's specific
+        arguments
+
+     """
+    local_parser = subparser.add_parser(
+        "export",
+        help="Export the issues or pull-requests of a project as "
+        "newline-delimited JSON",
+    )
+    local_parser.add_argument(
+        "project",
+        help="Project to export (as namespace/project if there "
+        "is a namespace)",
+    )
+    local_parser.add_argument(
+        "kind", choices=["issues", "pull-requests"], help="What to export"
+    )
+    local_parser.add_argument(
+        "--user", help="User of the project (to use only on forks)"
+    )
+    local_parser.add_argument(
+        "--updated-after",
+        default=None,
+        help="Only export what was updated after this date, as a timestamp "
+        "or in ISO 8601 format",
+    )
+    local_parser.add_argument(
+        "--output",
+        default=None,
+        help="File to write the export to, defaults to the standard output",
+    )
+    local_parser.set_defaults(func=do_export)
+
+
 def parse_arguments(args=None):
     """ Set-up the argument parsing. """
     parser = argparse.ArgumentParser(
@@ -441,6 +499,12 @@ def parse_arguments(args=None):
     # ensure-project-hooks
     _parser_ensure_project_hooks(subparser)
 
+    # search-index
+    _parser_search_index(subparser)
+
+    # export
+    _parser_export(subparser)
+
     return parser.parse_args(args)
 
 
@@ -1007,6 +1071,77 @@ def do_ensure_project_hooks(args):
     return projects
 
 
+def do_search_index(args):
+    """ Index the issues and pull-requests for the full-text search.
+
+    :arg args: the argparse object returned by ``parse_arguments()``.
+
+    """
+    _log.debug("project:          %s", args.project)
+
+    if not pagure.lib.search.is_enabled():
+        raise pagure.exceptions.PagureException(
+            "The full-text search is not enabled, see SEARCH_INDEX_BACKEND"
+        )
+
+    project = None
+    if args.project:
+        project = _get_project(args.project)
+        if project is None:
+            raise pagure.exceptions.PagureException(
+                "No project found with: %s" % args.project
+            )
+
+    cnt = pagure.lib.search.reindex(session, project=project)
+    print("%s issues and pull-requests indexed" % cnt)
+
+
+def do_export(args):
+    """ Export the issues or pull-requests of a project as newline-delimited
+    JSON.
+
+    :arg args: the argparse object returned by ``parse_arguments()``.
+
+    """
+    _log.debug("project:          %s", args.project)
+    _log.debug("kind:             %s", args.kind)
+    _log.debug("user:             %s", args.user)
+    _log.debug("updated after:    %s", args.updated_after)
+    _log.debug("output:           %s", args.output)
+
+    project = _get_project(args.project, user=args.user)
+    if project is None:
+        raise pagure.exceptions.PagureException(
+            "No project found with: %s" % args.project
+        )
+
+    updated_after = None
+    if args.updated_after:
+        try:
+            updated_after = pagure.lib.export.parse_updated_after(
+                args.updated_after
+            )
+        except ValueError:
+            raise pagure.exceptions.PagureException(
+                "Invalid date submitted: %s" % args.updated_after
+            )
+
+    if args.kind == "issues":
+        lines = pagure.lib.export.iter_issues(
+            session, project, updated_after=updated_after, private=None
+        )
+    else:
+        lines = pagure.lib.export.iter_pull_requests(
+            session, project, updated_after=updated_after
+        )
+
+    if args.output:
+        with open(args.output, "w") as stream:
+            stream.writelines(lines)
+    else:
+        sys.stdout.writelines(lines)
+
+
 def main():
     """ Start of the application. """
 
@@ -115,6 +115,7 @@ LOGCOM_CELERY_QUEUE = "pagure_logcom"
 LOADJSON_CELERY_QUEUE = "pagure_loadjson"
 CI_CELERY_QUEUE = "pagure_ci"
 MIRRORING_QUEUE = "pagure_mirror"
+EMAIL_CELERY_QUEUE = "pagure_email"
 
 # Number of items displayed per page
 ITEM_PER_PAGE = 48
@@ -128,6 +129,11 @@ IP_ALLOWED_INTERNAL = ["127.0.0.1", "localhost", "::1"]
 # Worker configuration
 CELERY_CONFIG = {}
 
+# Number of seconds to wait before writing the changes made to a ticket or a
+# pull-request to its git repo, all the changes made to the tickets or the
+# pull-requests of a project in the meantime are written in a single commit
+UPDATE_GIT_DELAY = 5
+
 # Redis configuration
 EVENTSOURCE_SOURCE = None
 WEBHOOK = False
@@ -135,6 +141,15 @@ REDIS_HOST = "0.0.0.0"
 REDIS_PORT = 6379
 REDIS_DB = 0
 EVENTSOURCE_PORT = 8080
+EV_STATS_PORT = None
+
+# Web-hooks delivery
+WEBHOOK_TIMEOUT = 15
+WEBHOOK_MAX_ATTEMPTS = 3
+WEBHOOK_BACKOFF = 1
+WEBHOOK_CIRCUIT_BREAKER_THRESHOLD = 10
+WEBHOOK_CIRCUIT_BREAKER_COOLDOWN = 600
+WEBHOOK_DELIVERIES_DAYS = 30
 
 # Disallow remote pull requests
 DISABLE_REMOTE_PR = False
@@ -212,6 +227,53 @@ GL_BINDIR = None
 # See https://git-scm.com/docs/git-gc#git-gc---auto for more details
 GIT_GARBAGE_COLLECT = False
 
+# How the main git repository of the forks is created: None to push the
+# branches of the parent to it, "hardlink" to hardlink the objects of the
+# parent and "alternates" to borrow them via the objects/info/alternates file
+FAST_FORK = None
+
+# Backend used to cache the blame of the files, either "disk" or "redis",
+# None to compute the blame every time it is viewed
+BLAME_CACHE_BACKEND = None
+# Folder where to store the blames when using the "disk" backend
+BLAME_CACHE_FOLDER = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "..", "lcl", "blame"
+)
+# Maximum number of blames to keep in the cache
+BLAME_CACHE_SIZE = 1000
+# Number of most viewed files whose blame is computed upon push
+BLAME_PREWARM_FILES = 0
+
+# Cache of the html generated from markdown
+MARKDOWN_CACHE_BACKEND = "memory"
+MARKDOWN_CACHE_SIZE = 1000
+MARKDOWN_CACHE_TTL = 300
+
+# Cache of the diffs of the pull-requests, it is filled by the workers when
+# it is shared, ie: using the "redis" or "tiered" backends
+PR_DIFF_CACHE_BACKEND = "memory"
+PR_DIFF_CACHE_SIZE = 100
+PR_DIFF_CACHE_TTL = 7 * 24 * 3600
+
+# Cache of the front page, trees and files of the projects viewed
+# anonymously: None, "memory", "redis" or "tiered"
+VIEW_CACHE_BACKEND = None
+VIEW_CACHE_SIZE = 100
+VIEW_CACHE_TTL = 3600
+# Change it to drop the cached pages after updating the templates
+VIEW_CACHE_VERSION = None
+
+# Cache of the users related to each project, its owner, access lists,
+# groups and watchers, used to find who to notify and who is watching an
+# issue or a pull-request: None, "memory", "redis" or "tiered"
+WATCHERS_CACHE_BACKEND = None
+WATCHERS_CACHE_SIZE = 1000
+WATCHERS_CACHE_TTL = 3600
+
+# Full-text search of the issues and pull-requests: None to only search the
+# titles, "auto", "postgresql" or "terms"
+SEARCH_INDEX_BACKEND = None
+
 
 # SMTP settings
 SMTP_SERVER = "localhost"
@@ -222,6 +284,28 @@ SMTP_SSL = False
 SMTP_USERNAME = None
 SMTP_PASSWORD = None
 
+# Send the emails from the worker of the EMAIL_CELERY_QUEUE rather than while
+# processing the request or the task notifying
+EMAIL_CELERY_QUEUE_ENABLED = False
+
+# Number of emails sent over a SMTP connection before opening a new one
+SMTP_MAX_MESSAGES = 100
+# Number of seconds after which a SMTP connection left unused is closed
+SMTP_IDLE_TIMEOUT = 30
+
+# Maximum number of emails sent per second by each process, 0 for no limit
+EMAIL_RATE_LIMIT = 0
+# Maximum number of recipients an email is sent to at once, they are then
+# not disclosed. The emails are always sent to each recipient separately when
+# their Reply-To header is specific to the recipient (see EVENTSOURCE_SOURCE)
+EMAIL_MAX_RECIPIENTS = 1
+# Number of times sending an email is retried and number of seconds to wait
+# before the first retry, doubled after every retry
+EMAIL_MAX_RETRIES = 5
+EMAIL_RETRY_BACKOFF = 60
+# Folder where the emails which could not be sent are stored
+EMAIL_DEAD_LETTER_FOLDER = None
+
 
 # Email used to sent emails
 FROM_EMAIL = "pagure@localhost.localdomain"
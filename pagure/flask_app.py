@@ -285,12 +285,16 @@ def set_request():
             flask.g.session, repo, user=username, namespace=namespace
         )
         if flask.g.authenticated:
-            flask.g.repo_forked = pagure.lib.query.get_authorized_project(
-                flask.g.session,
-                repo,
-                user=flask.g.fas_user.username,
-                namespace=namespace,
-            )
+            if username == flask.g.fas_user.username:
+                # The project viewed is the fork of the user
+                flask.g.repo_forked = flask.g.repo
+            else:
+                flask.g.repo_forked = pagure.lib.query.get_authorized_project(
+                    flask.g.session,
+                    repo,
+                    user=flask.g.fas_user.username,
+                    namespace=namespace,
+                )
             flask.g.repo_starred = pagure.lib.query.has_starred(
                 flask.g.session, flask.g.repo, user=flask.g.fas_user.username
             )
@@ -319,16 +323,12 @@ def set_request():
         flask.g.repo_admin = pagure.utils.is_repo_admin(flask.g.repo)
         flask.g.repo_committer = pagure.utils.is_repo_committer(flask.g.repo)
         flask.g.repo_user = pagure.utils.is_repo_user(flask.g.repo)
-        flask.g.branches = sorted(flask.g.repo_obj.listall_branches())
+        flask.g.branches = pagure.utils.LazyBranches(flask.g.repo_obj)
 
-        repouser = flask.g.repo.user.user if flask.g.repo.is_fork else None
-        fas_user = flask.g.fas_user if pagure.utils.authenticated() else None
+        fas_user = flask.g.fas_user if flask.g.authenticated else None
+        # The project was just retrieved, do not look it up again
         flask.g.repo_watch_levels = pagure.lib.query.get_watch_level_on_repo(
-            flask.g.session,
-            fas_user,
-            flask.g.repo.name,
-            repouser=repouser,
-            namespace=namespace,
+            flask.g.session, fas_user, flask.g.repo
         )
 
     items_per_page = pagure_config["ITEM_PER_PAGE"]
@@ -17,6 +17,8 @@ import six
 
 import pagure.config
 import pagure.exceptions
+import pagure.lib.commit_graph
+import pagure.lib.commit_log
 import pagure.lib.query
 import pagure.lib.tasks
 import pagure.lib.tasks_services
@@ -66,12 +68,20 @@ def send_notifications(session, project, repodir, user, refname, revs, forced):
     pushed.
     """
 
+    revs_authors = [
+        (
+            pagure.lib.git.get_author_email(rev, repodir),
+            pagure.lib.git.get_author(rev, repodir),
+        )
+        for rev in revs
+    ]
+    users = pagure.lib.query.EmailUserResolver(session).resolve(
+        [email for email, _ in revs_authors]
+    )
+
     auths = set()
-    for rev in revs:
-        email = pagure.lib.git.get_author_email(rev, repodir)
-        name = pagure.lib.git.get_author(rev, repodir)
-        author = pagure.lib.query.search_user(session, email=email) or name
-        auths.add(author)
+    for email, name in revs_authors:
+        auths.add(users.get(email) or name)
 
     authors = []
     for author in auths:
@@ -228,11 +238,44 @@ class DefaultRunner(BaseRunner):
                 if base:
                     oldrev = base[0]
 
+            is_branch = refname.startswith("refs/heads/")
             refname = refname.replace("refs/heads/", "")
             commits = pagure.lib.git.get_revs_between(
                 oldrev, newrev, repodir, refname
             )
 
+            # Keep the commit index of the repo up to date so computing the
+            # commits of the pull-requests does not walk the entire history
+            try:
+                pagure.lib.commit_graph.update_commit_graph(repo_obj, [newrev])
+            except Exception:
+                _log.exception("Error updating the commit index on push")
+            # Same for the commit log of the branch pushed to, used to
+            # paginate the list of commits
+            if is_branch:
+                try:
+                    pagure.lib.commit_log.update_commit_log(
+                        repo_obj, refname, newrev
+                    )
+                except Exception:
+                    _log.exception("Error updating the commit log on push")
+
+            if refname == default_branch:
+                # Refresh the commit stats, only processing the new commits
+                # unless the history was re-written
+                pagure.lib.tasks.update_commit_stats.delay(
+                    repopath=repodir, rebuild=forced
+                )
+                # Pre-compute the blame of the most viewed files
+                if _config.get("BLAME_CACHE_BACKEND") and _config.get(
+                    "BLAME_PREWARM_FILES"
+                ):
+                    pagure.lib.tasks.prewarm_blame.delay(
+                        repopath=repodir,
+                        commitid=newrev,
+                        count=_config["BLAME_PREWARM_FILES"],
+                    )
+
             log_all = _config.get("LOG_ALL_COMMITS", False)
             if log_all or refname == default_branch:
                 print(
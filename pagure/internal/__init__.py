@@ -28,6 +28,7 @@ PV = flask.Blueprint("internal_ns", __name__, url_prefix="/pv")
 import pagure  # noqa: E402
 import pagure.exceptions  # noqa: E402
 import pagure.forms  # noqa: E402
+import pagure.lib.commit_stats  # noqa: E402
 import pagure.lib.git  # noqa: E402
 import pagure.lib.query  # noqa: E402
 import pagure.lib.tasks  # noqa: E402
@@ -309,27 +310,18 @@ def mergeable_request_pull():
         response.status_code = 400
         return response
 
-    merge_status = request.merge_status
-    if not merge_status or force:
-        try:
-            merge_status = pagure.lib.git.merge_pull_request(
-                session=flask.g.session,
-                request=request,
-                username=None,
-                domerge=False,
-            )
-        except pygit2.GitError as err:
-            response = flask.jsonify(
-                {"code": "CONFLICTS", "message": "%s" % err}
-            )
-            response.status_code = 409
-            return response
-        except pagure.exceptions.PagureException as err:
-            response = flask.jsonify(
-                {"code": "CONFLICTS", "message": "%s" % err}
-            )
-            response.status_code = 500
-            return response
+    try:
+        merge_status = pagure.lib.git.get_merge_status(
+            flask.g.session, request, force=force
+        )
+    except pygit2.GitError as err:
+        response = flask.jsonify({"code": "CONFLICTS", "message": "%s" % err})
+        response.status_code = 409
+        return response
+    except pagure.exceptions.PagureException as err:
+        response = flask.jsonify({"code": "CONFLICTS", "message": "%s" % err})
+        response.status_code = 500
+        return response
 
     return flask.jsonify(pagure.utils.get_merge_options(request, merge_status))
 
@@ -683,6 +675,23 @@ def get_stats_commits():
 
     repopath = repo.repopath("main")
 
+    # If the stats are up to date, return them directly
+    stats = None
+    if os.path.exists(repopath):
+        stats = pagure.lib.commit_stats.get_cached_commit_stats(
+            pygit2.Repository(repopath)
+        )
+    if stats:
+        return flask.jsonify(
+            {
+                "code": "OK",
+                "message": "Stats found",
+                "results": pagure.lib.commit_stats.get_author_stats(
+                    flask.g.session, stats
+                ),
+            }
+        )
+
     task = pagure.lib.tasks.commits_author_stats.delay(repopath)
 
     return flask.jsonify(
@@ -727,6 +736,21 @@ def get_stats_commits_trend():
 
     repopath = repo.repopath("main")
 
+    # If the stats are up to date, return them directly
+    stats = None
+    if os.path.exists(repopath):
+        stats = pagure.lib.commit_stats.get_cached_commit_stats(
+            pygit2.Repository(repopath)
+        )
+    if stats:
+        return flask.jsonify(
+            {
+                "code": "OK",
+                "message": "Stats found",
+                "results": pagure.lib.commit_stats.get_history_stats(stats),
+            }
+        )
+
     task = pagure.lib.tasks.commits_history_stats.delay(repopath)
 
     return flask.jsonify(
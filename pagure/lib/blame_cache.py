@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+from __future__ import unicode_literals
+
+import bisect
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import zlib
+
+import redis
+
+from pagure.config import config as pagure_config
+
+
+_log = logging.getLogger(__name__)
+
+
+def _hash(*values):
+    """ Return a key usable in the caches for the specified values. """
+    return hashlib.sha1("\0".join(values).encode("utf-8")).hexdigest()
+
+
+class BlameSignature(object):
+    """ Light-weight version of the pygit2.Signature object, only keeping
+    the information needed to render the blame of a file.
+    """
+
+    __slots__ = ("name", "email", "time", "offset")
+
+    def __init__(self, name, email, time, offset):
+        self.name = name
+        self.email = email
+        self.time = time
+        self.offset = offset
+
+
+class BlameHunk(object):
+    """ Light-weight version of the pygit2.BlameHunk object. """
+
+    __slots__ = (
+        "final_start_line_number",
+        "lines_in_hunk",
+        "final_commit_id",
+        "orig_committer",
+    )
+
+    def __init__(self, start, lines, commit_id, committer):
+        self.final_start_line_number = start
+        self.lines_in_hunk = lines
+        self.final_commit_id = commit_id
+        self.orig_committer = committer
+
+
+class CachedBlame(object):
+    """ Blame of a file that can be stored in the cache and is used in place
+    of the pygit2.Blame object when rendering the blame of a file.
+    """
+
+    def __init__(self, hunks):
+        """ Constructor of the object.
+
+        :arg hunks: the list of BlameHunk objects composing the blame,
+            ordered by line number
+        :type hunks: list
+
+        """
+        self.hunks = hunks
+        self._starts = [hunk.final_start_line_number for hunk in hunks]
+
+    def __len__(self):
+        return len(self.hunks)
+
+    def __iter__(self):
+        return iter(self.hunks)
+
+    def for_line(self, line_no):
+        """ Return the BlameHunk of the specified line (starting at 1).
+
+        :raises IndexError: if the line is not in the file, the same way
+            pygit2 does
+
+        """
+        idx = bisect.bisect_right(self._starts, line_no) - 1
+        if idx < 0 or line_no < 1:
+            raise IndexError(line_no)
+        hunk = self.hunks[idx]
+        if line_no >= hunk.final_start_line_number + hunk.lines_in_hunk:
+            raise IndexError(line_no)
+        return hunk
+
+    @classmethod
+    def from_blame(cls, blame):
+        """ Build a CachedBlame from a pygit2.Blame object. """
+        hunks = []
+        for hunk in blame:
+            committer = None
+            try:
+                sig = hunk.orig_committer
+                if sig is not None:
+                    committer = BlameSignature(
+                        sig.name, sig.email, sig.time, sig.offset
+                    )
+            except ValueError:
+                pass
+            hunks.append(
+                BlameHunk(
+                    hunk.final_start_line_number,
+                    hunk.lines_in_hunk,
+                    "%s" % hunk.final_commit_id,
+                    committer,
+                )
+            )
+        return cls(hunks)
+
+    def dumps(self):
+        """ Return the compressed serialized form of the blame. """
+        data = []
+        for hunk in self.hunks:
+            row = [
+                hunk.final_start_line_number,
+                hunk.lines_in_hunk,
+                hunk.final_commit_id,
+            ]
+            committer = hunk.orig_committer
+            if committer is not None:
+                row.extend(
+                    [
+                        committer.name,
+                        committer.email,
+                        committer.time,
+                        committer.offset,
+                    ]
+                )
+            data.append(row)
+        return zlib.compress(
+            json.dumps(data, separators=(",", ":")).encode("utf-8")
+        )
+
+    @classmethod
+    def loads(cls, data):
+        """ Build a CachedBlame from its serialized form. """
+        hunks = []
+        for row in json.loads(zlib.decompress(data).decode("utf-8")):
+            committer = None
+            if len(row) > 3:
+                committer = BlameSignature(*row[3:7])
+            hunks.append(BlameHunk(row[0], row[1], row[2], committer))
+        return cls(hunks)
+
+
+class DiskBlameCache(object):
+    """ Store the blames in a folder on the local disk, removing the least
+    recently used ones when there are more than `size` of them.
+    """
+
+    def __init__(self, folder, size):
+        self.folder = folder
+        self.size = size
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with io.open(path, "rb") as stream:
+                data = stream.read()
+            # Mark the entry as recently used
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        return data
+
+    @staticmethod
+    def _write(path, data):
+        """ Atomically write the specified data in the specified file. """
+        folder = os.path.dirname(path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        tmppath = "%s.%s.tmp" % (path, os.getpid())
+        with io.open(tmppath, "wb") as stream:
+            stream.write(data)
+        os.rename(tmppath, path)
+
+    def set(self, key, data):
+        self._write(self._path(key), data)
+        self._evict()
+
+    def _evict(self):
+        """ Remove the least recently used entries from the cache. """
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            if root == self.folder:
+                continue
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+        if len(entries) <= self.size:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.size]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def record_view(self, repo_key, filename):
+        path = os.path.join(self.folder, "views-%s.json" % repo_key)
+        views = self._load_views(path)
+        views[filename] = views.get(filename, 0) + 1
+        self._write(path, json.dumps(views).encode("utf-8"))
+
+    def most_viewed(self, repo_key, count):
+        path = os.path.join(self.folder, "views-%s.json" % repo_key)
+        views = self._load_views(path)
+        return sorted(views, key=lambda name: (-views[name], name))[:count]
+
+    @staticmethod
+    def _load_views(path):
+        try:
+            with io.open(path, encoding="utf-8") as stream:
+                return json.load(stream)
+        except (IOError, OSError, ValueError):
+            return {}
+
+
+class RedisBlameCache(object):
+    """ Store the blames in redis, removing the least recently used ones
+    when there are more than `size` of them.
+    """
+
+    prefix = "pagure:blame:"
+
+    def __init__(self, client, size):
+        self.client = client
+        self.size = size
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        if data is not None:
+            self.client.execute_command(
+                "ZADD", self.prefix + "lru", time.time(), key
+            )
+        return data
+
+    def set(self, key, data):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, data)
+        pipe.execute_command("ZADD", self.prefix + "lru", time.time(), key)
+        pipe.execute()
+        self._evict()
+
+    def _evict(self):
+        """ Remove the least recently used entries from the cache. """
+        excess = self.client.zcard(self.prefix + "lru") - self.size
+        if excess <= 0:
+            return
+        keys = self.client.zrange(self.prefix + "lru", 0, excess - 1)
+        pipe = self.client.pipeline()
+        for key in keys:
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            pipe.delete(self.prefix + key)
+            pipe.zrem(self.prefix + "lru", key)
+        pipe.execute()
+
+    def record_view(self, repo_key, filename):
+        self.client.execute_command(
+            "ZINCRBY", self.prefix + "views:" + repo_key, 1, filename
+        )
+
+    def most_viewed(self, repo_key, count):
+        names = self.client.zrevrange(
+            self.prefix + "views:" + repo_key, 0, count - 1
+        )
+        return [
+            name.decode("utf-8") if isinstance(name, bytes) else name
+            for name in names
+        ]
+
+
+_CACHE = None
+
+
+def get_blame_cache():
+    """ Return the blame cache configured for this instance or None if
+    blames are not cached.
+    """
+    global _CACHE
+    backend = pagure_config.get("BLAME_CACHE_BACKEND")
+    if not backend:
+        return None
+    if _CACHE is None:
+        size = pagure_config.get("BLAME_CACHE_SIZE", 1000)
+        if backend == "redis":
+            pool = redis.ConnectionPool(
+                host=pagure_config["REDIS_HOST"],
+                port=pagure_config["REDIS_PORT"],
+                db=pagure_config["REDIS_DB"],
+            )
+            _CACHE = RedisBlameCache(
+                redis.StrictRedis(connection_pool=pool), size
+            )
+        else:
+            _CACHE = DiskBlameCache(pagure_config["BLAME_CACHE_FOLDER"], size)
+    return _CACHE
+
+
+def get_blame(repo_obj, filename, commitid):
+    """ Return the blame of the specified file at the specified commit if
+    it is in the cache, None otherwise.
+
+    :arg repo_obj: the git repository the file is in
+    :type repo_obj: pygit2.Repository
+    :arg filename: the path of the file in the repository
+    :type filename: str
+    :arg commitid: the identifier of the commit to blame the file at
+    :type commitid: str
+    :return: the blame of the file or None
+    :rtype: CachedBlame or None
+
+    """
+    cache = get_blame_cache()
+    if cache is None:
+        return None
+    try:
+        data = cache.get(_hash(repo_obj.path, filename, commitid))
+    except Exception:
+        _log.exception("Could not retrieve the blame from the cache")
+        return None
+    if data is None:
+        return None
+    return CachedBlame.loads(data)
+
+
+def compute_blame(repo_obj, filename, commitid):
+    """ Compute the blame of the specified file at the specified commit and
+    store it in the cache.
+
+    :arg repo_obj: the git repository the file is in
+    :type repo_obj: pygit2.Repository
+    :arg filename: the path of the file in the repository
+    :type filename: str
+    :arg commitid: the identifier of the commit to blame the file at
+    :type commitid: str
+    :return: the blame of the file
+    :rtype: CachedBlame
+
+    """
+    blame = CachedBlame.from_blame(
+        repo_obj.blame(filename, newest_commit=commitid)
+    )
+    cache = get_blame_cache()
+    if cache is not None:
+        try:
+            cache.set(_hash(repo_obj.path, filename, commitid), blame.dumps())
+        except Exception:
+            _log.exception("Could not store the blame in the cache")
+    return blame
+
+
+def record_view(repo_obj, filename):
+    """ Record that the blame of the specified file was viewed, used to
+    pre-compute the blame of the most viewed files upon push.
+    """
+    cache = get_blame_cache()
+    if cache is None or not pagure_config.get("BLAME_PREWARM_FILES"):
+        return
+    try:
+        cache.record_view(_hash(repo_obj.path), filename)
+    except Exception:
+        _log.exception("Could not record the blame view")
+
+
+def most_viewed(repo_obj, count):
+    """ Return the files of the specified git repository whose blame was
+    the most viewed.
+    """
+    cache = get_blame_cache()
+    if cache is None:
+        return []
+    return cache.most_viewed(_hash(repo_obj.path), count)
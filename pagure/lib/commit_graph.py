@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+from __future__ import unicode_literals
+
+import collections
+import heapq
+import io
+import logging
+import os
+import threading
+
+import pygit2
+
+
+_log = logging.getLogger(__name__)
+
+# Name of the file, stored in the git folder of the repository, holding the
+# commit index
+COMMIT_GRAPH_FILENAME = "pagure-commit-graph"
+
+# Flags used when painting the graph
+_IN_INCLUDE = 1
+_IN_EXCLUDE = 2
+_IN_BOTH = _IN_INCLUDE | _IN_EXCLUDE
+
+# Number of repositories whose commit index is kept in memory, the least
+# recently used ones are dropped and reloaded from disk when needed
+_CACHE_SIZE = 20
+_CACHE = collections.OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+class CommitGraph(object):
+    """ Persistent index of the commits of a git repository.
+
+    For each commit, the index stores its generation number (1 for a root
+    commit, 1 + the highest generation of its parents otherwise), its
+    commit time and its parents. This allows answering questions such as
+    "what are the commits in A that are not in B" or "what is the
+    merge-base of A and B" by walking only the part of the history that
+    matters instead of the entire history of the repository.
+
+    The index is stored as a text file in the git folder, one commit per
+    line: ``<oid> <generation> <commit time> [<parent oid> ...]``. Since
+    commits are immutable, the file is only ever appended to.
+
+    """
+
+    def __init__(self, path):
+        """ Constructor of the object.
+
+        :arg path: the path of the file holding the index
+        :type path: str
+
+        """
+        self.path = path
+        self.nodes = {}
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, oid):
+        return oid in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def refresh(self):
+        """ Load the entries added to the index on disk since it was last
+        read (for example by the post-receive hook).
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        inode = (stat.st_dev, stat.st_ino)
+        if inode != self._inode or stat.st_size < self._offset:
+            # The file was truncated/re-created, read it from scratch
+            self.nodes = {}
+            self._offset = 0
+            self._inode = inode
+        if stat.st_size == self._offset:
+            return
+
+        with io.open(self.path, "rb") as stream:
+            stream.seek(self._offset)
+            data = stream.read()
+
+        # Only consider complete lines, a partial one is likely being
+        # written at the moment and will be read on the next refresh
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("ascii", "ignore").splitlines():
+            info = line.split()
+            if len(info) < 3:
+                continue
+            try:
+                self.nodes[info[0]] = (
+                    int(info[1]),
+                    int(info[2]),
+                    tuple(info[3:]),
+                )
+            except ValueError:
+                _log.warning("Invalid line in %s: %s", self.path, line)
+        self._offset += end
+
+    def update(self, repo_obj, tips):
+        """ Add to the index the specified commits and all their ancestors
+        that are not already in it.
+
+        :arg repo_obj: the git repository the commits are in
+        :type repo_obj: pygit2.Repository
+        :arg tips: the list of commit identifiers to add to the index
+        :type tips: list
+        :return: the number of commits added to the index
+        :rtype: int
+
+        """
+        with self._lock:
+            return self._update(repo_obj, tips)
+
+    def _update(self, repo_obj, tips):
+        """ Actually update the index, see `update`. """
+        self.refresh()
+
+        new_nodes = []
+        parents_cache = {}
+        stack = [tip for tip in tips if tip and tip not in self.nodes]
+        while stack:
+            oid = stack[-1]
+            if oid in self.nodes:
+                stack.pop()
+                continue
+
+            if oid not in parents_cache:
+                commit = repo_obj.get(oid)
+                if commit is None:
+                    raise KeyError(
+                        "Commit %s not found in %s" % (oid, repo_obj.path)
+                    )
+                parents_cache[oid] = (
+                    commit.commit_time,
+                    tuple(parent.hex for parent in commit.parent_ids),
+                )
+            commit_time, parents = parents_cache[oid]
+
+            missing = [p for p in parents if p not in self.nodes]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            generation = 1
+            if parents:
+                generation += max(self.nodes[p][0] for p in parents)
+            self.nodes[oid] = (generation, commit_time, parents)
+            new_nodes.append(oid)
+            del parents_cache[oid]
+            stack.pop()
+
+        if new_nodes:
+            self._write(new_nodes)
+        return len(new_nodes)
+
+    def _write(self, oids):
+        """ Append the specified commits to the index stored on disk. """
+        lines = []
+        for oid in oids:
+            generation, commit_time, parents = self.nodes[oid]
+            lines.append(
+                " ".join(
+                    [oid, "%s" % generation, "%s" % commit_time]
+                    + list(parents)
+                )
+            )
+        data = ("\n".join(lines) + "\n").encode("ascii")
+        try:
+            with io.open(self.path, "ab") as stream:
+                stream.write(data)
+                offset = stream.tell()
+        except (IOError, OSError) as err:
+            # The index remains usable in memory for this process
+            _log.warning(
+                "Could not write the commit index %s: %s", self.path, err
+            )
+            return
+        # Do not re-read what was just written unless something else was
+        # written in between
+        if offset == self._offset + len(data):
+            self._offset = offset
+
+
+def has_commit_graph(repo_obj):
+    """ Return whether the commit index of the specified git repository was
+    built, which the post-receive hook does and keeps up to date.
+
+    The repositories not indexed, such as the temporary clones, are walked
+    instead of being indexed on the fly.
+
+    :arg repo_obj: the git repository to check
+    :type repo_obj: pygit2.Repository
+    :rtype: bool
+
+    """
+    return os.path.exists(os.path.join(repo_obj.path, COMMIT_GRAPH_FILENAME))
+
+
+def get_commit_graph(repo_obj):
+    """ Return the CommitGraph of the specified git repository, updated with
+    what has been written on disk since it was last loaded.
+
+    :arg repo_obj: the git repository to retrieve the index of
+    :type repo_obj: pygit2.Repository
+    :return: the commit index of the repository
+    :rtype: CommitGraph
+
+    """
+    path = os.path.join(repo_obj.path, COMMIT_GRAPH_FILENAME)
+    with _CACHE_LOCK:
+        graph = _CACHE.pop(path, None)
+        if graph is None:
+            graph = CommitGraph(path)
+        # Mark the index as recently used
+        _CACHE[path] = graph
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    with graph._lock:
+        graph.refresh()
+    return graph
+
+
+def update_commit_graph(repo_obj, tips):
+    """ Add the specified commits and their ancestors to the commit index of
+    the specified git repository.
+
+    :arg repo_obj: the git repository to update the index of
+    :type repo_obj: pygit2.Repository
+    :arg tips: the list of commit identifiers to add to the index
+    :type tips: list
+    :return: the number of commits added to the index
+    :rtype: int
+
+    """
+    return get_commit_graph(repo_obj).update(repo_obj, tips)
+
+
+class _GraphView(object):
+    """ Read-only view over the commit indexes of one or more repositories,
+    used when comparing a fork against its parent.
+    """
+
+    def __init__(self, sources):
+        """ Constructor of the object.
+
+        :arg sources: a list of (pygit2.Repository, CommitGraph) tuples
+        """
+        self.sources = sources
+
+    def node(self, oid):
+        """ Return the (generation, commit time, parents) tuple of the
+        specified commit, indexing it if needed.
+        """
+        for _, graph in self.sources:
+            node = graph.nodes.get(oid)
+            if node is not None:
+                return node
+
+        for repo_obj, graph in self.sources:
+            if oid in repo_obj:
+                graph.update(repo_obj, [oid])
+                return graph.nodes[oid]
+
+        raise KeyError("Commit %s not found" % oid)
+
+
+def _get_view(repo_obj, tips, other_repo=None, other_tips=None):
+    """ Return a _GraphView for the specified repo(s) with the specified
+    commits indexed.
+    """
+    sources = []
+    graph = get_commit_graph(repo_obj)
+    graph.update(repo_obj, tips)
+    sources.append((repo_obj, graph))
+    if other_repo is not None and other_repo.path != repo_obj.path:
+        other_graph = get_commit_graph(other_repo)
+        other_graph.update(other_repo, other_tips or [])
+        sources.append((other_repo, other_graph))
+    elif other_tips:
+        graph.update(repo_obj, other_tips)
+    return _GraphView(sources)
+
+
+def _paint(view, include, exclude, stop_at_first_common=False):
+    """ Walk the graph from the specified commits, by decreasing generation
+    number, marking each commit as reachable from `include`, from `exclude`
+    or from both.
+
+    The walk stops as soon as all the commits left to visit are reachable
+    from both sides, meaning none of their ancestors is of interest.
+
+    :return: the list of (oid, flags) in the order they were visited
+    """
+    flags = {}
+    heap = []
+    visited = []
+    seen = set()
+
+    def _push(oid, flag):
+        old = flags.get(oid, 0)
+        if old | flag == old:
+            return
+        flags[oid] = old | flag
+        generation, commit_time, _ = view.node(oid)
+        heapq.heappush(heap, (-generation, -commit_time, oid))
+
+    for oid in include:
+        _push(oid, _IN_INCLUDE)
+    for oid in exclude:
+        _push(oid, _IN_EXCLUDE)
+
+    # The commits are visited by decreasing generation number, so when one
+    # is popped all its children have been visited and its flags are final
+    while heap:
+        if not stop_at_first_common and all(
+            flags[entry] == _IN_BOTH for _, _, entry in heap
+        ):
+            break
+        _, _, oid = heapq.heappop(heap)
+        if oid in seen:
+            continue
+        seen.add(oid)
+        flag = flags[oid]
+        visited.append((oid, flag))
+        if flag == _IN_BOTH and stop_at_first_common:
+            break
+        for parent in view.node(oid)[2]:
+            _push(parent, flag)
+
+    return visited
+
+
+def _walk_between(repo_obj, tip, base, base_repo):
+    """ Return the commits reachable from `tip` that are not reachable from
+    `base` by walking the history of the repositories, see
+    `commits_between`.
+    """
+    sort = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME
+    if base is None or base in repo_obj:
+        walker = repo_obj.walk(tip, sort)
+        if base is not None:
+            walker.hide(base)
+        return [commit.oid.hex for commit in walker]
+
+    # The base commit is only in the other repo, walk both histories until
+    # they meet
+    tip_walker = repo_obj.walk(tip, sort)
+    base_walker = base_repo.walk(base, sort)
+    tip_oids = []
+    tip_seen = set()
+    base_seen = set()
+    while True:
+        tip_commit = next(tip_walker, None)
+        base_commit = next(base_walker, None)
+        if tip_commit is None and base_commit is None:
+            break
+        if tip_commit is not None:
+            tip_oids.append(tip_commit.oid.hex)
+            tip_seen.add(tip_commit.oid.hex)
+            if tip_commit.oid.hex in base_seen:
+                break
+        if base_commit is not None:
+            base_seen.add(base_commit.oid.hex)
+            if base_commit.oid.hex in tip_seen:
+                break
+
+    for idx, oid in enumerate(tip_oids):
+        if oid in base_seen:
+            return tip_oids[:idx]
+    return tip_oids
+
+
+def _is_indexed(repo_obj, other_repo=None):
+    """ Return whether the specified repositories have a commit index. """
+    return has_commit_graph(repo_obj) and (
+        other_repo is None or has_commit_graph(other_repo)
+    )
+
+
+def commits_between(repo_obj, tip, base=None, base_repo=None):
+    """ Return the list of the commits reachable from `tip` that are not
+    reachable from `base`, newest first.
+
+    :arg repo_obj: the git repository containing the `tip` commit
+    :type repo_obj: pygit2.Repository
+    :arg tip: the identifier of the commit to start from
+    :type tip: str
+    :kwarg base: the identifier of the commit whose ancestors should be
+        excluded, if None, all the ancestors of `tip` are returned
+    :type base: str or None
+    :kwarg base_repo: the git repository containing the `base` commit, if
+        it differs from `repo_obj` (ie: when comparing a fork with its
+        parent)
+    :type base_repo: pygit2.Repository or None
+    :return: the list of commit identifiers
+    :rtype: list
+
+    """
+    if not _is_indexed(repo_obj, base_repo):
+        return _walk_between(repo_obj, tip, base, base_repo)
+
+    base_tips = [base] if base else []
+    view = _get_view(repo_obj, [tip], base_repo, base_tips)
+    return [
+        oid
+        for oid, flag in _paint(view, [tip], base_tips)
+        if flag == _IN_INCLUDE
+    ]
+
+
+def merge_base(repo_obj, first, second, other_repo=None):
+    """ Return the best common ancestor of the two specified commits.
+
+    :arg repo_obj: the git repository containing the `first` commit
+    :type repo_obj: pygit2.Repository
+    :arg first: the identifier of the first commit
+    :type first: str
+    :arg second: the identifier of the second commit
+    :type second: str
+    :kwarg other_repo: the git repository containing the `second` commit,
+        if it differs from `repo_obj`
+    :type other_repo: pygit2.Repository or None
+    :return: the identifier of the merge-base or None if the two commits
+        do not have any history in common
+    :rtype: str or None
+
+    """
+    if not _is_indexed(repo_obj, other_repo):
+        for candidate in (repo_obj, other_repo):
+            if candidate is None:
+                continue
+            if first in candidate and second in candidate:
+                oid = candidate.merge_base(first, second)
+                return oid.hex if oid else None
+        return None
+
+    view = _get_view(repo_obj, [first], other_repo, [second])
+    visited = _paint(view, [first], [second], stop_at_first_common=True)
+    if visited and visited[-1][1] == _IN_BOTH:
+        return visited[-1][0]
+    return None
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+from __future__ import unicode_literals
+
+import binascii
+import collections
+import fcntl
+import hashlib
+import io
+import logging
+import os
+import shutil
+import struct
+from contextlib import contextmanager
+
+import pagure.lib.commit_graph
+
+
+_log = logging.getLogger(__name__)
+
+# Name of the folder, stored in the git folder of the repository, holding
+# the commit log index of each branch
+COMMIT_LOG_FOLDER = "pagure-commit-log"
+
+_OID_SIZE = 20
+_POSITION = struct.Struct(">I")
+
+
+def _hash(value):
+    """ Return a name usable on the filesystem for the specified value. """
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+class CommitLog(object):
+    """ Index of the commits reachable from a branch of a git repository.
+
+    The index is composed of:
+    - a file listing the (binary) identifiers of the commits, oldest first,
+      so that new commits are simply appended to it when pushed and the
+      commit at a given position can be read directly.
+    - one file per author e-mail address listing the positions, in the
+      file above, of the commits made with this e-mail address.
+
+    If the branch is rewritten (ie: force-pushed), the index is rebuilt.
+
+    """
+
+    def __init__(self, repo_obj, branchname):
+        """ Constructor of the object.
+
+        :arg repo_obj: the git repository the branch is in
+        :type repo_obj: pygit2.Repository
+        :arg branchname: the name of the branch to index
+        :type branchname: str
+
+        """
+        self.repo_obj = repo_obj
+        self.branchname = branchname
+        self.path = os.path.join(
+            repo_obj.path,
+            COMMIT_LOG_FOLDER,
+            _hash("refs/heads/%s" % branchname),
+        )
+        self.oids_path = os.path.join(self.path, "oids")
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.oids_path) // _OID_SIZE
+        except OSError:
+            return 0
+
+    @contextmanager
+    def _lock(self):
+        """ Prevent concurrent updates of the index. """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        with io.open(os.path.join(self.path, "lock"), "wb") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(stream, fcntl.LOCK_UN)
+
+    def _read_oids(self, start, end):
+        """ Return the identifiers of the commits at the specified positions
+        of the index, `start` included, `end` excluded, oldest first.
+        """
+        if end <= start:
+            return []
+        with io.open(self.oids_path, "rb") as stream:
+            stream.seek(start * _OID_SIZE)
+            data = stream.read((end - start) * _OID_SIZE)
+        return [
+            binascii.hexlify(data[idx : idx + _OID_SIZE]).decode("ascii")
+            for idx in range(0, len(data) - _OID_SIZE + 1, _OID_SIZE)
+        ]
+
+    def _read_positions(self, email):
+        """ Return the positions of the commits made with the specified
+        e-mail address, oldest first.
+        """
+        path = os.path.join(self.path, "authors", _hash(email))
+        try:
+            with io.open(path, "rb") as stream:
+                data = stream.read()
+        except (IOError, OSError):
+            return []
+        size = _POSITION.size
+        return [
+            _POSITION.unpack(data[idx : idx + size])[0]
+            for idx in range(0, len(data) - size + 1, size)
+        ]
+
+    def head(self):
+        """ Return the identifier of the newest commit in the index or None
+        if the index is empty.
+        """
+        count = len(self)
+        if not count:
+            return None
+        oids = self._read_oids(count - 1, count)
+        return oids[0] if oids else None
+
+    def update(self, tip):
+        """ Update the index so it matches the specified commit, the current
+        head of the branch.
+
+        :arg tip: the identifier of the commit the branch points to
+        :type tip: str
+        :return: the number of commits added to the index
+        :rtype: int
+
+        """
+        with self._lock():
+            head = self.head()
+            if head == tip:
+                return 0
+
+            count = len(self)
+            if head and (
+                head not in self.repo_obj
+                or pagure.lib.commit_graph.merge_base(self.repo_obj, tip, head)
+                != head
+            ):
+                # The branch was rewritten, start over
+                _log.info(
+                    "%s is not an ancestor of %s, rebuilding the commit log",
+                    head,
+                    tip,
+                )
+                for filename in ("oids", "authors"):
+                    path = os.path.join(self.path, filename)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    elif os.path.exists(path):
+                        os.unlink(path)
+                head = None
+                count = 0
+
+            new_oids = pagure.lib.commit_graph.commits_between(
+                self.repo_obj, tip, base=head
+            )
+            new_oids.reverse()
+
+            authors = collections.defaultdict(list)
+            for idx, oid in enumerate(new_oids):
+                email = self.repo_obj[oid].author.email
+                if email:
+                    authors[email].append(count + idx)
+
+            authors_path = os.path.join(self.path, "authors")
+            if not os.path.exists(authors_path):
+                os.makedirs(authors_path)
+            for email, positions in authors.items():
+                path = os.path.join(authors_path, _hash(email))
+                with io.open(path, "ab") as stream:
+                    stream.write(
+                        b"".join(_POSITION.pack(pos) for pos in positions)
+                    )
+
+            # Write the commits last, so the readers never see commits whose
+            # authors are not indexed yet
+            with io.open(self.oids_path, "ab") as stream:
+                stream.write(
+                    b"".join(binascii.unhexlify(oid) for oid in new_oids)
+                )
+
+            return len(new_oids)
+
+    def get_commits(self, start, end):
+        """ Return the identifiers of the commits between the specified
+        positions, counted from the newest commit of the branch.
+
+        :arg start: the position of the first commit to return
+        :type start: int
+        :arg end: the position of the last commit to return (included)
+        :type end: int
+        :return: the list of commit identifiers, newest first
+        :rtype: list
+
+        """
+        count = len(self)
+        oids = self._read_oids(max(count - end - 1, 0), max(count - start, 0))
+        oids.reverse()
+        return oids
+
+    def get_author_commits(self, emails, start, end):
+        """ Return the number of commits made with any of the specified
+        e-mail addresses and the identifiers of the ones between the
+        specified positions, counted from the newest one.
+
+        :arg emails: the e-mail addresses of the author
+        :type emails: list
+        :arg start: the position of the first commit to return
+        :type start: int
+        :arg end: the position of the last commit to return (included)
+        :type end: int
+        :return: a tuple with the number of commits and the list of commit
+            identifiers, newest first
+        :rtype: tuple
+
+        """
+        count = len(self)
+        positions = set()
+        for email in set(emails):
+            # Ignore the commits being added to the index at the moment
+            positions.update(
+                pos for pos in self._read_positions(email) if pos < count
+            )
+        merged = sorted(positions, reverse=True)
+
+        oids = []
+        for pos in merged[start : end + 1]:
+            oids.extend(self._read_oids(pos, pos + 1))
+        return len(merged), oids
+
+
+def update_commit_log(repo_obj, branchname, tip):
+    """ Update the commit log index of the specified branch so it matches
+    the specified commit.
+
+    :arg repo_obj: the git repository the branch is in
+    :type repo_obj: pygit2.Repository
+    :arg branchname: the name of the branch
+    :type branchname: str
+    :arg tip: the identifier of the commit the branch points to
+    :type tip: str
+    :return: the commit log index of the branch
+    :rtype: CommitLog
+
+    """
+    commit_log = CommitLog(repo_obj, branchname)
+    commit_log.update(tip)
+    return commit_log
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+from __future__ import unicode_literals
+
+import collections
+import datetime
+import io
+import json
+import logging
+import os
+import tempfile
+
+import pygit2
+
+import pagure.lib.query
+
+
+_log = logging.getLogger(__name__)
+
+# Name of the file, stored in the git folder of the repository, holding the
+# commit statistics
+COMMIT_STATS_FILENAME = "pagure-commit-stats.json"
+
+
+def _get_stats_path(repo_obj):
+    """ Return the path of the file storing the commit statistics of the
+    specified git repository.
+    """
+    return os.path.join(repo_obj.path, COMMIT_STATS_FILENAME)
+
+
+def _empty_stats():
+    """ Return the statistics of a repository without any commit. """
+    return {
+        "head": None,
+        "number_of_commits": 0,
+        "first_commit_time": None,
+        "authors": [],
+        "dates": {},
+    }
+
+
+def load_commit_stats(repo_obj):
+    """ Return the commit statistics stored for the specified git repository
+    or None if there are none or they could not be read.
+
+    :arg repo_obj: the git repository to retrieve the statistics of
+    :type repo_obj: pygit2.Repository
+    :return: the statistics as stored on disk
+    :rtype: dict or None
+
+    """
+    path = _get_stats_path(repo_obj)
+    if not os.path.exists(path):
+        return None
+    try:
+        with io.open(path, encoding="utf-8") as stream:
+            return json.load(stream)
+    except (IOError, OSError, ValueError) as err:
+        _log.warning("Could not load the commit stats %s: %s", path, err)
+        return None
+
+
+def save_commit_stats(repo_obj, stats):
+    """ Store the specified commit statistics for the specified git
+    repository.
+
+    :arg repo_obj: the git repository the statistics are about
+    :type repo_obj: pygit2.Repository
+    :arg stats: the statistics to store
+    :type stats: dict
+
+    """
+    path = _get_stats_path(repo_obj)
+    try:
+        # Write into a temporary file and move it in place so readers never
+        # see a partially written file
+        fd, tmppath = tempfile.mkstemp(
+            prefix=".%s" % COMMIT_STATS_FILENAME, dir=repo_obj.path
+        )
+        with io.open(fd, "w", encoding="utf-8") as stream:
+            stream.write(json.dumps(stats, sort_keys=True))
+        os.rename(tmppath, path)
+    except (IOError, OSError) as err:
+        _log.warning("Could not write the commit stats %s: %s", path, err)
+
+
+def _walk(repo_obj, stats, head):
+    """ Add to the specified statistics the commits reachable from `head`
+    that were not already counted.
+    """
+    old_head = stats.get("head")
+    walker = repo_obj.walk(head, pygit2.GIT_SORT_NONE)
+    if old_head:
+        walker.hide(old_head)
+
+    authors = collections.OrderedDict()
+    for name, email, count in stats["authors"]:
+        authors[(name, email)] = count
+    dates = collections.defaultdict(int, stats["dates"])
+
+    commit = None
+    for commit in walker:
+        # For each commit record how many times each combination of name
+        # and e-mail appears in the git history.
+        key = (commit.author.name, commit.author.email)
+        authors[key] = authors.get(key, 0) + 1
+        day = datetime.datetime.utcfromtimestamp(commit.commit_time)
+        dates[day.date().isoformat()] += 1
+        stats["number_of_commits"] += 1
+
+    if commit is not None and not old_head:
+        # The last commit walked is the oldest one
+        stats["first_commit_time"] = commit.commit_time
+
+    stats["authors"] = [
+        [name, email, count] for (name, email), count in authors.items()
+    ]
+    stats["dates"] = dict(dates)
+    stats["head"] = head
+    return stats
+
+
+def get_commit_stats(repo_obj, rebuild=False):
+    """ Return the commit statistics of the default branch of the specified
+    git repository, updating them if the branch moved since they were last
+    computed.
+
+    If the branch moved forward, only the new commits are processed,
+    otherwise (for example after a force-push) the statistics are rebuilt
+    from scratch.
+
+    :arg repo_obj: the git repository to retrieve the statistics of
+    :type repo_obj: pygit2.Repository
+    :kwarg rebuild: a boolean specifying whether to ignore the statistics
+        stored and to rebuild them from scratch
+    :type rebuild: bool
+    :return: the statistics of the repository
+    :rtype: dict
+
+    """
+    head = repo_obj.head.get_object().oid.hex
+
+    stats = None if rebuild else load_commit_stats(repo_obj)
+    if stats and stats.get("head") == head:
+        return stats
+
+    if stats and stats.get("head"):
+        old_head = stats["head"]
+        base = None
+        if old_head in repo_obj:
+            base = repo_obj.merge_base(head, old_head)
+        if base is None or base.hex != old_head:
+            _log.info(
+                "%s is not an ancestor of %s, rebuilding the commit stats",
+                old_head,
+                head,
+            )
+            stats = None
+
+    stats = _walk(repo_obj, stats or _empty_stats(), head)
+    save_commit_stats(repo_obj, stats)
+    return stats
+
+
+def get_cached_commit_stats(repo_obj):
+    """ Return the commit statistics of the specified git repository if
+    they are up to date, None otherwise.
+
+    :arg repo_obj: the git repository to retrieve the statistics of
+    :type repo_obj: pygit2.Repository
+    :return: the statistics of the repository or None
+    :rtype: dict or None
+
+    """
+    if repo_obj.is_empty or repo_obj.head_is_unborn:
+        return None
+    stats = load_commit_stats(repo_obj)
+    if stats and stats.get("head") == repo_obj.head.target.hex:
+        return stats
+    return None
+
+
+def get_author_stats(session, stats):
+    """ Return the statistics about the authors of the commits in the
+    format returned by the ``commits_author_stats`` task.
+
+    :arg session: the session to use to connect to the database
+    :arg stats: the commit statistics of the repository
+    :type stats: dict
+    :return: a tuple containing the number of commits, the list of authors
+        ordered by number of commits, the number of authors and the time
+        of the oldest commit
+    :rtype: tuple
+
+    """
+    counts = collections.OrderedDict()
+    for name, email, count in stats["authors"]:
+        counts[(name, email)] = count
+
+    # Retrieve in one query the users we know the e-mail address of
+    users = pagure.lib.query.search_users_by_emails(
+        session, [email for _, email in counts]
+    )
+
+    merged = collections.OrderedDict()
+    for (name, email), val in counts.items():
+        user = users.get(email) if email else None
+        if user and (user.default_email != email or user.fullname != name):
+            # We know the the user, but the name or e-mail used in Git
+            # commit does not match their default e-mail address and full
+            # name. Let's merge them into one record.
+            name, email = user.fullname, user.default_email
+        merged[(name, email)] = merged.get((name, email), 0) + val
+
+    # Generate a list of contributors ordered by how many commits they
+    # authored. The list consists of tuples with number of commits and
+    # people with that number of commits. Each contributor is represented
+    # by a name and e-mail address.
+    authors_email = set()
+    out_stats = collections.defaultdict(list)
+    for authors, val in merged.items():
+        authors_email.add(authors[1])
+        out_stats[val].append(authors)
+    out_list = [
+        (key, out_stats[key]) for key in sorted(out_stats, reverse=True)
+    ]
+
+    return (
+        stats["number_of_commits"],
+        out_list,
+        len(authors_email),
+        stats["first_commit_time"],
+    )
+
+
+def get_history_stats(stats, days=365):
+    """ Return the number of commits made per day over the specified
+    period, in the format returned by the ``commits_history_stats`` task.
+
+    :arg stats: the commit statistics of the repository
+    :type stats: dict
+    :kwarg days: the number of days to return the statistics for
+    :type days: int
+    :return: a list of (date, number of commits) tuples ordered by date
+    :rtype: list
+
+    """
+    start = (
+        (datetime.datetime.utcnow() - datetime.timedelta(days=days))
+        .date()
+        .isoformat()
+    )
+    return [
+        (key, stats["dates"][key])
+        for key in sorted(stats["dates"])
+        if key >= start
+    ]
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Send the email notifications over a SMTP connection kept open between them.
+
+The connection is opened once per process and reused for all the emails
+sent, until it was used for SMTP_MAX_MESSAGES emails or left unused for
+SMTP_IDLE_TIMEOUT seconds. The emails are sent at most EMAIL_RATE_LIMIT per
+second.
+The emails which could not be sent because of a temporary error (the SMTP
+server could not be reached or answered with a 4xx code) are returned to be
+sent again later, the others are dead-lettered: logged and, if
+EMAIL_DEAD_LETTER_FOLDER is set, saved there.
+
+"""
+
+from __future__ import unicode_literals
+
+import io
+import logging
+import os
+import smtplib
+import socket
+import threading
+import time
+import uuid
+
+from pagure.config import config as pagure_config
+
+
+_log = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+_CONNECTION = {"smtp": None, "sent": 0, "last_used": 0, "last_sent": 0}
+
+# The errors only concerning the email being sent, not the connection
+_MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+def _connect():
+    """ Open a connection to the SMTP server. """
+    if pagure_config["SMTP_SSL"]:
+        smtp = smtplib.SMTP_SSL(
+            pagure_config["SMTP_SERVER"], pagure_config["SMTP_PORT"]
+        )
+    else:
+        smtp = smtplib.SMTP(
+            pagure_config["SMTP_SERVER"], pagure_config["SMTP_PORT"]
+        )
+    if pagure_config["SMTP_USERNAME"] and pagure_config["SMTP_PASSWORD"]:
+        smtp.login(
+            pagure_config["SMTP_USERNAME"], pagure_config["SMTP_PASSWORD"]
+        )
+    return smtp
+
+
+def close_connection():
+    """ Close the connection to the SMTP server, if one is open. """
+    smtp = _CONNECTION["smtp"]
+    _CONNECTION["smtp"] = None
+    if smtp is None:
+        return
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, socket.error):
+        pass
+
+
+def _get_connection():
+    """ Return the connection to the SMTP server, opening a new one if the
+    current one was used for too many emails or for too long ago.
+    """
+    max_messages = pagure_config.get("SMTP_MAX_MESSAGES", 100)
+    idle_timeout = pagure_config.get("SMTP_IDLE_TIMEOUT", 30)
+    if _CONNECTION["smtp"] is not None and (
+        (max_messages and _CONNECTION["sent"] >= max_messages)
+        or time.time() - _CONNECTION["last_used"] > idle_timeout
+    ):
+        close_connection()
+    if _CONNECTION["smtp"] is None:
+        _CONNECTION["smtp"] = _connect()
+        _CONNECTION["sent"] = 0
+    _CONNECTION["last_used"] = time.time()
+    return _CONNECTION["smtp"]
+
+
+def _throttle():
+    """ Wait until the next email can be sent without exceeding the rate
+    limit.
+    """
+    rate = pagure_config.get("EMAIL_RATE_LIMIT")
+    if not rate:
+        return
+    wait = _CONNECTION["last_sent"] + 1.0 / rate - time.time()
+    if wait > 0:
+        time.sleep(wait)
+    _CONNECTION["last_sent"] = time.time()
+
+
+def _is_temporary(err):
+    """ Return whether sending the email may succeed if tried again later.
+    """
+    if isinstance(err, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in err.recipients.values())
+    if isinstance(err, smtplib.SMTPResponseException):
+        return 400 <= err.smtp_code < 500
+    return True
+
+
+def dead_letter(mailto, message, reason):
+    """ Give up on sending the specified email, log it and store it in the
+    EMAIL_DEAD_LETTER_FOLDER if it is set.
+
+    :arg mailto: the recipient of the email
+    :type mailto: str
+    :arg message: the email, as a string
+    :type message: str
+    :arg reason: the error which prevented sending the email
+    :type reason: Exception or str
+    :return: the path of the file where the email is stored, if any
+    :rtype: str or None
+
+    """
+    _log.error("Could not send email to %s: %s", mailto, reason)
+    folder = pagure_config.get("EMAIL_DEAD_LETTER_FOLDER")
+    if not folder:
+        return None
+    path = os.path.join(
+        folder, "%s-%s.eml" % (int(time.time()), uuid.uuid4().hex)
+    )
+    with io.open(path, "w", encoding="utf-8") as stream:
+        stream.write(message)
+    return path
+
+
+def _send(from_email, mailtos, message):
+    """ Send the email, opening a new connection if the one kept open was
+    closed by the server.
+
+    :return: the recipients refused by the server, if not all of them were
+    :rtype: dict
+
+    """
+    try:
+        refused = _get_connection().sendmail(from_email, mailtos, message)
+    except smtplib.SMTPServerDisconnected:
+        close_connection()
+        refused = _get_connection().sendmail(from_email, mailtos, message)
+    _CONNECTION["sent"] += 1
+    return refused
+
+
+def send_messages(from_email, messages, retry=False):
+    """ Send the specified emails.
+
+    :arg from_email: the sender of the emails
+    :type from_email: str
+    :arg messages: the emails to send, as a list of (recipients, email)
+    :type messages: list
+    :kwarg retry: whether the emails failing because of a temporary error
+        are returned to be sent again later, rather than being dead-lettered
+    :type retry: bool
+    :return: the emails to send again later, as a list of
+        (recipients, email)
+    :rtype: list
+
+    """
+    pending = []
+    with _LOCK:
+        for idx, (mailtos, message) in enumerate(messages):
+            _throttle()
+            start = time.time()
+            try:
+                refused = _send(from_email, mailtos, message)
+            except _MESSAGE_ERRORS as err:
+                error, failed = err, [(mailtos, message)]
+            except (smtplib.SMTPException, socket.error) as err:
+                # The server cannot be used, for the remaining emails too
+                close_connection()
+                error, failed = err, messages[idx:]
+            else:
+                _log.info(
+                    "Sent email to %s in %d ms",
+                    ", ".join(m for m in mailtos if m not in refused),
+                    int((time.time() - start) * 1000),
+                )
+                if not refused:
+                    continue
+                # Only some of the recipients were refused
+                error = smtplib.SMTPRecipientsRefused(refused)
+                failed = [(sorted(refused), message)]
+
+            for mailtos, message in failed:
+                if retry and _is_temporary(error):
+                    _log.info(
+                        "Could not send email to %s, will retry: %s",
+                        ", ".join(mailtos),
+                        error,
+                    )
+                    pending.append((mailtos, message))
+                else:
+                    dead_letter(", ".join(mailtos), message, error)
+            if not isinstance(error, _MESSAGE_ERRORS):
+                break
+    return pending
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Export of the issues and pull-requests of a project as newline-delimited
+JSON, one object per line.
+
+The objects are retrieved in batches sorted on their last update, each
+batch being loaded together with the comments, users and custom fields
+of its objects, following the load plans of `pagure.lib.serializers`. A
+batch is serialized and released before the next one is retrieved, so the
+memory used does not depend on the number of objects exported.
+
+"""
+
+from __future__ import unicode_literals
+
+import json
+
+import arrow
+import six
+import sqlalchemy
+
+import pagure.lib.query
+import pagure.lib.serializers
+from pagure.lib import model
+
+
+BATCH_SIZE = 100
+
+
+def parse_updated_after(value):
+    """ Return the date the specified watermark corresponds to.
+
+    :arg value: a timestamp or a date in ISO 8601 format, in UTC
+    :type value: str
+    :return: the date as a naive datetime in UTC
+    :rtype: datetime.datetime
+    :raises ValueError: if the watermark is invalid
+
+    """
+    try:
+        if value.isdigit():
+            return arrow.get(int(value)).naive
+        return arrow.get(value).to("UTC").naive
+    except (arrow.parser.ParserError, OverflowError, TypeError, ValueError):
+        raise ValueError("Invalid date: %s" % value)
+
+
+def _iter_batches(query, columns, batch_size):
+    keyset = []
+    while True:
+        batch = (
+            pagure.lib.query._apply_keyset(query, columns, keyset)
+            .limit(batch_size)
+            .all()
+        )
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            break
+        keyset = [getattr(batch[-1], column.key) for column in columns]
+
+
+def iter_issues(
+    session, project, updated_after=None, private=False, batch_size=None
+):
+    """ Yield the issues of the specified project serialized to JSON, one
+    per line, from the least recently updated to the most recently updated.
+
+    :arg session: the session to use to connect to the database
+    :arg project: the project to export the issues of
+    :type project: pagure.lib.model.Project
+    :kwarg updated_after: only export the issues updated after that date
+    :type updated_after: datetime.datetime or None
+    :kwarg private: whether to export the private issues: if False they are
+        excluded, if None they are included and if it is a username, only
+        the private issues of that user are included
+    :type private: bool or str or None
+    :kwarg batch_size: the number of issues retrieved at once, defaults to
+        BATCH_SIZE
+    :type batch_size: int or None
+    :return: a generator of lines
+    :rtype: generator of str
+
+    """
+    query = (
+        session.query(model.Issue)
+        .filter(model.Issue.project_id == project.id)
+        .options(*pagure.lib.serializers.issue_load_plan())
+    )
+    if updated_after:
+        query = query.filter(model.Issue.last_updated >= updated_after)
+
+    if private is False:
+        query = query.filter(model.Issue.private == False)  # noqa: E712
+    elif isinstance(private, six.string_types):
+        user = pagure.lib.query.search_user(session, username=private)
+        clauses = [model.Issue.private == False]  # noqa: E712
+        if user is not None:
+            clauses.extend(
+                [
+                    model.Issue.user_id == user.id,
+                    model.Issue.assignee_id == user.id,
+                ]
+            )
+        query = query.filter(sqlalchemy.or_(*clauses))
+
+    for batch in _iter_batches(
+        query,
+        [model.Issue.last_updated, model.Issue.uid],
+        batch_size or BATCH_SIZE,
+    ):
+        serializer = pagure.lib.serializers.Serializer(public=True, api=True)
+        for issue in batch:
+            yield json.dumps(serializer.issue(issue)) + "\n"
+
+
+def iter_pull_requests(session, project, updated_after=None, batch_size=None):
+    """ Yield the pull-requests opened against the specified project
+    serialized to JSON, one per line, from the least recently updated to
+    the most recently updated.
+
+    :arg session: the session to use to connect to the database
+    :arg project: the project to export the pull-requests of
+    :type project: pagure.lib.model.Project
+    :kwarg updated_after: only export the pull-requests updated after that
+        date
+    :type updated_after: datetime.datetime or None
+    :kwarg batch_size: the number of pull-requests retrieved at once,
+        defaults to BATCH_SIZE
+    :type batch_size: int or None
+    :return: a generator of lines
+    :rtype: generator of str
+
+    """
+    query = (
+        session.query(model.PullRequest)
+        .filter(model.PullRequest.project_id == project.id)
+        .options(*pagure.lib.serializers.pull_request_load_plan())
+    )
+    if updated_after:
+        query = query.filter(model.PullRequest.last_updated >= updated_after)
+
+    for batch in _iter_batches(
+        query,
+        [model.PullRequest.last_updated, model.PullRequest.uid],
+        batch_size or BATCH_SIZE,
+    ):
+        serializer = pagure.lib.serializers.Serializer(public=True, api=True)
+        for request in batch:
+            yield json.dumps(serializer.pull_request(request)) + "\n"
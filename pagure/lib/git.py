@@ -16,6 +16,7 @@ from __future__ import print_function, unicode_literals
 # pylint: disable=too-many-lines
 
 import datetime
+import errno
 import json
 import logging
 import os
@@ -26,6 +27,7 @@ import tempfile
 
 import arrow
 import pygit2
+import redis
 import six
 
 from sqlalchemy.exc import SQLAlchemyError
@@ -35,6 +37,7 @@ from pygit2.remote import RemoteCollection
 
 import pagure.utils
 import pagure.exceptions
+import pagure.lib.commit_graph
 import pagure.lib.query
 import pagure.lib.notify
 from pagure.config import config as pagure_config
@@ -48,6 +51,11 @@ import pagure.hooks
 
 _log = logging.getLogger(__name__)
 
+# Number of commits logged to the DB at once
+LOG_COMMITS_BATCH_SIZE = 500
+
+_REDIS = None
+
 
 def commit_to_patch(
     repo_obj, commits, diff_view=False, find_similar=False, separated=False
@@ -178,17 +186,85 @@ def update_git(obj, repo):
     else:
         raise NotImplementedError("Unknown object type %s" % obj.isa)
 
-    queued = pagure.lib.tasks.update_git.delay(
-        repo.name,
-        repo.namespace,
-        repo.user.username if repo.is_fork else None,
-        ticketuid,
-        requestuid,
+    _add_pending_update(repo, obj.repotype, obj.uid)
+    queued = pagure.lib.tasks.update_git.apply_async(
+        args=(
+            repo.name,
+            repo.namespace,
+            repo.user.username if repo.is_fork else None,
+            ticketuid,
+            requestuid,
+        ),
+        countdown=pagure_config.get("UPDATE_GIT_DELAY", 0) or None,
     )
     _maybe_wait(queued)
     return queued
 
 
+def _get_redis():
+    """ Return the redis connection used to keep track of the tickets and
+    pull-requests waiting to be written to their git repo.
+    """
+    global _REDIS
+    if _REDIS is None:
+        pool = redis.ConnectionPool(
+            host=pagure_config["REDIS_HOST"],
+            port=pagure_config["REDIS_PORT"],
+            db=pagure_config["REDIS_DB"],
+        )
+        _REDIS = redis.StrictRedis(connection_pool=pool)
+    return _REDIS
+
+
+def _pending_updates_key(repo, repotype):
+    """ Return the redis key of the set of uids waiting to be written to
+    the specified git repo of the project. """
+    return "pagure:update_git:%s:%s" % (repotype, repo.fullname)
+
+
+def _add_pending_update(repo, repotype, uid):
+    """ Record that the ticket or pull-request with the specified uid is
+    waiting to be written to its git repo, so the first task writing to
+    this repo also writes it.
+    """
+    try:
+        _get_redis().sadd(_pending_updates_key(repo, repotype), uid)
+    except redis.exceptions.RedisError:
+        _log.exception("Could not record the pending update of %s", uid)
+
+
+def pop_pending_updates(repo, repotype, uid):
+    """ Return the uids of the tickets or pull-requests waiting to be
+    written to the specified git repo of the project, forgetting them.
+
+    :arg repo: the project the tickets or pull-requests are in
+    :type repo: pagure.lib.model.Project
+    :arg repotype: the type of git repo: tickets or requests
+    :type repotype: str
+    :arg uid: the uid of the ticket or pull-request the task was queued
+        for, always part of the uids returned
+    :type uid: str
+    :return: the sorted list of uids
+    :rtype: list
+
+    """
+    uids = set([uid])
+    key = _pending_updates_key(repo, repotype)
+    try:
+        pipeline = _get_redis().pipeline()
+        pipeline.smembers(key)
+        pipeline.delete(key)
+        pending, _ = pipeline.execute()
+    except redis.exceptions.RedisError:
+        _log.exception("Could not retrieve the pending updates of %s", key)
+        pending = []
+    for item in pending:
+        if isinstance(item, six.binary_type):
+            item = item.decode("utf-8")
+        uids.add(item)
+    return sorted(uids)
+
+
 def _maybe_wait(result):
     """ Function to patch if one wants to wait for finish.
 
@@ -209,6 +285,91 @@ def _make_signature(name, email):
 def _update_git(obj, repo):
     """ Update the given issue in its git.
 
+    See `_update_git_objects`.
+
+    """
+    return _update_git_objects([obj], repo)
+
+
+def _update_git_objects(objs, repo):
+    """ Update the given issues or pull-requests in their git.
+
+    The JSON representation of each object is written in the file named
+    after its uid and, if there are additions/changes, a single commit is
+    created for all of them directly in the git repo, without cloning it.
+
+    """
+    if not objs:
+        return
+    _log.info("Update the git repo: %s for: %s", repo.path, objs)
+
+    if repo.is_on_repospanner:
+        # The repo is not available locally, work in a clone
+        for obj in objs:
+            _update_git_clone(obj, repo)
+        return
+
+    repopath = repo.repopath(objs[0].repotype)
+    if repopath is None or not os.path.exists(repopath):
+        # Turns out we don't have a repo for this kind of object.
+        return
+    repo_obj = pygit2.Repository(repopath)
+
+    # See if there is a parent to this commit
+    parents = []
+    tree = None
+    try:
+        parent = repo_obj.revparse_single("refs/heads/master")
+        parents.append(parent.oid)
+        tree = parent.tree
+    except KeyError:
+        pass
+    builder = repo_obj.TreeBuilder(tree) if tree else repo_obj.TreeBuilder()
+
+    changed = []
+    for obj in objs:
+        blobid = repo_obj.create_blob(
+            json.dumps(
+                obj.to_json(),
+                sort_keys=True,
+                indent=4,
+                separators=(",", ": "),
+            ).encode("utf-8")
+        )
+        entry = builder.get(obj.uid)
+        if entry is not None and entry.id == blobid:
+            continue
+        builder.insert(obj.uid, blobid, pygit2.GIT_FILEMODE_BLOB)
+        changed.append(obj)
+
+    # If not change, return
+    if not changed:
+        return
+
+    if len(changed) == 1:
+        obj = changed[0]
+        message = "Updated %s %s: %s" % (obj.isa, obj.uid, obj.title)
+    else:
+        message = "Updated %s %ss\n\n%s" % (
+            len(changed),
+            changed[0].isa,
+            "\n".join(
+                "%s %s: %s" % (obj.isa, obj.uid, obj.title) for obj in changed
+            ),
+        )
+
+    # Author/commiter will always be this one
+    author = _make_signature(name="pagure", email="pagure")
+
+    # Actually commit
+    repo_obj.create_commit(
+        "refs/heads/master", author, author, message, builder.write(), parents
+    )
+
+
+def _update_git_clone(obj, repo):
+    """ Update the given issue in its git.
+
     This method forks the provided repo, add/edit the issue whose file name
     is defined by the uid field of the issue and if there are additions/
     changes commit them and push them back to the original repo.
@@ -1442,6 +1603,184 @@ def get_branch_ref(repo, branchname):
     return branch_ref.resolve()
 
 
+def _get_pull_request_repopath(request):
+    """ Return the path to the git repo the changes of the specified
+    pull-request are in, or None if there is none.
+    """
+    if request.remote:
+        return pagure.utils.get_remote_repo_path(
+            request.remote_git, request.branch_from
+        )
+    elif request.project_from:
+        return pagure.utils.get_repo_path(request.project_from)
+    return None
+
+
+def _can_check_merge_in_place(request):
+    """ Return whether the mergeability of the specified pull-request can
+    be checked directly in the git repos, without cloning them.
+    """
+    return (
+        not request.project.is_on_repospanner
+        and hasattr(pygit2.Odb, "add_disk_alternate")
+        and hasattr(pygit2.Repository, "descendant_of")
+        and hasattr(pygit2.Repository, "merge_commits")
+    )
+
+
+def _get_merge_heads(request, repo_obj=None, fork_obj=None):
+    """ Return the commit the target branch and the branch of origin of the
+    specified pull-request point to.
+
+    :return: a tuple of the identifiers of these two commits, the first
+        one being None if the target repo is empty
+    :raises pagure.exceptions.BranchNotFoundException: if one of the
+        branches could not be found
+
+    """
+    if repo_obj is None:
+        repo_obj = PagureRepo(pagure.utils.get_repo_path(request.project))
+    if fork_obj is None:
+        fork_obj = PagureRepo(_get_pull_request_repopath(request))
+
+    try:
+        branch = get_branch_ref(fork_obj, request.branch_from)
+    except pagure.exceptions.PagureException:
+        branch = None
+    if not branch:
+        raise pagure.exceptions.BranchNotFoundException(
+            "Branch %s could not be found in the repo %s"
+            % (
+                request.branch_from,
+                request.project_from.fullname
+                if request.project_from
+                else request.remote_git,
+            )
+        )
+    head = branch.target.hex
+
+    if repo_obj.is_empty or repo_obj.head_is_unborn:
+        return (None, head)
+
+    try:
+        branch_ref = get_branch_ref(repo_obj, request.branch)
+    except pagure.exceptions.PagureException:
+        branch_ref = None
+    if not branch_ref:
+        raise pagure.exceptions.BranchNotFoundException(
+            "Branch %s could not be found in the repo %s"
+            % (request.branch, request.project.fullname)
+        )
+
+    return (branch_ref.target.hex, head)
+
+
+def analyze_merge(repo_obj, target, head):
+    """ Return how the specified commit can be merged into the specified
+    target commit, without touching the working directory or the index of
+    the repo, so it works on bare repos.
+
+    :arg repo_obj: the git repo containing both commits
+    :type repo_obj: pygit2.Repository
+    :arg target: the identifier of the commit to merge into, None if the
+        target branch does not exist yet
+    :type target: str or None
+    :arg head: the identifier of the commit to merge
+    :type head: str
+    :return: the merge status: NO_CHANGE, FFORWARD, CONFLICTS or MERGE
+    :rtype: str
+
+    """
+    if target is None:
+        return "FFORWARD"
+    if target == head or repo_obj.descendant_of(target, head):
+        return "NO_CHANGE"
+    if repo_obj.descendant_of(head, target):
+        return "FFORWARD"
+
+    index = repo_obj.merge_commits(target, head)
+    if index.conflicts is not None:
+        return "CONFLICTS"
+    return "MERGE"
+
+
+def _merge_status_in_place(session, request):
+    """ Compute the merge status of the specified pull-request directly in
+    the git repos and store it, with the commits it was computed for.
+    """
+    repo_obj = PagureRepo(pagure.utils.get_repo_path(request.project))
+    fork_obj = PagureRepo(_get_pull_request_repopath(request))
+
+    # Update the start and stop commits in the DB, one last time
+    diff_commits = diff_pull_request(
+        session, request, fork_obj, repo_obj, with_diff=False
+    )
+    _log.info("  %s commit to merge", len(diff_commits))
+
+    if request.project.settings.get(
+        "Enforce_signed-off_commits_in_pull-request", False
+    ):
+        for commit in diff_commits:
+            if "signed-off-by" not in commit.message.lower():
+                _log.info("  Missing a required: signed-off-by: Bailing")
+                raise pagure.exceptions.PagureException(
+                    "This repo enforces that all commits are "
+                    "signed off by their author. "
+                )
+
+    target, head = _get_merge_heads(request, repo_obj, fork_obj)
+    if os.path.normpath(fork_obj.path) != os.path.normpath(repo_obj.path):
+        # Make the commits of the fork available in the target repo, in
+        # memory only
+        repo_obj.odb.add_disk_alternate(os.path.join(fork_obj.path, "objects"))
+
+    if request.status != "Open":
+        _log.info(
+            "  This pull-request has already been merged or closed by %s "
+            "on %s" % (request.closed_by.user, request.closed_at)
+        )
+        raise pagure.exceptions.PagureException(
+            "This pull-request was merged or closed by %s"
+            % request.closed_by.user
+        )
+
+    merge_status = analyze_merge(repo_obj, target, head)
+    _log.info("  Merge status: %s, reporting it", merge_status)
+    request.merge_status = merge_status
+    request.merge_status_target = target
+    request.merge_status_head = head
+    session.commit()
+    return merge_status
+
+
+def get_merge_status(session, request, force=False):
+    """ Return the merge status of the specified pull-request, computing
+    it only if the target branch or the branch of origin changed since it
+    was last computed.
+
+    :arg session: the session to use to connect to the database.
+    :arg request: the pull-request to check
+    :type request: pagure.lib.model.PullRequest
+    :kwarg force: compute the merge status even if it did not change
+    :type force: bool
+    :return: the merge status: NO_CHANGE, FFORWARD, CONFLICTS or MERGE
+    :rtype: str
+
+    """
+    if request.merge_status and not force:
+        # Merge status not tied to commits are kept until the pull-request
+        # is updated, as they used to be
+        if not request.merge_status_head or not _can_check_merge_in_place(
+            request
+        ):
+            return request.merge_status
+        heads = (request.merge_status_target, request.merge_status_head)
+        if heads == _get_merge_heads(request):
+            return request.merge_status
+
+    return merge_pull_request(session, request, username=None, domerge=False)
+
+
 def merge_pull_request(session, request, username, domerge=True):
     """ Merge the specified pull-request.
     """
@@ -1450,25 +1789,32 @@ def merge_pull_request(session, request, username, domerge=True):
     else:
         _log.info("%s asked to diff the pull-request: %s", username, request)
 
-    if request.remote:
-        # Get the fork
-        repopath = pagure.utils.get_remote_repo_path(
-            request.remote_git, request.branch_from
-        )
-    elif request.project_from:
-        # Get the fork
-        repopath = pagure.utils.get_repo_path(request.project_from)
-    else:
+    if not domerge and _can_check_merge_in_place(request):
+        if _get_pull_request_repopath(request) is None:
+            return
+        return _merge_status_in_place(session, request)
+
+    # Get the fork
+    repopath = _get_pull_request_repopath(request)
+    if repopath is None:
         return
 
     fork_obj = PagureRepo(repopath)
+    # The merge status is not tied to the commits it was computed for
+    request.merge_status_target = None
+    request.merge_status_head = None
 
     with TemporaryClone(request.project, "main", "merge_pr") as tempclone:
         new_repo = tempclone.repo
 
-        # Update the start and stop commits in the DB, one last time
+        # Update the start and stop commits in the DB, one last time. Use
+        # the project's repo rather than the clone, it has a commit index
         diff_commits = diff_pull_request(
-            session, request, fork_obj, new_repo, with_diff=False
+            session,
+            request,
+            fork_obj,
+            PagureRepo(pagure.utils.get_repo_path(request.project)),
+            with_diff=False,
         )
         _log.info("  %s commit to merge", len(diff_commits))
 
@@ -1742,7 +2088,27 @@ def merge_pull_request(session, request, username, domerge=True):
     return "Changes merged!"
 
 
-def get_diff_info(repo_obj, orig_repo, branch_from, branch_to, prid=None):
+def get_commits_diff(diff_commits):
+    """ Return the diff of the changes made by the specified commits.
+
+    :arg diff_commits: the commits, the most recent one first
+    :type diff_commits: list of pygit2.Commit
+    :return: the diff of the changes or None if there are no commits
+    :rtype: pygit2.Diff or None
+
+    """
+    if not diff_commits:
+        return None
+    first_commit = diff_commits[-1]
+    if first_commit.parents:
+        return first_commit.parents[0].tree.diff_to_tree(diff_commits[0].tree)
+    # The commits start the history, diff against an empty tree
+    return diff_commits[0].tree.diff_to_tree(swap=True)
+
+
+def get_diff_info(
+    repo_obj, orig_repo, branch_from, branch_to, prid=None, with_diff=True
+):
     """ Return the info needed to see a diff or make a Pull-Request between
     the two specified repo.
 
@@ -1753,6 +2119,8 @@ def get_diff_info(repo_obj, orig_repo, branch_from, branch_to, prid=None):
     :arg branch_to: the name of the branch in which we want to merge the
         changes in the second git repo
     :kwarg prid: the identifier of the pull-request to
+    :kwarg with_diff: A boolean on whether to compute the diff, it is None
+        otherwise
 
     """
     try:
@@ -1809,67 +2177,24 @@ def get_diff_info(repo_obj, orig_repo, branch_from, branch_to, prid=None):
         _log.info(
             "pagure.lib.git.get_diff_info: Pulling into a non-empty repo"
         )
+        base = None
         if branch:
             orig_commit = orig_repo[branch.get_object().hex]
-            main_walker = orig_repo.walk(
-                orig_commit.oid.hex, pygit2.GIT_SORT_NONE
-            )
+            base = orig_commit.oid.hex
 
         repo_commit = repo_obj[commitid]
-        branch_walker = repo_obj.walk(
-            repo_commit.oid.hex, pygit2.GIT_SORT_NONE
-        )
-
-        main_commits = set()
-        branch_commits = set()
-
-        while 1:
-            com = None
-            if branch:
-                try:
-                    com = next(main_walker)
-                    main_commits.add(com.oid.hex)
-                except StopIteration:
-                    com = None
-
-            try:
-                branch_commit = next(branch_walker)
-            except StopIteration:
-                branch_commit = None
-
-            # We sure never end up here but better safe than sorry
-            if com is None and branch_commit is None:
-                break
-
-            if branch_commit:
-                branch_commits.add(branch_commit.oid.hex)
-                diff_commits.append(branch_commit)
-            if main_commits.intersection(branch_commits):
-                break
-
-        # If master is ahead of branch, we need to remove the commits
-        # that are after the first one found in master
-        i = 0
-        if diff_commits and main_commits:
-            for i in range(len(diff_commits)):
-                if diff_commits[i].oid.hex in main_commits:
-                    break
-            diff_commits = diff_commits[:i]
+        # Use the commit index to only walk the part of the history that
+        # differs between the two branches
+        diff_commits = [
+            repo_obj[oid]
+            for oid in pagure.lib.commit_graph.commits_between(
+                repo_obj, repo_commit.oid.hex, base=base, base_repo=orig_repo
+            )
+        ]
 
         _log.debug("Diff commits: %s", diff_commits)
-        if diff_commits:
-            first_commit = repo_obj[diff_commits[-1].oid.hex]
-            if len(first_commit.parents) > 0:
-                diff = repo_obj.diff(
-                    repo_obj.revparse_single(first_commit.parents[0].oid.hex),
-                    repo_obj.revparse_single(diff_commits[0].oid.hex),
-                )
-            elif first_commit.oid.hex == diff_commits[0].oid.hex:
-                _log.info(
-                    "pagure.lib.git.get_diff_info: First commit is also the "
-                    "last commit"
-                )
-                diff = diff_commits[0].tree.diff_to_tree(swap=True)
+        if with_diff:
+            diff = get_commits_diff(diff_commits)
 
     elif orig_repo.is_empty and not repo_obj.is_empty:
         _log.info("pagure.lib.git.get_diff_info: Pulling into an empty repo")
@@ -1883,7 +2208,8 @@ def get_diff_info(repo_obj, orig_repo, branch_from, branch_to, prid=None):
             diff_commits.append(commit)
 
         _log.debug("Diff commits: %s", diff_commits)
-        diff = repo_commit.tree.diff_to_tree(swap=True)
+        if with_diff:
+            diff = repo_commit.tree.diff_to_tree(swap=True)
     else:
         raise pagure.exceptions.PagureException(
             "Fork is empty, there are no commits to create a pull "
@@ -1923,6 +2249,7 @@ def diff_pull_request(
         request.branch_from,
         request.branch,
         prid=request.id,
+        with_diff=with_diff,
     )
 
     if request.status == "Open" and diff_commits:
@@ -2109,34 +2436,52 @@ def get_git_tags_objects(project):
 
 
 def log_commits_to_db(session, project, commits, gitdir):
-    """ Log the given commits to the DB. """
+    """ Log the given commits to the DB.
+
+    The commits are processed by batches, resolving the authors of all the
+    commits of a batch in a single query and inserting their logs at once.
+
+    :arg session: the session to use to connect to the database.
+    :arg project: the project the commits were pushed to.
+    :type project: pagure.lib.model.Project
+    :arg commits: the identifiers of the commits to log.
+    :type commits: list
+    :arg gitdir: the path to the git repository the commits are in.
+    :type gitdir: str
+
+    """
     repo_obj = PagureRepo(gitdir)
+    resolver = pagure.lib.query.EmailUserResolver(session)
 
-    for commitid in commits:
-        try:
-            commit = repo_obj[commitid]
-        except ValueError:
-            continue
+    for idx in range(0, len(commits), LOG_COMMITS_BATCH_SIZE):
+        commit_objs = []
+        for commitid in commits[idx : idx + LOG_COMMITS_BATCH_SIZE]:
+            try:
+                commit_objs.append(repo_obj[commitid])
+            except ValueError:
+                continue
 
-        try:
-            author_obj = pagure.lib.query.get_user(
-                session, commit.author.email
-            )
-        except pagure.exceptions.PagureException:
-            author_obj = None
-
-        date_created = arrow.get(commit.commit_time)
-
-        log = model.PagureLog(
-            user_id=author_obj.id if author_obj else None,
-            user_email=commit.author.email if not author_obj else None,
-            project_id=project.id,
-            log_type="committed",
-            ref_id=commit.oid.hex,
-            date=date_created.date(),
-            date_created=date_created.datetime,
+        authors = resolver.resolve(
+            [commit.author.email for commit in commit_objs]
         )
-        session.add(log)
+
+        logs = []
+        for commit in commit_objs:
+            author_obj = authors.get(commit.author.email)
+            date_created = arrow.get(commit.commit_time)
+            logs.append(
+                dict(
+                    user_id=author_obj.id if author_obj else None,
+                    user_email=commit.author.email if not author_obj else None,
+                    project_id=project.id,
+                    log_type="committed",
+                    ref_id=commit.oid.hex,
+                    date=date_created.date(),
+                    date_created=date_created.datetime,
+                )
+            )
+        if logs:
+            session.bulk_insert_mappings(model.PagureLog, logs)
 
 
 def reinit_git(project, repofolder):
@@ -2212,6 +2557,10 @@ def delete_project_repos(project):
     Args:
         project (Project): Project to delete repos for
     """
+    if not project.is_on_repospanner:
+        # The forks created with FAST_FORK may borrow its objects
+        dissociate_forks(project)
+
     for repotype in pagure.lib.query.get_repotypes():
         if project.is_on_repospanner:
             _, regioninfo = project.repospanner_repo_info(repotype)
@@ -2408,3 +2757,164 @@ def create_project_repos(project, region, templ, ignore_existing):
         raise
 
     set_up_project_hooks(project, region)
+
+
+def _alternates_path(repopath):
+    """ Returns the path of the file listing the object stores a git
+    repository borrows objects from.
+    """
+    return os.path.join(repopath, "objects", "info", "alternates")
+
+
+def _link_objects(from_objects, to_objects):
+    """ Hardlinks the objects of an object store into another one, copying
+    them if they are on different filesystems.
+
+    Returns: (bool): Whether all the files listed could be linked, False
+        if some were removed while linking them (by a concurrent gc)
+    """
+    complete = True
+    for root, dirs, files in os.walk(from_objects):
+        relpath = os.path.relpath(root, from_objects)
+        if relpath.split(os.sep)[0] == "info":
+            continue
+        # Skip the quarantine directories of the pushes in progress
+        dirs[:] = [name for name in dirs if not name.startswith("incoming-")]
+        destdir = os.path.normpath(os.path.join(to_objects, relpath))
+        if not os.path.exists(destdir):
+            os.makedirs(destdir)
+        # Link the packs before their index so an index is never visible
+        # without its pack
+        for filename in sorted(files, key=lambda name: name.endswith(".idx")):
+            if filename.startswith("tmp_"):
+                continue
+            source = os.path.join(root, filename)
+            dest = os.path.join(destdir, filename)
+            if os.path.exists(dest):
+                continue
+            try:
+                try:
+                    os.link(source, dest)
+                except OSError as err:
+                    if err.errno != errno.EXDEV:
+                        raise
+                    shutil.copy2(source, dest)
+            except (IOError, OSError) as err:
+                if err.errno != errno.ENOENT:
+                    raise
+                complete = False
+    return complete
+
+
+def share_objects(from_path, to_path, mode):
+    """ Makes a git repository share the object store of another one.
+
+    Args:
+        from_path (string): Path of the repository whose objects are shared
+        to_path (string): Path of the repository sharing them
+        mode (string): Either "hardlink" to hardlink the packs and objects
+            of the first repository into the second one, or "alternates"
+            to have the second repository borrow the objects of the first
+            one via its `objects/info/alternates` file
+    """
+    from_objects = os.path.abspath(os.path.join(from_path, "objects"))
+    to_objects = os.path.join(to_path, "objects")
+
+    alternates = []
+    if os.path.exists(_alternates_path(from_path)):
+        with open(_alternates_path(from_path)) as stream:
+            alternates = [line.strip() for line in stream if line.strip()]
+
+    if mode == "alternates":
+        alternates.insert(0, from_objects)
+        # The objects no longer reachable in the parent must be kept since
+        # its forks may still use them
+        pygit2.Repository(from_path).config["gc.pruneExpire"] = "never"
+    elif mode == "hardlink":
+        # A gc of the parent replaces its packs while they are linked,
+        # retry until all the files could be linked
+        for _ in range(3):
+            if _link_objects(from_objects, to_objects):
+                break
+        else:
+            raise pagure.exceptions.PagureException(
+                "Could not link the objects of %s" % from_path
+            )
+    else:
+        raise ValueError("Invalid mode to share objects: %s" % mode)
+
+    # The objects the parent borrows are borrowed from the same places
+    if alternates:
+        with open(_alternates_path(to_path), "w") as stream:
+            stream.write("\n".join(alternates) + "\n")
+
+
+def fast_fork_repo(repo_from, repo_to, mode):
+    """ Fills the main git repository of a fork from the one of its parent
+    without transferring the objects: the fork shares the object store of
+    its parent and its branches are set directly, no hook is run.
+
+    Args:
+        repo_from (Project): Project forked
+        repo_to (Project): Fork whose main repository was just created
+        mode (string): How the objects are shared, see `share_objects`
+    """
+    from_path = repo_from.repopath("main")
+    to_path = repo_to.repopath("main")
+    share_objects(from_path, to_path, mode)
+
+    parent = pygit2.Repository(from_path)
+    fork = pygit2.Repository(to_path)
+    for refname in parent.listall_references():
+        if not refname.startswith("refs/heads/"):
+            continue
+        fork.references.create(
+            refname, parent.lookup_reference(refname).resolve().target
+        )
+
+    if not parent.head_is_unborn:
+        fork.references.create("HEAD", parent.head.name, force=True)
+
+
+def dissociate_repo(repopath):
+    """ Copies the objects a git repository borrows from other ones into
+    its own object store, so it no longer depends on them.
+
+    Args:
+        repopath (string): Path of the repository to dissociate
+    Returns: (bool): Whether the repository was borrowing objects
+    """
+    alternates = _alternates_path(repopath)
+    if not os.path.exists(alternates):
+        return False
+
+    _log.info("Dissociating the repo %s", repopath)
+    # Without --local, the objects of the alternates are packed as well
+    subprocess.check_output(["git", "repack", "-a", "-d", "-q"], cwd=repopath)
+    os.unlink(alternates)
+    return True
+
+
+def dissociate_forks(project):
+    """ Dissociates the main git repository of all the forks of a project
+    borrowing objects from it, before it is deleted.
+
+    Args:
+        project (Project): Project whose forks to dissociate
+    """
+    objects = os.path.abspath(
+        os.path.join(project.repopath("main"), "objects")
+    )
+    forks = list(project.forks)
+    while forks:
+        fork = forks.pop()
+        forks.extend(fork.forks)
+        if fork.is_on_repospanner:
+            continue
+        repopath = fork.repopath("main")
+        alternates = _alternates_path(repopath)
+        if not os.path.exists(alternates):
+            continue
+        with open(alternates) as stream:
+            if objects in [line.strip() for line in stream]:
+                dissociate_repo(repopath)
@@ -21,6 +21,7 @@ from io import open
 import werkzeug
 from six import with_metaclass
 from six.moves import dbm_gnu
+from sqlalchemy.orm import joinedload, subqueryload
 
 import pagure.exceptions
 import pagure.lib.query
@@ -34,6 +35,10 @@ _log = logging.getLogger(__name__)
 GIT_AUTH_BACKEND_NAME = None
 GIT_AUTH_BACKEND_INSTANCE = None
 
+# Number of projects loaded at once when generating the configuration of
+# all the projects
+PROJECTS_BATCH_SIZE = 500
+
 
 def get_git_auth_helper(backend=None):
     """ Instantiate and return the appropriate git auth helper backend.
@@ -275,6 +280,119 @@ class Gitolite2Auth(GitAuthHelper):
 
         return config
 
+    @staticmethod
+    def _get_fragments_folder(configfile):
+        """ Return the folder holding the gitolite configuration of each
+        project, from which the specified configuration file is built.
+
+        :arg configfile: the name of the gitolite configuration file
+        :type configfile: str
+        :return: the path to the folder
+        :return type: str
+
+        """
+        return "%s.d" % configfile
+
+    @classmethod
+    def _write_fragment(cls, folder, project, global_pr_only):
+        """ Store the gitolite configuration of the specified project in the
+        specified folder.
+
+        :arg folder: the folder holding the configuration of each project
+        :type folder: str
+        :arg project: the project to generate the configuration for
+        :type project: pagure.lib.model.Project
+        :arg global_pr_only: boolean on whether the pagure instance enforces
+            the PR workflow only or not
+        :type global_pr_only: bool
+
+        """
+        config = cls._process_project(project, [], global_pr_only)
+        path = os.path.join(folder, "%s.conf" % project.id)
+        tmppath = "%s.%s.tmp" % (path, os.getpid())
+        with open(tmppath, "w", encoding="utf-8") as stream:
+            for row in config:
+                stream.write(row + "\n")
+        os.rename(tmppath, path)
+
+    @classmethod
+    def _write_all_fragments(cls, session, folder, global_pr_only):
+        """ Store the gitolite configuration of all the projects in the
+        specified folder, removing the configuration of the projects that
+        no longer exist.
+
+        The projects are loaded by batches, together with the users, groups
+        and deploy keys having access to them.
+
+        :arg session: the session with which to connect to the database
+        :arg folder: the folder holding the configuration of each project
+        :type folder: str
+        :arg global_pr_only: boolean on whether the pagure instance enforces
+            the PR workflow only or not
+        :type global_pr_only: bool
+
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        seen = set()
+        last_id = 0
+        while True:
+            projects = (
+                session.query(model.Project)
+                .options(
+                    joinedload(model.Project.user),
+                    subqueryload(model.Project.committers),
+                    subqueryload(model.Project.committer_groups),
+                    subqueryload(model.Project.deploykeys),
+                )
+                .filter(model.Project.id > last_id)
+                .order_by(model.Project.id)
+                .limit(PROJECTS_BATCH_SIZE)
+                .all()
+            )
+            if not projects:
+                break
+            for project in projects:
+                cls._write_fragment(folder, project, global_pr_only)
+                seen.add("%s.conf" % project.id)
+            last_id = projects[-1].id
+
+        for filename in os.listdir(folder):
+            if filename not in seen:
+                _log.info("Removing the outdated configuration: %s", filename)
+                os.unlink(os.path.join(folder, filename))
+
+    @classmethod
+    def _get_include(cls, configfile):
+        """ Return the row of the gitolite configuration file including the
+        configuration of all the projects.
+
+        :arg configfile: the name of the gitolite configuration file
+        :type configfile: str
+        :return: the include directive, relative to the configuration file
+        :return type: str
+
+        """
+        folder = os.path.basename(cls._get_fragments_folder(configfile))
+        return 'include "%s/*.conf"' % folder
+
+    @classmethod
+    def _includes_fragments(cls, configfile):
+        """ Return whether the specified gitolite configuration file includes
+        the configuration of each project stored separately.
+
+        :arg configfile: the name of the gitolite configuration file
+        :type configfile: str
+        :return type: bool
+
+        """
+        if not os.path.isdir(cls._get_fragments_folder(configfile)):
+            return False
+        include = cls._get_include(configfile)
+        with open(configfile, encoding="utf-8") as stream:
+            return any(line.rstrip() == include for line in stream)
+
     @classmethod
     def _clean_current_config(cls, current_config, project):
         """ Remove the specified project from the current configuration file
@@ -332,7 +450,7 @@ class Gitolite2Auth(GitAuthHelper):
             seen = False
             output = []
             for idx, row in enumerate(config):
-                if end_grp is None and row.startswith("repo "):
+                if end_grp is None and row.startswith(("repo ", "include ")):
                     end_grp = idx
 
                 if row.startswith("@%s " % group.group_name):
@@ -364,8 +482,10 @@ class Gitolite2Auth(GitAuthHelper):
         :return type: list
 
         """
-        query = session.query(model.PagureGroup).order_by(
-            model.PagureGroup.group_name
+        query = (
+            session.query(model.PagureGroup)
+            .options(subqueryload(model.PagureGroup.users))
+            .order_by(model.PagureGroup.group_name)
         )
 
         groups = {}
@@ -476,17 +596,22 @@ class Gitolite2Auth(GitAuthHelper):
             postconfig = _read_file(postconf)
 
         global_pr_only = pagure_config.get("PR_ONLY", False)
+        fragments = cls._get_fragments_folder(configfile)
         config = []
-        groups = {}
-        if group is None:
-            groups = cls._generate_groups_config(session)
-
         if project == -1 or not os.path.exists(configfile):
             _log.info("Refreshing the configuration for all projects")
-            query = session.query(model.Project).order_by(model.Project.id)
-            for project in query.all():
-                config = cls._process_project(project, config, global_pr_only)
+            cls._write_all_fragments(session, fragments, global_pr_only)
+            config = [cls._get_include(configfile)]
+        elif project and cls._includes_fragments(configfile):
+            # The configuration file includes the one of the project, which
+            # is the only file to update unless a group changed as well
+            _log.info("Refreshing the configuration for one project")
+            cls._write_fragment(fragments, project, global_pr_only)
+            if group is None:
+                return
         elif project:
+            # The configuration of each project has not been stored yet,
+            # update the configuration file itself
             _log.info("Refreshing the configuration for one project")
             config = cls._process_project(project, config, global_pr_only)
 
@@ -498,6 +623,10 @@ class Gitolite2Auth(GitAuthHelper):
 
             config = current_config + config
 
+        groups = {}
+        if group is None:
+            groups = cls._generate_groups_config(session)
+
         if config:
             _log.info("Cleaning the group %s from the loaded config", group)
             config = cls._clean_groups(config, group=group)
@@ -606,6 +735,17 @@ class Gitolite2Auth(GitAuthHelper):
             )
             return
 
+        if cls._includes_fragments(configfile):
+            # The configuration file includes the one of the project, which
+            # is the only file to remove
+            _log.info("Removing the configuration of the project")
+            path = os.path.join(
+                cls._get_fragments_folder(configfile), "%s.conf" % project.id
+            )
+            if os.path.exists(path):
+                os.unlink(path)
+            return
+
         preconfig = None
         if preconf:
             _log.info(
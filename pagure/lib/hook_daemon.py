@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Daemon running the git hooks of the projects, so that a push does not have
+to start a new python interpreter and import pagure, its dependencies and
+its plugins.
+
+The ``hookrunner`` script connects to the daemon via a Unix socket and
+sends it its stdin, stdout and stderr file descriptors together with its
+arguments, environment and working directory. The daemon forks to run the
+hook, writing directly to the descriptors of the ``hookrunner``, and sends
+back the exit code of the hook.
+
+This module is imported by the ``hookrunner`` script, so it must not
+import anything but the standard library at the module level.
+
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import array
+import io
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import traceback
+
+try:
+    import socketserver
+except ImportError:  # pragma: no cover
+    import SocketServer as socketserver
+
+
+_log = logging.getLogger(__name__)
+
+# Path of the Unix socket the daemon listens on, can be changed via the
+# PAGURE_HOOK_DAEMON_SOCKET environment variable, for both the daemon and
+# the hookrunner script
+DEFAULT_SOCKET = "/var/run/pagure-hookd/hookd.sock"
+
+_FDS = array.array("i", [0, 1, 2])
+
+
+def get_socket_path():
+    """ Return the path of the Unix socket of the hook daemon. """
+    return os.environ.get("PAGURE_HOOK_DAEMON_SOCKET", DEFAULT_SOCKET)
+
+
+def forward_hook(hooktype, socket_path=None):
+    """ Have the hook daemon run the specified hook.
+
+    :arg hooktype: the name of the hook to run: pre-receive, update or
+        post-receive
+    :type hooktype: str
+    :kwarg socket_path: the path of the Unix socket of the hook daemon,
+        defaults to the one returned by `get_socket_path`
+    :type socket_path: str or None
+    :return: the exit code of the hook or None if the daemon could not be
+        reached, in which case the hook should be run in-process
+    :rtype: int or None
+
+    """
+    if not hasattr(socket, "AF_UNIX") or not hasattr(socket.socket, "sendmsg"):
+        return None
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path or get_socket_path())
+        request = {
+            "hooktype": hooktype,
+            "argv": sys.argv,
+            "env": dict(os.environ),
+            "cwd": os.getcwd(),
+        }
+        conn.sendmsg(
+            [b"\0"], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, _FDS.tobytes())]
+        )
+        conn.sendall(json.dumps(request).encode("utf-8") + b"\n")
+    except (IOError, OSError):
+        # The daemon is not running or went away before it got the request
+        conn.close()
+        return None
+
+    # The output of the hook is written directly to our stdout and stderr,
+    # the daemon only sends back the exit code once the hook is done
+    data = b""
+    try:
+        while True:
+            chunk = conn.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+    except (IOError, OSError):
+        pass
+    finally:
+        conn.close()
+
+    try:
+        return int(data.strip())
+    except ValueError:
+        print(
+            "The hook daemon did not finish running the hook", file=sys.stderr
+        )
+        return 1
+
+
+class HookRequestHandler(socketserver.BaseRequestHandler):
+    """ Run the hook requested by a hookrunner, in the forked process
+    handling the request.
+    """
+
+    def _check_peer(self):
+        """ Only accept requests from the user running the daemon, since
+        the hooks are run with the environment sent, ie: as the user
+        pushing.
+        """
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+        creds = self.request.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        _, uid, _ = struct.unpack("3i", creds)
+        return uid in (0, os.getuid())
+
+    def _read_request(self):
+        """ Return the file descriptors and the request sent. """
+        _, ancdata, _, _ = self.request.recvmsg(
+            1, socket.CMSG_LEN(len(_FDS) * _FDS.itemsize)
+        )
+        fds = array.array("i")
+        for level, kind, cmsg_data in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(
+                    cmsg_data[: len(cmsg_data) - len(cmsg_data) % fds.itemsize]
+                )
+
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = self.request.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        return list(fds), json.loads(data.decode("utf-8"))
+
+    def handle(self):
+        if not self._check_peer():
+            _log.warning("Refusing a request from another user")
+            return
+
+        try:
+            fds, request = self._read_request()
+        except (IOError, OSError, ValueError):
+            _log.exception("Invalid request received")
+            return
+        if len(fds) != len(_FDS):
+            _log.warning("Request received without its file descriptors")
+            for fd in fds:
+                os.close(fd)
+            return
+
+        import pagure.hooks
+
+        # Run the hook as if this process was the hookrunner
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        sys.stdin = io.open(0, "r", closefd=False)
+        sys.stdout = io.open(1, "w", closefd=False)
+        sys.stderr = io.open(2, "w", closefd=False)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = request["argv"]
+
+        exitcode = 0
+        try:
+            pagure.hooks.run_hook_file(request["hooktype"])
+        except SystemExit as err:
+            if isinstance(err.code, int):
+                exitcode = err.code
+            elif err.code is not None:
+                print(err.code, file=sys.stderr)
+                exitcode = 1
+        except Exception:
+            traceback.print_exc()
+            exitcode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+        self.request.sendall(("%d\n" % exitcode).encode("utf-8"))
+
+
+class HookDaemon(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """ Unix socket server running each hook in a forked process. """
+
+    # Pushes can come in bursts, do not limit the number of hooks running
+    # at the same time more than the rest of the system does
+    max_children = 256
+
+
+def warm_up():
+    """ Import and initialize everything the hooks need, so the processes
+    forked to run them do not have to.
+    """
+    import sqlalchemy.orm
+
+    import pagure.hooks
+    import pagure.lib.plugins
+    import pagure.lib.query
+    from pagure.config import config as pagure_config
+
+    # Import the plugins and configure the database mapping
+    pagure.lib.plugins.get_plugin_names()
+    pagure.lib.plugins.get_plugin_tables()
+    sqlalchemy.orm.configure_mappers()
+
+    session = pagure.lib.query.create_session(pagure_config["DB_URL"])
+    session.remove()
+    # The connections cannot be shared with the forked processes, they
+    # each open their own
+    pagure.lib.query.SESSIONMAKER.kw["bind"].dispose()
+
+
+def serve(socket_path=None):
+    """ Run the hook daemon until it is interrupted.
+
+    :kwarg socket_path: the path of the Unix socket to listen on, defaults
+        to the one returned by `get_socket_path`
+    :type socket_path: str or None
+
+    """
+    socket_path = socket_path or get_socket_path()
+    warm_up()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    old_umask = os.umask(0o177)
+    try:
+        server = HookDaemon(socket_path, HookRequestHandler)
+    finally:
+        os.umask(old_umask)
+
+    _log.info("Hook daemon listening on %s", socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def main():
+    """ Entry point of the hook daemon. """
+    parser = argparse.ArgumentParser(
+        description="Daemon running the git hooks of the projects"
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Path of the Unix socket to listen on (default: %s)"
+        % get_socket_path(),
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        serve(args.socket)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,7 @@ from sqlalchemy.orm import relation
 from sqlalchemy.orm import validates
 
 import pagure.exceptions
+import pagure.lib.serializers
 from pagure.config import config as pagure_config
 from pagure.lib.model_base import BASE
 from pagure.lib.plugins import get_plugin_tables
@@ -278,12 +279,7 @@ class User(BASE):
 
     def to_json(self, public=False):
         """ Return a representation of the User in a dictionary. """
-        output = {"name": self.user, "fullname": self.fullname}
-        if not public:
-            output["default_email"] = self.default_email
-            output["emails"] = sorted([email.email for email in self.emails])
-
-        return output
+        return pagure.lib.serializers.Serializer(public=public).user(self)
 
 
 class UserEmail(BASE):
@@ -983,33 +979,8 @@ class Project(BASE):
     def to_json(self, public=False, api=False):
         """ Return a representation of the project as JSON.
         """
-        custom_keys = [[key.name, key.key_type] for key in self.issue_keys]
-
-        output = {
-            "id": self.id,
-            "name": self.name,
-            "fullname": self.fullname,
-            "url_path": self.url_path,
-            "description": self.description,
-            "namespace": self.namespace,
-            "parent": self.parent.to_json(public=public, api=api)
-            if self.parent
-            else None,
-            "date_created": arrow_ts(self.date_created),
-            "date_modified": arrow_ts(self.date_modified),
-            "user": self.user.to_json(public=public),
-            "access_users": self.access_users_json,
-            "access_groups": self.access_groups_json,
-            "tags": self.tags_text,
-            "priorities": self.priorities,
-            "custom_keys": custom_keys,
-            "close_status": self.close_status,
-            "milestones": self.milestones,
-        }
-        if not api and not public:
-            output["settings"] = self.settings
-
-        return output
+        serializer = pagure.lib.serializers.Serializer(public=public, api=api)
+        return serializer.project(self)
 
 
 class ProjectLock(BASE):
@@ -1406,49 +1377,10 @@ class Issue(BASE):
         """ Returns a dictionary representation of the issue.
 
         """
-        custom_fields = [
-            dict(
-                name=field.key.name,
-                key_type=field.key.key_type,
-                value=field.value,
-                key_data=field.key.key_data,
-            )
-            for field in self.other_fields
-        ]
-
-        output = {
-            "id": self.id,
-            "title": self.title,
-            "content": self.content,
-            "status": self.status,
-            "close_status": self.close_status,
-            "date_created": arrow_ts(self.date_created),
-            "last_updated": arrow_ts(self.last_updated),
-            "closed_at": arrow_ts(self.closed_at) if self.closed_at else None,
-            "user": self.user.to_json(public=public),
-            "private": self.private,
-            "tags": self.tags_text,
-            "depends": ["%s" % item for item in self.depending_text],
-            "blocks": ["%s" % item for item in self.blocking_text],
-            "assignee": self.assignee.to_json(public=public)
-            if self.assignee
-            else None,
-            "priority": self.priority,
-            "milestone": self.milestone,
-            "custom_fields": custom_fields,
-        }
-
-        comments = []
-        if with_comments:
-            for comment in self.comments:
-                comments.append(comment.to_json(public=public))
-
-        output["comments"] = comments
-
-        if with_project:
-            output["project"] = self.project.to_json(public=public, api=True)
-
-        return output
+        serializer = pagure.lib.serializers.Serializer(public=public, api=True)
+        return serializer.issue(
+            self, with_comments=with_comments, with_project=with_project
+        )
 
 
 class IssueToIssue(BASE):
@@ -1586,20 +1518,8 @@ class IssueComment(BASE):
         """ Returns a dictionary representation of the issue.
 
         """
-        output = {
-            "id": self.id,
-            "comment": self.comment,
-            "parent": self.parent_id,
-            "date_created": arrow_ts(self.date_created),
-            "user": self.user.to_json(public=public),
-            "edited_on": arrow_ts(self.edited_on) if self.edited_on else None,
-            "editor": self.editor.to_json(public=public)
-            if self.editor_id
-            else None,
-            "notification": self.notification,
-            "reactions": self.reactions,
-        }
-        return output
+        serializer = pagure.lib.serializers.Serializer(public=public)
+        return serializer.issue_comment(self)
 
 
 class IssueKeys(BASE):
@@ -1911,6 +1831,10 @@ class PullRequest(BASE):
         ),
         nullable=True,
     )
+    # The commits of the target branch and of the branch of origin the
+    # merge_status was computed for
+    merge_status_target = sa.Column(sa.Text, nullable=True)
+    merge_status_head = sa.Column(sa.Text, nullable=True)
 
     # While present this column isn't used anywhere yet
     private = sa.Column(sa.Boolean, nullable=False, default=False)
@@ -2069,43 +1993,8 @@ class PullRequest(BASE):
         """ Returns a dictionary representation of the pull-request.
 
         """
-        output = {
-            "id": self.id,
-            "uid": self.uid,
-            "title": self.title,
-            "branch": self.branch,
-            "project": self.project.to_json(public=public, api=api),
-            "branch_from": self.branch_from,
-            "repo_from": self.project_from.to_json(public=public, api=api)
-            if self.project_from
-            else None,
-            "remote_git": self.remote_git,
-            "date_created": arrow_ts(self.date_created),
-            "updated_on": arrow_ts(self.updated_on),
-            "last_updated": arrow_ts(self.last_updated),
-            "closed_at": arrow_ts(self.closed_at) if self.closed_at else None,
-            "user": self.user.to_json(public=public),
-            "assignee": self.assignee.to_json(public=public)
-            if self.assignee
-            else None,
-            "status": self.status,
-            "commit_start": self.commit_start,
-            "commit_stop": self.commit_stop,
-            "closed_by": self.closed_by.to_json(public=public)
-            if self.closed_by
-            else None,
-            "initial_comment": self.initial_comment,
-            "cached_merge_status": self.merge_status or "unknown",
-        }
-
-        comments = []
-        if with_comments:
-            for comment in self.comments:
-                comments.append(comment.to_json(public=public))
-
-        output["comments"] = comments
-
-        return output
+        serializer = pagure.lib.serializers.Serializer(public=public, api=api)
+        return serializer.pull_request(self, with_comments=with_comments)
 
 
 class PullRequestComment(BASE):
@@ -2207,24 +2096,8 @@ class PullRequestComment(BASE):
 
     def to_json(self, public=False):
         """ Return a dict representation of the pull-request comment. """
-
-        return {
-            "id": self.id,
-            "commit": self.commit_id,
-            "tree": self.tree_id,
-            "filename": self.filename,
-            "line": self.line,
-            "comment": self.comment,
-            "parent": self.parent_id,
-            "date_created": arrow_ts(self.date_created),
-            "user": self.user.to_json(public=public),
-            "edited_on": arrow_ts(self.edited_on) if self.edited_on else None,
-            "editor": self.editor.to_json(public=public)
-            if self.editor_id
-            else None,
-            "notification": self.notification,
-            "reactions": self.reactions,
-        }
+        serializer = pagure.lib.serializers.Serializer(public=public)
+        return serializer.pull_request_comment(self)
 
 
 class PullRequestFlag(BASE):
@@ -2660,6 +2533,135 @@ class Watcher(BASE):
     )
 
 
+class WebhookDelivery(BASE):
+    """
+    Stores the attempts made at delivering the web-hook notifications of the
+    projects.
+    """
+
+    __tablename__ = "webhook_deliveries"
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    project_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey("projects.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    url = sa.Column(sa.Text, nullable=False)
+    msg_id = sa.Column(sa.String(255), nullable=False)
+    topic = sa.Column(sa.Text, nullable=False)
+    attempt = sa.Column(sa.Integer, nullable=False)
+    success = sa.Column(sa.Boolean, nullable=False)
+    status_code = sa.Column(sa.Integer, nullable=True)
+    error = sa.Column(sa.Text, nullable=True)
+    latency = sa.Column(sa.Integer, nullable=False)
+    date_created = sa.Column(
+        sa.DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow,
+        index=True,
+    )
+
+    project = relation(
+        "Project",
+        foreign_keys=[project_id],
+        remote_side=[Project.id],
+        backref=backref("webhook_deliveries", cascade="delete, delete-orphan"),
+    )
+
+    def to_json(self, public=False):
+        """ Returns a dictionary representation of the delivery attempt.
+
+        """
+        return {
+            "url": self.url,
+            "msg_id": self.msg_id,
+            "topic": self.topic,
+            "attempt": self.attempt,
+            "success": self.success,
+            "status_code": self.status_code,
+            "error": self.error,
+            "latency": self.latency,
+            "date_created": arrow_ts(self.date_created),
+        }
+
+
+class SearchDocument(BASE):
+    """
+    Stores the words of the issues and pull-requests, comments included,
+    used by the full-text search.
+
+    Table -- search_documents
+    """
+
+    __tablename__ = "search_documents"
+    __table_args__ = (sa.UniqueConstraint("obj_type", "obj_uid"),)
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    project_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey("projects.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    obj_type = sa.Column(sa.String(32), nullable=False)
+    obj_uid = sa.Column(sa.String(32), nullable=False)
+    title = sa.Column(sa.Text, nullable=False, default="")
+    content = sa.Column(sa.Text, nullable=False, default="")
+
+    project = relation(
+        "Project",
+        foreign_keys=[project_id],
+        remote_side=[Project.id],
+        backref=backref("search_documents", cascade="delete, delete-orphan"),
+    )
+
+
+# Index used by the full-text search of PostgreSQL, it must be kept in sync
+# with pagure.lib.search._tsvector
+sa.event.listen(
+    SearchDocument.__table__,
+    "after_create",
+    sa.DDL(
+        "CREATE INDEX search_documents_tsvector_idx ON search_documents "
+        "USING gin ((setweight(to_tsvector('simple'::regconfig, title), "
+        "'A') || setweight(to_tsvector('simple'::regconfig, content), "
+        "'B')))"
+    ).execute_if(dialect="postgresql"),
+)
+
+
+class SearchTerm(BASE):
+    """
+    Stores the number of times the words are found in the title and the
+    content of the issues and pull-requests, used by the full-text search
+    when it is not done by the database.
+
+    Table -- search_terms
+    """
+
+    __tablename__ = "search_terms"
+
+    document_id = sa.Column(
+        sa.Integer,
+        sa.ForeignKey(
+            "search_documents.id", onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        primary_key=True,
+    )
+    term = sa.Column(sa.String(64), primary_key=True, index=True)
+    title_count = sa.Column(sa.Integer, nullable=False, default=0)
+    content_count = sa.Column(sa.Integer, nullable=False, default=0)
+
+    document = relation(
+        "SearchDocument",
+        foreign_keys=[document_id],
+        remote_side=[SearchDocument.id],
+        backref=backref("terms", cascade="delete, delete-orphan"),
+    )
+
+
 @six.python_2_unicode_compatible
 class PagureLog(BASE):
     """
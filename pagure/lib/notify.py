@@ -20,7 +20,6 @@ import hashlib
 import json
 import logging
 import re
-import smtplib
 import time
 import six
 from email.header import Header
@@ -28,8 +27,11 @@ from email.mime.text import MIMEText
 from six.moves.urllib_parse import urljoin
 
 import flask
+import sqlalchemy.orm
+import pagure.lib.email_delivery
 import pagure.lib.query
 import pagure.lib.tasks_services
+import pagure.lib.watchers
 from pagure.config import config as pagure_config
 
 
@@ -161,43 +163,40 @@ def _get_emails_for_obj(obj):
     """ Return the list of emails to send notification to when notifying
     about the specified issue or pull-request.
     """
+    participants = pagure.lib.watchers.get_participants(
+        sqlalchemy.orm.object_session(obj), obj
+    )
+
     emails = set()
+
+    def _add(user):
+        if user and user.email:
+            emails.add(user.email)
+
     # Add project creator/owner
-    if obj.project.user.default_email:
-        emails.add(obj.project.user.default_email)
+    _add(participants.owner)
 
     # Add committers is object is private, otherwise all contributors
     if obj.isa in ["issue", "pull-request"] and obj.private:
-        for user in obj.project.committers:
-            if user.default_email:
-                emails.add(user.default_email)
+        for user in participants.committers:
+            _add(user)
     else:
-        for user in obj.project.users:
-            if user.default_email:
-                emails.add(user.default_email)
+        for user in participants.users:
+            _add(user)
 
     # Add people in groups with any access to the project:
-    for group in obj.project.groups:
-        if group.creator.default_email:
-            emails.add(group.creator.default_email)
-        for user in group.users:
-            if user.default_email:
-                emails.add(user.default_email)
+    for user in participants.group_creators + participants.group_members:
+        _add(user)
 
     # Add people that commented on the issue/PR
-    if obj.isa in ["issue", "pull-request"]:
-        for comment in obj.comments:
-            if comment.user.default_email:
-                emails.add(comment.user.default_email)
+    for user in participants.commenters:
+        _add(user)
 
     # Add the person that opened the issue/PR
-    if obj.user.default_email:
-        emails.add(obj.user.default_email)
+    _add(participants.author)
 
     # Add the person assigned to the issue/PR
-    if obj.isa in ["issue", "pull-request"]:
-        if obj.assignee and obj.assignee.default_email:
-            emails.add(obj.assignee.default_email)
+    _add(participants.assignee)
 
     # Add public notifications to lists/users set project-wide
     if obj.isa == "issue" and not obj.private:
@@ -210,22 +209,21 @@ def _get_emails_for_obj(obj):
     # Add the person watching this project, if it's a public issue or a
     # pull-request
     if (obj.isa == "issue" and not obj.private) or obj.isa == "pull-request":
-        for watcher in obj.project.watchers:
-            if watcher.watch_issues:
-                emails.add(watcher.user.default_email)
+        for user, watch_issues, _ in participants.project_watchers:
+            if watch_issues:
+                emails.add(user.email)
             else:
                 # If there is a watch entry and it is false, it means the user
                 # explicitly requested to not watch the issue
-                if watcher.user.default_email in emails:
-                    emails.remove(watcher.user.default_email)
+                if user.email in emails:
+                    emails.remove(user.email)
 
     # Add/Remove people who explicitly asked to be added/removed
-    if obj.isa in ["issue", "pull-request"]:
-        for watcher in obj.watchers:
-            if not watcher.watch and watcher.user.default_email in emails:
-                emails.remove(watcher.user.default_email)
-            elif watcher.watch:
-                emails.add(watcher.user.default_email)
+    for user, watch in participants.watchers:
+        if not watch and user.email in emails:
+            emails.remove(user.email)
+        elif watch:
+            emails.add(user.email)
 
     # Drop the email used by pagure when sending
     emails = _clean_emails(
@@ -239,10 +237,13 @@ def _get_emails_for_obj(obj):
 
 
 def _get_emails_for_commit_notification(project):
+    participants = pagure.lib.watchers.get_participants(
+        sqlalchemy.orm.object_session(project), project
+    )
     emails = set()
-    for watcher in project.watchers:
-        if watcher.watch_commits:
-            emails.add(watcher.user.default_email)
+    for user, _, watch_commits in participants.project_watchers:
+        if watch_commits:
+            emails.add(user.email)
 
     # Drop the email used by pagure when sending
     emails = _clean_emails(
@@ -291,6 +292,9 @@ def send_email(
 ):  # pragma: no cover
     """ Send an email with the specified information.
 
+    If EMAIL_CELERY_QUEUE_ENABLED is set, the email is queued to be sent by
+    the worker of the EMAIL_CELERY_QUEUE, otherwise it is sent right away.
+
     :arg text: the content of the email to send
     :type text: unicode
     :arg subject: the subject of the email
@@ -300,11 +304,64 @@ def send_email(
     :kwarg in_reply_to: if defined, the header `In-Reply-To` is set with
         this value
     :kwarg project_name: if defined, the name of the project
+    :return: the last email sent, if it was not queued
 
     """
     if not to_mail:
         return
 
+    recipients = []
+    for mailto in to_mail.split(","):
+        try:
+            pagure.lib.query.allowed_emailaddress(mailto)
+        except pagure.exceptions.PagureException:
+            continue
+        recipients.append(mailto)
+    if not recipients:
+        return
+
+    kwargs = dict(
+        mail_id=mail_id,
+        in_reply_to=in_reply_to,
+        project_name=project_name,
+        user_from=user_from,
+        reporter=reporter,
+        assignee=assignee,
+    )
+    if pagure_config.get("EMAIL_SEND", True) and pagure_config.get(
+        "EMAIL_CELERY_QUEUE_ENABLED"
+    ):
+        pagure.lib.tasks_services.send_email.delay(
+            text, subject, recipients, queued_at=time.time(), **kwargs
+        )
+        return
+
+    return deliver_email(text, subject, recipients, **kwargs)[0]
+
+
+def _build_emails(
+    text,
+    subject,
+    recipients,
+    mail_id=None,
+    in_reply_to=None,
+    project_name=None,
+    user_from=None,
+    reporter=None,
+    assignee=None,
+):
+    """ Build the email to send to each of the recipients, the headers they
+    share and the content are only encoded once.
+
+    Unless the Reply-To header is specific to each recipient, the email is
+    sent at once to up to EMAIL_MAX_RECIPIENTS recipients, who are then not
+    disclosed in its To header.
+
+    :return: the sender, a list of (recipients, email as a string) and the
+        last email built
+    :rtype: tuple
+
+    """
     from_email = pagure_config.get("FROM_EMAIL", "pagure@fedoraproject.org")
     if isinstance(from_email, bytes):
         from_email = from_email.decode("utf-8")
@@ -323,42 +380,51 @@ def send_email(
             in_reply_to + "@%s" % pagure_config["DOMAIN_EMAIL_NOTIFICATIONS"]
         )
 
-    smtp = None
-    for mailto in to_mail.split(","):
-        try:
-            pagure.lib.query.allowed_emailaddress(mailto)
-        except pagure.exceptions.PagureException:
-            continue
-        msg = MIMEText(text.encode("utf-8"), "plain", "utf-8")
-        msg["Subject"] = Header("[%s] %s" % (subject_tag, subject), "utf-8")
-        msg["From"] = from_email
-
-        if mail_id:
-            msg["mail-id"] = mail_id
-            msg["Message-Id"] = "<%s>" % mail_id
-
-        if in_reply_to:
-            msg["In-Reply-To"] = "<%s>" % in_reply_to
-
-        msg["X-Auto-Response-Suppress"] = "All"
-        msg["X-pagure"] = pagure_config["APP_URL"]
-        if project_name is not None:
-            msg["X-pagure-project"] = project_name
-            msg["List-ID"] = project_name
-            msg["List-Archive"] = _build_url(
-                pagure_config["APP_URL"], _fullname_to_url(project_name)
-            )
-        if reporter is not None:
-            msg["X-pagure-reporter"] = reporter
-        if assignee is not None:
-            msg["X-pagure-assignee"] = assignee
+    msg = MIMEText(text.encode("utf-8"), "plain", "utf-8")
+    msg["Subject"] = Header("[%s] %s" % (subject_tag, subject), "utf-8")
+    msg["From"] = from_email
+
+    if mail_id:
+        msg["mail-id"] = mail_id
+        msg["Message-Id"] = "<%s>" % mail_id
 
+    if in_reply_to:
+        msg["In-Reply-To"] = "<%s>" % in_reply_to
+
+    msg["X-Auto-Response-Suppress"] = "All"
+    msg["X-pagure"] = pagure_config["APP_URL"]
+    if project_name is not None:
+        msg["X-pagure-project"] = project_name
+        msg["List-ID"] = project_name
+        msg["List-Archive"] = _build_url(
+            pagure_config["APP_URL"], _fullname_to_url(project_name)
+        )
+    if reporter is not None:
+        msg["X-pagure-reporter"] = reporter
+    if assignee is not None:
+        msg["X-pagure-assignee"] = assignee
+
+    batch = pagure_config.get("EMAIL_MAX_RECIPIENTS") or 1
+    if batch > 1 and not (mail_id and pagure_config["EVENTSOURCE_SOURCE"]):
+        # The emails only differ by their To header, send a single one
+        msg["To"] = "undisclosed-recipients:;"
+        message = msg.as_string()
+        messages = [
+            (recipients[idx : idx + batch], message)
+            for idx in range(0, len(recipients), batch)
+        ]
+        return from_email, messages, msg
+
+    salt = pagure_config.get("SALT_EMAIL")
+    if salt and not isinstance(salt, bytes):
+        salt = salt.encode("utf-8")
+
+    messages = []
+    for mailto in recipients:
         # Send the message via our own SMTP server, but don't include the
         # envelope header.
+        del msg["To"]
         msg["To"] = mailto
-        salt = pagure_config.get("SALT_EMAIL")
-        if salt and not isinstance(salt, bytes):
-            salt = salt.encode("utf-8")
 
         if mail_id and pagure_config["EVENTSOURCE_SOURCE"]:
 
@@ -373,51 +439,65 @@ def send_email(
                 key = key.encode("utf-8")
             mhash = hashlib.sha512(key)
 
+            del msg["Reply-To"]
+            del msg["Mail-Followup-To"]
             msg["Reply-To"] = "reply+%s@%s" % (
                 mhash.hexdigest(),
                 pagure_config["DOMAIN_EMAIL_NOTIFICATIONS"],
             )
             msg["Mail-Followup-To"] = msg["Reply-To"]
-        if not pagure_config.get("EMAIL_SEND", True):
+        messages.append(([mailto], msg.as_string()))
+    return from_email, messages, msg
+
+
+def deliver_email(text, subject, recipients, retry=False, **kwargs):
+    """ Build and send the email with the specified information to each of
+    the recipients.
+
+    :arg text: the content of the email to send
+    :type text: unicode
+    :arg subject: the subject of the email
+    :arg recipients: the email addresses to send the email to
+    :type recipients: list
+    :kwarg retry: whether the recipients to whom the email could not be
+        sent because of a temporary error are returned rather than the
+        email being dead-lettered
+    :type retry: bool
+    :kwarg kwargs: the headers of the email, see `send_email`
+    :return: the last email built and the recipients to whom the email
+        could not be sent
+    :rtype: tuple
+
+    """
+    start = time.time()
+    from_email, messages, msg = _build_emails(
+        text, subject, recipients, **kwargs
+    )
+    _log.debug(
+        "Built %s emails in %.1f ms",
+        len(messages),
+        (time.time() - start) * 1000,
+    )
+
+    if not pagure_config.get("EMAIL_SEND", True):
+        for mailtos, message in messages:
             _log.debug("******EMAIL******")
             _log.debug("From: %s", from_email)
-            _log.debug("To: %s", to_mail)
+            _log.debug("To: %s", ", ".join(mailtos))
             _log.debug("Subject: %s", subject)
-            _log.debug("in_reply_to: %s", in_reply_to)
-            _log.debug("mail_id: %s", mail_id)
+            _log.debug("in_reply_to: %s", kwargs.get("in_reply_to"))
+            _log.debug("mail_id: %s", kwargs.get("mail_id"))
             _log.debug("Contents:")
             _log.debug("%s" % text)
             _log.debug("*****************")
-            _log.debug(msg.as_string())
+            _log.debug(message)
             _log.debug("*****/EMAIL******")
-            continue
-        try:
-            if smtp is None:
-                if pagure_config["SMTP_SSL"]:
-                    smtp = smtplib.SMTP_SSL(
-                        pagure_config["SMTP_SERVER"],
-                        pagure_config["SMTP_PORT"],
-                    )
-                else:
-                    smtp = smtplib.SMTP(
-                        pagure_config["SMTP_SERVER"],
-                        pagure_config["SMTP_PORT"],
-                    )
-            if (
-                pagure_config["SMTP_USERNAME"]
-                and pagure_config["SMTP_PASSWORD"]
-            ):
-                smtp.login(
-                    pagure_config["SMTP_USERNAME"],
-                    pagure_config["SMTP_PASSWORD"],
-                )
+        return msg, []
 
-            smtp.sendmail(from_email, [mailto], msg.as_string())
-        except smtplib.SMTPException as err:
-            _log.exception(err)
-    if smtp:
-        smtp.quit()
-    return msg
+    pending = pagure.lib.email_delivery.send_messages(
+        from_email, messages, retry=retry
+    )
+    return msg, [mailto for mailtos, _ in pending for mailto in mailtos]
 
 
 def notify_new_comment(comment, user=None):
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Cache of the diffs of the pull-requests.
+
+The diff of a pull-request is stored once the renames were detected in it,
+as a list of patches having the attributes the templates and the API rely
+on. The entries are keyed on the first and last commits of the
+pull-request as well as the commit the target branch points to, so they
+never need to be invalidated.
+
+"""
+
+from __future__ import unicode_literals
+
+import json
+
+import pygit2
+
+import pagure.lib.git
+import pagure.lib.render_cache
+from pagure.config import config as pagure_config
+
+
+_FILE_MODES = [pygit2.GIT_FILEMODE_BLOB, pygit2.GIT_FILEMODE_BLOB_EXECUTABLE]
+
+
+class CachedHunk(object):
+    """ A hunk of a cached patch, its lines are (origin, content) tuples.
+    """
+
+    def __init__(self, old_start, old_lines, new_start, new_lines, lines):
+        self.old_start = old_start
+        self.old_lines = old_lines
+        self.new_start = new_start
+        self.new_lines = new_lines
+        self.lines = [tuple(line) for line in lines]
+
+    def to_json(self):
+        return [
+            self.old_start,
+            self.old_lines,
+            self.new_start,
+            self.new_lines,
+            self.lines,
+        ]
+
+
+class CachedPatch(object):
+    """ A patch of a cached diff, providing the same attributes as the
+    patches of the older versions of pygit2.
+    """
+
+    def __init__(
+        self,
+        old_file_path,
+        new_file_path,
+        old_id,
+        new_id,
+        status,
+        line_stats,
+        hunks,
+    ):
+        self.old_file_path = old_file_path
+        self.new_file_path = new_file_path
+        self.old_id = pygit2.Oid(hex=old_id)
+        self.new_id = pygit2.Oid(hex=new_id)
+        self.status = status
+        self.line_stats = tuple(line_stats)
+        self.hunks = [CachedHunk(*hunk) for hunk in hunks]
+
+    @classmethod
+    def from_patch(cls, patch):
+        """ Return the cached version of the specified pygit2 patch. """
+        delta = patch.delta
+        if delta.new_file.mode == 0 and delta.old_file.mode in _FILE_MODES:
+            status = "D"
+        elif delta.new_file.mode in _FILE_MODES and delta.old_file.mode == 0:
+            status = "A"
+        elif (
+            delta.new_file.mode in _FILE_MODES
+            and delta.old_file.mode in _FILE_MODES
+        ):
+            status = "M"
+        else:
+            status = delta.status_char()
+        if delta.new_file.path != delta.old_file.path:
+            status = "R"
+
+        hunks = []
+        for hunk in patch.hunks:
+            hunks.append(
+                [
+                    hunk.old_start,
+                    hunk.old_lines,
+                    hunk.new_start,
+                    hunk.new_lines,
+                    [(line.origin, line.content) for line in hunk.lines],
+                ]
+            )
+
+        return cls(
+            old_file_path=delta.old_file.path,
+            new_file_path=delta.new_file.path,
+            old_id=delta.old_file.id.hex,
+            new_id=delta.new_file.id.hex,
+            status=status,
+            line_stats=patch.line_stats,
+            hunks=hunks,
+        )
+
+    def to_json(self):
+        return {
+            "old_file_path": self.old_file_path,
+            "new_file_path": self.new_file_path,
+            "old_id": self.old_id.hex,
+            "new_id": self.new_id.hex,
+            "status": self.status,
+            "line_stats": list(self.line_stats),
+            "hunks": [hunk.to_json() for hunk in self.hunks],
+        }
+
+
+def get_target_head(request, orig_repo):
+    """ Return the commit the target branch of the specified pull-request
+    points to, or an empty string if there is none.
+    """
+    try:
+        branch = orig_repo.lookup_branch(request.branch)
+    except ValueError:
+        branch = None
+    if not branch:
+        return ""
+    return branch.target.hex
+
+
+def _make_key(request, target_head):
+    return pagure.lib.render_cache.make_key(
+        "pr-diff",
+        request.project.fullname,
+        request.commit_start,
+        request.commit_stop,
+        target_head,
+    )
+
+
+def store_diff(request, orig_repo, diff):
+    """ Detect the renames in the specified diff of the pull-request and
+    store it in the cache.
+
+    :arg request: the pull-request the diff is of
+    :type request: pagure.lib.model.PullRequest
+    :arg orig_repo: the git repo the pull-request is against
+    :type orig_repo: pygit2.Repository
+    :arg diff: the diff of the pull-request
+    :type diff: pygit2.Diff
+    :return: the patches of the diff
+    :rtype: list of CachedPatch
+
+    """
+    diff.find_similar()
+    patches = [CachedPatch.from_patch(patch) for patch in diff]
+
+    cache = pagure.lib.render_cache.get_cache("PR_DIFF")
+    if cache is not None and request.commit_stop:
+        pagure.lib.render_cache.cache_set(
+            cache,
+            _make_key(request, get_target_head(request, orig_repo)),
+            json.dumps([patch.to_json() for patch in patches]),
+            ttl=pagure_config.get("PR_DIFF_CACHE_TTL"),
+        )
+    return patches
+
+
+def get_diff(request, orig_repo, diff_commits):
+    """ Return the patches of the diff of the specified pull-request, from
+    the cache if it is in it, computing the diff of its commits otherwise.
+
+    :arg request: the pull-request to return the diff of
+    :type request: pagure.lib.model.PullRequest
+    :arg orig_repo: the git repo the pull-request is against
+    :type orig_repo: pygit2.Repository
+    :arg diff_commits: the commits of the pull-request, the most recent one
+        first
+    :type diff_commits: list of pygit2.Commit
+    :return: the patches of the diff or None if there is no diff
+    :rtype: list of CachedPatch or None
+
+    """
+    if not diff_commits:
+        return None
+
+    cache = pagure.lib.render_cache.get_cache("PR_DIFF")
+    if cache is not None and request.commit_stop:
+        data = pagure.lib.render_cache.cache_get(
+            cache, _make_key(request, get_target_head(request, orig_repo))
+        )
+        if data is not None:
+            return [CachedPatch(**patch) for patch in json.loads(data)]
+
+    diff = pagure.lib.git.get_commits_diff(diff_commits)
+    return store_diff(request, orig_repo, diff)
+
+
+def is_shared():
+    """ Return whether the cache is shared by all the processes, in which
+    case it is worth filling it from the workers.
+    """
+    return pagure_config.get("PR_DIFF_CACHE_BACKEND") in ("redis", "tiered")
+
+
+def get_diff_stats(patches):
+    """ Return the statistics about the specified patches, per file.
+
+    :arg patches: the patches of the diff of a pull-request
+    :type patches: list of CachedPatch
+    :return: a dictionary with the path of the files changed as keys and
+        their status, old path and number of lines added and removed as
+        values
+    :rtype: dict
+
+    """
+    output = {}
+    for patch in patches:
+        output[patch.new_file_path] = {
+            "status": patch.status,
+            "old_path": patch.old_file_path,
+            "lines_added": patch.line_stats[1],
+            "lines_removed": patch.line_stats[2],
+        }
+    return output
+
+
+def get_comments_index(request):
+    """ Return the inline comments of the specified pull-request indexed by
+    commit, file and line.
+
+    :arg request: the pull-request to index the comments of
+    :type request: pagure.lib.model.PullRequest
+    :return: a dictionary with (commit, filename) tuples as keys and
+        dictionaries with the line numbers as keys and the comments made
+        on that line, sorted by date, as values
+    :rtype: dict
+
+    """
+    index = {}
+    for comment in request.comments:
+        if not comment.commit_id:
+            continue
+        lines = index.setdefault((comment.commit_id, comment.filename), {})
+        lines.setdefault(comment.line, []).append(comment)
+    for lines in index.values():
+        for line in lines:
+            lines[line] = sorted(lines[line], key=lambda obj: obj.date_created)
+    return index
@@ -23,6 +23,8 @@ try:
 except ImportError:  # pragma: no cover
     import json
 
+import base64
+import contextlib
 import datetime
 import fnmatch
 import functools
@@ -30,9 +32,11 @@ import hashlib
 import logging
 import os
 import tempfile
+import threading
 import subprocess
 import uuid
 import markdown
+import flask
 import werkzeug
 from collections import Counter
 from math import ceil
@@ -58,6 +62,9 @@ import pagure.lib.git_auth
 import pagure.lib.login
 import pagure.lib.notify
 import pagure.lib.plugins
+import pagure.lib.render_cache
+import pagure.lib.search
+import pagure.lib.watchers
 import pagure.pfmarkdown
 import pagure.utils
 from pagure.config import config as pagure_config
@@ -237,6 +244,101 @@ def search_user(session, username=None, email=None, token=None, pattern=None):
     return output
 
 
+def search_users_by_emails(session, emails):
+    """ Searches the database for the users having one of the given email
+    addresses, using a single query per batch of 500 email addresses.
+
+    :arg session: the session to use to connect to the database.
+    :arg emails: the email addresses of the users to look for.
+    :type emails: list
+    :return: A dictionary associating the email addresses found to the
+        corresponding User object.
+    :rtype: dict
+
+    """
+    emails = sorted(set(email for email in emails if email))
+
+    output = {}
+    for idx in range(0, len(emails), 500):
+        query = (
+            session.query(model.UserEmail.email, model.User)
+            .filter(model.UserEmail.user_id == model.User.id)
+            .filter(model.UserEmail.email.in_(emails[idx : idx + 500]))
+        )
+        for email, user in query.all():
+            output[email] = user
+
+    return output
+
+
+def search_users_by_names(session, usernames):
+    """ Searches the database for the users having one of the given
+    usernames, using a single query per batch of 500 usernames.
+
+    :arg session: the session to use to connect to the database.
+    :arg usernames: the usernames of the users to look for.
+    :type usernames: list
+    :return: A dictionary associating the usernames found to the
+        corresponding User object.
+    :rtype: dict
+
+    """
+    usernames = sorted(set(name for name in usernames if name))
+
+    output = {}
+    for idx in range(0, len(usernames), 500):
+        query = session.query(model.User).filter(
+            model.User.user.in_(usernames[idx : idx + 500])
+        )
+        for user in query.all():
+            output[user.user] = user
+
+    return output
+
+
+class EmailUserResolver(object):
+    """ Resolve email addresses to the corresponding users, remembering the
+    addresses already resolved so each of them is only queried once.
+    """
+
+    def __init__(self, session):
+        """ Constructor of the object.
+
+        :arg session: the session to use to connect to the database.
+
+        """
+        self.session = session
+        self._users = {}
+
+    def resolve(self, emails):
+        """ Return the users having the given email addresses, querying
+        the database only for the addresses not resolved yet.
+
+        :arg emails: the email addresses of the users to look for.
+        :type emails: list
+        :return: A dictionary associating the email addresses found to the
+            corresponding User object.
+        :rtype: dict
+
+        """
+        emails = set(email for email in emails if email)
+        missing = [email for email in emails if email not in self._users]
+        if missing:
+            found = search_users_by_emails(self.session, missing)
+            for email in missing:
+                self._users[email] = found.get(email)
+
+        return dict(
+            (email, self._users[email])
+            for email in emails
+            if self._users[email] is not None
+        )
+
+    def get(self, email):
+        """ Return the user having the given email address or None. """
+        return self.resolve([email]).get(email)
+
+
 def is_valid_ssh_key(key, fp_hash="SHA256"):
     """ Validates the ssh key using ssh-keygen. """
     key = key.strip()
@@ -1805,6 +1907,7 @@ def new_issue(
             session.add(dbobjtag)
 
     session.commit()
+    invalidate_issues_history_stats(repo)
 
     pagure.lib.git.update_git(issue, repo=repo)
 
@@ -1852,6 +1955,7 @@ def drop_issue(session, issue, user):
         )
 
     session.commit()
+    invalidate_issues_history_stats(issue.project)
 
     pagure.lib.git.clean_git(issue.project, repotype, uid)
 
@@ -2078,6 +2182,7 @@ def edit_issue(
     pagure.lib.git.update_git(issue, repo=issue.project)
 
     if "status" in edit:
+        invalidate_issues_history_stats(issue.project)
         log_action(session, issue.status.lower(), issue, user_obj)
         pagure.lib.notify.notify_status_change_issue(issue, user_obj)
 
@@ -2273,8 +2378,17 @@ def search_projects(
     exclude_groups=None,
     private=None,
     owner=None,
+    keyset=None,
+    load_plan=None,
 ):
     """List existing projects
+
+    The `keyset` argument allows to paginate using the position of the
+    last project of the previous page, as returned by `get_keyset`, rather
+    than an offset. It should be an empty list for the first page.
+    The `load_plan` argument is a list of loader options eager-loading the
+    relations of the projects returned, as returned by
+    `pagure.lib.serializers.project_load_plan`.
     """
     projects = session.query(sqlalchemy.distinct(model.Project.id))
 
@@ -2462,6 +2576,8 @@ def search_projects(
     query = session.query(model.Project).filter(
         model.Project.id.in_(projects.subquery())
     )
+    if load_plan:
+        query = query.options(*load_plan)
 
     if sort == "latest":
         query = query.order_by(model.Project.date_created.desc())
@@ -2470,6 +2586,15 @@ def search_projects(
     else:
         query = query.order_by(asc(func.lower(model.Project.name)))
 
+    if keyset is not None:
+        if sort in ["latest", "oldest"]:
+            columns = [model.Project.date_created, model.Project.id]
+        else:
+            columns = [func.lower(model.Project.name), model.Project.id]
+        query = _apply_keyset(
+            query, columns, keyset, descending=sort == "latest"
+        )
+
     if start is not None:
         query = query.offset(start)
 
@@ -2746,6 +2871,8 @@ def search_issues(
     no_milestones=None,
     order="desc",
     order_key=None,
+    keyset=None,
+    load_plan=None,
 ):
     """ Retrieve one or more issues associated to a project with the given
     criterias.
@@ -2807,6 +2934,15 @@ def search_issues(
     :type order: None, str
     :kwarg order_key: Order issues by database column
     :type order_key: None, str
+    :kwarg keyset: the position of the last issue of the previous page, as
+        returned by `get_keyset`, to paginate using it rather than an
+        offset. It should be an empty list for the first page and can only
+        be used when ordering on date_created or last_updated.
+    :type keyset: None or list
+    :kwarg load_plan: the loader options eager-loading the relations of the
+        issues returned, as returned by
+        `pagure.lib.serializers.issue_load_plan`
+    :type load_plan: None or list
 
     :return: A single Issue object if issueid is specified, a list of Project
         objects otherwise.
@@ -2987,17 +3123,32 @@ def search_issues(
     query = session.query(model.Issue).filter(
         model.Issue.uid.in_(query.subquery())
     )
+    if load_plan:
+        query = query.options(*load_plan)
 
     if repo is not None:
         query = query.filter(model.Issue.project_id == repo.id)
 
+    matches = None
     if search_pattern is not None:
-        query = query.filter(
-            model.Issue.title.ilike("%%%s%%" % search_pattern)
+        matches = pagure.lib.search.search(
+            session,
+            "issue",
+            search_pattern,
+            project_id=repo.id if repo is not None else None,
         )
+        if matches is None:
+            query = query.filter(
+                model.Issue.title.ilike("%%%s%%" % search_pattern)
+            )
+        else:
+            query = query.join(matches, matches.c.uid == model.Issue.uid)
 
     column = model.Issue.date_created
-    if order_key:
+    if order_key == "relevance":
+        if matches is not None:
+            column = matches.c.rank
+    elif order_key:
         # If we are ordering by assignee, then order by the assignees'
         # usernames
         if order_key == "assignee":
@@ -3032,6 +3183,11 @@ def search_issues(
     else:
         query = query.order_by(desc(column))
 
+    if keyset is not None:
+        query = _apply_keyset(
+            query, [column, model.Issue.uid], keyset, descending=order != "asc"
+        )
+
     if issueid is not None or issueuid is not None:
         output = query.first()
     elif count:
@@ -3046,6 +3202,35 @@ def search_issues(
     return output
 
 
+def search_issues_by_ids(session, project, ids):
+    """ Searches the database for the issues of the given project having one
+    of the given identifiers, using a single query per batch of 500
+    identifiers.
+
+    :arg session: the session to use to connect to the database.
+    :arg project: the project the issues belong to.
+    :type project: pagure.lib.model.Project
+    :arg ids: the identifiers of the issues to look for.
+    :type ids: list
+    :return: A dictionary associating the identifiers found to the
+        corresponding Issue object.
+    :rtype: dict
+
+    """
+    ids = sorted(set(ids))
+
+    output = {}
+    for idx in range(0, len(ids), 500):
+        query = session.query(model.Issue).filter(
+            model.Issue.project_id == project.id,
+            model.Issue.id.in_(ids[idx : idx + 500]),
+        )
+        for issue in query.all():
+            output[issue.id] = issue
+
+    return output
+
+
 def get_tags_of_project(session, project, pattern=None):
     """ Returns the list of tags associated with the issues of a project.
     """
@@ -3100,11 +3285,22 @@ def search_pull_requests(
     order="desc",
     order_key=None,
     search_pattern=None,
+    keyset=None,
+    load_plan=None,
 ):
     """ Retrieve the specified pull-requests.
+
+    The `keyset` argument allows to paginate using the position of the
+    last pull-request of the previous page, as returned by `get_keyset`,
+    rather than an offset. It should be an empty list for the first page.
+    The `load_plan` argument is a list of loader options eager-loading the
+    relations of the pull-requests returned, as returned by
+    `pagure.lib.serializers.pull_request_load_plan`.
     """
 
     query = session.query(model.PullRequest)
+    if load_plan:
+        query = query.options(*load_plan)
 
     # by default sort request by date_created.
     column = model.PullRequest.date_created
@@ -3166,14 +3362,29 @@ def search_pull_requests(
         query = query.filter(model.PullRequest.branch_from == branch_from)
 
     if search_pattern is not None:
-        if "*" in search_pattern:
-            search_pattern = search_pattern.replace("*", "%")
+        matches = pagure.lib.search.search(
+            session, "pull-request", search_pattern, project_id=project_id
+        )
+        if matches is not None:
+            query = query.join(matches, matches.c.uid == model.PullRequest.uid)
+            if order_key == "relevance":
+                column = matches.c.rank
         else:
-            search_pattern = "%%%s%%" % search_pattern
-        query = query.filter(model.PullRequest.title.ilike(search_pattern))
+            if "*" in search_pattern:
+                search_pattern = search_pattern.replace("*", "%")
+            else:
+                search_pattern = "%%%s%%" % search_pattern
+            query = query.filter(model.PullRequest.title.ilike(search_pattern))
 
     # Depending on the order, the query is sorted(default is desc)
-    if order == "asc":
+    if keyset is not None:
+        query = _apply_keyset(
+            query,
+            [column, model.PullRequest.uid],
+            keyset,
+            descending=order != "asc",
+        )
+    elif order == "asc":
         query = query.order_by(asc(column))
     else:
         query = query.order_by(desc(column))
@@ -3192,6 +3403,35 @@ def search_pull_requests(
     return output
 
 
+def search_pull_requests_by_ids(session, project, ids):
+    """ Searches the database for the pull-requests opened against the
+    given project having one of the given identifiers, using a single query
+    per batch of 500 identifiers.
+
+    :arg session: the session to use to connect to the database.
+    :arg project: the project the pull-requests are opened against.
+    :type project: pagure.lib.model.Project
+    :arg ids: the identifiers of the pull-requests to look for.
+    :type ids: list
+    :return: A dictionary associating the identifiers found to the
+        corresponding PullRequest object.
+    :rtype: dict
+
+    """
+    ids = sorted(set(ids))
+
+    output = {}
+    for idx in range(0, len(ids), 500):
+        query = session.query(model.PullRequest).filter(
+            model.PullRequest.project_id == project.id,
+            model.PullRequest.id.in_(ids[idx : idx + 500]),
+        )
+        for request in query.all():
+            output[request.id] = request
+
+    return output
+
+
 def reopen_pull_request(session, request, user):
     """ Re-Open the provided pull request
     """
@@ -4152,9 +4392,8 @@ def _convert_markdown(md_processor, text):
     return md_processor.convert(text)
 
 
-def text2markdown(text, extended=True, readme=False):
-    """ Simple text to html converter using the markdown library.
-    """
+def _get_markdown_extensions(extended, readme):
+    """ Return the markdown extensions to use to render the text. """
     extensions = [
         "markdown.extensions.def_list",
         "markdown.extensions.fenced_code",
@@ -4177,26 +4416,106 @@ def text2markdown(text, extended=True, readme=False):
     if extended:
         # Install our markdown modifications
         extensions.append("pagure.pfmarkdown")
+    return extensions
 
-    md_processor = markdown.Markdown(
-        extensions=extensions,
-        extension_configs={
-            "markdown.extensions.codehilite": {"guess_lang": False}
-        },
-        output_format="xhtml5",
-    )
 
-    if text:
+# Markdown processors ready to be used, per set of extensions
+_MD_PROCESSORS = {}
+_MD_PROCESSORS_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def _markdown_processor(extended, readme):
+    """ Context manager providing a markdown processor with the specified
+    set of extensions, re-using the processors built previously since
+    loading the extensions is costly.
+    """
+    key = (extended, readme)
+    md_processor = None
+    with _MD_PROCESSORS_LOCK:
+        processors = _MD_PROCESSORS.setdefault(key, [])
+        if processors:
+            md_processor = processors.pop()
+
+    if md_processor is None:
+        md_processor = markdown.Markdown(
+            extensions=_get_markdown_extensions(extended, readme),
+            extension_configs={
+                "markdown.extensions.codehilite": {"guess_lang": False}
+            },
+            output_format="xhtml5",
+        )
+
+    try:
+        yield md_processor
+    finally:
+        md_processor.reset()
+        with _MD_PROCESSORS_LOCK:
+            _MD_PROCESSORS[key].append(md_processor)
+
+
+def _markdown_cache_key(text, extended, readme):
+    """ Return the key of the specified text in the markdown cache or None
+    if its html cannot be cached.
+
+    Our markdown extensions link to the issues, pull-requests, commits and
+    users mentioned if they exist and the viewer has access to them, so the
+    html depends on the project being viewed and on the viewer.
+    """
+    context = []
+    if extended:
+        if not flask.has_request_context():
+            return None
         try:
-            text = _convert_markdown(md_processor, text)
+            namespace, repo, user = pagure.pfmarkdown._get_ns_repo_user()
+        except (ValueError, IndexError):
+            # The project viewed cannot be found from the url
+            return None
+        viewer = None
+        if pagure.utils.authenticated():
+            viewer = flask.g.fas_user.username
+        context = [flask.request.url_root, namespace, repo, user, viewer]
+    return pagure.lib.render_cache.make_key(text, extended, readme, *context)
+
+
+def text2markdown(text, extended=True, readme=False):
+    """ Simple text to html converter using the markdown library.
+
+    The html generated is cached, see the MARKDOWN_CACHE_* configuration
+    keys.
+    """
+    if not text:
+        return ""
+
+    cache = pagure.lib.render_cache.get_cache("MARKDOWN")
+    key = None
+    if cache is not None:
+        key = _markdown_cache_key(text, extended, readme)
+        if key is not None:
+            html = pagure.lib.render_cache.cache_get(cache, key)
+            if html is not None:
+                return html
+
+    with _markdown_processor(extended, readme) as md_processor:
+        try:
+            html = _convert_markdown(md_processor, text)
         except Exception as err:
             print(err)
             _log.debug(
                 "A markdown error occured while processing: ``%s``", text
             )
-        return clean_input(text)
+            # Do not cache the result of a failed conversion
+            key = None
+            html = text
+    html = clean_input(html)
+
+    if key is not None:
+        # The links to the objects mentioned are not updated if the
+        # objects change, so only keep them for a while
+        ttl = pagure_config.get("MARKDOWN_CACHE_TTL") if extended else None
+        pagure.lib.render_cache.cache_set(cache, key, html, ttl=ttl)
 
-    return ""
+    return html
 
 
 def filter_img_src(name, value):
@@ -4211,13 +4530,8 @@ def filter_img_src(name, value):
     return False
 
 
-def clean_input(text, ignore=None):
-    """ For a given html text, escape everything we do not want to support
-    to avoid potential security breach.
-    """
-    if ignore and not isinstance(ignore, (tuple, set, list)):
-        ignore = [ignore]
-
+def _get_bleach_version():
+    """ Return the version of bleach as a tuple. """
     bleach_v = bleach.__version__.split(".")
     for idx, val in enumerate(bleach_v):
         try:
@@ -4225,6 +4539,24 @@ def clean_input(text, ignore=None):
         except ValueError:  # pragma: no cover
             pass
         bleach_v[idx] = val
+    return tuple(bleach_v)
+
+
+BLEACH_VERSION = _get_bleach_version()
+
+# Arguments given to bleach, per set of tags ignored
+_BLEACH_KWARGS = {}
+# Sanitizers built with these arguments, per thread since they cannot be
+# shared between threads
+_BLEACH_CLEANERS = threading.local()
+
+
+def _get_bleach_kwargs(ignore):
+    """ Return the arguments to give to bleach to sanitize the html,
+    ignoring the specified tags.
+    """
+    if ignore in _BLEACH_KWARGS:
+        return _BLEACH_KWARGS[ignore]
 
     attrs = bleach.ALLOWED_ATTRIBUTES.copy()
     attrs["table"] = ["class"]
@@ -4234,7 +4566,7 @@ def clean_input(text, ignore=None):
     attrs["th"] = ["align"]
     if not ignore or "img" not in ignore:
         # newer bleach need three args for attribute callable
-        if tuple(bleach_v) >= (2, 0, 0):  # pragma: no cover
+        if BLEACH_VERSION >= (2, 0, 0):  # pragma: no cover
             attrs["img"] = lambda tag, name, val: filter_img_src(name, val)
         else:
             attrs["img"] = filter_img_src
@@ -4277,11 +4609,33 @@ def clean_input(text, ignore=None):
     kwargs = {"tags": tags, "attributes": attrs}
 
     # newer bleach allow to customize the protocol supported
-    if tuple(bleach_v) >= (1, 5, 0):  # pragma: no cover
+    if BLEACH_VERSION >= (1, 5, 0):  # pragma: no cover
         protocols = bleach.ALLOWED_PROTOCOLS + ["irc", "ircs"]
         kwargs["protocols"] = protocols
 
-    return bleach.clean(text, **kwargs)
+    _BLEACH_KWARGS[ignore] = kwargs
+    return kwargs
+
+
+def clean_input(text, ignore=None):
+    """ For a given html text, escape everything we do not want to support
+    to avoid potential security breach.
+    """
+    if ignore and not isinstance(ignore, (tuple, set, list)):
+        ignore = [ignore]
+    ignore = tuple(sorted(set(ignore))) if ignore else None
+
+    kwargs = _get_bleach_kwargs(ignore)
+    if not hasattr(bleach, "Cleaner"):  # pragma: no cover
+        return bleach.clean(text, **kwargs)
+
+    cleaners = getattr(_BLEACH_CLEANERS, "cleaners", None)
+    if cleaners is None:
+        cleaners = _BLEACH_CLEANERS.cleaners = {}
+    cleaner = cleaners.get(ignore)
+    if cleaner is None:
+        cleaner = cleaners[ignore] = bleach.Cleaner(**kwargs)
+    return cleaner.clean(text)
 
 
 def could_be_text(text):
@@ -4303,6 +4657,8 @@ def get_pull_request_of_user(
     offset=None,
     limit=None,
     count=False,
+    keyset=None,
+    load_plan=None,
 ):
     """List the opened pull-requests of an user.
     These pull-requests have either been opened by that user or against
@@ -4312,6 +4668,11 @@ def get_pull_request_of_user(
     returned.
     If actionable: only the PRs not opened/filed by the specified username
     will be returned.
+    If keyset: only the PRs following the position specified, as returned
+    by `get_keyset`, will be returned.
+    If load_plan: the relations of the PRs returned are eager-loaded using
+    these loader options, as returned by
+    `pagure.lib.serializers.pull_request_load_plan`.
     """
     projects = session.query(sqlalchemy.distinct(model.Project.id))
 
@@ -4384,6 +4745,8 @@ def get_pull_request_of_user(
         .filter(model.PullRequest.uid.in_(final_sub.subquery()))
         .order_by(model.PullRequest.date_created.desc())
     )
+    if load_plan:
+        query = query.options(*load_plan)
 
     if status:
         query = query.filter(model.PullRequest.status == status)
@@ -4399,6 +4762,14 @@ def get_pull_request_of_user(
             model.User.user != actionable,
         )
 
+    if keyset is not None:
+        query = _apply_keyset(
+            query,
+            [model.PullRequest.date_created, model.PullRequest.uid],
+            keyset,
+            descending=True,
+        )
+
     if offset:
         query = query.offset(offset)
     if limit:
@@ -4657,60 +5028,50 @@ def get_watch_list(session, obj):
     private = False
     if obj.isa == "issue":
         private = obj.private
-        obj_watchers_query = session.query(model.IssueWatcher).filter(
-            model.IssueWatcher.issue_uid == obj.uid
-        )
-    elif obj.isa == "pull-request":
-        obj_watchers_query = session.query(model.PullRequestWatcher).filter(
-            model.PullRequestWatcher.pull_request_uid == obj.uid
-        )
-    else:
+    elif obj.isa != "pull-request":
         raise pagure.exceptions.InvalidObjectException(
             'Unsupported object found: "%s"' % obj
         )
 
-    project_watchers_query = session.query(model.Watcher).filter(
-        model.Watcher.project_id == obj.project.id
-    )
+    participants = pagure.lib.watchers.get_participants(session, obj)
 
     users = set()
 
     # Add the person who opened the object
-    users.add(obj.user.username)
+    users.add(participants.author.username)
 
     # Add all the people who commented on that object
-    for comment in obj.comments:
-        users.add(comment.user.username)
+    for user in participants.commenters:
+        users.add(user.username)
 
     # Add the user of the project
-    users.add(obj.project.user.username)
+    users.add(participants.owner.username)
 
     # Add the regular contributors
-    for contributor in obj.project.users:
+    for contributor in participants.users:
         users.add(contributor.username)
 
     # Add people in groups with commit access
-    for group in obj.project.groups:
-        for member in group.users:
-            users.add(member.username)
+    for member in participants.group_members:
+        users.add(member.username)
 
     # If the issue isn't private:
     if not private:
         # Add all the people watching the repo, remove those who opted-out
-        for watcher in project_watchers_query.all():
-            if watcher.watch_issues:
-                users.add(watcher.user.username)
+        for user, watch_issues, _ in participants.project_watchers:
+            if watch_issues:
+                users.add(user.username)
             else:
-                if watcher.user.username in users:
-                    users.remove(watcher.user.username)
+                if user.username in users:
+                    users.remove(user.username)
 
     # Add all the people watching this object, remove those who opted-out
-    for watcher in obj_watchers_query.all():
-        if watcher.watch:
-            users.add(watcher.user.username)
+    for user, watch in participants.watchers:
+        if watch:
+            users.add(user.username)
         else:
-            if watcher.user.username in users:
-                users.remove(watcher.user.username)
+            if user.username in users:
+                users.remove(user.username)
 
     return users
 
@@ -5071,18 +5432,28 @@ def tokenize_search_string(pattern):
     """This function tokenizes search patterns into key:value and rest.
 
     It will also correctly parse key values between quotes.
+    When the full-text search is enabled, the phrases between quotes and
+    the filters on the fields it supports are kept in the rest.
     """
     if pattern is None:
         return {}, None
 
+    search_index = pagure.lib.search.is_enabled()
+
     def finalize_token(token, custom_search):
         if ":" in token:
             # This was a "key:value" parameter
             key, value = token.split(":", 1)
+            if search_index and key in pagure.lib.search.FIELDS:
+                if " " in value:
+                    value = '"%s"' % value
+                return "%s:%s " % (key, value)
             custom_search[key] = value
             return ""
         else:
             # This was a token without colon, thus a search pattern
+            if search_index and " " in token:
+                token = '"%s"' % token
             return "%s " % token
 
     custom_search = {}
@@ -5287,6 +5658,144 @@ def get_pagination_metadata(
     }
 
 
+def get_keyset(obj, order_key=None):
+    """ Returns the position of the specified project, issue or
+    pull-request in the lists sorted on `order_key`, used as cursor by the
+    keyset pagination.
+
+    :arg obj: the project, issue or pull-request
+    :kwarg order_key: the attribute the list is sorted on, defaults to the
+        name of the projects and the creation date of the issues and
+        pull-requests
+    :return: the value of the attribute and the unique identifier of the
+        object
+    :rtype: list
+
+    """
+    if isinstance(obj, model.Project):
+        if order_key in (None, "name"):
+            return [obj.name.lower(), obj.id]
+        return [getattr(obj, order_key), obj.id]
+    return [getattr(obj, order_key or "date_created"), obj.uid]
+
+
+def _apply_keyset(query, columns, keyset, descending=False):
+    """ Sort the query on the specified columns, the last one being unique,
+    and if `keyset` has values only return the rows coming after the one
+    having these values.
+    """
+    order = desc if descending else asc
+    query = query.order_by(None).order_by(*[order(col) for col in columns])
+    if keyset:
+        clauses = []
+        for idx, column in enumerate(columns):
+            if descending:
+                after = column < keyset[idx]
+            else:
+                after = column > keyset[idx]
+            clauses.append(
+                sqlalchemy.and_(
+                    *[columns[i] == keyset[i] for i in range(idx)] + [after]
+                )
+            )
+        query = query.filter(sqlalchemy.or_(*clauses))
+    return query
+
+
+def encode_cursor(keyset, order_key=None):
+    """ Returns the opaque cursor pointing after the specified keyset. """
+    values = []
+    for value in keyset:
+        if isinstance(value, datetime.datetime):
+            value = {"dt": value.isoformat()}
+        values.append(value)
+    data = json.dumps([order_key, values]).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, order_key=None):
+    """ Returns the keyset the specified cursor points after, or None if the
+    cursor is invalid or was returned for another ordering.
+    """
+    try:
+        data = base64.urlsafe_b64decode(
+            cursor.encode("ascii") + b"=" * (-len(cursor) % 4)
+        )
+        cursor_key, values = json.loads(data.decode("utf-8"))
+    except (TypeError, ValueError, UnicodeError):
+        return None
+    if cursor_key != order_key or not isinstance(values, list):
+        return None
+
+    keyset = []
+    for value in values:
+        if isinstance(value, dict):
+            try:
+                value = datetime.datetime.strptime(
+                    value["dt"],
+                    "%Y-%m-%dT%H:%M:%S.%f"
+                    if "." in value["dt"]
+                    else "%Y-%m-%dT%H:%M:%S",
+                )
+            except (KeyError, TypeError, ValueError):
+                return None
+        keyset.append(value)
+    return keyset
+
+
+def get_keyset_pagination_metadata(
+    flask_request,
+    per_page,
+    objects,
+    order_key=None,
+    total=None,
+    key_cursor="cursor",
+):
+    """
+    Returns pagination metadata for an API using keyset pagination, ie:
+    walking through the objects using the cursor of the last object of the
+    previous page rather than an offset.
+    :param flask_request: flask.request object
+    :param per_page: int of results per page
+    :param objects: the objects of the page, retrieved with a limit of
+        `per_page + 1` to know if there is a next page
+    :param order_key: the attribute the objects are sorted on
+    :param total: int of total results, if they were counted
+    :param key_cursor: the name of the argument corresponding to the cursor
+    :return: dictionary of pagination metadata
+    """
+    next_cursor = None
+    next_page = None
+    if len(objects) > per_page:
+        next_cursor = encode_cursor(
+            get_keyset(objects[per_page - 1], order_key=order_key),
+            order_key=order_key,
+        )
+
+        request_args = flask_request.args.to_dict(flat=False)
+        for key in list(request_args):
+            if key in [key_cursor, "per_page", "endpoint"] or key.startswith(
+                "_"
+            ):
+                request_args.pop(key)
+        request_args.update(flask_request.view_args)
+        request_args[key_cursor] = next_cursor
+        next_page = url_for(
+            flask_request.endpoint,
+            per_page=per_page,
+            _external=True,
+            **request_args
+        )
+
+    return {
+        key_cursor: flask_request.args.get(key_cursor) or None,
+        "next_cursor": next_cursor,
+        "per_page": per_page,
+        "next": next_page,
+        "total": total,
+    }
+
+
 def update_star_project(session, repo, star, user):
     """ Unset or set the star status depending on the star value.
 
@@ -5407,47 +5916,125 @@ def update_read_only_mode(session, repo, read_only=True):
         session.add(repo)
 
 
+def _issues_history_stats_key(project):
+    """ Returns the key under which the issues stats of the specified
+    project are cached in redis.
+    """
+    return "pagure.issues_history_stats.%s" % project.id
+
+
+def invalidate_issues_history_stats(project):
+    """ Removes the cached issues stats of the specified project, to be
+    called when an issue is created, closed, re-opened or deleted.
+
+    :arg project: model.Project object whose issues stats changed
+
+    """
+    if REDIS:
+        try:
+            REDIS.delete(_issues_history_stats_key(project))
+        except redis.exceptions.RedisError:
+            _log.exception("Could not invalidate the issues stats")
+
+
 def issues_history_stats(session, project):
     """ Returns the number of opened issues on the specified project over
     the last 365 days
 
+    The issues are grouped by the week they were created and the week they
+    were closed in, in a single query, and the number of opened issues is
+    computed from these groups.
+    The output is cached in redis, if available, until an issue is created,
+    closed, re-opened or deleted.
+
     :arg session: The session object to query the db with
     :arg repo: model.Project object to get the issues stats about
 
     """
+    key = _issues_history_stats_key(project)
+    if REDIS:
+        try:
+            cached = REDIS.get(key)
+        except redis.exceptions.RedisError:
+            _log.exception("Could not retrieve the cached issues stats")
+            cached = None
+        if cached:
+            return json.loads(cached)
+
+    # The start of each week, from tomorrow going backward
+    tomorrow = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+    starts = [
+        tomorrow - datetime.timedelta(days=(week * 7)) for week in range(53)
+    ]
+
+    # Index of the first week starting before the issue was created, the
+    # issue was opened during the weeks with a higher index
+    created_week = sqlalchemy.case(
+        [
+            (model.Issue.date_created > start, idx)
+            for idx, start in enumerate(starts)
+        ],
+        else_=len(starts),
+    )
+    # Index of the first week starting before the issue was closed, or -1
+    # if it has no closed date, the issue was still opened during the weeks
+    # with a lower or equal index
+    closed_week = sqlalchemy.case(
+        [(model.Issue.closed_at == None, -1)]  # noqa
+        + [
+            (model.Issue.closed_at >= start, idx)
+            for idx, start in enumerate(starts)
+        ],
+        else_=len(starts),
+    )
+    subquery = (
+        session.query(
+            model.Issue.status.label("status"),
+            created_week.label("created_week"),
+            closed_week.label("closed_week"),
+        )
+        .filter(model.Issue.project_id == project.id)
+        .subquery()
+    )
+    groups = (
+        session.query(
+            subquery.c.status,
+            subquery.c.created_week,
+            subquery.c.closed_week,
+            func.count(),
+        )
+        .group_by(
+            subquery.c.status, subquery.c.created_week, subquery.c.closed_week
+        )
+        .all()
+    )
 
     # Some ticket got imported as closed but without a closed_at date, so
     # let's ignore them all
-    to_ignore = (
-        session.query(model.Issue)
-        .filter(model.Issue.project_id == project.id)
-        .filter(model.Issue.closed_at == None)  # noqa
-        .filter(model.Issue.status == "Closed")
-        .count()
+    to_ignore = sum(
+        cnt
+        for status, _, closed, cnt in groups
+        if status == "Closed" and closed == -1
     )
 
-    # For each week from tomorrow, get the number of open tickets
-    tomorrow = datetime.datetime.utcnow() + datetime.timedelta(days=1)
     output = {}
-    for week in range(53):
-        start = tomorrow - datetime.timedelta(days=(week * 7))
-        closed_ticket = (
-            session.query(model.Issue)
-            .filter(model.Issue.project_id == project.id)
-            .filter(model.Issue.closed_at >= start)
-            .filter(model.Issue.date_created <= start)
-        )
-        open_ticket = (
-            session.query(model.Issue)
-            .filter(model.Issue.project_id == project.id)
-            .filter(model.Issue.status == "Open")
-            .filter(model.Issue.date_created <= start)
-        )
-        cnt = open_ticket.count() + closed_ticket.count() - to_ignore
+    for week, start in enumerate(starts):
+        cnt = -to_ignore
+        for status, created, closed, count in groups:
+            if created <= week:
+                continue
+            if status == "Open" or 0 <= closed <= week:
+                cnt += count
         if cnt < 0:
             cnt = 0
         output[start.isoformat()] = cnt
 
+    if REDIS:
+        try:
+            REDIS.setex(key, 24 * 3600, json.dumps(output))
+        except redis.exceptions.RedisError:
+            _log.exception("Could not cache the issues stats")
+
     return output
 
 
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Caches for the content rendered by pagure, such as the html generated
+from markdown, either kept in the memory of each process, shared via
+redis or both.
+
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import hashlib
+import logging
+import threading
+import time
+
+import redis
+
+from pagure.config import config as pagure_config
+
+
+_log = logging.getLogger(__name__)
+
+
+def make_key(*values):
+    """ Return a key usable in the caches for the specified values. """
+    return hashlib.sha256(
+        "\0".join("%s" % value for value in values).encode("utf-8")
+    ).hexdigest()
+
+
+class MemoryCache(object):
+    """ Keep the entries in the memory of the process, removing the least
+    recently used ones when there are more than `size` of them.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                return None
+            # Mark the entry as recently used
+            self._entries[key] = entry
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(object):
+    """ Store the entries in redis, shared by all the processes. Entries
+    without a ttl are kept for `ttl` seconds, redis is relied upon to
+    evict the least recently used ones.
+    """
+
+    def __init__(self, client, prefix, ttl):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is not None:
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.client.setex(
+            self.prefix + key, int(ttl or self.ttl), value.encode("utf-8")
+        )
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class TieredCache(object):
+    """ Keep the most recently used entries in the memory of the process,
+    in front of a cache shared by all the processes.
+    """
+
+    def __init__(self, local, shared, ttl=None):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value, ttl=self.ttl)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl=ttl or self.ttl)
+        self.shared.set(key, value, ttl=ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(name):
+    """ Return the cache of the specified kind configured for this
+    instance or None if this kind of content is not cached.
+
+    The cache is configured via the ``<name>_CACHE_BACKEND`` ("memory",
+    "redis" or "tiered"), ``<name>_CACHE_SIZE`` and ``<name>_CACHE_TTL``
+    configuration keys.
+
+    :arg name: the kind of content to cache, for example: MARKDOWN
+    :type name: str
+    :return: the cache or None
+    :rtype: MemoryCache or RedisCache or TieredCache or None
+
+    """
+    backend = pagure_config.get("%s_CACHE_BACKEND" % name)
+    if not backend:
+        return None
+    with _CACHES_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None:
+            if backend == "redis":
+                cache = _get_redis_cache(name)
+            elif backend == "tiered":
+                cache = TieredCache(
+                    _get_memory_cache(name),
+                    _get_redis_cache(name),
+                    pagure_config.get("%s_CACHE_TTL" % name),
+                )
+            else:
+                cache = _get_memory_cache(name)
+            _CACHES[name] = cache
+    return cache
+
+
+def _get_memory_cache(name):
+    return MemoryCache(pagure_config.get("%s_CACHE_SIZE" % name, 1000))
+
+
+def _get_redis_cache(name):
+    pool = redis.ConnectionPool(
+        host=pagure_config["REDIS_HOST"],
+        port=pagure_config["REDIS_PORT"],
+        db=pagure_config["REDIS_DB"],
+    )
+    return RedisCache(
+        redis.StrictRedis(connection_pool=pool),
+        "pagure:%s:" % name.lower(),
+        pagure_config.get("%s_CACHE_TTL" % name) or 24 * 3600,
+    )
+
+
+def cache_get(cache, key):
+    """ Return the entry of the specified cache or None if it is not in
+    it or could not be retrieved.
+    """
+    try:
+        return cache.get(key)
+    except Exception:
+        _log.exception("Could not retrieve the entry from the cache")
+        return None
+
+
+def cache_set(cache, key, value, ttl=None):
+    """ Store the entry in the specified cache, ignoring the errors. """
+    try:
+        cache.set(key, value, ttl=ttl)
+    except Exception:
+        _log.exception("Could not store the entry in the cache")
+
+
+def cache_delete(cache, key):
+    """ Remove the entry from the specified cache, ignoring the errors. """
+    try:
+        cache.delete(key)
+    except Exception:
+        _log.exception("Could not remove the entry from the cache")
+
+
+def reset():
+    """ Forget the caches created, mostly useful for the tests. """
+    with _CACHES_LOCK:
+        _CACHES.clear()
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Full-text search of the issues and pull-requests of the projects.
+
+The title, content and comments of the issues and pull-requests are split
+into words, stored in the search_documents table, which is updated as they
+are created, edited or commented on. The documents are then searched using
+one of the backends:
+
+- ``postgresql``: the native full-text search of PostgreSQL, relying on a
+  GIN index of the documents,
+- ``terms``: an inverted index of the words of the documents, stored in the
+  search_terms table, usable with any database and notably SQLite.
+
+The patterns searched are made of words, which must all be found, of
+phrases between double quotes, of prefixes ending with a ``*`` and of
+``title:`` or ``content:`` filters restricting the search to the title or
+the content (comments included) of the issues and pull-requests.
+
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import re
+
+import six
+import sqlalchemy
+import sqlalchemy.orm
+from sqlalchemy import func
+from sqlalchemy.orm.attributes import get_history
+
+from pagure.config import config as pagure_config
+from pagure.lib import model
+
+
+_log = logging.getLogger(__name__)
+
+# Fields the search can be restricted to via `<field>:<value>`
+FIELDS = ("title", "content")
+
+# Terms found in the title count more than the ones found in the content
+# when ranking the results of the ``terms`` backend
+TITLE_WEIGHT = 3
+
+_WORDS_RE = re.compile(r"\w+", re.UNICODE)
+_MAX_TERM_LENGTH = 64
+
+# Key of the session.info entry listing the documents to update
+_PENDING = "search_index_pending"
+
+
+def get_words(text):
+    """ Return the words of the specified text, as they are indexed. """
+    if not text:
+        return []
+    return [
+        word[:_MAX_TERM_LENGTH]
+        for word in _WORDS_RE.findall(six.text_type(text).lower())
+    ]
+
+
+def is_enabled():
+    """ Return whether the issues and pull-requests are indexed. """
+    return bool(pagure_config.get("SEARCH_INDEX_BACKEND"))
+
+
+def get_backend(session):
+    """ Return the backend to use to search the documents or None if the
+    full-text search is disabled.
+    """
+    backend = pagure_config.get("SEARCH_INDEX_BACKEND")
+    if backend == "auto":
+        if session.bind.dialect.name == "postgresql":
+            backend = "postgresql"
+        else:
+            backend = "terms"
+    return backend or None
+
+
+class Clause(object):
+    """ A part of a search pattern: a word, a prefix or a phrase, possibly
+    restricted to a field.
+    """
+
+    def __init__(self, words, field=None, prefix=False):
+        self.words = words
+        self.field = field
+        self.prefix = prefix
+
+    @property
+    def phrase(self):
+        return len(self.words) > 1
+
+    def __eq__(self, other):
+        return (self.words, self.field, self.prefix) == (
+            other.words,
+            other.field,
+            other.prefix,
+        )
+
+    def __repr__(self):
+        return "<Clause %s%s%s>" % (
+            "%s:" % self.field if self.field else "",
+            " ".join(self.words),
+            "*" if self.prefix else "",
+        )
+
+
+def parse_pattern(pattern):
+    """ Split the specified search pattern into clauses.
+
+    :arg pattern: the pattern searched
+    :type pattern: str
+    :return: the clauses of the pattern or None if the index cannot be used
+        to search it, ie: it has wildcards elsewhere than at the end of a
+        word
+    :rtype: list of Clause or None
+
+    """
+    tokens = []
+    token = ""
+    in_quotes = False
+    for char in pattern:
+        if char == " " and not in_quotes:
+            tokens.append(token)
+            token = ""
+        elif char == '"':
+            in_quotes = not in_quotes
+        else:
+            token += char
+    tokens.append(token)
+
+    clauses = []
+    for token in tokens:
+        field = None
+        if ":" in token:
+            key, value = token.split(":", 1)
+            if key in FIELDS:
+                field, token = key, value
+
+        prefix = token.endswith("*")
+        if prefix:
+            token = token.rstrip("*")
+        if "*" in token:
+            return None
+
+        words = get_words(token)
+        if not words:
+            continue
+        clauses.append(
+            Clause(words, field=field, prefix=prefix and len(words) == 1)
+        )
+    return clauses
+
+
+def _term_filter(clause, word):
+    """ Return the filter on the search_terms table matching the specified
+    word of the clause.
+    """
+    if clause.prefix:
+        term_filter = model.SearchTerm.term.like(
+            word.replace("%", "\\%").replace("_", "\\_") + "%", escape="\\"
+        )
+    else:
+        term_filter = model.SearchTerm.term == word
+    if clause.field == "title":
+        term_filter = sqlalchemy.and_(
+            term_filter, model.SearchTerm.title_count > 0
+        )
+    elif clause.field == "content":
+        term_filter = sqlalchemy.and_(
+            term_filter, model.SearchTerm.content_count > 0
+        )
+    return term_filter
+
+
+def _search_terms(session, query, clauses):
+    """ Search the documents using the search_terms table. """
+    term_filters = []
+    for clause in clauses:
+        for word in clause.words:
+            term_filter = _term_filter(clause, word)
+            term_filters.append(term_filter)
+            query = query.filter(
+                model.SearchDocument.id.in_(
+                    session.query(model.SearchTerm.document_id).filter(
+                        term_filter
+                    )
+                )
+            )
+
+        if clause.phrase:
+            # The documents have all the words, check they are in order
+            phrase = " %s " % " ".join(clause.words)
+            phrase = phrase.replace("%", "\\%").replace("_", "\\_")
+            columns = [
+                model.SearchDocument.title,
+                model.SearchDocument.content,
+            ]
+            if clause.field:
+                columns = [getattr(model.SearchDocument, clause.field)]
+            query = query.filter(
+                sqlalchemy.or_(
+                    *[
+                        column.like("%" + phrase + "%", escape="\\")
+                        for column in columns
+                    ]
+                )
+            )
+
+    rank = func.sum(
+        model.SearchTerm.title_count * TITLE_WEIGHT
+        + model.SearchTerm.content_count
+    )
+    return (
+        query.add_columns(rank.label("rank"))
+        .join(
+            model.SearchTerm,
+            model.SearchTerm.document_id == model.SearchDocument.id,
+        )
+        .filter(sqlalchemy.or_(*term_filters))
+        .group_by(model.SearchDocument.obj_uid)
+    )
+
+
+def _tsvector():
+    """ Return the tsvector of the documents, it is the expression the GIN
+    index is created on.
+    """
+    config = sqlalchemy.literal_column("'simple'::regconfig")
+    return func.setweight(
+        func.to_tsvector(config, model.SearchDocument.title),
+        sqlalchemy.literal_column("'A'"),
+    ).op("||")(
+        func.setweight(
+            func.to_tsvector(config, model.SearchDocument.content),
+            sqlalchemy.literal_column("'B'"),
+        )
+    )
+
+
+def _search_postgresql(session, query, clauses):
+    """ Search the documents using the full-text search of PostgreSQL. """
+    weight = {"title": "A", "content": "B", None: ""}
+    parts = []
+    for clause in clauses:
+        label = "%s%s" % ("*" if clause.prefix else "", weight[clause.field])
+        lexemes = [
+            "'%s'%s" % (word, ":" + label if label else "")
+            for word in clause.words
+        ]
+        parts.append("(%s)" % " <-> ".join(lexemes))
+    tsquery = func.to_tsquery(
+        sqlalchemy.literal_column("'simple'::regconfig"), " & ".join(parts)
+    )
+
+    vector = _tsvector()
+    return query.add_columns(
+        func.ts_rank(vector, tsquery).label("rank")
+    ).filter(vector.op("@@")(tsquery))
+
+
+def search(session, obj_type, pattern, project_id=None):
+    """ Search the issues or the pull-requests matching the specified
+    pattern.
+
+    :arg session: the session to use to connect to the database.
+    :arg obj_type: the type of objects to search: issue or pull-request
+    :type obj_type: str
+    :arg pattern: the pattern searched
+    :type pattern: str
+    :kwarg project_id: the identifier of the project to search in
+    :type project_id: int or None
+    :return: a subquery returning the uid of the matching objects and
+        their rank or None if the index cannot be used for this search, in
+        which case the caller should fall back to searching the titles
+    :rtype: sqlalchemy.sql.Alias or None
+
+    """
+    backend = get_backend(session)
+    if backend is None:
+        return None
+    clauses = parse_pattern(pattern)
+    if clauses is None:
+        return None
+
+    query = session.query(model.SearchDocument.obj_uid.label("uid")).filter(
+        model.SearchDocument.obj_type == obj_type
+    )
+    if project_id is not None:
+        query = query.filter(model.SearchDocument.project_id == project_id)
+
+    if not clauses:
+        # Nothing to search for, eg: only punctuation
+        query = query.add_columns(sqlalchemy.literal(0).label("rank"))
+        query = query.filter(sqlalchemy.false())
+    elif backend == "postgresql":
+        query = _search_postgresql(session, query, clauses)
+    else:
+        query = _search_terms(session, query, clauses)
+    return query.subquery()
+
+
+def _get_object(session, obj_type, uid):
+    """ Return the issue or pull-request having the specified uid. """
+    if obj_type == "issue":
+        cls = model.Issue
+    else:
+        cls = model.PullRequest
+    return session.query(cls).filter(cls.uid == uid).first()
+
+
+def _get_text(session, obj_type, obj):
+    """ Return the title and the content, comments included, of the
+    specified issue or pull-request.
+    """
+    if obj_type == "issue":
+        content = [obj.content]
+        comments = session.query(model.IssueComment.comment).filter(
+            model.IssueComment.issue_uid == obj.uid
+        )
+        comment_cls = model.IssueComment
+    else:
+        content = [obj.initial_comment]
+        comments = session.query(model.PullRequestComment.comment).filter(
+            model.PullRequestComment.pull_request_uid == obj.uid
+        )
+        comment_cls = model.PullRequestComment
+    comments = comments.filter(
+        comment_cls.notification == False  # noqa: E712
+    ).order_by(comment_cls.id)
+    content.extend(comment[0] for comment in comments)
+    return obj.title, "\n".join(text for text in content if text)
+
+
+def index_object(session, obj_type, uid):
+    """ Update the document of the specified issue or pull-request, or
+    remove it if the issue or pull-request no longer exists.
+
+    :arg session: the session to use to connect to the database.
+    :arg obj_type: the type of object to index: issue or pull-request
+    :type obj_type: str
+    :arg uid: the unique identifier of the issue or pull-request
+    :type uid: str
+
+    """
+    doc = (
+        session.query(model.SearchDocument)
+        .filter(model.SearchDocument.obj_type == obj_type)
+        .filter(model.SearchDocument.obj_uid == uid)
+        .first()
+    )
+
+    obj = _get_object(session, obj_type, uid)
+    if obj is None:
+        if doc is not None:
+            session.query(model.SearchTerm).filter(
+                model.SearchTerm.document_id == doc.id
+            ).delete(synchronize_session=False)
+            session.delete(doc)
+        return
+
+    title, content = _get_text(session, obj_type, obj)
+    title_words = get_words(title)
+    content_words = get_words(content)
+
+    if doc is None:
+        doc = model.SearchDocument(obj_type=obj_type, obj_uid=uid)
+        session.add(doc)
+    doc.project_id = obj.project_id
+    doc.title = " %s " % " ".join(title_words)
+    doc.content = " %s " % " ".join(content_words)
+
+    if get_backend(session) != "terms":
+        return
+
+    counts = {}
+    for idx, words in enumerate([title_words, content_words]):
+        for word in words:
+            counts.setdefault(word, [0, 0])[idx] += 1
+
+    if doc.id is None:
+        session.flush()
+        existing = {}
+    else:
+        existing = dict(
+            (term.term, term)
+            for term in session.query(model.SearchTerm).filter(
+                model.SearchTerm.document_id == doc.id
+            )
+        )
+
+    for word in set(existing) - set(counts):
+        session.delete(existing[word])
+    for word, (title_count, content_count) in counts.items():
+        term = existing.get(word)
+        if term is None:
+            term = model.SearchTerm(document_id=doc.id, term=word)
+            session.add(term)
+        term.title_count = title_count
+        term.content_count = content_count
+
+
+def reindex(session, project=None):
+    """ Index all the issues and pull-requests, of the specified project
+    or of all the projects.
+
+    :arg session: the session to use to connect to the database.
+    :kwarg project: the project to index the issues and pull-requests of
+    :type project: pagure.lib.model.Project or None
+    :return: the number of issues and pull-requests indexed
+    :rtype: int
+
+    """
+    cnt = 0
+    for obj_type, cls in [
+        ("issue", model.Issue),
+        ("pull-request", model.PullRequest),
+    ]:
+        query = session.query(cls.uid).order_by(cls.uid)
+        if project is not None:
+            query = query.filter(cls.project_id == project.id)
+        for (uid,) in query.all():
+            index_object(session, obj_type, uid)
+            cnt += 1
+            if cnt % 100 == 0:
+                session.commit()
+    session.commit()
+    return cnt
+
+
+def _get_document_key(session, obj):
+    """ Return the type and uid of the issue or pull-request whose document
+    must be updated because of the change made to the specified object, or
+    None if the document is unchanged.
+    """
+
+    def _changed(*attrs):
+        if obj in session.new or obj in session.deleted:
+            return True
+        return any(get_history(obj, attr).has_changes() for attr in attrs)
+
+    if isinstance(obj, model.Issue):
+        if _changed("title", "content", "project_id"):
+            return ("issue", obj.uid)
+    elif isinstance(obj, model.IssueComment):
+        if _changed("comment"):
+            return ("issue", obj.issue_uid)
+    elif isinstance(obj, model.PullRequest):
+        if _changed("title", "initial_comment", "project_id"):
+            return ("pull-request", obj.uid)
+    elif isinstance(obj, model.PullRequestComment):
+        if _changed("comment"):
+            return ("pull-request", obj.pull_request_uid)
+    return None
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_flush")
+def _track_changes(session, flush_context):
+    """ Keep track of the issues and pull-requests changed, so their
+    documents are updated before the changes are committed.
+    """
+    if not is_enabled():
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        key = _get_document_key(session, obj)
+        if key is not None and key[1]:
+            session.info.setdefault(_PENDING, set()).add(key)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "before_commit")
+def _update_documents(session):
+    """ Update the documents of the issues and pull-requests changed in
+    this transaction.
+    """
+    if not is_enabled():
+        return
+    session.flush()
+    pending = session.info.pop(_PENDING, None)
+    for obj_type, uid in sorted(pending or []):
+        index_object(session, obj_type, uid)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_soft_rollback")
+def _forget_changes(session, previous_transaction):
+    """ Forget the issues and pull-requests changed in the transaction
+    rolled back.
+    """
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Serialization of the projects, issues and pull-requests to JSON.
+
+A serializer is used for a whole response: the users and projects nested
+in the objects it serializes are serialized once and shared by all these
+objects. It can also serialize the nested projects as stubs, for the lists
+which do not need their access lists, tags and custom fields.
+
+The load plans are the eager-loading options matching the fields
+serialized, to pass to the queries retrieving the objects so serializing
+them does not lazy-load the relations of each object one at a time.
+
+"""
+
+from __future__ import unicode_literals
+
+import sqlalchemy.orm
+from sqlalchemy.orm import defaultload, selectinload
+
+import pagure.lib.model
+
+
+class Serializer(object):
+    """ Serialize objects to dictionaries, the users and projects nested in
+    them being serialized only once.
+
+    The dictionaries returned for these users and projects are shared and
+    thus should not be modified.
+
+    :kwarg public: whether to leave out the private information, such as
+        the emails of the users
+    :type public: bool
+    :kwarg api: whether the output is returned by the API, which leaves out
+        the settings of the projects
+    :type api: bool
+    :kwarg compact: whether to serialize the projects nested in other
+        objects as stubs, ie: with only their name and namespace
+    :type compact: bool
+
+    """
+
+    def __init__(self, public=False, api=False, compact=False):
+        self.public = public
+        self.api = api
+        self.compact = compact
+        self._serialized = {}
+
+    def _memoize(self, kind, obj, serialize):
+        key = (kind, obj.id)
+        if key not in self._serialized:
+            self._serialized[key] = serialize(obj)
+        return self._serialized[key]
+
+    def user(self, user):
+        """ Return a representation of the specified user. """
+        if user is None:
+            return None
+        return self._memoize("user", user, self._user)
+
+    def _user(self, user):
+        output = {"name": user.user, "fullname": user.fullname}
+        if not self.public:
+            output["default_email"] = user.default_email
+            output["emails"] = sorted([email.email for email in user.emails])
+        return output
+
+    def project(self, project):
+        """ Return the full representation of the specified project. """
+        return self._memoize("project", project, self._project)
+
+    def _project(self, project):
+        output = {
+            "id": project.id,
+            "name": project.name,
+            "fullname": project.fullname,
+            "url_path": project.url_path,
+            "description": project.description,
+            "namespace": project.namespace,
+            "parent": self.nested_project(project.parent),
+            "date_created": pagure.lib.model.arrow_ts(project.date_created),
+            "date_modified": pagure.lib.model.arrow_ts(project.date_modified),
+            "user": self.user(project.user),
+            "access_users": project.access_users_json,
+            "access_groups": project.access_groups_json,
+            "tags": project.tags_text,
+            "priorities": project.priorities,
+            "custom_keys": [
+                [key.name, key.key_type] for key in project.issue_keys
+            ],
+            "close_status": project.close_status,
+            "milestones": project.milestones,
+        }
+        if not self.api and not self.public:
+            output["settings"] = project.settings
+        return output
+
+    def project_stub(self, project):
+        """ Return the short representation of the specified project,
+        enough to link to it.
+        """
+        return self._memoize("project_stub", project, self._project_stub)
+
+    def _project_stub(self, project):
+        return {
+            "id": project.id,
+            "name": project.name,
+            "namespace": project.namespace,
+            "fullname": project.fullname,
+            "url_path": project.url_path,
+        }
+
+    def nested_project(self, project):
+        """ Return the representation of a project nested in another object,
+        a stub if the serializer is compact.
+        """
+        if project is None:
+            return None
+        if self.compact:
+            return self.project_stub(project)
+        return self.project(project)
+
+    def issue(self, issue, with_comments=True, with_project=False):
+        """ Return a representation of the specified issue. """
+        output = {
+            "id": issue.id,
+            "title": issue.title,
+            "content": issue.content,
+            "status": issue.status,
+            "close_status": issue.close_status,
+            "date_created": pagure.lib.model.arrow_ts(issue.date_created),
+            "last_updated": pagure.lib.model.arrow_ts(issue.last_updated),
+            "closed_at": pagure.lib.model.arrow_ts(issue.closed_at)
+            if issue.closed_at
+            else None,
+            "user": self.user(issue.user),
+            "private": issue.private,
+            "tags": issue.tags_text,
+            "depends": ["%s" % item for item in issue.depending_text],
+            "blocks": ["%s" % item for item in issue.blocking_text],
+            "assignee": self.user(issue.assignee),
+            "priority": issue.priority,
+            "milestone": issue.milestone,
+            "custom_fields": [
+                dict(
+                    name=field.key.name,
+                    key_type=field.key.key_type,
+                    value=field.value,
+                    key_data=field.key.key_data,
+                )
+                for field in issue.other_fields
+            ],
+        }
+
+        comments = []
+        if with_comments:
+            comments = [
+                self.issue_comment(comment) for comment in issue.comments
+            ]
+        output["comments"] = comments
+
+        if with_project:
+            output["project"] = self.nested_project(issue.project)
+
+        return output
+
+    def pull_request(self, request, with_comments=True):
+        """ Return a representation of the specified pull-request. """
+        output = {
+            "id": request.id,
+            "uid": request.uid,
+            "title": request.title,
+            "branch": request.branch,
+            "project": self.nested_project(request.project),
+            "branch_from": request.branch_from,
+            "repo_from": self.nested_project(request.project_from),
+            "remote_git": request.remote_git,
+            "date_created": pagure.lib.model.arrow_ts(request.date_created),
+            "updated_on": pagure.lib.model.arrow_ts(request.updated_on),
+            "last_updated": pagure.lib.model.arrow_ts(request.last_updated),
+            "closed_at": pagure.lib.model.arrow_ts(request.closed_at)
+            if request.closed_at
+            else None,
+            "user": self.user(request.user),
+            "assignee": self.user(request.assignee),
+            "status": request.status,
+            "commit_start": request.commit_start,
+            "commit_stop": request.commit_stop,
+            "closed_by": self.user(request.closed_by),
+            "initial_comment": request.initial_comment,
+            "cached_merge_status": request.merge_status or "unknown",
+        }
+
+        comments = []
+        if with_comments:
+            comments = [
+                self.pull_request_comment(comment)
+                for comment in request.comments
+            ]
+        output["comments"] = comments
+
+        return output
+
+    def issue_comment(self, comment):
+        """ Return a representation of the specified comment on an issue.
+        """
+        return self._comment(comment)
+
+    def pull_request_comment(self, comment):
+        """ Return a representation of the specified comment on a
+        pull-request.
+        """
+        output = self._comment(comment)
+        output.update(
+            {
+                "commit": comment.commit_id,
+                "tree": comment.tree_id,
+                "filename": comment.filename,
+                "line": comment.line,
+            }
+        )
+        return output
+
+    def _comment(self, comment):
+        return {
+            "id": comment.id,
+            "comment": comment.comment,
+            "parent": comment.parent_id,
+            "date_created": pagure.lib.model.arrow_ts(comment.date_created),
+            "user": self.user(comment.user),
+            "edited_on": pagure.lib.model.arrow_ts(comment.edited_on)
+            if comment.edited_on
+            else None,
+            "editor": self.user(comment.editor) if comment.editor_id else None,
+            "notification": comment.notification,
+            "reactions": comment.reactions,
+        }
+
+
+def _load(path, *attrs):
+    """ Return the option eager-loading the chain of relations `attrs` of
+    the objects reached via the chain of relations `path`.
+    """
+    option = None
+    for attr in path:
+        if option is None:
+            option = defaultload(attr)
+        else:
+            option = option.defaultload(attr)
+    for attr in attrs:
+        if option is None:
+            option = selectinload(attr)
+        else:
+            option = option.selectinload(attr)
+    return option
+
+
+def _project_plan(path, compact, stub=False, with_parent=True):
+    model = pagure.lib.model
+    # The user is needed to build the name of the forks
+    options = [_load(path, model.Project.user)]
+    if stub:
+        return options
+
+    for attr in [
+        model.Project.users,
+        model.Project.admins,
+        model.Project.committers,
+        model.Project.groups,
+        model.Project.admin_groups,
+        model.Project.committer_groups,
+        model.Project.tags,
+        model.Project.issue_keys,
+    ]:
+        options.append(_load(path, attr))
+
+    # Only the parent is loaded, its own parent is loaded as needed
+    if with_parent:
+        options.append(_load(path, model.Project.parent))
+        options.extend(
+            _project_plan(
+                path + (model.Project.parent,),
+                compact,
+                stub=compact,
+                with_parent=False,
+            )
+        )
+    return options
+
+
+def _comments_plan(comments, comment_cls):
+    return [
+        _load((), comments, comment_cls.user),
+        _load((), comments, comment_cls.editor),
+    ]
+
+
+def project_load_plan(compact=False):
+    """ Return the loader options eager-loading the relations serialized
+    for the projects queried.
+
+    :kwarg compact: whether the parent projects are serialized as stubs
+    :type compact: bool
+    :return: the options to pass to the query
+    :rtype: list
+
+    """
+    # The backrefs are only set on the models once the mappers configured
+    sqlalchemy.orm.configure_mappers()
+    return _project_plan((), compact)
+
+
+def issue_load_plan(with_comments=True, with_project=False, compact=False):
+    """ Return the loader options eager-loading the relations serialized
+    for the issues queried.
+
+    :kwarg with_comments: whether the comments are serialized
+    :type with_comments: bool
+    :kwarg with_project: whether the projects of the issues are serialized
+    :type with_project: bool
+    :kwarg compact: whether the projects are serialized as stubs
+    :type compact: bool
+    :return: the options to pass to the query
+    :rtype: list
+
+    """
+    sqlalchemy.orm.configure_mappers()
+    model = pagure.lib.model
+    options = [
+        _load((), model.Issue.user),
+        _load((), model.Issue.assignee),
+        _load((), model.Issue.tags),
+        _load((), model.Issue.parents),
+        _load((), model.Issue.children),
+        _load((), model.Issue.other_fields, model.IssueValues.key),
+    ]
+    if with_comments:
+        options.extend(
+            _comments_plan(model.Issue.comments, model.IssueComment)
+        )
+    if with_project:
+        options.append(_load((), model.Issue.project))
+        options.extend(
+            _project_plan((model.Issue.project,), compact, stub=compact)
+        )
+    return options
+
+
+def pull_request_load_plan(with_comments=True, compact=False):
+    """ Return the loader options eager-loading the relations serialized
+    for the pull-requests queried.
+
+    :kwarg with_comments: whether the comments are serialized
+    :type with_comments: bool
+    :kwarg compact: whether the projects are serialized as stubs
+    :type compact: bool
+    :return: the options to pass to the query
+    :rtype: list
+
+    """
+    sqlalchemy.orm.configure_mappers()
+    model = pagure.lib.model
+    options = [
+        _load((), model.PullRequest.user),
+        _load((), model.PullRequest.assignee),
+        _load((), model.PullRequest.closed_by),
+    ]
+    for attr in [model.PullRequest.project, model.PullRequest.project_from]:
+        options.append(_load((), attr))
+        options.extend(_project_plan((attr,), compact, stub=compact))
+    if with_comments:
+        options.extend(
+            _comments_plan(
+                model.PullRequest.comments, model.PullRequestComment
+            )
+        )
+    return options
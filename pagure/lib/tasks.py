@@ -10,8 +10,6 @@
 
 from __future__ import unicode_literals
 
-import collections
-import datetime
 import hashlib
 import os
 import os.path
@@ -19,7 +17,6 @@ import shutil
 import subprocess
 import time
 
-import arrow
 import pygit2
 import six
 
@@ -29,12 +26,16 @@ from celery.signals import after_setup_task_logger
 from celery.utils.log import get_task_logger
 from sqlalchemy.exc import SQLAlchemyError
 
+import pagure.lib.blame_cache
+import pagure.lib.commit_stats
 import pagure.lib.git
 import pagure.lib.git_auth
 import pagure.lib.link
+import pagure.lib.pr_diff_cache
 import pagure.lib.query
 import pagure.lib.repo
 import pagure.utils
+from pagure.lib import model
 from pagure.lib.tasks_utils import pagure_task
 from pagure.config import config as pagure_config
 from pagure.utils import get_parent_repo_path
@@ -316,6 +317,9 @@ def update_git(
 ):
     """ Update the JSON representation of either a ticket or a pull-request
     depending on the argument specified.
+
+    All the tickets or pull-requests of the project waiting to be written
+    to the git repo are written at the same time, in a single commit.
     """
     project = pagure.lib.query._get_project(
         session, namespace=namespace, name=name, user=user
@@ -329,16 +333,35 @@ def update_git(
 
     with project.lock(project_lock):
         if ticketuid is not None:
-            obj = pagure.lib.query.get_issue_by_uid(session, ticketuid)
+            uids = pagure.lib.git.pop_pending_updates(
+                project, "tickets", ticketuid
+            )
+            objs = (
+                session.query(model.Issue)
+                .filter(model.Issue.project_id == project.id)
+                .filter(model.Issue.uid.in_(uids))
+                .all()
+            )
+            uid = ticketuid
         elif requestuid is not None:
-            obj = pagure.lib.query.get_request_by_uid(session, requestuid)
+            uids = pagure.lib.git.pop_pending_updates(
+                project, "requests", requestuid
+            )
+            objs = (
+                session.query(model.PullRequest)
+                .filter(model.PullRequest.project_id == project.id)
+                .filter(model.PullRequest.uid.in_(uids))
+                .all()
+            )
+            uid = requestuid
         else:
             raise NotImplementedError("No ticket ID or request ID provided")
 
-        if obj is None:
+        if uid not in [obj.uid for obj in objs]:
             raise Exception("Unable to find object")
 
-        result = pagure.lib.git._update_git(obj, project)
+        objs = sorted(objs, key=lambda obj: obj.uid)
+        result = pagure.lib.git._update_git_objects(objs, project)
 
     return result
 
@@ -426,6 +449,31 @@ def delete_branch(self, session, name, namespace, user, branchname):
     )
 
 
+def _fork_repo_by_push(repo_from, repo_to):
+    """ Fills the main git repository of a fork by fetching the branches
+    of its parent in a clone of the fork and pushing them to it.
+    """
+    with pagure.lib.git.TemporaryClone(repo_to, "main", "fork") as tempclone:
+        fork_repo = tempclone.repo
+
+        fork_repo.remotes.create("forkedfrom", repo_from.repopath("main"))
+        fork_repo.remotes["forkedfrom"].fetch()
+
+        for branchname in fork_repo.branches.remote:
+            if not branchname.startswith("forkedfrom/"):
+                continue
+            localname = branchname.replace("forkedfrom/", "")
+            if localname == "HEAD":
+                # HEAD will be created automatically as a symref
+                continue
+            tempclone.push(
+                "pagure",
+                "remotes/%s" % branchname,
+                "refs/heads/%s" % localname,
+                internal="yes",
+            )
+
+
 @conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
 @pagure_task
 def fork(
@@ -464,32 +512,19 @@ def fork(
         session, namespace=namespace, name=name, user=user_forker
     )
 
+    fast_fork = pagure_config.get("FAST_FORK")
+    if repo_from.is_on_repospanner or repo_to.is_on_repospanner:
+        fast_fork = None
+
     with repo_to.lock("WORKER"):
         pagure.lib.git.create_project_repos(
             repo_to, repo_to.repospanner_region, None, False
         )
 
-        with pagure.lib.git.TemporaryClone(
-            repo_to, "main", "fork"
-        ) as tempclone:
-            fork_repo = tempclone.repo
-
-            fork_repo.remotes.create("forkedfrom", repo_from.repopath("main"))
-            fork_repo.remotes["forkedfrom"].fetch()
-
-            for branchname in fork_repo.branches.remote:
-                if not branchname.startswith("forkedfrom/"):
-                    continue
-                localname = branchname.replace("forkedfrom/", "")
-                if localname == "HEAD":
-                    # HEAD will be created automatically as a symref
-                    continue
-                tempclone.push(
-                    "pagure",
-                    "remotes/%s" % branchname,
-                    "refs/heads/%s" % localname,
-                    internal="yes",
-                )
+        if fast_fork:
+            pagure.lib.git.fast_fork_repo(repo_from, repo_to, fast_fork)
+        else:
+            _fork_repo_by_push(repo_from, repo_to)
 
         if not repo_to.is_on_repospanner and not repo_to.private:
             # Create the git-daemon-export-ok file on the clone
@@ -692,7 +727,7 @@ def move_to_repospanner(self, session, name, namespace, user, region):
 @conn.task(queue=pagure_config.get("FAST_CELERY_QUEUE", None), bind=True)
 @pagure_task
 def refresh_pr_cache(self, session, name, namespace, user):
-    """ Refresh the merge status cached of pull-requests.
+    """ Refresh the merge status and the diff cached of pull-requests.
     """
     project = pagure.lib.query._get_project(
         session, namespace=namespace, name=name, user=user
@@ -700,6 +735,42 @@ def refresh_pr_cache(self, session, name, namespace, user):
 
     pagure.lib.query.reset_status_pull_request(session, project)
 
+    if not pagure.lib.pr_diff_cache.is_shared():
+        return
+
+    # The target branch changed, cache the diffs of the pull-requests
+    # against the new commit it points to
+    orig_repo = pygit2.Repository(pagure.utils.get_repo_path(project))
+    requests = pagure.lib.query.search_pull_requests(
+        session, project_id=project.id, status="Open"
+    )
+    for request in requests:
+        if request.remote:
+            repopath = pagure.utils.get_remote_repo_path(
+                request.remote_git, request.branch_from
+            )
+        elif request.project_from:
+            repopath = pagure.utils.get_repo_path(request.project_from)
+        else:
+            continue
+        try:
+            diff, _, _ = pagure.lib.git.get_diff_info(
+                pygit2.Repository(repopath),
+                orig_repo,
+                request.branch_from,
+                request.branch,
+                prid=request.id,
+            )
+            if diff is not None:
+                pagure.lib.pr_diff_cache.store_diff(request, orig_repo, diff)
+        except (pagure.exceptions.PagureException, pygit2.GitError) as err:
+            _log.info(
+                "Could not cache the diff of %s#%s: %s",
+                project.fullname,
+                request.id,
+                err,
+            )
+
 
 @conn.task(queue=pagure_config.get("FAST_CELERY_QUEUE", None), bind=True)
 @pagure_task
@@ -870,10 +941,14 @@ def update_pull_request(self, session, pr_uid):
         repo_obj = pygit2.Repository(repopath)
         orig_repo = pygit2.Repository(parentpath)
 
-        pagure.lib.git.diff_pull_request(
-            session, request, repo_obj, orig_repo, with_diff=False
+        diff_commits, diff = pagure.lib.git.diff_pull_request(
+            session, request, repo_obj, orig_repo
         )
 
+        if diff is not None and pagure.lib.pr_diff_cache.is_shared():
+            _log.debug("Caching the diff of the pull-request")
+            pagure.lib.pr_diff_cache.store_diff(request, orig_repo, diff)
+
 
 @conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
 @pagure_task
@@ -927,51 +1002,10 @@ def commits_author_stats(self, session, repopath):
 
     repo_obj = pygit2.Repository(repopath)
 
-    stats = collections.defaultdict(int)
-    number_of_commits = 0
-    authors_email = set()
-    for commit in repo_obj.walk(
-        repo_obj.head.get_object().oid.hex, pygit2.GIT_SORT_NONE
-    ):
-        # For each commit record how many times each combination of name and
-        # e-mail appears in the git history.
-        number_of_commits += 1
-        email = commit.author.email
-        author = commit.author.name
-        stats[(author, email)] += 1
-
-    for (name, email), val in list(stats.items()):
-        if not email:
-            # Author email is missing in the git commit.
-            continue
-        # For each recorded user info, check if we know the e-mail address of
-        # the user.
-        user = pagure.lib.query.search_user(session, email=email)
-        if user and (user.default_email != email or user.fullname != name):
-            # We know the the user, but the name or e-mail used in Git commit
-            # does not match their default e-mail address and full name. Let's
-            # merge them into one record.
-            stats.pop((name, email))
-            stats[(user.fullname, user.default_email)] += val
-
-    # Generate a list of contributors ordered by how many commits they
-    # authored. The list consists of tuples with number of commits and people
-    # with that number of commits. Each contributor is represented by a name
-    # and e-mail address.
-    out_stats = collections.defaultdict(list)
-    for authors, val in stats.items():
-        authors_email.add(authors[1])
-        out_stats[val].append(authors)
-    out_list = [
-        (key, out_stats[key]) for key in sorted(out_stats, reverse=True)
-    ]
-
-    return (
-        number_of_commits,
-        out_list,
-        len(authors_email),
-        commit.commit_time,
-    )
+    # Only the commits pushed since the last time the stats were computed
+    # are processed
+    stats = pagure.lib.commit_stats.get_commit_stats(repo_obj)
+    return pagure.lib.commit_stats.get_author_stats(session, stats)
 
 
 @conn.task(queue=pagure_config.get("FAST_CELERY_QUEUE", None), bind=True)
@@ -986,18 +1020,80 @@ def commits_history_stats(self, session, repopath):
 
     repo_obj = pygit2.Repository(repopath)
 
-    dates = collections.defaultdict(int)
-    for commit in repo_obj.walk(
-        repo_obj.head.get_object().oid.hex, pygit2.GIT_SORT_NONE
-    ):
-        delta = (
-            datetime.datetime.utcnow() - arrow.get(commit.commit_time).naive
-        )
-        if delta.days > 365:
-            break
-        dates[arrow.get(commit.commit_time).date().isoformat()] += 1
+    stats = pagure.lib.commit_stats.get_commit_stats(repo_obj)
+    return pagure.lib.commit_stats.get_history_stats(stats)
+
 
-    return [(key, dates[key]) for key in sorted(dates)]
+@conn.task(queue=pagure_config.get("FAST_CELERY_QUEUE", None), bind=True)
+@pagure_task
+def update_commit_stats(self, session, repopath, rebuild=False):
+    """ Update the commit statistics of the specified git repository, only
+    processing the commits added since they were last computed unless
+    `rebuild` is True.
+    """
+
+    if not os.path.exists(repopath):
+        raise ValueError("Git repository not found.")
+
+    repo_obj = pygit2.Repository(repopath)
+    if repo_obj.is_empty or repo_obj.head_is_unborn:
+        return
+
+    pagure.lib.commit_stats.get_commit_stats(repo_obj, rebuild=rebuild)
+
+
+@conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
+@pagure_task
+def compute_blame(
+    self, session, name, namespace, user, filename, commitid, identifier
+):
+    """ Compute the blame of a file at the specified commit and store it in
+    the blame cache.
+    """
+    project = pagure.lib.query._get_project(
+        session, namespace=namespace, name=name, user=user
+    )
+    repo_obj = pygit2.Repository(pagure.utils.get_repo_path(project))
+
+    if pagure.lib.blame_cache.get_blame(repo_obj, filename, commitid) is None:
+        pagure.lib.blame_cache.compute_blame(repo_obj, filename, commitid)
+
+    return ret(
+        "ui_ns.view_blame_file",
+        repo=name,
+        namespace=namespace,
+        username=user,
+        filename=filename,
+        identifier=identifier,
+    )
+
+
+@conn.task(queue=pagure_config.get("SLOW_CELERY_QUEUE", None), bind=True)
+@pagure_task
+def prewarm_blame(self, session, repopath, commitid, count):
+    """ Compute the blame of the `count` files of the specified git
+    repository whose blame is the most viewed, at the specified commit.
+    """
+
+    if not os.path.exists(repopath):
+        raise ValueError("Git repository not found.")
+
+    repo_obj = pygit2.Repository(repopath)
+    commit = repo_obj[commitid]
+
+    for filename in pagure.lib.blame_cache.most_viewed(repo_obj, count):
+        try:
+            entry = commit.tree[filename]
+        except KeyError:
+            # The file no longer exists
+            continue
+        blob = repo_obj[entry.id]
+        if not isinstance(blob, pygit2.Blob) or blob.is_binary:
+            continue
+        if pagure.lib.blame_cache.get_blame(repo_obj, filename, commitid):
+            continue
+        _log.info("Pre-computing the blame of %s at %s", filename, commitid)
+        pagure.lib.blame_cache.compute_blame(repo_obj, filename, commitid)
 
 
 @conn.task(queue=pagure_config.get("MEDIUM_CELERY_QUEUE", None), bind=True)
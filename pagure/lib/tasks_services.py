@@ -19,7 +19,6 @@ import os.path
 import time
 import uuid
 
-import requests
 import six
 
 from celery import Celery
@@ -29,6 +28,7 @@ from kitchen.text.converters import to_bytes
 from sqlalchemy.exc import SQLAlchemyError
 
 import pagure.lib.query
+import pagure.lib.webhook_delivery
 from pagure.config import config as pagure_config
 from pagure.lib.tasks_utils import pagure_task
 from pagure.mail_logging import format_callstack
@@ -56,7 +56,7 @@ def augment_celery_log(**kwargs):
     set_up_logging(force=True)
 
 
-def call_web_hooks(project, topic, msg, urls):
+def call_web_hooks(session, project, topic, msg, urls):
     """ Sends the web-hook notification. """
     _log.info("Processing project: %s - topic: %s", project.fullname, topic)
     _log.debug("msg: %s", msg)
@@ -96,20 +96,16 @@ def call_web_hooks(project, topic, msg, urls):
         "X-Pagure-Topic": topic,
         "Content-Type": "application/json",
     }
-    for url in sorted(urls):
-        url = url.strip()
-        _log.info("Calling url %s" % url)
-        try:
-            req = requests.post(url, headers=headers, data=content, timeout=60)
-            if not req:
-                _log.info(
-                    "An error occured while querying: %s - "
-                    "Error code: %s" % (url, req.status_code)
-                )
-        except (requests.exceptions.RequestException, Exception) as err:
-            _log.info(
-                "An error occured while querying: %s - Error: %s" % (url, err)
-            )
+    urls = sorted(set(url.strip() for url in urls if url.strip()))
+    pagure.lib.webhook_delivery.deliver_all(
+        session,
+        project,
+        topic.decode("utf-8"),
+        msg["msg_id"],
+        content,
+        headers,
+        urls,
+    )
 
 
 @conn.task(queue=pagure_config.get("WEBHOOK_CELERY_QUEUE", None), bind=True)
@@ -151,7 +147,7 @@ def webhook_notification(
 
     urls = urls.split("\n")
     _log.info("Got the project and urls, going to the webhooks")
-    call_web_hooks(project, topic, msg, urls)
+    call_web_hooks(session, project, topic, msg, urls)
 
 
 @conn.task(queue=pagure_config.get("LOGCOM_CELERY_QUEUE", None), bind=True)
@@ -389,6 +385,75 @@ def load_json_commits_to_db(
     _log.info("LOADJSON: Ready for another")
 
 
+def get_queue_depth(queue):
+    """ Return the number of tasks waiting in the specified queue, or None
+    if it could not be retrieved (for example, redis drops the queue once it
+    is empty).
+    """
+    # We only report the depth, it should never prevent running the task
+    # pylint: disable=broad-except
+    try:
+        with conn.connection_or_acquire() as connection:
+            return connection.default_channel.queue_declare(
+                queue=queue, passive=True
+            ).message_count
+    except Exception as err:
+        _log.debug("Could not retrieve the depth of %s: %s", queue, err)
+        return None
+
+
+@conn.task(queue=pagure_config.get("EMAIL_CELERY_QUEUE", None), bind=True)
+def send_email(self, text, subject, recipients, queued_at=None, **kwargs):
+    """ Send the email with the specified information to the recipients,
+    over the SMTP connection kept open by the worker.
+
+    The email is sent again later to the recipients it could not be sent to
+    because of a temporary error, up to EMAIL_MAX_RETRIES times with an
+    exponential backoff, after which it is dead-lettered.
+
+    :arg text: the content of the email to send
+    :type text: unicode
+    :arg subject: the subject of the email
+    :arg recipients: the email addresses to send the email to
+    :type recipients: list
+    :kwarg queued_at: the time at which the email was queued
+    :type queued_at: float
+    :kwarg kwargs: the headers of the email, see
+        `pagure.lib.notify.send_email`
+
+    """
+    if queued_at is not None and not self.request.is_eager:
+        queue = (
+            pagure_config.get("EMAIL_CELERY_QUEUE")
+            or conn.conf.task_default_queue
+        )
+        _log.info(
+            "EMAIL: Sending %r to %s recipients, queued for %d ms, "
+            "%s emails left in the queue",
+            subject,
+            len(recipients),
+            (time.time() - queued_at) * 1000,
+            get_queue_depth(queue),
+        )
+
+    max_retries = pagure_config.get("EMAIL_MAX_RETRIES", 5)
+    _, pending = pagure.lib.notify.deliver_email(
+        text,
+        subject,
+        recipients,
+        retry=self.request.retries < max_retries,
+        **kwargs
+    )
+    if pending:
+        raise self.retry(
+            args=(text, subject, pending),
+            kwargs=kwargs,
+            countdown=pagure_config.get("EMAIL_RETRY_BACKOFF", 60)
+            * 2 ** self.request.retries,
+            max_retries=max_retries,
+        )
+
+
 @conn.task(queue=pagure_config.get("CI_CELERY_QUEUE", None), bind=True)
 @pagure_task
 def trigger_ci_build(
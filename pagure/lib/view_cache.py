@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Cache of the pages showing the content of the git repositories: the front
+page of the projects, their trees and their files.
+
+These pages are rendered from the commit the ref viewed points to, so they
+are keyed on that commit: pushing to the branch changes the key and the
+entries never need to be invalidated. They also list the branches of the
+repository, so the branches and tags with the commits they point to are
+part of the key, as are the few information coming from the database, such
+as the number of open issues, and the version of pagure and of its
+templates.
+
+Only the pages viewed anonymously are cached, the pages of the
+authenticated users contain their own forms and links. The key is used
+as ETag, so the browsers revalidating a page they already have get a 304
+without it being rendered.
+
+"""
+
+from __future__ import unicode_literals
+
+import flask
+import sqlalchemy as sa
+
+import pagure
+import pagure.lib.model
+import pagure.lib.render_cache
+from pagure.config import config as pagure_config
+
+
+# Do not fill the cache with the pages of huge files
+_MAX_PAGE_SIZE = 1024 * 1024
+
+
+def get_page_key(view, project, commit_oid):
+    """ Return the key of the page of the specified view for the current
+    request or None if it cannot be cached.
+
+    :arg view: the name of the view rendering the page, for example:
+        view_repo
+    :type view: str
+    :arg project: the project viewed
+    :type project: pagure.lib.model.Project
+    :arg commit_oid: the commit the ref viewed points to
+    :type commit_oid: str or None
+    :return: the key of the page or None
+    :rtype: str or None
+
+    """
+    if not commit_oid or pagure.lib.render_cache.get_cache("VIEW") is None:
+        return None
+    if flask.g.authenticated or flask.session.get("_flashes"):
+        return None
+
+    return pagure.lib.render_cache.make_key(
+        "view",
+        # The pages rendered by another version of pagure or its templates
+        # are not served
+        pagure.__version__,
+        pagure_config.get("THEME"),
+        pagure_config.get("VIEW_CACHE_VERSION"),
+        view,
+        project.fullname,
+        commit_oid,
+        _get_refs_key(flask.g.repo_obj),
+        flask.request.full_path,
+        "anonymous",
+        project.date_modified,
+        *_get_counts(flask.g.session, project)
+    )
+
+
+def _get_refs_key(repo_obj):
+    """ Return a key changing whenever a branch or a tag of the specified
+    git repo is created, removed or updated.
+
+    The references are listed with their target at once, rather than being
+    looked up one by one.
+    """
+    refs = []
+    for ref in repo_obj.listall_reference_objects():
+        if not ref.name.startswith(("refs/heads/", "refs/tags/")):
+            continue
+        refs.append("%s %s" % (ref.name, ref.target))
+    return pagure.lib.render_cache.make_key(*sorted(refs))
+
+
+def _get_counts(session, project):
+    """ Return the number of open public issues, open pull-requests,
+    stargazers, watchers and users of the specified project, counted in a
+    single query rather than by loading them.
+    """
+    model = pagure.lib.model
+
+    def count(*criteria):
+        return session.query(sa.func.count()).filter(*criteria).as_scalar()
+
+    return session.query(
+        count(
+            model.Issue.project_id == project.id,
+            model.Issue.status == "Open",
+            model.Issue.private == False,  # noqa: E712
+        ),
+        count(
+            model.PullRequest.project_id == project.id,
+            model.PullRequest.status == "Open",
+        ),
+        count(model.Star.project_id == project.id),
+        count(model.Watcher.project_id == project.id),
+        count(model.ProjectUser.project_id == project.id),
+    ).one()
+
+
+def get_response(key):
+    """ Return the response to the current request from the cache: a 304
+    if the browser already has the page or the page cached, None if it is
+    not in the cache.
+    """
+    if key is None:
+        return None
+
+    if key in flask.request.if_none_match:
+        response = flask.Response(status=304)
+        response.set_etag(key)
+        return response
+
+    cache = pagure.lib.render_cache.get_cache("VIEW")
+    html = pagure.lib.render_cache.cache_get(cache, key)
+    if html is None:
+        return None
+    return _make_response(key, html)
+
+
+def cache_response(key, html):
+    """ Store the specified page in the cache if it can be cached and
+    return the response to send.
+
+    :arg key: the key of the page, as returned by `get_page_key`
+    :type key: str or None
+    :arg html: the page rendered
+    :type html: str
+    :return: the response to send
+    :rtype: flask.Response or str
+
+    """
+    if key is None:
+        return html
+
+    if len(html) <= _MAX_PAGE_SIZE:
+        pagure.lib.render_cache.cache_set(
+            pagure.lib.render_cache.get_cache("VIEW"),
+            key,
+            html,
+            ttl=pagure_config.get("VIEW_CACHE_TTL"),
+        )
+    return _make_response(key, html)
+
+
+def _make_response(key, html):
+    response = flask.make_response(html)
+    response.set_etag(key)
+    # Let the browsers keep the page but check it is still current
+    response.headers[str("Cache-Control")] = "no-cache"
+    return response
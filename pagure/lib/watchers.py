@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Resolution of the users related to a project, an issue or a pull-request,
+used to find who to notify about them and who is watching them.
+
+The users related to a project, its owner, the users and groups having
+access to it and the users watching it, are retrieved in a single query
+and cached per project (see the WATCHERS_CACHE_* configuration keys). The
+entries are dropped once a change to the access or the watchers of the
+project is committed.
+The users taking part in an issue or a pull-request are retrieved, along
+with the names and emails of all the users, in a second query.
+
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import json
+import uuid
+
+import sqlalchemy as sa
+import sqlalchemy.event
+import sqlalchemy.orm
+from sqlalchemy.orm.attributes import get_history
+
+import pagure.lib.model
+import pagure.lib.render_cache
+from pagure.config import config as pagure_config
+
+
+Recipient = collections.namedtuple("Recipient", ["id", "username", "email"])
+
+# Number of users looked up at once
+_BATCH_SIZE = 500
+
+
+class Participants(object):
+    """ The users related to a project and, for an issue or a pull-request,
+    the users taking part in it.
+
+    Each user is a `Recipient`, the access lists contain the users in the
+    order the rows were retrieved and may contain the same user more than
+    once.
+    """
+
+    def __init__(self):
+        self.owner = None
+        self.users = []
+        self.committers = []
+        self.group_creators = []
+        self.group_members = []
+        # (user, watch_issues, watch_commits)
+        self.project_watchers = []
+        self.author = None
+        self.assignee = None
+        self.commenters = []
+        # (user, watch)
+        self.watchers = []
+
+
+def _generation_key(project_id):
+    return pagure.lib.render_cache.make_key("watchers-generation", project_id)
+
+
+def _project_key(cache, project_id):
+    """ Return the key of the users related to the specified project in
+    the cache.
+
+    The entries kept in the memory of the other processes cannot be dropped
+    when using the ``tiered`` backend, the key then includes the generation
+    of the project stored in redis, which changes every time its entry is
+    invalidated.
+    """
+    generation = None
+    if isinstance(cache, pagure.lib.render_cache.TieredCache):
+        generation = pagure.lib.render_cache.cache_get(
+            cache.shared, _generation_key(project_id)
+        )
+    return pagure.lib.render_cache.make_key("watchers", project_id, generation)
+
+
+def _query_project(session, project_id):
+    """ Retrieve the ids of the users related to the specified project. """
+    model = pagure.lib.model
+    no_flag = sa.cast(sa.null(), sa.Boolean)
+    queries = [
+        session.query(
+            model.Project.user_id, sa.literal("owner"), no_flag, no_flag
+        ).filter(model.Project.id == project_id),
+        session.query(
+            model.ProjectUser.user_id,
+            model.ProjectUser.access,
+            no_flag,
+            no_flag,
+        ).filter(model.ProjectUser.project_id == project_id),
+        session.query(
+            model.PagureGroup.user_id,
+            sa.literal("group_creator"),
+            no_flag,
+            no_flag,
+        )
+        .join(
+            model.ProjectGroup,
+            model.ProjectGroup.group_id == model.PagureGroup.id,
+        )
+        .filter(model.ProjectGroup.project_id == project_id),
+        session.query(
+            model.PagureUserGroup.user_id,
+            sa.literal("group_member"),
+            no_flag,
+            no_flag,
+        )
+        .join(
+            model.ProjectGroup,
+            model.ProjectGroup.group_id == model.PagureUserGroup.group_id,
+        )
+        .filter(model.ProjectGroup.project_id == project_id),
+        session.query(
+            model.Watcher.user_id,
+            sa.literal("watcher"),
+            model.Watcher.watch_issues,
+            model.Watcher.watch_commits,
+        ).filter(model.Watcher.project_id == project_id),
+    ]
+
+    graph = {
+        "owner": None,
+        "access": [],
+        "group_creators": [],
+        "group_members": [],
+        "watchers": [],
+    }
+    for user_id, kind, watch_issues, watch_commits in (
+        queries[0].union_all(*queries[1:]).all()
+    ):
+        if kind == "owner":
+            graph["owner"] = user_id
+        elif kind == "group_creator":
+            graph["group_creators"].append(user_id)
+        elif kind == "group_member":
+            graph["group_members"].append(user_id)
+        elif kind == "watcher":
+            graph["watchers"].append(
+                [user_id, bool(watch_issues), bool(watch_commits)]
+            )
+        else:
+            graph["access"].append([user_id, kind])
+    return graph
+
+
+def get_project_graph(session, project_id):
+    """ Return the ids of the users related to the specified project, from
+    the cache if it is configured.
+
+    :arg session: the session to use to connect to the database
+    :arg project_id: the identifier of the project
+    :type project_id: int
+    :return: a dict with the id of the "owner", the "access" list of
+        [user_id, access], the "group_creators" and "group_members" ids and
+        the "watchers" list of [user_id, watch_issues, watch_commits]
+    :rtype: dict
+
+    """
+    cache = pagure.lib.render_cache.get_cache("WATCHERS")
+    # The changes not committed yet are neither read from nor stored in
+    # the cache
+    if project_id in session.info.get("_watchers_changed", ()):
+        cache = None
+    if cache is not None:
+        key = _project_key(cache, project_id)
+        graph = pagure.lib.render_cache.cache_get(cache, key)
+        if graph is not None:
+            return json.loads(graph)
+
+    graph = _query_project(session, project_id)
+    if cache is not None:
+        pagure.lib.render_cache.cache_set(
+            cache,
+            key,
+            json.dumps(graph),
+            ttl=pagure_config.get("WATCHERS_CACHE_TTL"),
+        )
+    return graph
+
+
+def _query_object(session, obj, user_ids):
+    """ Retrieve the users taking part in the specified issue or
+    pull-request, along with the users having the given ids.
+    """
+    model = pagure.lib.model
+    no_flag = sa.cast(sa.null(), sa.Boolean)
+    if obj.isa == "issue":
+        comment_cls, comment_uid = model.IssueComment, "issue_uid"
+        watcher_cls, watcher_uid = model.IssueWatcher, "issue_uid"
+    else:
+        comment_cls = model.PullRequestComment
+        comment_uid = "pull_request_uid"
+        watcher_cls = model.PullRequestWatcher
+        watcher_uid = "pull_request_uid"
+
+    rows = (
+        session.query(comment_cls.user_id, sa.literal("comment"), no_flag)
+        .filter(getattr(comment_cls, comment_uid) == obj.uid)
+        .union_all(
+            session.query(
+                watcher_cls.user_id, sa.literal("watch"), watcher_cls.watch
+            ).filter(getattr(watcher_cls, watcher_uid) == obj.uid),
+            session.query(model.User.id, sa.literal("user"), no_flag).filter(
+                model.User.id.in_(user_ids[:_BATCH_SIZE])
+            ),
+        )
+        .subquery()
+    )
+    user_id, kind, flag = rows.c
+    user = model.User
+    return (
+        session.query(user.id, user.user, user.default_email, kind, flag)
+        .join(rows, user.id == user_id)
+        .all()
+    )
+
+
+def _query_users(session, user_ids):
+    """ Retrieve the users having the given ids. """
+    model = pagure.lib.model
+    rows = []
+    for idx in range(0, len(user_ids), _BATCH_SIZE):
+        rows.extend(
+            session.query(
+                model.User.id, model.User.user, model.User.default_email
+            )
+            .filter(model.User.id.in_(user_ids[idx : idx + _BATCH_SIZE]))
+            .all()
+        )
+    return rows
+
+
+def get_participants(session, obj):
+    """ Return the users related to the specified project, issue,
+    pull-request or commit flag.
+
+    :arg session: the session to use to connect to the database
+    :arg obj: the project, issue, pull-request or commit flag
+    :return: the users related to the object
+    :rtype: Participants
+
+    """
+    project = obj if obj.isa == "project" else obj.project
+    graph = get_project_graph(session, project.id)
+
+    user_ids = set([graph["owner"]])
+    user_ids.update(user_id for user_id, _ in graph["access"])
+    user_ids.update(graph["group_creators"])
+    user_ids.update(graph["group_members"])
+    user_ids.update(user_id for user_id, _, _ in graph["watchers"])
+    if obj.isa != "project":
+        user_ids.add(obj.user_id)
+    if obj.isa in ["issue", "pull-request"] and obj.assignee_id:
+        user_ids.add(obj.assignee_id)
+    user_ids.discard(None)
+    user_ids = sorted(user_ids)
+
+    users = {}
+    comments = []
+    watches = []
+    if obj.isa in ["issue", "pull-request"]:
+        rows = _query_object(session, obj, user_ids)
+        user_ids = user_ids[_BATCH_SIZE:]
+    else:
+        rows = []
+    rows.extend(
+        (user_id, username, email, "user", None)
+        for user_id, username, email in _query_users(session, user_ids)
+    )
+    for user_id, username, email, kind, flag in rows:
+        user = users.setdefault(user_id, Recipient(user_id, username, email))
+        if kind == "comment":
+            comments.append(user)
+        elif kind == "watch":
+            watches.append((user, bool(flag)))
+
+    participants = Participants()
+    participants.owner = users.get(graph["owner"])
+    for user_id, access in graph["access"]:
+        participants.users.append(users[user_id])
+        if access in ["commit", "admin"]:
+            participants.committers.append(users[user_id])
+    participants.group_creators = [
+        users[user_id] for user_id in graph["group_creators"]
+    ]
+    participants.group_members = [
+        users[user_id] for user_id in graph["group_members"]
+    ]
+    participants.project_watchers = [
+        (users[user_id], watch_issues, watch_commits)
+        for user_id, watch_issues, watch_commits in graph["watchers"]
+    ]
+    if obj.isa != "project":
+        participants.author = users.get(obj.user_id)
+    if obj.isa in ["issue", "pull-request"]:
+        participants.assignee = users.get(obj.assignee_id)
+        participants.commenters = comments
+        participants.watchers = watches
+    return participants
+
+
+def _changed(obj, *attrs):
+    """ Return whether any of the given attributes of the object changed.
+    """
+    return any(get_history(obj, attr).has_changes() for attr in attrs)
+
+
+def _projects_of_groups(session, group_ids):
+    model = pagure.lib.model
+    if not group_ids:
+        return set()
+    return set(
+        project_id
+        for (project_id,) in session.query(model.ProjectGroup.project_id)
+        .filter(model.ProjectGroup.group_id.in_(group_ids))
+        .all()
+    )
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "before_flush")
+def _track_changes(session, flush_context, instances):
+    """ Record the projects whose related users change in this transaction.
+    """
+    if pagure.lib.render_cache.get_cache("WATCHERS") is None:
+        return
+
+    model = pagure.lib.model
+    project_ids = set()
+    group_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(
+            obj, (model.ProjectUser, model.ProjectGroup, model.Watcher)
+        ):
+            project_ids.add(obj.project_id or getattr(obj.project, "id", None))
+        elif isinstance(obj, model.PagureUserGroup):
+            group_ids.add(obj.group_id)
+        elif isinstance(obj, model.Project):
+            if _changed(obj, "user_id", "user", "users", "groups"):
+                project_ids.add(obj.id)
+        elif isinstance(obj, model.PagureGroup):
+            if _changed(obj, "user_id", "creator", "users"):
+                group_ids.add(obj.id)
+        elif isinstance(obj, model.User):
+            history = get_history(obj, "group_objs")
+            group_ids.update(
+                group.id for group in history.added + history.deleted
+            )
+    group_ids.discard(None)
+    project_ids.update(_projects_of_groups(session, group_ids))
+    project_ids.discard(None)
+    if project_ids:
+        session.info.setdefault("_watchers_changed", set()).update(project_ids)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def _invalidate(session):
+    """ Drop the cached users of the projects changed once committed. """
+    project_ids = session.info.pop("_watchers_changed", None)
+    cache = pagure.lib.render_cache.get_cache("WATCHERS")
+    if not project_ids or cache is None:
+        return
+    for project_id in project_ids:
+        if isinstance(cache, pagure.lib.render_cache.TieredCache):
+            # Change the generation of the project so the other processes
+            # stop using the entry kept in their memory
+            pagure.lib.render_cache.cache_set(
+                cache.shared,
+                _generation_key(project_id),
+                uuid.uuid4().hex,
+                ttl=pagure_config.get("WATCHERS_CACHE_TTL"),
+            )
+        else:
+            pagure.lib.render_cache.cache_delete(
+                cache, _project_key(cache, project_id)
+            )
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_rollback")
+def _forget_changes(session):
+    """ Forget the projects changed, their cached users are still valid. """
+    session.info.pop("_watchers_changed", None)
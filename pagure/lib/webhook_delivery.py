@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+Deliver the web-hook notifications of the projects.
+
+The notifications are sent to all the URLs of a project at the same time,
+using one pool of HTTP connections per host, and retried with an
+exponential backoff when the endpoint could not be reached or returned a
+server error. Every attempt is stored in the database, which is used to
+stop sending notifications for a while to the URLs whose last attempts all
+failed (circuit breaker).
+
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import logging
+import threading
+import time
+
+import requests
+import requests.adapters
+from six.moves.urllib.parse import urlparse
+
+from pagure.config import config as pagure_config
+from pagure.lib import model
+
+
+_log = logging.getLogger(__name__)
+
+# Number of connections kept open per host
+POOL_SIZE = 10
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_http_session(url):
+    """ Return the requests session to use to call the specified URL, there
+    is one session, keeping its connections open, per host.
+    """
+    parsed = urlparse(url)
+    key = (parsed.scheme, parsed.netloc)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=POOL_SIZE
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSIONS[key] = session
+    return session
+
+
+def _should_retry(status_code):
+    """ Return whether a failed attempt is worth retrying, ie: the endpoint
+    could not be reached, is throttling us or had an internal error.
+    """
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def deliver(url, content, headers):
+    """ Send the notification to the specified URL, retrying with an
+    exponential backoff if it fails.
+
+    :arg url: the URL to send the notification to
+    :type url: str
+    :arg content: the JSON content of the notification
+    :type content: str
+    :arg headers: the HTTP headers of the notification
+    :type headers: dict
+    :return: the attempts made, as dictionaries
+    :rtype: list
+
+    """
+    max_attempts = max(pagure_config.get("WEBHOOK_MAX_ATTEMPTS", 3), 1)
+    backoff = pagure_config.get("WEBHOOK_BACKOFF", 1)
+    timeout = pagure_config.get("WEBHOOK_TIMEOUT", 15)
+
+    attempts = []
+    for attempt in range(1, max_attempts + 1):
+        status_code = None
+        error = None
+        start = time.time()
+        try:
+            req = get_http_session(url).post(
+                url, headers=headers, data=content, timeout=timeout
+            )
+            status_code = req.status_code
+            if not req:
+                error = "Error code: %s" % status_code
+        except Exception as err:
+            error = "%s" % err
+        latency = int((time.time() - start) * 1000)
+
+        if error:
+            _log.info(
+                "An error occured while querying: %s - %s (attempt %s/%s)",
+                url,
+                error,
+                attempt,
+                max_attempts,
+            )
+        attempts.append(
+            dict(
+                url=url,
+                attempt=attempt,
+                success=error is None,
+                status_code=status_code,
+                error=error,
+                latency=latency,
+            )
+        )
+
+        if error is None or not _should_retry(status_code):
+            break
+        if attempt < max_attempts:
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+    return attempts
+
+
+def is_circuit_open(session, project, url):
+    """ Return whether notifications should not be sent to the specified
+    URL for now, because its last attempts all failed recently.
+
+    :arg session: the session to use to connect to the database.
+    :arg project: the project the URL is a web-hook of
+    :type project: pagure.lib.model.Project
+    :arg url: the URL of the web-hook
+    :type url: str
+    :rtype: bool
+
+    """
+    threshold = pagure_config.get("WEBHOOK_CIRCUIT_BREAKER_THRESHOLD", 10)
+    if not threshold:
+        return False
+    cooldown = pagure_config.get("WEBHOOK_CIRCUIT_BREAKER_COOLDOWN", 600)
+
+    last_attempts = (
+        session.query(model.WebhookDelivery)
+        .filter(model.WebhookDelivery.project_id == project.id)
+        .filter(model.WebhookDelivery.url == url)
+        .order_by(
+            model.WebhookDelivery.date_created.desc(),
+            model.WebhookDelivery.id.desc(),
+        )
+        .limit(threshold)
+        .all()
+    )
+    if len(last_attempts) < threshold or any(
+        attempt.success for attempt in last_attempts
+    ):
+        return False
+
+    # Once the cooldown is over, let one notification through to check if
+    # the endpoint is back
+    limit = datetime.datetime.utcnow() - datetime.timedelta(seconds=cooldown)
+    return last_attempts[0].date_created > limit
+
+
+def deliver_all(session, project, topic, msg_id, content, headers, urls):
+    """ Send the notification to all the specified URLs at the same time
+    and store the attempts made in the database.
+
+    :arg session: the session to use to connect to the database.
+    :arg project: the project the notification is about
+    :type project: pagure.lib.model.Project
+    :arg topic: the topic of the notification
+    :type topic: str
+    :arg msg_id: the identifier of the notification
+    :type msg_id: str
+    :arg content: the JSON content of the notification
+    :type content: str
+    :arg headers: the HTTP headers of the notification
+    :type headers: dict
+    :arg urls: the URLs to send the notification to
+    :type urls: list
+    :return: the attempts made, as WebhookDelivery objects
+    :rtype: list
+
+    """
+    to_call = []
+    for url in urls:
+        if is_circuit_open(session, project, url):
+            _log.info("Too many failures, not calling url %s for now", url)
+        else:
+            to_call.append(url)
+    urls = to_call
+
+    results = [None] * len(urls)
+
+    def _deliver(idx, url):
+        _log.info("Calling url %s" % url)
+        results[idx] = deliver(url, content, headers)
+
+    threads = [
+        threading.Thread(target=_deliver, args=(idx, url))
+        for idx, url in enumerate(urls)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    deliveries = []
+    for attempts in results:
+        for attempt in attempts or []:
+            delivery = model.WebhookDelivery(
+                project_id=project.id, msg_id=msg_id, topic=topic, **attempt
+            )
+            session.add(delivery)
+            deliveries.append(delivery)
+
+    days = pagure_config.get("WEBHOOK_DELIVERIES_DAYS", 30)
+    session.query(model.WebhookDelivery).filter(
+        model.WebhookDelivery.project_id == project.id
+    ).filter(
+        model.WebhookDelivery.date_created
+        < datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    ).delete(
+        synchronize_session=False
+    )
+    session.commit()
+
+    return deliveries
+
+
+def get_deliveries(session, project, limit=20):
+    """ Return the last attempts made at delivering the web-hook
+    notifications of the specified project.
+
+    :arg session: the session to use to connect to the database.
+    :arg project: the project to retrieve the attempts of
+    :type project: pagure.lib.model.Project
+    :kwarg limit: the maximum number of attempts to return
+    :type limit: int
+    :return: the attempts, the most recent first
+    :rtype: list
+
+    """
+    return (
+        session.query(model.WebhookDelivery)
+        .filter(model.WebhookDelivery.project_id == project.id)
+        .order_by(
+            model.WebhookDelivery.date_created.desc(),
+            model.WebhookDelivery.id.desc(),
+        )
+        .limit(limit)
+        .all()
+    )
+
+
+def get_disabled_urls(session, project):
+    """ Return the web-hooks of the specified project to which no
+    notifications are currently sent because of their repeated failures.
+    """
+    urls = (project.settings.get("Web-hooks") or "").split("\n")
+    return sorted(
+        set(
+            url.strip()
+            for url in urls
+            if url.strip() and is_circuit_open(session, project, url.strip())
+        )
+    )
@@ -29,6 +29,8 @@ import markdown.util
 import pygit2
 import re
 import six
+import sqlalchemy
+import sqlalchemy.orm
 
 import pagure.lib.query
 from pagure.config import config as pagure_config
@@ -74,6 +76,174 @@ IMPLICIT_COMMIT_RE = r"(?<![<\w#])([a-f0-9]{7,40})"
 STRIKE_THROUGH_RE = r"~~(.*?)~~"
 
 
+class References(object):
+    """ The users, projects, issues and pull-requests referenced in the
+    documents rendered during the current request.
+
+    The references found in a document are all looked up at once before it
+    is rendered, with a few queries, and remembered for the rest of the
+    request so the patterns below do not query the database one reference
+    at a time.
+    """
+
+    def __init__(self, session):
+        """ Constructor of the object.
+
+        :arg session: the session to use to connect to the database.
+
+        """
+        self.session = session
+        self._users = {}
+        self._projects = {}
+        self._searched_projects = {}
+        self._issues = {}
+        self._requests = {}
+        self._git_repos = {}
+
+    def collect(self, text):
+        """ Look up all the references the specified document may contain.
+        """
+        self.resolve_users(
+            match.group(1) for match in re.finditer(MENTION_RE, text)
+        )
+
+        ids = {}
+        for match in re.finditer(EXPLICIT_LINK_RE, text):
+            user, namespace = _split_link(
+                match.group(1), match.group(2), match.group(3)
+            )
+            key = (user, namespace, match.group(4))
+            ids.setdefault(key, set()).add(int(match.group("id")))
+
+        implicit = [
+            match.group(1)
+            for regex in [IMPLICIT_ISSUE_RE, IMPLICIT_PR_RE]
+            for match in re.finditer(regex, text)
+        ]
+        if implicit:
+            try:
+                namespace, repo, user = _get_ns_repo_user()
+            except RuntimeError:
+                pass
+            else:
+                key = (user, namespace, repo)
+                ids.setdefault(key, set()).update(int(idx) for idx in implicit)
+
+        for (user, namespace, repo), idx in ids.items():
+            project = self.project(user, namespace, repo)
+            if project is not None:
+                self.resolve_objects(project, idx)
+
+    def resolve_users(self, usernames):
+        """ Look up the users having the given usernames not looked up yet.
+        """
+        missing = set(name for name in usernames if name not in self._users)
+        if missing:
+            found = pagure.lib.query.search_users_by_names(
+                self.session, missing
+            )
+            for name in missing:
+                self._users[name] = found.get(name)
+
+    def resolve_objects(self, project, ids):
+        """ Look up the issues and pull-requests of the given project having
+        the given identifiers not looked up yet.
+        """
+        missing = set(
+            idx for idx in ids if (project.id, idx) not in self._issues
+        )
+        if missing:
+            issues = pagure.lib.query.search_issues_by_ids(
+                self.session, project, missing
+            )
+            requests = pagure.lib.query.search_pull_requests_by_ids(
+                self.session, project, missing
+            )
+            for idx in missing:
+                self._issues[(project.id, idx)] = issues.get(idx)
+                self._requests[(project.id, idx)] = requests.get(idx)
+
+    def user(self, username):
+        """ Return the user having the given username or None. """
+        self.resolve_users([username])
+        return self._users[username]
+
+    def project(self, user, namespace, repo):
+        """ Return the project the current user can access with the given
+        name or None. """
+        key = (user, namespace, repo)
+        if key not in self._projects:
+            self._projects[key] = pagure.lib.query.get_authorized_project(
+                self.session,
+                project_name=repo,
+                user=user,
+                namespace=namespace,
+            )
+        return self._projects[key]
+
+    def project_exists(self, user, fork, namespace, repo):
+        """ Return whether a project matching the given criterias exists,
+        as searched by `pagure.lib.query.search_projects`. """
+        key = (user, bool(fork), namespace, repo)
+        if key not in self._searched_projects:
+            self._searched_projects[key] = bool(
+                pagure.lib.query.search_projects(
+                    self.session,
+                    username=user,
+                    fork=fork,
+                    namespace=namespace,
+                    pattern=repo,
+                )
+            )
+        return self._searched_projects[key]
+
+    def issue(self, user, namespace, repo, idx):
+        """ Return the issue of the given project or None. """
+        project = self.project(user, namespace, repo)
+        if project is None:
+            return None
+        self.resolve_objects(project, [idx])
+        return self._issues[(project.id, idx)]
+
+    def pull_request(self, user, namespace, repo, idx):
+        """ Return the pull-request of the given project or None. """
+        project = self.project(user, namespace, repo)
+        if project is None:
+            return None
+        self.resolve_objects(project, [idx])
+        return self._requests[(project.id, idx)]
+
+    def git_repo(self, user, namespace, repo):
+        """ Return the git repository of the given project or None. """
+        project = self.project(user, namespace, repo)
+        if project is None:
+            return None
+        if project.id not in self._git_repos:
+            self._git_repos[project.id] = pygit2.Repository(
+                pagure.utils.get_repo_path(project)
+            )
+        return self._git_repos[project.id]
+
+
+def get_references():
+    """ Return the references resolved during the current request, they
+    are kept until the next commit to the database.
+    """
+    references = getattr(flask.g, "_md_references", None)
+    if not isinstance(references, References):
+        references = References(flask.g.session)
+        flask.g._md_references = references
+    return references
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def _reset_references(session):
+    """ Forget the references resolved in this request, as the objects
+    referenced may just have been created or changed. """
+    if flask.has_app_context():
+        flask.g.pop("_md_references", None)
+
+
 class MentionPattern(markdown.inlinepatterns.Pattern):
     """ @user pattern class. """
 
@@ -81,7 +251,7 @@ class MentionPattern(markdown.inlinepatterns.Pattern):
         """ When the pattern matches, update the text. """
         name = markdown.util.AtomicString(m.group(2))
         text = "@%s" % name
-        user = pagure.lib.query.search_user(flask.g.session, username=name)
+        user = get_references().user(name)
         if not user:
             return text
 
@@ -107,16 +277,11 @@ class ExplicitLinkPattern(markdown.inlinepatterns.Pattern):
         idx = m.group(6)
         text = "%s#%s" % (repo, idx)
 
-        if not is_fork and user:
-            namespace = user
-            user = None
-
+        user, namespace = _split_link(is_fork, user, namespace)
         if namespace:
-            namespace = namespace.rstrip("/")
             text = "%s/%s" % (namespace, text)
         if user:
-            user = user.rstrip("/")
-            text = "%s/%s" % (user.rstrip("/"), text)
+            text = "%s/%s" % (user, text)
 
         try:
             idx = int(idx)
@@ -146,29 +311,31 @@ class CommitLinkPattern(markdown.inlinepatterns.Pattern):
         commitid = m.group(6)
         text = "%s#%s" % (repo, commitid)
 
-        if not is_fork and user:
-            namespace = user
-            user = None
-
+        user, namespace = _split_link(is_fork, user, namespace)
         if namespace:
-            namespace = namespace.rstrip("/")
             text = "%s/%s" % (namespace, text)
         if user:
-            user = user.rstrip("/")
-            text = "%s/%s" % (user.rstrip("/"), text)
+            text = "%s/%s" % (user, text)
 
-        if pagure.lib.query.search_projects(
-            flask.g.session,
-            username=user,
-            fork=is_fork,
-            namespace=namespace,
-            pattern=repo,
-        ):
+        if get_references().project_exists(user, is_fork, namespace, repo):
             return _obj_anchor_tag(user, namespace, repo, commitid, text)
 
         return text
 
 
+class ReferencesPreprocessor(markdown.preprocessors.Preprocessor):
+    """
+    Preprocessor looking up at once all the references the document may
+    contain, before the patterns below link to them.
+    """
+
+    def run(self, lines):
+        # The references are only linked to when rendering in a request
+        if flask.has_app_context() and "session" in flask.g:
+            get_references().collect("\n".join(lines))
+        return lines
+
+
 class ImplicitIssuePreprocessor(markdown.preprocessors.Preprocessor):
     """
     Preprocessor which handles lines starting with an implicit
@@ -285,8 +452,8 @@ class ImplicitCommitPattern(markdown.inlinepatterns.Pattern):
         except RuntimeError:
             return text
 
-        if pagure.lib.query.search_projects(
-            flask.g.session, username=user, namespace=namespace, pattern=repo
+        if get_references().project_exists(
+            user, None, namespace, repo
         ) and _commit_exists(user, namespace, repo, githash):
             return _obj_anchor_tag(user, namespace, repo, githash, text[:7])
 
@@ -364,6 +531,7 @@ class PagureExtension(markdown.extensions.Extension):
         )
         markdown.inlinepatterns.AUTOLINK_RE = AUTOLINK_RE
 
+        md.preprocessors["references"] = ReferencesPreprocessor()
         md.preprocessors["implicit_issue"] = ImplicitIssuePreprocessor()
 
         md.inlinePatterns["mention"] = MentionPattern(MENTION_RE)
@@ -399,53 +567,35 @@ def makeExtension(*arg, **kwargs):
     return PagureExtension(**kwargs)
 
 
-def _issue_exists(user, namespace, repo, idx):
-    """ Utility method checking if a given issue exists. """
+def _split_link(is_fork, user, namespace):
+    """ Return the user and namespace of the project an explicit link
+    points to, from the parts of the link matched. """
+    if not is_fork and user:
+        namespace = user
+        user = None
 
-    repo_obj = pagure.lib.query.get_authorized_project(
-        flask.g.session, project_name=repo, user=user, namespace=namespace
-    )
+    if namespace:
+        namespace = namespace.rstrip("/")
+    if user:
+        user = user.rstrip("/")
+    return user, namespace
 
-    if not repo_obj:
-        return False
 
-    issue_obj = pagure.lib.query.search_issues(
-        flask.g.session, repo=repo_obj, issueid=idx
-    )
-    if not issue_obj:
-        return False
-
-    return issue_obj
+def _issue_exists(user, namespace, repo, idx):
+    """ Utility method checking if a given issue exists. """
+    return get_references().issue(user, namespace, repo, idx) or False
 
 
 def _pr_exists(user, namespace, repo, idx):
     """ Utility method checking if a given PR exists. """
-    repo_obj = pagure.lib.query.get_authorized_project(
-        flask.g.session, project_name=repo, user=user, namespace=namespace
-    )
-
-    if not repo_obj:
-        return False
-
-    pr_obj = pagure.lib.query.search_pull_requests(
-        flask.g.session, project_id=repo_obj.id, requestid=idx
-    )
-    if not pr_obj:
-        return False
-
-    return pr_obj
+    return get_references().pull_request(user, namespace, repo, idx) or False
 
 
 def _commit_exists(user, namespace, repo, githash):
     """ Utility method checking if a given commit exists. """
-    repo_obj = pagure.lib.query.get_authorized_project(
-        flask.g.session, project_name=repo, user=user, namespace=namespace
-    )
-    if not repo_obj:
+    git_repo = get_references().git_repo(user, namespace, repo)
+    if git_repo is None:
         return False
-
-    reponame = pagure.utils.get_repo_path(repo_obj)
-    git_repo = pygit2.Repository(reponame)
     return githash in git_repo
 
 
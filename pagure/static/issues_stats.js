@@ -153,6 +153,12 @@ function show_commits_history(data) {
 function process_async(url, _data, callback) {
   $.post(url, _data)
   .done(function(data) {
-    wait_for_task(data.url, callback);
+    if (data.results) {
+      // The results were already available, no need to wait for a task
+      callback(data);
+      $("#data_stats_spinner").hide();
+    } else {
+      wait_for_task(data.url, callback);
+    }
   })
 }
@@ -12,12 +12,11 @@ from __future__ import unicode_literals
 
 import logging
 import subprocess
-import tempfile
+import threading
 import os
 
 import flask
 import requests
-import werkzeug
 
 import pagure.exceptions
 import pagure.lib.git
@@ -32,6 +31,13 @@ from pagure.ui import UI_NS
 
 _log = logging.getLogger(__name__)
 
+# Size of the blocks in which the bodies of the git requests and responses
+# are streamed
+GIT_HTTP_BLOCK_SIZE = 64 * 1024
+# Number of seconds to wait for the thread sending the request body to git
+# once git exited
+GIT_HTTP_FEEDER_TIMEOUT = 5
+
 
 def proxy_raw_git():
     """ Proxy a request to Git or gitolite3 via a subprocess.
@@ -97,24 +103,25 @@ def proxy_raw_git():
     else:
         cmd = ["/usr/bin/git", "http-backend"]
 
-    # Note: using a temporary files to buffer the input contents
-    # is non-ideal, but it is a way to make sure we don't need to have
-    # the full input (which can be very long) in memory.
-    # Ideally, we'd directly stream, but that's an RFE for the future,
-    # since that needs to happen in other threads so as to not block.
-    # (See the warnings in the subprocess module)
-    with tempfile.SpooledTemporaryFile() as infile:
-        while True:
-            block = flask.request.stream.read(4096)
-            if not block:
-                break
-            infile.write(block)
-        infile.seek(0)
-
-        proc = subprocess.Popen(
-            cmd, stdin=infile, stdout=subprocess.PIPE, stderr=None, env=gitenv
-        )
+    # The request body is written to git by another thread while its output
+    # is streamed back, so neither of them is buffered: the pipes hold at
+    # most a few blocks, blocking the writes and thus the reads from the
+    # client when git does not keep up.
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=None,
+        env=gitenv,
+        bufsize=0,
+    )
+    feeder = threading.Thread(
+        target=_feed_process, args=(flask.request.stream, proc.stdin)
+    )
+    feeder.daemon = True
+    feeder.start()
 
+    try:
         out = proc.stdout
 
         # First, gather the response head
@@ -132,19 +139,77 @@ def proxy_raw_git():
 
         if len(headers) == 0:
             raise Exception("No response at all received")
+    except Exception:
+        _stop_process(proc, feeder)
+        raise
 
-        if "status" not in headers:
-            # If no status provided, assume 200 OK as per RFC3875
-            headers["status"] = "200 OK"
-
-        respcode, respmsg = headers.pop("status").split(" ", 1)
-        wrapout = werkzeug.wsgi.wrap_file(flask.request.environ, out)
-        return flask.Response(
-            wrapout,
-            status=int(respcode),
-            headers=headers,
-            direct_passthrough=True,
-        )
+    if "status" not in headers:
+        # If no status provided, assume 200 OK as per RFC3875
+        headers["status"] = "200 OK"
+
+    respcode, respmsg = headers.pop("status").split(" ", 1)
+    return flask.Response(
+        _stream_output(proc, feeder),
+        status=int(respcode),
+        headers=headers,
+        direct_passthrough=True,
+    )
+
+
+def _feed_process(stream, stdin):
+    """ Write the request body to the standard input of the git process.
+
+    This is run in its own thread, the body (possibly gzip-compressed, git
+    inflates it itself) is thus never held entirely in memory or on disk.
+    """
+    try:
+        while True:
+            block = stream.read(GIT_HTTP_BLOCK_SIZE)
+            if not block:
+                break
+            while block:
+                block = block[os.write(stdin.fileno(), block) :]
+    except (IOError, OSError, ValueError):
+        # The process exited without reading all its input or the client
+        # went away
+        _log.debug("Could not send the whole request body to git")
+    finally:
+        try:
+            stdin.close()
+        except (IOError, OSError):
+            pass
+
+
+def _stream_output(proc, feeder):
+    """ Yield the output of the git process as it is produced and clean up
+    after it, even if the client went away before the end.
+    """
+    finished = False
+    try:
+        while True:
+            # The stdout is unbuffered, nothing was read ahead of the head
+            # and this returns what is available without waiting for more
+            block = os.read(proc.stdout.fileno(), GIT_HTTP_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+        finished = True
+    finally:
+        _stop_process(proc, feeder, kill=not finished)
+
+
+def _stop_process(proc, feeder, kill=True):
+    """ Wait for the git process and the thread feeding it to be done,
+    killing the process first if asked and it is still running.
+    """
+    if kill and proc.poll() is None:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+    proc.stdout.close()
+    proc.wait()
+    feeder.join(GIT_HTTP_FEEDER_TIMEOUT)
 
 
 def proxy_repospanner(project, service):
@@ -25,6 +25,7 @@ from six.moves.urllib.parse import urlparse, parse_qsl
 from jinja2 import escape
 
 import pagure.exceptions
+import pagure.lib.pr_diff_cache
 import pagure.lib.query
 import pagure.forms
 from pagure.config import config as pagure_config
@@ -92,19 +93,20 @@ def format_loc(
     output = ['<div class="highlight">', '<table class="code_table">']
 
     comments = {}
-    if prequest and not isinstance(prequest, flask.wrappers.Request):
-        for com in prequest.comments:
-            if (
-                commit
-                and com.commit_id == commit.hex
-                and com.filename == filename
-            ):
-                if com.line in comments:
-                    comments[com.line].append(com)
-                else:
-                    comments[com.line] = [com]
-    for key in comments:
-        comments[key] = sorted(comments[key], key=lambda obj: obj.date_created)
+    if (
+        prequest
+        and commit
+        and not isinstance(prequest, flask.wrappers.Request)
+    ):
+        # Index the comments once per pull-request rather than once per file
+        indexes = flask.g.setdefault("pr_comments_index", {})
+        comments_index = indexes.get(prequest.uid)
+        if comments_index is None:
+            comments_index = pagure.lib.pr_diff_cache.get_comments_index(
+                prequest
+            )
+            indexes[prequest.uid] = comments_index
+        comments = comments_index.get((commit.hex, filename), {})
 
     if not index:
         index = ""
@@ -31,6 +31,7 @@ import pagure.doc_utils
 import pagure.exceptions
 import pagure.lib.git
 import pagure.lib.plugins
+import pagure.lib.pr_diff_cache
 import pagure.lib.query
 import pagure.lib.tasks
 import pagure.forms
@@ -261,7 +262,6 @@ def request_pull(repo, requestid, username=None, namespace=None):
     orig_repo = pygit2.Repository(parentpath)
 
     diff_commits = []
-    diff = None
     # Closed pull-request
     if request.status != "Open":
         commitid = request.commit_stop
@@ -273,28 +273,10 @@ def request_pull(repo, requestid, username=None, namespace=None):
         except KeyError:
             # This happens when repo.walk() cannot find commitid
             pass
-
-        if diff_commits:
-            # Ensure the first commit in the PR as a parent, otherwise
-            # point to it
-            start = diff_commits[-1].oid.hex
-            if diff_commits[-1].parents:
-                start = diff_commits[-1].parents[0].oid.hex
-
-            # If the start and the end commits are the same, it means we are,
-            # dealing with one commit that has no parent, so just diff that
-            # one commit
-            if start == diff_commits[0].oid.hex:
-                diff = diff_commits[0].tree.diff_to_tree(swap=True)
-            else:
-                diff = repo_obj.diff(
-                    repo_obj.revparse_single(start),
-                    repo_obj.revparse_single(diff_commits[0].oid.hex),
-                )
     else:
         try:
-            diff_commits, diff = pagure.lib.git.diff_pull_request(
-                flask.g.session, request, repo_obj, orig_repo
+            diff_commits = pagure.lib.git.diff_pull_request(
+                flask.g.session, request, repo_obj, orig_repo, with_diff=False
             )
         except pagure.exceptions.PagureException as err:
             flask.flash("%s" % err, "error")
@@ -305,8 +287,8 @@ def request_pull(repo, requestid, username=None, namespace=None):
                 "Could not update this pull-request in the database", "error"
             )
 
-    if diff:
-        diff.find_similar()
+    # Only compute the diff if it is not cached
+    diff = pagure.lib.pr_diff_cache.get_diff(request, orig_repo, diff_commits)
 
     form = pagure.forms.MergePRForm()
     trigger_ci_pr_form = pagure.forms.TriggerCIPRForm()
@@ -39,11 +39,15 @@ from sqlalchemy.exc import SQLAlchemyError
 from binaryornot.helpers import is_binary_string
 
 import pagure.exceptions
+import pagure.lib.blame_cache
+import pagure.lib.commit_log
 import pagure.lib.git
 import pagure.lib.mimetype
 import pagure.lib.plugins
 import pagure.lib.query
 import pagure.lib.tasks
+import pagure.lib.view_cache
+import pagure.lib.webhook_delivery
 import pagure.forms
 import pagure.ui.plugins
 from pagure.config import config as pagure_config
@@ -118,8 +122,16 @@ def view_repo(repo, username=None, namespace=None):
 
     if not repo_obj.is_empty and not repo_obj.head_is_unborn:
         head = repo_obj.head.shorthand
+        page_key = pagure.lib.view_cache.get_page_key(
+            "view_repo", repo_db, repo_obj.head.target.hex
+        )
     else:
         head = None
+        page_key = None
+
+    response = pagure.lib.view_cache.get_response(page_key)
+    if response is not None:
+        return response
 
     cnt = 0
     last_commits = []
@@ -172,19 +184,22 @@ def view_repo(repo, username=None, namespace=None):
                 filename="",
             ),
         )
-    return flask.render_template(
-        "repo_info.html",
-        select="overview",
-        repo=repo_db,
-        username=username,
-        head=head,
-        readme=readme,
-        safe=safe,
-        origin="view_repo",
-        branchname=branchname,
-        last_commits=last_commits,
-        tree=tree,
-        num_watchers=len(watch_users),
+    return pagure.lib.view_cache.cache_response(
+        page_key,
+        flask.render_template(
+            "repo_info.html",
+            select="overview",
+            repo=repo_db,
+            username=username,
+            head=head,
+            readme=readme,
+            safe=safe,
+            origin="view_repo",
+            branchname=branchname,
+            last_commits=last_commits,
+            tree=tree,
+            num_watchers=len(watch_users),
+        ),
     )
 
 
@@ -350,20 +365,44 @@ def view_commits(repo, branchname=None, username=None, namespace=None):
     start = limit * (page - 1)
     end = limit * page
 
+    emails = None
+    if author_obj:
+        emails = set(email.email for email in author_obj.emails)
+
     n_commits = 0
     last_commits = []
-    if commit:
+    commit_log = None
+    if commit and branch:
+        try:
+            commit_log = pagure.lib.commit_log.update_commit_log(
+                repo_obj, branch.branch_name, commit.hex
+            )
+        except (IOError, OSError, KeyError):
+            _log.exception("Could not update the commit log index")
+
+    if commit_log:
+        # Only read the commits of the page from the index
+        try:
+            if emails is not None:
+                n_commits, oids = commit_log.get_author_commits(
+                    emails, start, end
+                )
+            else:
+                n_commits = len(commit_log)
+                oids = commit_log.get_commits(start, end)
+            last_commits = [repo_obj[oid] for oid in oids]
+        except KeyError:
+            # A commit of the index is no longer in the repo
+            _log.exception("Could not read the commit log index")
+            commit_log = None
+            n_commits = 0
+
+    if not commit_log and commit:
         for commit in repo_obj.walk(commit.hex, pygit2.GIT_SORT_NONE):
 
             # Filters the commits for a user
-            if author_obj:
-                tmp = False
-                for email in author_obj.emails:
-                    if email.email == commit.author.email:
-                        tmp = True
-                        break
-                if not tmp:
-                    continue
+            if emails is not None and commit.author.email not in emails:
+                continue
 
             if n_commits >= start and n_commits <= end:
                 last_commits.append(commit)
@@ -530,6 +569,15 @@ def view_file(repo, identifier, filename, username=None, namespace=None):
     if isinstance(commit, pygit2.Tag):
         commit = commit.get_object()
 
+    page_key = None
+    if commit:
+        page_key = pagure.lib.view_cache.get_page_key(
+            "view_file", repo, commit.oid.hex
+        )
+        response = pagure.lib.view_cache.get_response(page_key)
+        if response is not None:
+            return response
+
     tree = None
     if isinstance(commit, pygit2.Tree):
         tree = commit
@@ -632,24 +680,28 @@ def view_file(repo, identifier, filename, username=None, namespace=None):
     if output_type == "binary":
         headers[str("Content-Disposition")] = "attachment"
 
+    context = dict(
+        select="tree",
+        repo=repo,
+        origin="view_file",
+        username=username,
+        branchname=branchname,
+        filename=filename,
+        content=content,
+        output_type=output_type,
+        readme=readme,
+        readme_ext=readme_ext,
+        safe=safe,
+        huge=huge,
+    )
+    if page_key is not None and not headers:
+        return pagure.lib.view_cache.cache_response(
+            page_key, flask.render_template("file.html", **context)
+        )
+
     return flask.Response(
         flask.stream_with_context(
-            stream_template(
-                flask.current_app,
-                "file.html",
-                select="tree",
-                repo=repo,
-                origin="view_file",
-                username=username,
-                branchname=branchname,
-                filename=filename,
-                content=content,
-                output_type=output_type,
-                readme=readme,
-                readme_ext=readme_ext,
-                safe=safe,
-                huge=huge,
-            )
+            stream_template(flask.current_app, "file.html", **context)
         ),
         200,
         headers,
@@ -771,7 +823,29 @@ def view_blame_file(repo, filename, username=None, namespace=None):
         _log.exception("File could not be decoded")
         flask.abort(500, "File could not be decoded")
 
-    blame = repo_obj.blame(filename, newest_commit=commit.oid.hex)
+    blame = None
+    if pagure.lib.blame_cache.get_blame_cache():
+        pagure.lib.blame_cache.record_view(repo_obj, filename)
+        blame = pagure.lib.blame_cache.get_blame(
+            repo_obj, filename, commit.oid.hex
+        )
+        if blame is None:
+            task = pagure.lib.tasks.compute_blame.delay(
+                repo.name,
+                repo.namespace,
+                repo.user.username if repo.is_fork else None,
+                filename,
+                commit.oid.hex,
+                branchname,
+            )
+            if not task.ready():
+                return pagure.utils.wait_for_task(task)
+            blame = pagure.lib.blame_cache.get_blame(
+                repo_obj, filename, commit.oid.hex
+            )
+
+    if blame is None:
+        blame = repo_obj.blame(filename, newest_commit=commit.oid.hex)
 
     return flask.render_template(
         "blame.html",
@@ -948,6 +1022,7 @@ def view_tree(repo, identifier=None, username=None, namespace=None):
     readme = None
     safe = False
     readme_ext = None
+    page_key = None
     if not repo_obj.is_empty:
         if identifier in repo_obj.listall_branches():
             branchname = identifier
@@ -968,6 +1043,14 @@ def view_tree(repo, identifier=None, username=None, namespace=None):
             commit = commit.get_object()
             branchname = commit.oid.hex
 
+        if commit:
+            page_key = pagure.lib.view_cache.get_page_key(
+                "view_tree", repo, commit.oid.hex
+            )
+            response = pagure.lib.view_cache.get_response(page_key)
+            if response is not None:
+                return response
+
         if commit and not isinstance(commit, pygit2.Blob):
             content = sorted(commit.tree, key=lambda x: x.filemode)
             for i in commit.tree:
@@ -984,19 +1067,22 @@ def view_tree(repo, identifier=None, username=None, namespace=None):
                     readme_ext = ext
         output_type = "tree"
 
-    return flask.render_template(
-        "file.html",
-        select="tree",
-        origin="view_tree",
-        repo=repo,
-        username=username,
-        branchname=branchname,
-        filename="",
-        content=content,
-        output_type=output_type,
-        readme=readme,
-        readme_ext=readme_ext,
-        safe=safe,
+    return pagure.lib.view_cache.cache_response(
+        page_key,
+        flask.render_template(
+            "file.html",
+            select="tree",
+            origin="view_tree",
+            repo=repo,
+            username=username,
+            branchname=branchname,
+            filename="",
+            content=content,
+            output_type=output_type,
+            readme=readme,
+            readme_ext=readme_ext,
+            safe=safe,
+        ),
     )
 
 
@@ -1240,6 +1326,16 @@ def view_settings(repo, username=None, namespace=None):
         branches_form.branches.data = branchname
         priority_form.priority.data = repo.default_priority
 
+    webhook_deliveries = []
+    webhook_disabled = []
+    if pagure_config.get("WEBHOOK", False):
+        webhook_deliveries = pagure.lib.webhook_delivery.get_deliveries(
+            flask.g.session, repo
+        )
+        webhook_disabled = pagure.lib.webhook_delivery.get_disabled_urls(
+            flask.g.session, repo
+        )
+
     return flask.render_template(
         "settings.html",
         select="settings",
@@ -1255,6 +1351,8 @@ def view_settings(repo, username=None, namespace=None):
         plugins=plugins,
         branchname=branchname,
         pagure_admin=pagure.utils.is_admin(),
+        webhook_deliveries=webhook_deliveries,
+        webhook_disabled=webhook_disabled,
     )
 
 
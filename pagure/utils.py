@@ -20,6 +20,8 @@ from functools import wraps
 import flask
 import pygit2
 import six
+import sqlalchemy
+import sqlalchemy.orm
 import werkzeug
 
 from pagure.config import config as pagure_config
@@ -98,11 +100,181 @@ def is_admin():
     return not groups.isdisjoint(admins)
 
 
+class RepoAccess(object):
+    """ The access the current user has on a project, resolved from the
+    database in a single query.
+    """
+
+    def __init__(self, session, repo_obj):
+        import pagure.lib.query
+        from pagure.lib import model
+
+        self.repo = repo_obj
+        self.username = flask.g.fas_user.username
+        self.usergroups = set(flask.g.fas_user.groups)
+        self.user = pagure.lib.query.search_user(
+            session, username=self.username
+        )
+        # Access of the user and of the groups of the project, with whether
+        # the user is a member of the group
+        self.user_access = set()
+        self.groups_access = []
+        if self.user is None:
+            return
+
+        direct = session.query(
+            model.ProjectUser.access,
+            sqlalchemy.literal_column("NULL").label("group_name"),
+            sqlalchemy.literal(True).label("member"),
+        ).filter(
+            model.ProjectUser.project_id == repo_obj.id,
+            model.ProjectUser.user_id == self.user.id,
+        )
+        groups = (
+            session.query(
+                model.ProjectGroup.access,
+                model.PagureGroup.group_name,
+                model.PagureUserGroup.user_id.isnot(None),
+            )
+            .join(
+                model.PagureGroup,
+                model.PagureGroup.id == model.ProjectGroup.group_id,
+            )
+            .outerjoin(
+                model.PagureUserGroup,
+                sqlalchemy.and_(
+                    model.PagureUserGroup.group_id == model.PagureGroup.id,
+                    model.PagureUserGroup.user_id == self.user.id,
+                ),
+            )
+            .filter(model.ProjectGroup.project_id == repo_obj.id)
+        )
+        for access, group_name, member in direct.union_all(groups):
+            if group_name is None:
+                self.user_access.add(access)
+            else:
+                self.groups_access.append((access, group_name, bool(member)))
+
+    @property
+    def is_owner(self):
+        return self.user is not None and self.repo.user_id == self.user.id
+
+    def _group_access(self, levels, usergroups=False):
+        """ Return whether the user is in a group having one of the
+        specified access levels, either as a member in the database or,
+        if `usergroups` is set, as a member of a group of the same name in
+        the authentication system.
+        """
+        for access, group_name, member in self.groups_access:
+            if access not in levels:
+                continue
+            if member or (usergroups and group_name in self.usergroups):
+                return True
+        return False
+
+    @property
+    def admin(self):
+        return (
+            self.is_owner
+            or "admin" in self.user_access
+            or self._group_access(["admin"])
+        )
+
+    @property
+    def committer(self):
+        if self.user is None:
+            return False
+        if (
+            self.is_owner
+            or self.user_access & set(["admin", "commit"])
+            or self._group_access(["admin", "commit"], usergroups=True)
+        ):
+            return True
+
+        # If no direct committer, check EXTERNAL_COMMITTER info
+        ext_committer = pagure_config.get("EXTERNAL_COMMITTER", None)
+        if ext_committer:
+            usergroups = self.usergroups.union(set(self.user.groups))
+            for grp in set(ext_committer) & usergroups:
+                restrict = ext_committer[grp].get("restrict", [])
+                exclude = ext_committer[grp].get("exclude", [])
+                if restrict and self.repo.fullname not in restrict:
+                    continue
+                elif self.repo.fullname in exclude:
+                    continue
+                else:
+                    return True
+        return False
+
+    @property
+    def has_access(self):
+        return (
+            self.is_owner
+            or bool(self.user_access)
+            or self._group_access(["admin", "commit", "ticket"])
+        )
+
+
+def get_repo_access(repo_obj, session=None):
+    """ Return the access the current user has on the provided repo, it is
+    only resolved once per request or until the next commit to the
+    database.
+    """
+    cache = flask.g.setdefault("_repo_access", {})
+    access = cache.get(repo_obj.id)
+    if access is None:
+        access = RepoAccess(session or flask.g.session, repo_obj)
+        cache[repo_obj.id] = access
+    return access
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def _reset_repo_access(session):
+    """ Forget the access resolved in this request, as they may just have
+    been changed. """
+    if flask.has_app_context():
+        flask.g.pop("_repo_access", None)
+
+
+class LazyBranches(object):
+    """ The sorted list of the branches of a git repo, only retrieved from
+    the repo when it is used.
+    """
+
+    def __init__(self, repo_obj):
+        self._repo_obj = repo_obj
+        self._branches = None
+
+    @property
+    def branches(self):
+        if self._branches is None:
+            self._branches = sorted(self._repo_obj.listall_branches())
+        return self._branches
+
+    def __iter__(self):
+        return iter(self.branches)
+
+    def __reversed__(self):
+        return reversed(self.branches)
+
+    def __len__(self):
+        return len(self.branches)
+
+    def __contains__(self, branch):
+        return branch in self.branches
+
+    def __getitem__(self, index):
+        return self.branches[index]
+
+
 def is_repo_admin(repo_obj, username=None):
     """ Return whether the user is an admin of the provided repo. """
     if not authenticated():
         return False
 
+    if username is None and not is_admin():
+        return get_repo_access(repo_obj).admin
+
     if username:
         user = username
     else:
@@ -130,8 +302,7 @@ def is_repo_committer(repo_obj, username=None, session=None):
             return False
         if is_admin():
             return True
-        username = flask.g.fas_user.username
-        usergroups = set(flask.g.fas_user.groups)
+        return get_repo_access(repo_obj, session=session).committer
 
     if not session:
         session = flask.g.session
@@ -182,7 +353,9 @@ def is_repo_user(repo_obj, username=None):
     else:
         if not authenticated():
             return False
-        user = flask.g.fas_user.username
+        if is_admin():
+            return True
+        return get_repo_access(repo_obj).has_access
 
     if is_admin():
         return True
@@ -13,6 +13,7 @@ from __future__ import unicode_literals
 __requires__ = ['SQLAlchemy >= 0.7']
 import pkg_resources
 
+import glob
 import imp
 import json
 import logging
@@ -61,6 +62,7 @@ import pagure.flask_app
 import pagure.lib.git
 import pagure.lib.model
 import pagure.lib.query
+import pagure.lib.render_cache
 import pagure.lib.tasks_mirror
 import pagure.perfrepo as perfrepo
 from pagure.config import config as pagure_config, reload_config
@@ -370,6 +372,7 @@ class SimplePagureTest(unittest.TestCase):
         if hasattr(pagure.lib.query, 'REDIS') and pagure.lib.query.REDIS:
             pagure.lib.query.REDIS.connection_pool.disconnect()
             pagure.lib.query.REDIS = None
+        pagure.lib.render_cache.reset()
 
         # Database
         self._prepare_db()
@@ -580,6 +583,26 @@ class FakeUser(object):     # pylint: disable=too-few-public-methods
         return self.dic[key]
 
 
+def read_gitolite_config(configfile):
+    """ Return the content of the specified gitolite configuration file with
+    the configuration of the projects it includes inlined, in project order.
+    """
+    folder = os.path.dirname(configfile)
+    rows = []
+    with open(configfile, encoding='utf-8') as stream:
+        for row in stream:
+            match = re.match(r'include "(.*)"$', row.rstrip())
+            if not match:
+                rows.append(row)
+                continue
+            paths = glob.glob(os.path.join(folder, match.group(1)))
+            paths.sort(key=lambda path: int(os.path.basename(path)[:-5]))
+            for path in paths:
+                with open(path, encoding='utf-8') as fragment:
+                    rows.extend(fragment)
+    return ''.join(rows)
+
+
 def create_locks(session, project):
     for ltype in ('WORKER', 'WORKER_TICKET', 'WORKER_REQUEST'):
         lock = pagure.lib.model.ProjectLock(
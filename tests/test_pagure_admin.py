@@ -14,6 +14,7 @@ __requires__ = ['SQLAlchemy >= 0.8']
 import pkg_resources  # noqa
 
 import datetime  # noqa
+import json  # noqa
 import os  # noqa
 import platform  # noqa
 import shutil  # noqa
@@ -1596,5 +1597,73 @@ class PagureBlockUserTests(tests.Modeltests):
         self.assertIsNotNone(user.refuse_sessions_before)
 
 
+class PagureAdminExportTests(tests.Modeltests):
+    """ Tests for pagure-admin export """
+
+    def setUp(self):
+        """ Set up the environnment, ran before every tests. """
+        super(PagureAdminExportTests, self).setUp()
+        pagure.cli.admin.session = self.session
+
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+        for title, private in [('Public', False), ('Private', True)]:
+            pagure.lib.query.new_issue(
+                session=self.session, repo=repo, title=title,
+                content='content', user='foo', private=private,
+                notify=False)
+        self.session.commit()
+
+    def test_export_invalid_project(self):
+        """ Test the export function of pagure-admin with an invalid
+        project.
+        """
+        args = munch.Munch({
+            'project': 'invalid', 'kind': 'issues', 'user': None,
+            'updated_after': None, 'output': None,
+        })
+        with self.assertRaises(pagure.exceptions.PagureException) as cm:
+            pagure.cli.admin.do_export(args)
+        self.assertEqual(
+            cm.exception.args[0], 'No project found with: invalid')
+
+    def test_export_invalid_date(self):
+        """ Test the export function of pagure-admin with an invalid date.
+        """
+        args = munch.Munch({
+            'project': 'test', 'kind': 'issues', 'user': None,
+            'updated_after': '12-13', 'output': None,
+        })
+        with self.assertRaises(pagure.exceptions.PagureException) as cm:
+            pagure.cli.admin.do_export(args)
+        self.assertEqual(
+            cm.exception.args[0], 'Invalid date submitted: 12-13')
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_export_issues(self, mock_stdout):
+        """ Test exporting the issues of a project, private ones included.
+        """
+        args = munch.Munch({
+            'project': 'test', 'kind': 'issues', 'user': None,
+            'updated_after': None, 'output': None,
+        })
+        pagure.cli.admin.do_export(args)
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)['title'] for line in lines),
+            ['Private', 'Public'])
+
+    def test_export_pull_requests_to_file(self):
+        """ Test exporting the pull-requests of a project to a file. """
+        output = os.path.join(self.path, 'export.ndjson')
+        args = munch.Munch({
+            'project': 'test', 'kind': 'pull-requests', 'user': None,
+            'updated_after': '2018-01-01', 'output': output,
+        })
+        pagure.cli.admin.do_export(args)
+        with open(output) as stream:
+            self.assertEqual(stream.read(), '')
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -319,5 +319,87 @@ class PagureGetRemoteRepoPath(tests.SimplePagureTest):
             self.assertFalse(output)
 
 
+class PagureRepoAccess(tests.SimplePagureTest):
+    """ Tests for the access of the user on a project in pagure """
+
+    def setUp(self):
+        """ Set up the environnment, ran before every tests. """
+        super(PagureRepoAccess, self).setUp()
+
+        tests.create_projects(self.session)
+
+    def test_is_repo_committer_access_resolved_once(self):
+        """ Test that the access of the user on the project is only
+        resolved once per request and until the next commit. """
+        repo = pagure.lib.query._get_project(self.session, 'test')
+
+        g = munch.Munch()
+        g.fas_user = tests.FakeUser(username='pingou')
+        g.authenticated = True
+        g.session = self.session
+        with self.app.application.app_context():
+            with mock.patch('flask.g', g):
+                with mock.patch(
+                        'pagure.utils.RepoAccess',
+                        wraps=pagure.utils.RepoAccess) as access:
+                    self.assertTrue(pagure.utils.is_repo_committer(repo))
+                    self.assertTrue(pagure.utils.is_repo_admin(repo))
+                    self.assertTrue(pagure.utils.is_repo_user(repo))
+                    self.assertEqual(access.call_count, 1)
+
+                    self.session.commit()
+                    self.assertNotIn('_repo_access', g)
+                    self.assertTrue(pagure.utils.is_repo_committer(repo))
+                    self.assertEqual(access.call_count, 2)
+
+    def test_set_request_own_fork(self):
+        """ Test that the project is only retrieved once when the user
+        views their own fork. """
+        item = pagure.lib.model.Project(
+            user_id=1,  # pingou
+            name='test',
+            description='test project #1',
+            is_fork=True,
+            parent_id=1,
+            hook_token='aaabbbyyy',
+        )
+        self.session.add(item)
+        self.session.commit()
+        tests.create_projects_git(os.path.join(self.path, 'repos'), bare=True)
+        tests.add_content_git_repo(
+            os.path.join(self.path, 'repos', 'forks', 'pingou', 'test.git'))
+
+        user = tests.FakeUser(username='pingou')
+        with tests.user_set(self.app.application, user):
+            with mock.patch(
+                    'pagure.lib.query.get_authorized_project',
+                    wraps=pagure.lib.query.get_authorized_project) as getter:
+                output = self.app.get('/fork/pingou/test/stargazers/')
+                self.assertEqual(output.status_code, 200)
+                self.assertEqual(getter.call_count, 1)
+
+                output = self.app.get('/test/stargazers/')
+                self.assertEqual(output.status_code, 200)
+                self.assertEqual(getter.call_count, 3)
+
+
+class PagureLazyBranches(unittest.TestCase):
+    """ Tests for the branches listed lazily in pagure """
+
+    def test_lazy_branches(self):
+        """ Test that LazyBranches only lists the branches when used. """
+        repo_obj = mock.MagicMock()
+        repo_obj.listall_branches.return_value = ['master', 'feature']
+        branches = pagure.utils.LazyBranches(repo_obj)
+        self.assertFalse(repo_obj.listall_branches.called)
+
+        self.assertIn('master', branches)
+        self.assertEqual(list(branches), ['feature', 'master'])
+        self.assertEqual(len(branches), 2)
+        self.assertEqual(branches[0], 'feature')
+        self.assertEqual(list(reversed(branches)), ['master', 'feature'])
+        self.assertEqual(repo_obj.listall_branches.call_count, 1)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -230,6 +230,48 @@ class PagureFlaskApiForktests(tests.Modeltests):
         )
         self.assertEqual(data['total_requests'], 1)
 
+    @patch('pagure.lib.notify.send_email', MagicMock(return_value=True))
+    def test_api_pull_request_views_compact(self):
+        """ Test the api_pull_request_views method of the flask api
+        returning the projects of the PRs as stubs. """
+
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+        for idx in range(2):
+            pagure.lib.query.new_pull_request(
+                session=self.session,
+                repo_from=repo,
+                branch_from='feature%s' % idx,
+                repo_to=repo,
+                branch_to='master',
+                title='test pull-request #%s' % idx,
+                user='pingou',
+            )
+        self.session.commit()
+
+        output = self.app.get('/api/0/test/pull-requests')
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.get_data(as_text=True))
+        self.assertEqual(data['total_requests'], 2)
+        self.assertIn('access_users', data['requests'][0]['project'])
+
+        output = self.app.get('/api/0/test/pull-requests?compact=1')
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.get_data(as_text=True))
+        self.assertEqual(data['total_requests'], 2)
+        stub = {
+            u'id': 1,
+            u'name': u'test',
+            u'namespace': None,
+            u'fullname': u'test',
+            u'url_path': u'test',
+        }
+        for request in data['requests']:
+            self.assertEqual(request['project'], stub)
+            self.assertEqual(request['repo_from'], stub)
+            self.assertEqual(
+                request['user'], {u'fullname': u'PY C', u'name': u'pingou'})
+
     @patch('pagure.lib.notify.send_email')
     def test_api_pull_request_views(self, send_email):
         """ Test the api_pull_request_views method of the flask api. """
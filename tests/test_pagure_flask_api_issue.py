@@ -1569,6 +1569,48 @@ class PagureFlaskApiIssuetests(tests.SimplePagureTest):
             }
         )
 
+    def test_api_export_issues(self):
+        """ Test the api_export_issues method of the flask api. """
+        tests.create_projects(self.session)
+        tests.create_tokens(self.session)
+        tests.create_tokens_acl(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+        for title, private in [('Public', False), ('Private', True)]:
+            pagure.lib.query.new_issue(
+                session=self.session, repo=repo, title=title,
+                content='content', user='foo', private=private,
+                notify=False)
+        self.session.commit()
+
+        output = self.app.get('/api/0/foo/issues/export')
+        self.assertEqual(output.status_code, 404)
+
+        output = self.app.get('/api/0/test/issues/export')
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.mimetype, 'application/x-ndjson')
+        lines = output.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['title'], 'Public')
+
+        # The committers get the private issues as well
+        headers = {'Authorization': 'token aaabbbcccddd'}
+        output = self.app.get('/api/0/test/issues/export', headers=headers)
+        self.assertEqual(output.status_code, 200)
+        lines = output.get_data(as_text=True).splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)['title'] for line in lines),
+            ['Private', 'Public'])
+
+        output = self.app.get(
+            '/api/0/test/issues/export?updated_after=2100-01-01')
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.get_data(as_text=True), '')
+
+        output = self.app.get('/api/0/test/issues/export?updated_after=12-13')
+        self.assertEqual(output.status_code, 400)
+        data = json.loads(output.get_data(as_text=True))
+        self.assertEqual(data['error_code'], 'EDATETIME')
+
     def test_api_view_issues_reversed(self):
         """ Test the api_view_issues method of the flask api. in reversed
         order.
@@ -1395,6 +1395,49 @@ class PagureFlaskApiProjecttests(tests.Modeltests):
             }
         )
 
+    def test_api_projects_pagination_cursor(self):
+        """ Test the api_projects method of the flask api when paginating
+        with a cursor. """
+        tests.create_projects(self.session)
+
+        output = self.app.get('/api/0/projects?cursor=&per_page=2&short=1')
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.get_data(as_text=True))
+        self.assertEqual(
+            [project['name'] for project in data['projects']],
+            ['test', 'test2'])
+        self.assertEqual(data['total_projects'], None)
+        self.assertNotIn('page', data['args'])
+        self.assertEqual(data['pagination']['cursor'], None)
+        self.assertEqual(data['pagination']['per_page'], 2)
+        next_cursor = data['pagination']['next_cursor']
+        self.assertIsNotNone(next_cursor)
+        self.assertURLEqual(
+            data['pagination']['next'],
+            'http://localhost/api/0/projects?short=1&per_page=2'
+            '&cursor=%s' % next_cursor,
+        )
+
+        output = self.app.get(
+            '/api/0/projects?cursor=%s&per_page=2&count=1' % next_cursor)
+        self.assertEqual(output.status_code, 200)
+        data = json.loads(output.get_data(as_text=True))
+        self.assertEqual(
+            [project['name'] for project in data['projects']],
+            ['test3'])
+        self.assertEqual(data['total_projects'], 3)
+        self.assertEqual(data['pagination']['cursor'], next_cursor)
+        self.assertIsNone(data['pagination']['next_cursor'])
+        self.assertIsNone(data['pagination']['next'])
+
+    def test_api_projects_pagination_invalid_cursor(self):
+        """ Test the api_projects method of the flask api when an invalid
+        cursor is entered. """
+        tests.create_projects(self.session)
+
+        output = self.app.get('/api/0/projects?cursor=foobar')
+        self.assertEqual(output.status_code, 400)
+
     def test_api_modify_project_main_admin(self):
         """ Test the api_modify_project method of the flask api when the
         request is to change the main_admin of the project. """
@@ -2130,6 +2130,20 @@ class PagureFlaskInternaltests(tests.Modeltests):
             }
         )
 
+        # The stats are now up to date and returned directly
+        output = self.app.post('/pv/stats/commits/authors', data=data)
+        self.assertEqual(output.status_code, 200)
+        js_data = json.loads(output.get_data(as_text=True))
+        self.assertEqual(
+            sorted(js_data.keys()),
+            ['code', 'message', 'results']
+        )
+        self.assertEqual(js_data['message'], 'Stats found')
+        self.assertEqual(js_data['results'][0], 2)
+        self.assertEqual(
+            js_data['results'][1],
+            [[2, [['Alice Author', 'alice@authors.tld']]]])
+
     def test_get_stats_commits_trend_no_token(self):
         ''' Test the get_stats_commits_trend from the internal API. '''
         # No CSRF token
@@ -2237,6 +2251,19 @@ class PagureFlaskInternaltests(tests.Modeltests):
             {'results': [[str(today), 2]]}
         )
 
+        # The stats are now up to date and returned directly
+        output = self.app.post('/pv/stats/commits/trend', data=data)
+        self.assertEqual(output.status_code, 200)
+        js_data = json.loads(output.get_data(as_text=True))
+        self.assertDictEqual(
+            js_data,
+            {
+                'code': 'OK',
+                'message': 'Stats found',
+                'results': [[str(today), 2]],
+            }
+        )
+
     def test_get_project_family_no_project(self):
         ''' Test the get_project_family from the internal API. '''
         output = self.app.post('/pv/test/family')
@@ -14,10 +14,13 @@ __requires__ = ['SQLAlchemy >= 0.8']
 import pkg_resources
 
 import datetime
+import gzip
 import unittest
 import shutil
+import subprocess
 import sys
 import tempfile
+import threading
 import os
 
 import six
@@ -29,9 +32,18 @@ sys.path.insert(0, os.path.join(os.path.dirname(
     os.path.abspath(__file__)), '..'))
 
 import pagure.lib.query
+import pagure.ui.clone
 import tests
 
 
+def gzip_compress(data):
+    """ Return the given bytes compressed with gzip. """
+    stream = six.BytesIO()
+    with gzip.GzipFile(fileobj=stream, mode='wb') as gzfile:
+        gzfile.write(data)
+    return stream.getvalue()
+
+
 class PagureFlaskAppClonetests(tests.Modeltests):
     """ Tests for the clone bridging. """
 
@@ -174,3 +186,75 @@ class PagureFlaskAppClonetests(tests.Modeltests):
         output_text = output.get_data(as_text=True)
         self.assertIn("# service=git-receive-pack", output_text)
         self.assertIn(" refs/heads/master\x00", output_text)
+
+
+class PagureFlaskAppCloneStreamtests(tests.Modeltests):
+    """ Tests for the streaming of the git requests and responses. """
+
+    def setUp(self):
+        super(PagureFlaskAppCloneStreamtests, self).setUp()
+
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, 'repos'), bare=True)
+        self.gitrepo = os.path.join(self.path, 'repos', 'test.git')
+        tests.add_content_git_repo(self.gitrepo)
+
+    def _upload_pack_request(self):
+        """ Return the body of a request fetching the master branch. """
+        commit = pygit2.Repository(self.gitrepo).lookup_branch('master')
+        want = 'want %s\n' % commit.target
+        return (
+            '%04x%s0000' % (len(want) + 4, want) + '0009done\n'
+        ).encode('utf-8')
+
+    @patch.dict('pagure.config.config', {
+        'ALLOW_HTTP_PULL_PUSH': True,
+        'HTTP_REPO_ACCESS_GITOLITE': None,
+    })
+    def test_http_upload_pack(self):
+        """ Test fetching a pack, with a plain and a gzip-encoded body. """
+        body = self._upload_pack_request()
+        for encoding, data in [
+                (None, body), ('gzip', gzip_compress(body))]:
+            headers = {
+                'Content-Type': 'application/x-git-upload-pack-request'}
+            if encoding:
+                headers['Content-Encoding'] = encoding
+            output = self.app.post(
+                '/test.git/git-upload-pack', headers=headers, data=data)
+            self.assertEqual(output.status_code, 200)
+            self.assertEqual(
+                output.headers['Content-Type'],
+                'application/x-git-upload-pack-result')
+            self.assertIn(b'PACK', output.get_data())
+
+    def test_stream_process(self):
+        """ Test that bodies larger than the pipes are streamed both ways
+        without blocking. """
+        data = os.urandom(1024 * 1024)
+        proc = subprocess.Popen(
+            ['cat'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            bufsize=0)
+        feeder = threading.Thread(
+            target=pagure.ui.clone._feed_process,
+            args=(six.BytesIO(data), proc.stdin))
+        feeder.start()
+        output = b''.join(pagure.ui.clone._stream_output(proc, feeder))
+        self.assertEqual(output, data)
+        self.assertEqual(proc.returncode, 0)
+        self.assertFalse(feeder.is_alive())
+
+    def test_stream_process_interrupted(self):
+        """ Test that the process is stopped when the client goes away. """
+        proc = subprocess.Popen(
+            ['cat', '/dev/zero'], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, bufsize=0)
+        feeder = threading.Thread(
+            target=pagure.ui.clone._feed_process,
+            args=(six.BytesIO(b''), proc.stdin))
+        feeder.start()
+        output = pagure.ui.clone._stream_output(proc, feeder)
+        self.assertTrue(next(output))
+        output.close()
+        self.assertIsNotNone(proc.returncode)
+        self.assertFalse(feeder.is_alive())
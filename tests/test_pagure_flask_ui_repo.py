@@ -2048,6 +2048,32 @@ class PagureFlaskRepotests(tests.Modeltests):
             '<title>Commits - test3 - Pagure</title>', output_text)
         self.assertIn('Forked from', output_text)
 
+    def test_view_commits_missing_commit_in_index(self):
+        """ Test the view_commits endpoint when the commit log index refers
+        to commits no longer in the repo. """
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, 'repos'), bare=True)
+        tests.add_readme_git_repo(os.path.join(self.path, 'repos', 'test.git'))
+        repo = pygit2.Repository(os.path.join(self.path, 'repos', 'test.git'))
+        commit = repo.revparse_single('HEAD')
+
+        missing = '0' * 40
+        with patch('pagure.lib.commit_log.CommitLog.get_commits',
+                   return_value=[missing]):
+            output = self.app.get('/test/commits')
+        self.assertEqual(output.status_code, 200)
+        output_text = output.get_data(as_text=True)
+        self.assertIn(commit.oid.hex, output_text)
+        self.assertIn(
+            'Commits <span class="badge badge-secondary"> 1</span>',
+            output_text)
+
+        with patch('pagure.lib.commit_log.update_commit_log',
+                   side_effect=KeyError(missing)):
+            output = self.app.get('/test/commits')
+        self.assertEqual(output.status_code, 200)
+        self.assertIn(commit.oid.hex, output.get_data(as_text=True))
+
     def test_view_commits_from_tag(self):
         """ Test the view_commits endpoint given a tag. """
 
@@ -651,6 +651,62 @@ class PagureLibtests(tests.Modeltests):
         self.assertEqual(repo.issues[1].status, 'Closed')
         self.assertEqual(repo.issues[1].close_status, 'Invalid')
 
+    @patch('pagure.lib.git.update_git')
+    @patch('pagure.lib.notify.send_email')
+    def test_issues_history_stats(self, p_send_email, p_ugt):
+        """ Test the issues_history_stats of pagure.lib.query. """
+        p_send_email.return_value = True
+        p_ugt.return_value = True
+
+        tests.create_projects(self.session)
+        repo = pagure.lib.query._get_project(self.session, 'test')
+        now = datetime.datetime.utcnow()
+
+        def add_issue(created, closed=None, status='Open'):
+            issue = pagure.lib.query.new_issue(
+                session=self.session,
+                repo=repo,
+                title='Test issue',
+                content='We should work on this',
+                user='pingou',
+                status=status,
+                date_created=now - datetime.timedelta(days=created),
+            )
+            if closed is not None:
+                issue.closed_at = now - datetime.timedelta(days=closed)
+                self.session.add(issue)
+            self.session.commit()
+            return issue
+
+        issue = add_issue(10)
+        add_issue(10)
+        add_issue(100, closed=19, status='Closed')
+        add_issue(30, closed=2, status='Closed')
+        # Imported closed without closed_at, this one is ignored
+        add_issue(5, status='Closed')
+
+        def get_stats():
+            stats = pagure.lib.query.issues_history_stats(self.session, repo)
+            self.assertEqual(len(stats), 53)
+            return [stats[key] for key in sorted(stats, reverse=True)]
+
+        self.assertEqual(get_stats(), [1, 2, 0, 1, 1] + [0] * 48)
+
+        # The stats are cached until an issue is closed
+        with patch(
+                'pagure.lib.query.REDIS', tests.tests_state['broker_client']):
+            self.assertEqual(get_stats(), [1, 2, 0, 1, 1] + [0] * 48)
+            issue.date_created = now - datetime.timedelta(days=200)
+            self.session.add(issue)
+            self.session.commit()
+            self.assertEqual(get_stats(), [1, 2, 0, 1, 1] + [0] * 48)
+
+            pagure.lib.query.edit_issue(
+                self.session, issue=issue, user='pingou', status='Closed')
+            self.session.commit()
+            self.assertEqual(
+                get_stats(), [0, 2, 1, 2, 2] + [1] * 10 + [0] * 38)
+
     @patch('pagure.lib.git.update_git')
     @patch('pagure.lib.notify.send_email')
     def test_edit_issue_close_status(self, p_send_email, p_ugt):
@@ -5900,6 +5956,25 @@ foo bar
         project_obj = pagure.lib.query._get_project(self.session, 'test')
         self.assertEqual(project_obj.read_only, True)
 
+    def test_encode_decode_cursor(self):
+        """ Test the encode_cursor and decode_cursor methods of pagure.lib
+        """
+        keyset = [datetime.datetime(2018, 5, 3, 10, 20, 30, 123), 12]
+        cursor = pagure.lib.query.encode_cursor(keyset, 'date_created')
+        self.assertNotIn('=', cursor)
+        self.assertEqual(
+            pagure.lib.query.decode_cursor(cursor, 'date_created'), keyset)
+
+        keyset = [datetime.datetime(2018, 5, 3, 10, 20, 30), 'abc']
+        cursor = pagure.lib.query.encode_cursor(keyset)
+        self.assertEqual(pagure.lib.query.decode_cursor(cursor), keyset)
+
+        # The cursor is bound to the order it was generated for
+        self.assertIsNone(
+            pagure.lib.query.decode_cursor(cursor, 'last_updated'))
+        self.assertIsNone(pagure.lib.query.decode_cursor('foobar'))
+        self.assertIsNone(pagure.lib.query.decode_cursor('!!'))
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
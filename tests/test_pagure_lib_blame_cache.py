@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import pygit2
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.blame_cache
+import tests
+
+
+def add_commit(repo, content, parents, email):
+    """ Add a commit changing the `sources` file on the master branch of the
+    given repo and return its identifier. """
+    builder = repo.TreeBuilder()
+    blob = repo.create_blob(content.encode('utf-8'))
+    builder.insert('sources', blob, pygit2.GIT_FILEMODE_BLOB)
+    author = pygit2.Signature('Alice Author', email, 1514764800, 0)
+    return repo.create_commit(
+        'refs/heads/master', author, author, 'Edit sources',
+        builder.write(), parents).hex
+
+
+class PagureLibBlameCachetests(tests.SimplePagureTest):
+    """ Tests for pagure.lib.blame_cache """
+
+    def setUp(self):
+        """ Create a git repo with some history in it. """
+        super(PagureLibBlameCachetests, self).setUp()
+        self.repopath = os.path.join(self.path, 'repos', 'blame.git')
+        self.repo = pygit2.init_repository(self.repopath, bare=True)
+        self.c1 = add_commit(
+            self.repo, 'row 1\nrow 2\n', [], 'alice@authors.tld')
+        self.c2 = add_commit(
+            self.repo, 'row 1\nrow 2\nrow 3\n', [self.c1], 'bob@authors.tld')
+        pagure.lib.blame_cache._CACHE = None
+        self.config_patcher = patch.dict(
+            'pagure.lib.blame_cache.pagure_config',
+            {
+                'BLAME_CACHE_BACKEND': 'disk',
+                'BLAME_CACHE_FOLDER': os.path.join(self.path, 'blame'),
+                'BLAME_CACHE_SIZE': 2,
+                'BLAME_PREWARM_FILES': 5,
+            })
+        self.config_patcher.start()
+
+    def tearDown(self):
+        self.config_patcher.stop()
+        pagure.lib.blame_cache._CACHE = None
+        super(PagureLibBlameCachetests, self).tearDown()
+
+    def test_cached_blame(self):
+        """ Test serializing the blame and looking up its lines. """
+        blame = pagure.lib.blame_cache.CachedBlame.from_blame(
+            self.repo.blame('sources', newest_commit=self.c2))
+        blame = pagure.lib.blame_cache.CachedBlame.loads(blame.dumps())
+        self.assertEqual(len(blame), 2)
+        self.assertEqual(blame.for_line(1).final_commit_id, self.c1)
+        self.assertEqual(blame.for_line(2).final_commit_id, self.c1)
+        self.assertEqual(blame.for_line(3).final_commit_id, self.c2)
+        self.assertEqual(
+            blame.for_line(3).orig_committer.email, 'bob@authors.tld')
+        self.assertRaises(IndexError, blame.for_line, 0)
+        self.assertRaises(IndexError, blame.for_line, 4)
+
+    def test_compute_blame(self):
+        """ Test storing the blames in the cache. """
+        self.assertIsNone(
+            pagure.lib.blame_cache.get_blame(self.repo, 'sources', self.c2))
+        pagure.lib.blame_cache.compute_blame(self.repo, 'sources', self.c2)
+        blame = pagure.lib.blame_cache.get_blame(
+            self.repo, 'sources', self.c2)
+        self.assertEqual(blame.for_line(3).final_commit_id, self.c2)
+
+        # The least recently used blames are removed from the cache
+        c3 = add_commit(
+            self.repo, 'row 1\n', [self.c2], 'alice@authors.tld')
+        pagure.lib.blame_cache.compute_blame(self.repo, 'sources', self.c1)
+        os.utime(
+            pagure.lib.blame_cache.get_blame_cache()._path(
+                pagure.lib.blame_cache._hash(
+                    self.repo.path, 'sources', self.c1)),
+            (0, 0))
+        pagure.lib.blame_cache.compute_blame(self.repo, 'sources', c3)
+        self.assertIsNone(
+            pagure.lib.blame_cache.get_blame(self.repo, 'sources', self.c1))
+        self.assertIsNotNone(
+            pagure.lib.blame_cache.get_blame(self.repo, 'sources', self.c2))
+        self.assertIsNotNone(
+            pagure.lib.blame_cache.get_blame(self.repo, 'sources', c3))
+
+    def test_most_viewed(self):
+        """ Test recording the files whose blame is viewed. """
+        self.assertEqual(
+            pagure.lib.blame_cache.most_viewed(self.repo, 2), [])
+        pagure.lib.blame_cache.record_view(self.repo, 'README')
+        pagure.lib.blame_cache.record_view(self.repo, 'sources')
+        pagure.lib.blame_cache.record_view(self.repo, 'sources')
+        pagure.lib.blame_cache.record_view(self.repo, 'setup.py')
+        self.assertEqual(
+            pagure.lib.blame_cache.most_viewed(self.repo, 2),
+            ['sources', 'README'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import pygit2
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.commit_graph
+import tests
+
+
+def add_commit(repo, message, parents, ref=None):
+    """ Add a commit with the specified parents to the given repo and
+    return its identifier. """
+    builder = repo.TreeBuilder()
+    blob = repo.create_blob(message.encode('utf-8'))
+    builder.insert('sources', blob, pygit2.GIT_FILEMODE_BLOB)
+    tree = builder.write()
+    author = pygit2.Signature(
+        'Alice Author', 'alice@authors.tld', 1234567890, 0)
+    return repo.create_commit(
+        ref, author, author, message, tree, parents).hex
+
+
+class PagureLibCommitGraphtests(tests.SimplePagureTest):
+    """ Tests for pagure.lib.commit_graph """
+
+    def setUp(self):
+        """ Create a git repo with some history in it. """
+        super(PagureLibCommitGraphtests, self).setUp()
+        self.repopath = os.path.join(self.path, 'repos', 'graph.git')
+        self.repo = pygit2.init_repository(self.repopath, bare=True)
+
+        #   c1 - c2 - c3 - c4 - m5   master
+        #          \           /
+        #           b1 ------ b2 - b3   feature
+        self.c1 = add_commit(self.repo, 'c1', [])
+        self.c2 = add_commit(self.repo, 'c2', [self.c1])
+        self.c3 = add_commit(self.repo, 'c3', [self.c2])
+        self.c4 = add_commit(self.repo, 'c4', [self.c3])
+        self.b1 = add_commit(self.repo, 'b1', [self.c2])
+        self.b2 = add_commit(self.repo, 'b2', [self.b1])
+        self.b3 = add_commit(self.repo, 'b3', [self.b2])
+        self.m5 = add_commit(self.repo, 'm5', [self.c4, self.b2])
+
+    def test_update_commit_graph(self):
+        """ Test indexing the commits of a repo. """
+        added = pagure.lib.commit_graph.update_commit_graph(
+            self.repo, [self.m5])
+        self.assertEqual(added, 7)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.repopath, pagure.lib.commit_graph.COMMIT_GRAPH_FILENAME)))
+
+        graph = pagure.lib.commit_graph.get_commit_graph(self.repo)
+        self.assertEqual(graph.nodes[self.c1][0], 1)
+        self.assertEqual(graph.nodes[self.b2][0], 4)
+        self.assertEqual(graph.nodes[self.m5][0], 5)
+        self.assertEqual(graph.nodes[self.m5][2], (self.c4, self.b2))
+
+        # Incremental update, only the new commit is indexed
+        added = pagure.lib.commit_graph.update_commit_graph(
+            self.repo, [self.m5, self.b3])
+        self.assertEqual(added, 1)
+
+        # The index is read back from the disk
+        reloaded = pagure.lib.commit_graph.CommitGraph(graph.path)
+        reloaded.refresh()
+        self.assertEqual(reloaded.nodes, graph.nodes)
+
+    def test_commits_between(self):
+        """ Test listing the commits in a branch not in another one, with
+        and without the commit index. """
+        for indexed in (False, True):
+            if indexed:
+                pagure.lib.commit_graph.update_commit_graph(
+                    self.repo, [self.m5])
+            self.assertEqual(
+                pagure.lib.commit_graph.has_commit_graph(self.repo), indexed)
+
+            output = pagure.lib.commit_graph.commits_between(
+                self.repo, self.b3, base=self.c4)
+            self.assertEqual(output, [self.b3, self.b2, self.b1])
+
+            output = pagure.lib.commit_graph.commits_between(
+                self.repo, self.b3, base=self.m5)
+            self.assertEqual(output, [self.b3])
+
+            output = pagure.lib.commit_graph.commits_between(
+                self.repo, self.c4, base=self.m5)
+            self.assertEqual(output, [])
+
+            output = pagure.lib.commit_graph.commits_between(
+                self.repo, self.c3)
+            self.assertEqual(output, [self.c3, self.c2, self.c1])
+
+    def test_commits_between_not_indexed(self):
+        """ Test that the repos without a commit index are walked instead
+        of being indexed. """
+        output = pagure.lib.commit_graph.commits_between(
+            self.repo, self.b3, base=self.c4)
+        self.assertEqual(output, [self.b3, self.b2, self.b1])
+        self.assertFalse(pagure.lib.commit_graph.has_commit_graph(self.repo))
+
+    def test_commits_between_fork(self):
+        """ Test listing the commits between two different repos. """
+        forkpath = os.path.join(self.path, 'repos', 'forks', 'graph.git')
+        fork = pygit2.init_repository(forkpath, bare=True)
+        f1 = add_commit(fork, 'c1', [])
+        f2 = add_commit(fork, 'c2', [f1])
+        f3 = add_commit(fork, 'f3', [f2])
+        self.assertEqual(f2, self.c2)
+
+        output = pagure.lib.commit_graph.commits_between(
+            fork, f3, base=self.m5, base_repo=self.repo)
+        self.assertEqual(output, [f3])
+
+        pagure.lib.commit_graph.update_commit_graph(fork, [f3])
+        pagure.lib.commit_graph.update_commit_graph(self.repo, [self.m5])
+        output = pagure.lib.commit_graph.commits_between(
+            fork, f3, base=self.m5, base_repo=self.repo)
+        self.assertEqual(output, [f3])
+
+    def test_merge_base(self):
+        """ Test finding the merge-base of two commits, with and without
+        the commit index. """
+        orphan = add_commit(self.repo, 'orphan', [])
+        for indexed in (False, True):
+            if indexed:
+                pagure.lib.commit_graph.update_commit_graph(
+                    self.repo, [self.m5])
+            self.assertEqual(
+                pagure.lib.commit_graph.merge_base(
+                    self.repo, self.b3, self.c4),
+                self.c2)
+            self.assertEqual(
+                pagure.lib.commit_graph.merge_base(
+                    self.repo, self.b3, self.m5),
+                self.b2)
+            self.assertIsNone(
+                pagure.lib.commit_graph.merge_base(
+                    self.repo, orphan, self.m5))
+
+    @patch('pagure.lib.commit_graph._CACHE_SIZE', 2)
+    def test_get_commit_graph_cache_bounded(self):
+        """ Test that only the most recently used indexes are kept in
+        memory. """
+        pagure.lib.commit_graph._CACHE.clear()
+        repos = [self.repo]
+        for name in ('other1.git', 'other2.git'):
+            repos.append(pygit2.init_repository(
+                os.path.join(self.path, 'repos', name), bare=True))
+
+        graph = pagure.lib.commit_graph.get_commit_graph(repos[0])
+        pagure.lib.commit_graph.get_commit_graph(repos[1])
+        # Using the first index again makes the second one the oldest
+        self.assertIs(
+            pagure.lib.commit_graph.get_commit_graph(repos[0]), graph)
+        pagure.lib.commit_graph.get_commit_graph(repos[2])
+
+        self.assertEqual(
+            list(pagure.lib.commit_graph._CACHE),
+            [graph.path, os.path.join(
+                repos[2].path,
+                pagure.lib.commit_graph.COMMIT_GRAPH_FILENAME)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import pygit2
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.commit_log
+import tests
+
+
+def add_commits(repo, ncommits, parent=None, email='alice@authors.tld',
+                prefix='Add row'):
+    """ Add some commits on the master branch of the given repo and return
+    their identifiers, oldest first. """
+    output = []
+    parents = [parent] if parent else []
+    for idx in range(ncommits):
+        builder = repo.TreeBuilder()
+        blob = repo.create_blob(('%s %s' % (prefix, idx)).encode('utf-8'))
+        builder.insert('sources', blob, pygit2.GIT_FILEMODE_BLOB)
+        author = pygit2.Signature(
+            'Alice Author', email, 1514764800 + idx, 0)
+        commit = repo.create_commit(
+            'refs/heads/master', author, author, '%s %s' % (prefix, idx),
+            builder.write(), parents).hex
+        output.append(commit)
+        parents = [commit]
+    return output
+
+
+class PagureLibCommitLogtests(tests.SimplePagureTest):
+    """ Tests for pagure.lib.commit_log """
+
+    def setUp(self):
+        """ Create a git repo with some history in it. """
+        super(PagureLibCommitLogtests, self).setUp()
+        self.repopath = os.path.join(self.path, 'repos', 'log.git')
+        self.repo = pygit2.init_repository(self.repopath, bare=True)
+        self.commits = add_commits(self.repo, 5)
+        self.commits += add_commits(
+            self.repo, 3, parent=self.commits[-1], email='bob@authors.tld',
+            prefix='Bob row')
+
+    def test_update_commit_log(self):
+        """ Test building and updating the commit log of a branch. """
+        commit_log = pagure.lib.commit_log.update_commit_log(
+            self.repo, 'master', self.commits[-1])
+        self.assertEqual(len(commit_log), 8)
+        self.assertEqual(commit_log.head(), self.commits[-1])
+        self.assertEqual(commit_log.update(self.commits[-1]), 0)
+
+        # Only the new commits are added
+        new_commits = add_commits(
+            self.repo, 2, parent=self.commits[-1], prefix='New row')
+        self.assertEqual(commit_log.update(new_commits[-1]), 2)
+        self.assertEqual(len(commit_log), 10)
+
+        # The history is re-written, the log is rebuilt
+        self.assertEqual(commit_log.update(self.commits[2]), 3)
+        self.assertEqual(len(commit_log), 3)
+        self.assertEqual(
+            commit_log.get_commits(0, 10), self.commits[2::-1])
+
+    def test_get_commits(self):
+        """ Test retrieving a page of the commit log. """
+        commit_log = pagure.lib.commit_log.update_commit_log(
+            self.repo, 'master', self.commits[-1])
+        self.assertEqual(
+            commit_log.get_commits(0, 2),
+            [self.commits[7], self.commits[6], self.commits[5]])
+        self.assertEqual(
+            commit_log.get_commits(6, 9),
+            [self.commits[1], self.commits[0]])
+        self.assertEqual(commit_log.get_commits(10, 12), [])
+
+    def test_get_author_commits(self):
+        """ Test retrieving the commits of an author. """
+        commit_log = pagure.lib.commit_log.update_commit_log(
+            self.repo, 'master', self.commits[-1])
+        self.assertEqual(
+            commit_log.get_author_commits(['bob@authors.tld'], 0, 1),
+            (3, [self.commits[7], self.commits[6]]))
+        self.assertEqual(
+            commit_log.get_author_commits(
+                ['alice@authors.tld', 'bob@authors.tld'], 2, 3),
+            (8, [self.commits[5], self.commits[4]]))
+        self.assertEqual(
+            commit_log.get_author_commits(['foo@bar.com'], 0, 10),
+            (0, []))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import unittest
+import sys
+import os
+
+import pygit2
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.commit_stats
+import tests
+
+
+def add_commit(repo, message, parents, name='Alice Author',
+               email='alice@authors.tld', time=1514764800):
+    """ Add a commit on the master branch of the given repo and return its
+    identifier. """
+    builder = repo.TreeBuilder()
+    blob = repo.create_blob(message.encode('utf-8'))
+    builder.insert('sources', blob, pygit2.GIT_FILEMODE_BLOB)
+    tree = builder.write()
+    author = pygit2.Signature(name, email, time, 0)
+    return repo.create_commit(
+        'refs/heads/master', author, author, message, tree, parents).hex
+
+
+class PagureLibCommitStatstests(tests.Modeltests):
+    """ Tests for pagure.lib.commit_stats """
+
+    def setUp(self):
+        """ Create a git repo with some history in it. """
+        super(PagureLibCommitStatstests, self).setUp()
+        self.repopath = os.path.join(self.path, 'repos', 'stats.git')
+        self.repo = pygit2.init_repository(self.repopath, bare=True)
+        self.c1 = add_commit(self.repo, 'c1', [])
+        self.c2 = add_commit(
+            self.repo, 'c2', [self.c1], name='Pierre-Yves Chibon',
+            email='bar@pingou.com', time=1514764860)
+
+    def test_get_commit_stats(self):
+        """ Test computing and updating the commit stats of a repo. """
+        self.assertIsNone(
+            pagure.lib.commit_stats.get_cached_commit_stats(self.repo))
+
+        stats = pagure.lib.commit_stats.get_commit_stats(self.repo)
+        self.assertEqual(stats['head'], self.c2)
+        self.assertEqual(stats['number_of_commits'], 2)
+        self.assertEqual(stats['first_commit_time'], 1514764800)
+        self.assertEqual(stats['dates'], {'2018-01-01': 2})
+        self.assertEqual(
+            pagure.lib.commit_stats.get_cached_commit_stats(self.repo),
+            stats)
+
+        # Only the new commit is processed
+        c3 = add_commit(self.repo, 'c3', [self.c2], time=1514851200)
+        self.assertIsNone(
+            pagure.lib.commit_stats.get_cached_commit_stats(self.repo))
+        stats = pagure.lib.commit_stats.get_commit_stats(self.repo)
+        self.assertEqual(stats['head'], c3)
+        self.assertEqual(stats['number_of_commits'], 3)
+        self.assertEqual(
+            stats['dates'], {'2018-01-01': 2, '2018-01-02': 1})
+
+        # Re-writing the history rebuilds the stats
+        self.repo.lookup_reference('refs/heads/master').set_target(self.c1)
+        stats = pagure.lib.commit_stats.get_commit_stats(self.repo)
+        self.assertEqual(stats['head'], self.c1)
+        self.assertEqual(stats['number_of_commits'], 1)
+        self.assertEqual(
+            stats['authors'], [['Alice Author', 'alice@authors.tld', 1]])
+
+    def test_get_author_stats(self):
+        """ Test merging the authors of the commits with the known users.
+        """
+        stats = pagure.lib.commit_stats.get_commit_stats(self.repo)
+        self.assertEqual(
+            pagure.lib.commit_stats.get_author_stats(self.session, stats),
+            (
+                2,
+                [(1, [
+                    ('PY C', 'bar@pingou.com'),
+                    ('Alice Author', 'alice@authors.tld'),
+                ])],
+                2,
+                1514764800,
+            )
+        )
+
+    def test_get_history_stats(self):
+        """ Test retrieving the number of commits per day. """
+        today = datetime.datetime.utcnow()
+        add_commit(
+            self.repo, 'c3', [self.c2],
+            time=int((today - datetime.datetime(1970, 1, 1)).total_seconds()))
+        stats = pagure.lib.commit_stats.get_commit_stats(self.repo)
+        self.assertEqual(
+            pagure.lib.commit_stats.get_history_stats(stats),
+            [(today.date().isoformat(), 1)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
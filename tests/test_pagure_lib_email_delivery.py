@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import smtplib
+import sys
+import tempfile
+import unittest
+
+from mock import patch, MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.email_delivery
+import pagure.lib.notify
+import pagure.lib.tasks_services
+import tests
+
+
+@patch.dict('pagure.config.config', {'EMAIL_SEND': True})
+class PagureLibEmailDeliverytests(tests.SimplePagureTest):
+    """ Tests for pagure.lib.email_delivery """
+
+    def setUp(self):
+        """ Set up the environnment, ran before every tests. """
+        super(PagureLibEmailDeliverytests, self).setUp()
+        pagure.lib.email_delivery.close_connection()
+        self.addCleanup(pagure.lib.email_delivery.close_connection)
+        patcher = patch('pagure.lib.email_delivery.smtplib.SMTP')
+        self.smtp = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.smtp.return_value.sendmail.return_value = {}
+
+    @patch.dict('pagure.config.config', {'SMTP_MAX_MESSAGES': 3})
+    def test_connection_reused(self):
+        """ Test that the connection to the SMTP server is kept open
+        between the emails. """
+        messages = [(['foo@bar.com'], 'email'), (['bar@foo.com'], 'email')]
+        for idx in range(2):
+            pending = pagure.lib.email_delivery.send_messages(
+                'pagure@localhost', messages)
+            self.assertEqual(pending, [])
+        self.assertEqual(self.smtp.call_count, 2)
+        self.assertEqual(self.smtp.return_value.sendmail.call_count, 4)
+        self.assertEqual(self.smtp.return_value.quit.call_count, 1)
+
+    def test_connection_closed_by_server(self):
+        """ Test that a new connection is opened when the server closed the
+        one kept open. """
+        pagure.lib.email_delivery.send_messages(
+            'pagure@localhost', [(['foo@bar.com'], 'email')])
+        self.smtp.return_value.sendmail.side_effect = [
+            smtplib.SMTPServerDisconnected('Closed'), {}]
+        pending = pagure.lib.email_delivery.send_messages(
+            'pagure@localhost', [(['foo@bar.com'], 'email')])
+        self.assertEqual(pending, [])
+        self.assertEqual(self.smtp.call_count, 2)
+
+    def test_send_messages_failures(self):
+        """ Test that the emails failing because of a temporary error are
+        returned and the others dead-lettered. """
+        folder = tempfile.mkdtemp(prefix='pagure-tests-')
+        self.addCleanup(shutil.rmtree, folder)
+
+        def _sendmail(from_email, to_emails, message):
+            if to_emails == ['temp@bar.com']:
+                raise smtplib.SMTPRecipientsRefused(
+                    {'temp@bar.com': (450, 'Mailbox busy')})
+            if to_emails == ['perm@bar.com']:
+                raise smtplib.SMTPRecipientsRefused(
+                    {'perm@bar.com': (550, 'No such user')})
+            return {}
+
+        self.smtp.return_value.sendmail.side_effect = _sendmail
+        messages = [
+            (['temp@bar.com'], 'email 1'),
+            (['perm@bar.com'], 'email 2'),
+            (['foo@bar.com'], 'email 3'),
+        ]
+        with patch.dict('pagure.config.config', {
+                'EMAIL_DEAD_LETTER_FOLDER': folder}):
+            pending = pagure.lib.email_delivery.send_messages(
+                'pagure@localhost', messages, retry=True)
+            self.assertEqual(pending, [(['temp@bar.com'], 'email 1')])
+            self.assertEqual(len(os.listdir(folder)), 1)
+
+            # Without retrying, the temporary failures are dead-lettered too
+            pending = pagure.lib.email_delivery.send_messages(
+                'pagure@localhost', messages)
+            self.assertEqual(pending, [])
+            self.assertEqual(len(os.listdir(folder)), 3)
+        self.assertEqual(self.smtp.call_count, 1)
+
+    def test_server_unreachable(self):
+        """ Test that all the emails are returned when the server cannot be
+        reached, without trying to connect for each of them. """
+        self.smtp.side_effect = smtplib.SMTPConnectError(
+            421, 'Service not available')
+        messages = [(['foo@bar.com'], 'email'), (['bar@foo.com'], 'email')]
+        pending = pagure.lib.email_delivery.send_messages(
+            'pagure@localhost', messages, retry=True)
+        self.assertEqual(pending, messages)
+        self.assertEqual(self.smtp.call_count, 1)
+
+    def test_send_messages_some_refused(self):
+        """ Test that only the recipients refused are returned when the
+        email is sent to several of them at once. """
+        self.smtp.return_value.sendmail.return_value = {
+            'bar@foo.com': (450, 'Mailbox busy')}
+        pending = pagure.lib.email_delivery.send_messages(
+            'pagure@localhost', [(['foo@bar.com', 'bar@foo.com'], 'email')],
+            retry=True)
+        self.assertEqual(pending, [(['bar@foo.com'], 'email')])
+        self.assertEqual(self.smtp.return_value.sendmail.call_count, 1)
+
+    @patch.dict('pagure.config.config', {
+        'EMAIL_MAX_RECIPIENTS': 2, 'EVENTSOURCE_SOURCE': None})
+    def test_send_email_grouped(self):
+        """ Test that the email is sent at once to several recipients when
+        its Reply-To header is not specific to each of them. """
+        email = pagure.lib.notify.send_email(
+            'Email content', 'Subject', 'foo@bar.com,bar@foo.com,baz@foo.com',
+            mail_id='test-issue-1', project_name='test')
+        self.assertEqual(email['To'], 'undisclosed-recipients:;')
+        calls = self.smtp.return_value.sendmail.call_args_list
+        self.assertEqual(
+            [args[1] for args, _ in calls],
+            [['foo@bar.com', 'bar@foo.com'], ['baz@foo.com']])
+        self.assertEqual(calls[0][0][2], calls[1][0][2])
+
+        # Each recipient gets their own email when the Reply-To is specific
+        with patch.dict('pagure.config.config', {
+                'EVENTSOURCE_SOURCE': 'localhost.localdomain'}):
+            email = pagure.lib.notify.send_email(
+                'Email content', 'Subject', 'foo@bar.com,bar@foo.com',
+                mail_id='test-issue-1', project_name='test')
+        self.assertEqual(email['To'], 'bar@foo.com')
+        calls = self.smtp.return_value.sendmail.call_args_list[2:]
+        self.assertEqual(
+            [args[1] for args, _ in calls], [['foo@bar.com'], ['bar@foo.com']])
+
+    @patch('pagure.lib.email_delivery.time.sleep')
+    @patch.dict('pagure.config.config', {'EMAIL_RATE_LIMIT': 2})
+    def test_rate_limit(self, sleep):
+        """ Test that the emails are not sent faster than the rate limit.
+        """
+        messages = [(['foo@bar.com'], 'email'), (['bar@foo.com'], 'email')]
+        pagure.lib.email_delivery.send_messages('pagure@localhost', messages)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertLessEqual(sleep.call_args[0][0], 0.5)
+
+    @patch('pagure.lib.tasks_services.send_email.delay')
+    @patch.dict('pagure.config.config', {'EMAIL_CELERY_QUEUE_ENABLED': True})
+    def test_send_email_queued(self, delay):
+        """ Test that the email is queued once for all its recipients. """
+        output = pagure.lib.notify.send_email(
+            'Email content', 'Subject', 'foo@bar.com,bar@foo.com',
+            project_name='test')
+        self.assertIsNone(output)
+        self.assertEqual(delay.call_count, 1)
+        args, kwargs = delay.call_args
+        self.assertEqual(
+            args, ('Email content', 'Subject', ['foo@bar.com', 'bar@foo.com']))
+        self.assertEqual(kwargs['project_name'], 'test')
+        self.assertIn('queued_at', kwargs)
+        self.assertEqual(self.smtp.call_count, 0)
+
+    def test_send_email_task_retry(self):
+        """ Test that the task tries again to send the email only to the
+        recipients it could not be sent to. """
+        self.smtp.return_value.sendmail.side_effect = [
+            {}, smtplib.SMTPRecipientsRefused(
+                {'bar@foo.com': (450, 'Mailbox busy')})]
+        task = pagure.lib.tasks_services.send_email
+        with patch.object(task, 'retry', MagicMock(
+                side_effect=RuntimeError('retry'))) as retry:
+            self.assertRaises(
+                RuntimeError,
+                task, 'Email content', 'Subject',
+                ['foo@bar.com', 'bar@foo.com'], project_name='test')
+        self.assertEqual(
+            retry.call_args[1]['args'],
+            ('Email content', 'Subject', ['bar@foo.com']))
+        self.assertEqual(
+            retry.call_args[1]['kwargs'], {'project_name': 'test'})
+
+    @patch('pagure.lib.tasks_services.conn.connection_or_acquire')
+    def test_get_queue_depth_failure(self, connection):
+        """ Test that failing to retrieve the depth of the queue, such as
+        when redis dropped the empty queue, does not raise. """
+        channel = connection.return_value.__enter__.return_value\
+            .default_channel
+        channel.queue_declare.side_effect = Exception('NOT_FOUND')
+        self.assertIsNone(
+            pagure.lib.tasks_services.get_queue_depth('pagure_email'))
+        channel.queue_declare.side_effect = None
+        channel.queue_declare.return_value = MagicMock(message_count=3)
+        self.assertEqual(
+            pagure.lib.tasks_services.get_queue_depth('pagure_email'), 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
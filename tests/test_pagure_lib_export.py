@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import json
+import unittest
+import sys
+import os
+
+import sqlalchemy
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.export
+import pagure.lib.query
+import tests
+
+
+class PagureLibExporttests(tests.Modeltests):
+    """ Tests for pagure.lib.export """
+
+    def setUp(self):
+        """ Create a project with a few issues and a pull-request. """
+        super(PagureLibExporttests, self).setUp()
+
+        tests.create_projects(self.session)
+        self.repo = pagure.lib.query.get_authorized_project(
+            self.session, 'test')
+        for idx, private in enumerate([False, True, False, False]):
+            issue = pagure.lib.query.new_issue(
+                session=self.session,
+                repo=self.repo,
+                title='Issue #%s' % (idx + 1),
+                content='Content #%s' % (idx + 1),
+                user='foo' if private else 'pingou',
+                private=private,
+                notify=False,
+            )
+            pagure.lib.query.add_issue_comment(
+                self.session, issue, 'Comment on #%s' % (idx + 1),
+                user='pingou', notify=False)
+            self.session.commit()
+
+        # Make the first issue the most recently updated
+        issue = pagure.lib.query.search_issues(
+            self.session, repo=self.repo, issueid=1)
+        issue.last_updated = datetime.datetime.utcnow()
+        self.session.add(issue)
+        self.session.commit()
+
+    def _export_issues(self, **kwargs):
+        return [
+            json.loads(line)
+            for line in pagure.lib.export.iter_issues(
+                self.session, self.repo, batch_size=2, **kwargs)
+        ]
+
+    def test_parse_updated_after(self):
+        """ Test parsing the watermarks. """
+        self.assertEqual(
+            pagure.lib.export.parse_updated_after('1525342830'),
+            datetime.datetime(2018, 5, 3, 10, 20, 30))
+        self.assertEqual(
+            pagure.lib.export.parse_updated_after('2018-05-03'),
+            datetime.datetime(2018, 5, 3))
+        self.assertEqual(
+            pagure.lib.export.parse_updated_after(
+                '2018-05-03T12:20:30+02:00'),
+            datetime.datetime(2018, 5, 3, 10, 20, 30))
+        for value in ['12-13', 'foo']:
+            self.assertRaises(
+                ValueError, pagure.lib.export.parse_updated_after, value)
+
+    def test_iter_issues(self):
+        """ Test exporting the issues of a project. """
+        issues = self._export_issues(private=None)
+        self.assertEqual(
+            [issue['title'] for issue in issues],
+            ['Issue #2', 'Issue #3', 'Issue #4', 'Issue #1'])
+        self.assertEqual(
+            [comment['comment'] for comment in issues[0]['comments']],
+            ['Comment on #2'])
+        self.assertEqual(
+            issues[0]['user'], {'fullname': 'foo bar', 'name': 'foo'})
+
+        # Private issues are only exported if asked
+        self.assertEqual(
+            [issue['title'] for issue in self._export_issues()],
+            ['Issue #3', 'Issue #4', 'Issue #1'])
+        self.assertEqual(
+            len(self._export_issues(private='foo')), 4)
+        self.assertEqual(
+            len(self._export_issues(private='pingou')), 3)
+
+        # Only the issues updated after the watermark are exported
+        watermark = pagure.lib.query.search_issues(
+            self.session, repo=self.repo, issueid=1).last_updated
+        self.assertEqual(
+            [issue['title'] for issue in self._export_issues(
+                updated_after=watermark)],
+            ['Issue #1'])
+
+    def test_iter_issues_queries(self):
+        """ Test that the number of queries does not depend on the number
+        of issues exported. """
+        engine = self.session.get_bind()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        def export():
+            self.session.expire_all()
+            statements[:] = []
+            sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+            try:
+                lines = list(pagure.lib.export.iter_issues(
+                    self.session, self.repo, private=None, batch_size=10))
+            finally:
+                sqlalchemy.event.remove(
+                    engine, 'before_cursor_execute', count)
+            return len(lines), len(statements)
+
+        exported, queries = export()
+        self.assertEqual(exported, 4)
+
+        for idx in range(4):
+            issue = pagure.lib.query.new_issue(
+                session=self.session, repo=self.repo, title='Other issue',
+                content='content', user='foo', notify=False)
+            pagure.lib.query.add_issue_comment(
+                self.session, issue, 'Comment', user='pingou', notify=False)
+        self.session.commit()
+
+        self.assertEqual(export(), (8, queries))
+
+    def test_iter_pull_requests(self):
+        """ Test exporting the pull-requests of a project. """
+        pagure.lib.query.new_pull_request(
+            self.session,
+            repo_from=self.repo,
+            branch_from='feature',
+            repo_to=self.repo,
+            branch_to='master',
+            title='PR #5',
+            user='pingou',
+        )
+        self.session.commit()
+
+        requests = [
+            json.loads(line)
+            for line in pagure.lib.export.iter_pull_requests(
+                self.session, self.repo)
+        ]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]['title'], 'PR #5')
+        self.assertEqual(requests[0]['project']['name'], 'test')
+        self.assertEqual(requests[0]['comments'], [])
+
+        self.assertEqual(
+            list(pagure.lib.export.iter_pull_requests(
+                self.session, self.repo,
+                updated_after=datetime.datetime.utcnow()
+                + datetime.timedelta(days=1))),
+            [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
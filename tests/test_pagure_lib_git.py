@@ -15,6 +15,7 @@ __requires__ = ['SQLAlchemy >= 0.8']
 import pkg_resources
 
 import datetime
+import json
 import os
 import shutil
 import sys
@@ -23,6 +24,7 @@ import time
 import unittest
 
 import pygit2
+import redis
 import six
 from mock import patch, MagicMock
 
@@ -74,8 +76,7 @@ class PagureLibGittests(tests.Modeltests):
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo test
   R   = @all
@@ -164,8 +165,7 @@ repo requests/forks/pingou/test3
         )
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """# this is a header that is manually added
 # end of header
@@ -244,8 +244,7 @@ repo requests/somenamespace/test3
         )
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """# this is a header that is manually added
 # end of header
@@ -319,8 +318,7 @@ repo requests/somenamespace/test3
         )
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo test
   R   = @all
@@ -416,8 +414,7 @@ repo requests/somenamespace/test3
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo test
   R   = @all
@@ -527,8 +524,7 @@ repo requests/forks/pingou/test3
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo test
   R   = @all
@@ -630,8 +626,7 @@ repo requests/forks/pingou/test3
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo test
   R   = @all
@@ -782,8 +777,7 @@ repo requests/forks/pingou/test3
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """@devs  = pingou
 @sysadmin  = pingou
@@ -944,8 +938,7 @@ repo requests/forks/pingou/test2
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """@devs  = pingou
 @sysadmin  = pingou
@@ -1102,8 +1095,7 @@ repo requests/forks/pingou/test2
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """@devs  = pingou
 @sysadmin  = pingou
@@ -1224,8 +1216,7 @@ repo requests/forks/pingou/test2
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo docs/test
   R   = @all
@@ -1329,8 +1320,7 @@ repo requests/forks/pingou/test3
 
         self.assertTrue(os.path.exists(outputconf))
 
-        with open(outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(outputconf)
 
         exp = """repo docs/test
   R   = @all
@@ -1637,6 +1627,87 @@ index 458821a..77674a8
         files = [entry.name for entry in commit.tree]
         self.assertEqual(files, [])
 
+    @patch('pagure.lib.notify.send_email')
+    def test_update_git_objects(self, email_f):
+        """ Test the _update_git_objects method of pagure.lib.git. """
+        email_f.return_value = True
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+
+        issues = []
+        for idx in range(3):
+            issues.append(pagure.lib.query.new_issue(
+                session=self.session,
+                repo=repo,
+                title='Test issue #%s' % idx,
+                content='We should work on this',
+                user='pingou',
+            ))
+        self.session.commit()
+
+        # Create the repo once the issues are created so they are only
+        # written to it below
+        gitrepo = os.path.join(self.path, 'repos', 'tickets', 'test.git')
+        pygit2.init_repository(gitrepo, bare=True)
+
+        with patch('pagure.lib.git.TemporaryClone') as clone:
+            pagure.lib.git._update_git_objects(issues[:2], repo)
+            self.assertFalse(clone.called)
+
+        # A single commit for all the issues
+        repo_obj = pygit2.Repository(gitrepo)
+        commit = repo_obj.revparse_single('refs/heads/master')
+        self.assertEqual(commit.parents, [])
+        self.assertEqual(
+            commit.message.split('\n')[:2],
+            ['Updated 2 issues', ''])
+        self.assertEqual(
+            sorted(entry.name for entry in commit.tree),
+            sorted([issues[0].uid, issues[1].uid]))
+        data = json.loads(
+            repo_obj[commit.tree[issues[0].uid].id].data.decode('utf-8'))
+        self.assertEqual(data['title'], 'Test issue #0')
+
+        # Nothing changed, no new commit
+        pagure.lib.git._update_git_objects(issues[:2], repo)
+        self.assertEqual(
+            repo_obj.revparse_single('refs/heads/master').hex, commit.hex)
+
+        # Only the changed issues are committed
+        issues[0].title = 'Edited'
+        pagure.lib.git._update_git_objects(issues, repo)
+        new_commit = repo_obj.revparse_single('refs/heads/master')
+        self.assertEqual(new_commit.parents[0].hex, commit.hex)
+        self.assertEqual(
+            sorted(new_commit.message.strip().split('\n')[2:]),
+            sorted([
+                'issue %s: Edited' % issues[0].uid,
+                'issue %s: Test issue #2' % issues[2].uid,
+            ])
+        )
+        self.assertEqual(len(new_commit.tree), 3)
+
+    def test_pop_pending_updates(self):
+        """ Test the pop_pending_updates method of pagure.lib.git. """
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+
+        with patch('pagure.lib.git._get_redis') as get_redis:
+            pipeline = get_redis.return_value.pipeline.return_value
+            pipeline.execute.return_value = [set([b'bbb', b'ccc']), 1]
+            self.assertEqual(
+                pagure.lib.git.pop_pending_updates(repo, 'tickets', 'aaa'),
+                ['aaa', 'bbb', 'ccc'])
+            pipeline.smembers.assert_called_with(
+                'pagure:update_git:tickets:test')
+
+            # Redis could not be reached
+            get_redis.return_value.pipeline.side_effect = \
+                redis.exceptions.ConnectionError()
+            self.assertEqual(
+                pagure.lib.git.pop_pending_updates(repo, 'tickets', 'aaa'),
+                ['aaa'])
+
     @patch('pagure.lib.notify.send_email')
     def test_update_git_requests(self, email_f):
         """ Test the update_git of pagure.lib.git for pull-requests. """
@@ -2675,6 +2746,190 @@ index 0000000..60f7480
             output = pagure.lib.git.get_author(githash, gitrepo)
             self.assertEqual(output, 'pagure')
 
+    def test_log_commits_to_db(self):
+        """ Test the log_commits_to_db method of pagure.lib.git. """
+        tests.create_projects(self.session)
+        project = pagure.lib.query.get_authorized_project(self.session, 'test')
+        gitrepo = os.path.join(self.path, 'repos', 'test.git')
+        repo = pygit2.init_repository(gitrepo, bare=True)
+
+        commits = []
+        for idx, email in enumerate(
+                ['bar@pingou.com', 'alice@authors.tld', 'bar@pingou.com']):
+            builder = repo.TreeBuilder()
+            blob = repo.create_blob(('row %s\n' % idx).encode('utf-8'))
+            builder.insert('sources', blob, pygit2.GIT_FILEMODE_BLOB)
+            author = pygit2.Signature('Author', email, 1514764800, 0)
+            commits.append(repo.create_commit(
+                'refs/heads/master', author, author, 'Commit %s' % idx,
+                builder.write(), commits[-1:]).hex)
+
+        # The authors of all the commits are found in a single query
+        with patch(
+                'pagure.lib.query.search_users_by_emails',
+                wraps=pagure.lib.query.search_users_by_emails) as search:
+            pagure.lib.git.log_commits_to_db(
+                self.session, project, commits + ['invalid'], gitrepo)
+            self.assertEqual(search.call_count, 1)
+        self.session.commit()
+
+        logs = self.session.query(pagure.lib.model.PagureLog).order_by(
+            pagure.lib.model.PagureLog.id).all()
+        self.assertEqual(
+            [(log.ref_id, log.user_id, log.user_email) for log in logs],
+            [
+                (commits[0], 1, None),
+                (commits[1], None, 'alice@authors.tld'),
+                (commits[2], 1, None),
+            ]
+        )
+        self.assertEqual(
+            [log.log_type for log in logs], ['committed'] * 3)
+        self.assertEqual(logs[0].date, datetime.date(2018, 1, 1))
+        self.assertEqual(logs[0].project_id, project.id)
+
+    def _create_merge_repos(self):
+        """ Create a bare repo with a master branch and a feature branch
+        forked from it, return the repo and the commits created. """
+        gitrepo = os.path.join(self.path, 'repos', 'test.git')
+        repo = pygit2.init_repository(gitrepo, bare=True)
+        author = pygit2.Signature('Alice', 'alice@authors.tld', 1514764800, 0)
+
+        def commit(branch, parents, **files):
+            if parents:
+                builder = repo.TreeBuilder(repo[parents[0]].tree)
+            else:
+                builder = repo.TreeBuilder()
+            for filename, content in files.items():
+                blob = repo.create_blob(content.encode('utf-8'))
+                builder.insert(filename, blob, pygit2.GIT_FILEMODE_BLOB)
+            return repo.create_commit(
+                'refs/heads/%s' % branch, author, author, 'Edit %s' % branch,
+                builder.write(), parents).hex
+
+        commits = {}
+        commits['base'] = commit('master', [], sources='foo\n')
+        commits['feature'] = commit(
+            'feature', [commits['base']], sources='bar\n')
+        return repo, commit, commits
+
+    def test_analyze_merge(self):
+        """ Test the analyze_merge method of pagure.lib.git. """
+        repo, commit, commits = self._create_merge_repos()
+        base = commits['base']
+        feature = commits['feature']
+
+        self.assertEqual(
+            pagure.lib.git.analyze_merge(repo, None, feature), 'FFORWARD')
+        self.assertEqual(
+            pagure.lib.git.analyze_merge(repo, base, base), 'NO_CHANGE')
+        self.assertEqual(
+            pagure.lib.git.analyze_merge(repo, feature, base), 'NO_CHANGE')
+        self.assertEqual(
+            pagure.lib.git.analyze_merge(repo, base, feature), 'FFORWARD')
+
+        # Change another file on master
+        other = commit('master', [base], README='readme\n')
+        self.assertEqual(
+            pagure.lib.git.analyze_merge(repo, other, feature), 'MERGE')
+
+        # Change the same file on master
+        conflict = commit('master', [other], sources='baz\n')
+        self.assertEqual(
+            pagure.lib.git.analyze_merge(repo, conflict, feature),
+            'CONFLICTS')
+
+        # Nothing was written to the repo
+        self.assertEqual(
+            repo.lookup_reference('refs/heads/master').target.hex, conflict)
+        self.assertEqual(
+            repo.lookup_reference('refs/heads/feature').target.hex, feature)
+
+    @patch('pagure.lib.git.merge_pull_request')
+    def test_get_merge_status(self, merge):
+        """ Test the get_merge_status method of pagure.lib.git. """
+        tests.create_projects(self.session)
+        project = pagure.lib.query.get_authorized_project(self.session, 'test')
+        repo, commit, commits = self._create_merge_repos()
+
+        req = pagure.lib.query.new_pull_request(
+            session=self.session,
+            repo_from=project,
+            branch_from='feature',
+            repo_to=project,
+            branch_to='master',
+            title='test pull-request',
+            user='pingou',
+        )
+        self.session.commit()
+
+        # Nothing computed yet
+        merge.return_value = 'FFORWARD'
+        self.assertEqual(
+            pagure.lib.git.get_merge_status(self.session, req), 'FFORWARD')
+        self.assertEqual(merge.call_count, 1)
+
+        # Computed for the current commits of the branches
+        req.merge_status = 'FFORWARD'
+        req.merge_status_target = commits['base']
+        req.merge_status_head = commits['feature']
+        self.session.commit()
+        self.assertEqual(
+            pagure.lib.git.get_merge_status(self.session, req), 'FFORWARD')
+        self.assertEqual(merge.call_count, 1)
+
+        # Forced
+        self.assertEqual(
+            pagure.lib.git.get_merge_status(self.session, req, force=True),
+            'FFORWARD')
+        self.assertEqual(merge.call_count, 2)
+
+        # The target branch moved
+        commit('master', [commits['base']], README='readme\n')
+        merge.return_value = 'MERGE'
+        self.assertEqual(
+            pagure.lib.git.get_merge_status(self.session, req), 'MERGE')
+        self.assertEqual(merge.call_count, 3)
+
+        # Merge status not tied to any commit are kept
+        req.merge_status_target = None
+        req.merge_status_head = None
+        self.session.commit()
+        self.assertEqual(
+            pagure.lib.git.get_merge_status(self.session, req), 'FFORWARD')
+        self.assertEqual(merge.call_count, 3)
+
+    def test_merge_pull_request_in_place(self):
+        """ Test computing the merge status of a pull-request without
+        cloning the repos. """
+        tests.create_projects(self.session)
+        project = pagure.lib.query.get_authorized_project(self.session, 'test')
+        repo, commit, commits = self._create_merge_repos()
+        commit('master', [commits['base']], README='readme\n')
+
+        req = pagure.lib.query.new_pull_request(
+            session=self.session,
+            repo_from=project,
+            branch_from='feature',
+            repo_to=project,
+            branch_to='master',
+            title='test pull-request',
+            user='pingou',
+        )
+        self.session.commit()
+
+        with patch('pagure.lib.git.TemporaryClone') as clone:
+            output = pagure.lib.git.merge_pull_request(
+                self.session, req, username=None, domerge=False)
+            self.assertFalse(clone.called)
+        self.assertEqual(output, 'MERGE')
+        self.assertEqual(req.merge_status, 'MERGE')
+        self.assertEqual(
+            req.merge_status_target,
+            repo.lookup_reference('refs/heads/master').target.hex)
+        self.assertEqual(req.merge_status_head, commits['feature'])
+        self.assertEqual(req.commit_stop, commits['feature'])
+
     def get_author_email(self):
         """ Test the get_author_email method of pagure.lib.git. """
 
@@ -3016,6 +3271,93 @@ index 0000000..60f7480
             )
         )
 
+    def _fast_fork(self, mode):
+        """ Fork the project test into the project test2 with the given
+        mode and return their repositories. """
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+        fork = pagure.lib.query.get_authorized_project(self.session, 'test2')
+        gitrepo = repo.repopath('main')
+        tests.add_content_git_repo(gitrepo, branch='master')
+        tests.add_content_git_repo(gitrepo, branch='feature')
+        pygit2.init_repository(fork.repopath('main'), bare=True)
+
+        pagure.lib.git.fast_fork_repo(repo, fork, mode)
+        return (
+            pygit2.Repository(gitrepo),
+            pygit2.Repository(fork.repopath('main')),
+        )
+
+    def test_fast_fork_repo_hardlink(self):
+        """ Test forking a repository hardlinking its objects. """
+        parent, fork = self._fast_fork('hardlink')
+        self.assertEqual(
+            sorted(fork.listall_branches()), ['feature', 'master'])
+        for branch in ['master', 'feature']:
+            target = parent.lookup_branch(branch).target
+            self.assertEqual(fork.lookup_branch(branch).target, target)
+            self.assertIn(target, fork)
+        self.assertEqual(fork.head.shorthand, 'master')
+        self.assertFalse(os.path.exists(os.path.join(
+            fork.path, 'objects', 'info', 'alternates')))
+        links = [
+            os.stat(os.path.join(root, filename)).st_nlink
+            for root, _, files in os.walk(os.path.join(fork.path, 'objects'))
+            for filename in files
+        ]
+        self.assertTrue(links)
+        self.assertEqual(set(links), set([2]))
+
+        # The objects are still there once the parent removed
+        shutil.rmtree(parent.path)
+        fork = pygit2.Repository(fork.path)
+        self.assertEqual(
+            fork.revparse_single('feature').tree['sources'].name, 'sources')
+
+    def test_fast_fork_repo_alternates(self):
+        """ Test forking a repository borrowing its objects. """
+        parent, fork = self._fast_fork('alternates')
+        self.assertEqual(
+            sorted(fork.listall_branches()), ['feature', 'master'])
+        with open(os.path.join(
+                fork.path, 'objects', 'info', 'alternates')) as stream:
+            self.assertEqual(
+                stream.read().strip(),
+                os.path.abspath(os.path.join(parent.path, 'objects')))
+        self.assertEqual(
+            pygit2.Repository(parent.path).config['gc.pruneExpire'],
+            'never')
+        target = parent.lookup_branch('feature').target
+        self.assertIn(target, fork)
+
+        # Dissociating the fork copies the objects it uses
+        self.assertTrue(pagure.lib.git.dissociate_repo(fork.path))
+        self.assertFalse(pagure.lib.git.dissociate_repo(fork.path))
+        shutil.rmtree(parent.path)
+        fork = pygit2.Repository(fork.path)
+        self.assertIn(target, fork)
+        self.assertEqual(
+            fork.revparse_single('feature').tree['sources'].name, 'sources')
+
+    def test_dissociate_forks(self):
+        """ Test that deleting a project dissociates its forks. """
+        parent, fork = self._fast_fork('alternates')
+        project = pagure.lib.query.get_authorized_project(
+            self.session, 'test')
+        fork_project = pagure.lib.query.get_authorized_project(
+            self.session, 'test2')
+        fork_project.parent_id = project.id
+        self.session.add(fork_project)
+        self.session.commit()
+
+        pagure.lib.git.delete_project_repos(project)
+        self.assertFalse(os.path.exists(parent.path))
+        self.assertFalse(os.path.exists(os.path.join(
+            fork.path, 'objects', 'info', 'alternates')))
+        fork = pygit2.Repository(fork.path)
+        self.assertEqual(
+            fork.revparse_single('master').tree['sources'].name, 'sources')
+
 
 class PagureLibGitCommitToPatchtests(tests.Modeltests):
     """ Tests for pagure.lib.git """
@@ -126,8 +126,7 @@ class PagureLibGitoliteConfigtests(tests.Modeltests):
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf, 'r') as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -163,8 +162,7 @@ class PagureLibGitoliteConfigtests(tests.Modeltests):
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
         self.assertEqual(data, '')
 
     def test_write_gitolite_pre_post_project_1(self):
@@ -184,8 +182,7 @@ class PagureLibGitoliteConfigtests(tests.Modeltests):
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -224,8 +221,7 @@ class PagureLibGitoliteConfigtests(tests.Modeltests):
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -291,8 +287,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -300,50 +295,50 @@ repo requests/test
 @group2 = threebean puiterwijk kevin pingou
 
 # end of header
-repo test2
+repo test
   R   = @all
+  RW+ = foo
   RW+ = pingou
 
-repo docs/test2
+repo docs/test
   R   = @all
+  RW+ = foo
   RW+ = pingou
 
-repo tickets/test2
+repo tickets/test
+  RW+ = foo
   RW+ = pingou
 
-repo requests/test2
+repo requests/test
+  RW+ = foo
   RW+ = pingou
 
-repo somenamespace/test3
+repo test2
   R   = @all
   RW+ = pingou
 
-repo docs/somenamespace/test3
+repo docs/test2
   R   = @all
   RW+ = pingou
 
-repo tickets/somenamespace/test3
+repo tickets/test2
   RW+ = pingou
 
-repo requests/somenamespace/test3
+repo requests/test2
   RW+ = pingou
 
-repo test
+repo somenamespace/test3
   R   = @all
-  RW+ = foo
   RW+ = pingou
 
-repo docs/test
+repo docs/somenamespace/test3
   R   = @all
-  RW+ = foo
   RW+ = pingou
 
-repo tickets/test
-  RW+ = foo
+repo tickets/somenamespace/test3
   RW+ = pingou
 
-repo requests/test
-  RW+ = foo
+repo requests/somenamespace/test3
   RW+ = pingou
 
 # end of body
@@ -355,6 +350,84 @@ repo requests/test
         #print data
         self.assertEqual(data, exp)
 
+    def test_write_gitolite_project_fragments(self):
+        """ Test that the configuration of each project is stored and only
+        the one of the project updated is re-generated. """
+
+        # Re-generate the gitolite config for all the projects
+        self.test_write_gitolite_pre_post_project_1()
+        fragments = '%s.d' % self.outputconf
+        self.assertEqual(
+            sorted(os.listdir(fragments)), ['1.conf', '2.conf', '3.conf'])
+
+        # Make the stored configuration of test2 outdated, it is not read
+        # nor re-generated when updating the configuration of test
+        with open(os.path.join(fragments, '2.conf'), 'w') as stream:
+            stream.write('repo test2\n  RW+ = foo\n\n')
+        with open(self.outputconf) as stream:
+            config = stream.read()
+        self.assertIn('include "test_gitolite.conf.d/*.conf"\n', config)
+
+        project = pagure.lib.query._get_project(self.session, 'test')
+        project.private = True
+        project.name = 'renamed'
+        self.session.add(project)
+        self.session.commit()
+
+        helper = pagure.lib.git_auth.get_git_auth_helper('gitolite3')
+        helper.write_gitolite_acls(
+            self.session,
+            self.outputconf,
+            project=project,
+            preconf=self.preconf,
+            postconf=self.postconf
+        )
+
+        # Only the configuration of the project was re-generated
+        with open(self.outputconf) as stream:
+            self.assertEqual(stream.read(), config)
+        with open(os.path.join(fragments, '1.conf')) as stream:
+            data = stream.read()
+        exp = """repo renamed
+  RW+ = pingou
+
+repo docs/renamed
+  RW+ = pingou
+
+repo tickets/renamed
+  RW+ = pingou
+
+repo requests/renamed
+  RW+ = pingou
+
+"""
+        self.assertEqual(data, exp)
+        with open(os.path.join(fragments, '2.conf')) as stream:
+            self.assertEqual(stream.read(), 'repo test2\n  RW+ = foo\n\n')
+
+        # Removing the project only removes its configuration
+        with patch.dict(
+                'pagure.config.config', {'GITOLITE_CONFIG': self.outputconf}):
+            helper.remove_acls(self.session, project)
+        with open(self.outputconf) as stream:
+            self.assertEqual(stream.read(), config)
+        self.assertEqual(
+            sorted(os.listdir(fragments)), ['2.conf', '3.conf'])
+
+        # Re-generating the config of all projects drops the outdated one
+        with open(os.path.join(fragments, '42.conf'), 'w') as stream:
+            stream.write('repo test42\n  RW+ = foo\n\n')
+        helper.write_gitolite_acls(
+            self.session,
+            self.outputconf,
+            project=-1,
+        )
+        self.assertEqual(
+            sorted(os.listdir(fragments)), ['1.conf', '2.conf', '3.conf'])
+        data = tests.read_gitolite_config(self.outputconf)
+        self.assertNotIn('test42', data)
+        self.assertIn('repo test2\n  R   = @all\n  RW+ = pingou\n', data)
+
     @patch.dict('pagure.config.config',
                 {'ENABLE_DOCS': False, 'ENABLE_TICKETS': False})
     def test_write_gitolite_disabled_docs_tickets(self):
@@ -387,8 +460,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = """repo test
   R   = @all
@@ -498,8 +570,7 @@ class PagureLibGitoliteGroupConfigtests(tests.Modeltests):
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -550,8 +621,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -602,8 +672,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -668,8 +737,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -681,51 +749,51 @@ repo requests/test
 @grp2  = foo
 # end of groups
 
-repo test2
+repo test
   R   = @all
   RW+ = pingou
+  RW+ = foo
 
-repo docs/test2
+repo docs/test
   R   = @all
   RW+ = pingou
+  RW+ = foo
 
-repo tickets/test2
+repo tickets/test
   RW+ = pingou
+  RW+ = foo
 
-repo requests/test2
+repo requests/test
   RW+ = pingou
+  RW+ = foo
 
-repo somenamespace/test3
+repo test2
   R   = @all
   RW+ = pingou
 
-repo docs/somenamespace/test3
+repo docs/test2
   R   = @all
   RW+ = pingou
 
-repo tickets/somenamespace/test3
+repo tickets/test2
   RW+ = pingou
 
-repo requests/somenamespace/test3
+repo requests/test2
   RW+ = pingou
 
-repo test
+repo somenamespace/test3
   R   = @all
   RW+ = pingou
-  RW+ = foo
 
-repo docs/test
+repo docs/somenamespace/test3
   R   = @all
   RW+ = pingou
-  RW+ = foo
 
-repo tickets/test
+repo tickets/somenamespace/test3
   RW+ = pingou
-  RW+ = foo
 
-repo requests/test
+repo requests/somenamespace/test3
   RW+ = pingou
-  RW+ = foo
 
 # end of body
 # end of generated configuration
@@ -761,8 +829,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = r"""# this is a header that is manually added
 
@@ -819,8 +886,7 @@ repo requests/test
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = """@grp  = pingou
 @grp2  = foo
@@ -887,8 +953,7 @@ repo requests/somenamespace/test3
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = """@grp  = pingou
 @grp2  = foo
@@ -908,8 +973,7 @@ repo requests/somenamespace/test3
 
         helper.remove_acls(self.session, project=project)
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = """@grp  = pingou
 @grp2  = foo
@@ -965,8 +1029,7 @@ repo requests/somenamespace/test3
         )
         self.assertTrue(os.path.exists(self.outputconf))
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         exp = """@grp  = pingou
 @grp2  = foo
@@ -989,8 +1052,7 @@ repo requests/somenamespace/test3
             project=None
         )
 
-        with open(self.outputconf) as stream:
-            data = stream.read()
+        data = tests.read_gitolite_config(self.outputconf)
 
         self.assertEqual(data, exp)
 
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals, print_function
+
+import io
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+import six
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.hook_daemon
+import tests
+
+
+def fake_run_hook_file(hooktype):
+    """ Hook echoing its input and environment and failing. """
+    print('%s: %s %s' % (
+        hooktype, sys.stdin.read().strip(), os.environ['GL_USER']))
+    raise SystemExit(3)
+
+
+@unittest.skipIf(
+    six.PY2, 'The hook daemon relies on sendmsg which is only in python 3')
+class PagureLibHookDaemontests(tests.SimplePagureTest):
+    """ Tests for pagure.lib.hook_daemon """
+
+    def setUp(self):
+        """ Start the hook daemon in a thread. """
+        super(PagureLibHookDaemontests, self).setUp()
+        self.socket_path = os.path.join(self.path, 'hookd.sock')
+        self.server = pagure.lib.hook_daemon.HookDaemon(
+            self.socket_path, pagure.lib.hook_daemon.HookRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        super(PagureLibHookDaemontests, self).tearDown()
+
+    def _forward_hook(self, stdin, socket_path):
+        """ Forward the hook with the given stdin and return its exit code
+        and its output. """
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, stdin.encode('utf-8'))
+        os.close(write_fd)
+        output = os.path.join(self.path, 'output')
+        out_fd = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        saved_fds = [os.dup(0), os.dup(1)]
+        sys.stdout.flush()
+        os.dup2(read_fd, 0)
+        os.dup2(out_fd, 1)
+        try:
+            exitcode = pagure.lib.hook_daemon.forward_hook(
+                'post-receive', socket_path=socket_path)
+        finally:
+            os.dup2(saved_fds[0], 0)
+            os.dup2(saved_fds[1], 1)
+            for fd in saved_fds + [read_fd, out_fd]:
+                os.close(fd)
+        with io.open(output, encoding='utf-8') as stream:
+            return exitcode, stream.read()
+
+    @patch('pagure.hooks.run_hook_file', fake_run_hook_file)
+    @patch.dict('os.environ', {'GL_USER': 'pingou'})
+    def test_forward_hook(self):
+        """ Test running a hook in the daemon. """
+        exitcode, output = self._forward_hook(
+            'oldrev newrev refs/heads/master', self.socket_path)
+        self.assertEqual(exitcode, 3)
+        self.assertEqual(
+            output, 'post-receive: oldrev newrev refs/heads/master pingou\n')
+
+    def test_forward_hook_no_daemon(self):
+        """ Test forwarding a hook when the daemon is not running. """
+        exitcode, output = self._forward_hook(
+            '', os.path.join(self.path, 'nosuchdaemon.sock'))
+        self.assertIsNone(exitcode)
+        self.assertEqual(output, '')
+
+    def test_import_standard_library_only(self):
+        """ Test that importing the module, as the hookrunner script does,
+        does not load any dependency of pagure. """
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys; import pagure.lib.hook_daemon; '
+            'print(" ".join(sorted(sys.modules)))'],
+            cwd=os.path.join(os.path.dirname(__file__), '..'))
+        modules = output.decode('utf-8').split()
+        for dependency in ('six', 'flask', 'sqlalchemy', 'pygit2'):
+            self.assertNotIn(dependency, modules)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -170,7 +170,7 @@ class PagureLibNotifytests(tests.Modeltests):
         out = pagure.lib.notify._get_emails_for_obj(iss)
         self.assertEqual(out, exp)
 
-    @patch('pagure.lib.notify.smtplib.SMTP')
+    @patch('pagure.lib.email_delivery.smtplib.SMTP')
     def test_get_emails_for_obj_pr(self, mock_smtp):
         """ Test the _get_emails_for_obj method from pagure.lib.notify. """
         mock_smtp.return_value = MagicMock()
@@ -248,7 +248,7 @@ class PagureLibNotifytests(tests.Modeltests):
         out = pagure.lib.notify._get_emails_for_obj(req)
         self.assertEqual(out, exp)
 
-    @patch('pagure.lib.notify.smtplib.SMTP')
+    @patch('pagure.lib.email_delivery.smtplib.SMTP')
     def test_get_emails_for_obj_pr_watching_project(self, mock_smtp):
         """ Test the _get_emails_for_obj method from pagure.lib.notify. """
         mock_smtp.return_value = MagicMock()
@@ -407,7 +407,7 @@ class PagureLibNotifytests(tests.Modeltests):
     @patch.dict(
         'pagure.config.config',
         {'EVENTSOURCE_SOURCE': 'localhost.localdomain'})
-    @patch('pagure.lib.notify.smtplib.SMTP')
+    @patch('pagure.lib.email_delivery.smtplib.SMTP')
     def test_send_email(self, mock_smtp):
         """ Test the send_email method from pagure.lib.notify. """
         mock_smtp.return_value = MagicMock()
@@ -492,7 +492,7 @@ RW1haWwgY29udGVudA==
         self.assertEqual(email.as_string(), exp)
 
     @patch.dict('pagure.config.config', {'EVENTSOURCE_SOURCE': None})
-    @patch('pagure.lib.notify.smtplib.SMTP')
+    @patch('pagure.lib.email_delivery.smtplib.SMTP')
     def test_send_email_no_reply_to(self, mock_smtp):
         """ Test the send_email method from pagure.lib.notify when there
         should not be a Reply-To header even if mail_id is defined. """
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import unittest
+import sys
+import os
+
+import pygit2
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.pr_diff_cache
+import pagure.lib.query
+import pagure.ui.filters
+import tests
+
+
+class PagureLibPrDiffCachetests(tests.Modeltests):
+    """ Tests for pagure.lib.pr_diff_cache """
+
+    def setUp(self):
+        """ Create a git repo with two commits and a pull-request. """
+        super(PagureLibPrDiffCachetests, self).setUp()
+
+        tests.create_projects(self.session)
+        self.project = pagure.lib.query.get_authorized_project(
+            self.session, 'test')
+        gitrepo = os.path.join(self.path, 'repos', 'test.git')
+        self.repo = pygit2.init_repository(gitrepo, bare=True)
+        author = pygit2.Signature('Alice', 'alice@authors.tld', 1514764800, 0)
+
+        builder = self.repo.TreeBuilder()
+        for filename, content in [
+                ('sources', 'foo\nbar\n' * 20),
+                ('README', 'readme\n')]:
+            builder.insert(
+                filename, self.repo.create_blob(content.encode('utf-8')),
+                pygit2.GIT_FILEMODE_BLOB)
+        first = self.repo.create_commit(
+            'refs/heads/master', author, author, 'First', builder.write(), [])
+
+        # Rename the sources and edit the README
+        builder = self.repo.TreeBuilder(self.repo[first].tree)
+        builder.remove('sources')
+        builder.insert(
+            'sources.txt',
+            self.repo.create_blob(('foo\nbar\n' * 20 + 'baz\n').encode(
+                'utf-8')),
+            pygit2.GIT_FILEMODE_BLOB)
+        builder.insert(
+            'README', self.repo.create_blob(b'README\n'),
+            pygit2.GIT_FILEMODE_BLOB)
+        self.second = self.repo.create_commit(
+            'refs/heads/feature', author, author, 'Second', builder.write(),
+            [first])
+
+        self.request = pagure.lib.query.new_pull_request(
+            session=self.session,
+            repo_from=self.project,
+            branch_from='feature',
+            repo_to=self.project,
+            branch_to='master',
+            title='test pull-request',
+            user='pingou',
+        )
+        self.request.commit_start = self.second.hex
+        self.request.commit_stop = self.second.hex
+        self.session.commit()
+
+    def get_diff(self):
+        return self.repo.diff(
+            self.repo.revparse_single('master'),
+            self.repo.revparse_single('feature'))
+
+    def test_get_diff(self):
+        """ Test the diff is only computed once. """
+        commits = [self.repo[self.second]]
+        patches = pagure.lib.pr_diff_cache.get_diff(
+            self.request, self.repo, commits)
+        self.assertEqual(
+            [(patch.old_file_path, patch.new_file_path, patch.status)
+             for patch in patches],
+            [('README', 'README', 'M'), ('sources', 'sources.txt', 'R')])
+        self.assertEqual(
+            pagure.lib.pr_diff_cache.get_diff_stats(patches),
+            {
+                'README': {
+                    'status': 'M', 'old_path': 'README',
+                    'lines_added': 1, 'lines_removed': 1},
+                'sources.txt': {
+                    'status': 'R', 'old_path': 'sources',
+                    'lines_added': 1, 'lines_removed': 0},
+            }
+        )
+
+        # Retrieved from the cache, without computing the diff
+        with patch('pagure.lib.git.get_commits_diff') as get_commits_diff:
+            cached = pagure.lib.pr_diff_cache.get_diff(
+                self.request, self.repo, commits)
+            self.assertFalse(get_commits_diff.called)
+        self.assertEqual(
+            [patch.to_json() for patch in cached],
+            [patch.to_json() for patch in patches])
+        self.assertIsInstance(cached[0].new_id, pygit2.Oid)
+
+        # The target branch moved
+        self.repo.create_reference(
+            'refs/heads/master', self.second, force=True)
+        with patch('pagure.lib.pr_diff_cache.store_diff') as store:
+            pagure.lib.pr_diff_cache.get_diff(
+                self.request, self.repo, commits)
+            self.assertTrue(store.called)
+
+        self.assertIsNone(
+            pagure.lib.pr_diff_cache.get_diff(self.request, self.repo, []))
+
+    def test_cached_patch_rendering(self):
+        """ Test the cached patches are rendered as the pygit2 ones. """
+        diff = self.get_diff()
+        diff.find_similar()
+        patches = pagure.lib.pr_diff_cache.get_diff(
+            self.request, self.repo, [self.repo[self.second]])
+        for original, cached in zip(diff, patches):
+            self.assertEqual(
+                pagure.ui.filters.patch_to_diff(cached),
+                pagure.ui.filters.patch_to_diff(original))
+            self.assertEqual(cached.new_id, original.delta.new_file.id)
+            self.assertEqual(cached.line_stats, original.line_stats)
+
+    def test_get_comments_index(self):
+        """ Test indexing the inline comments of a pull-request. """
+        for line, date in [(3, 2), (3, 1), (5, 3)]:
+            pagure.lib.query.add_pull_request_comment(
+                session=self.session,
+                request=self.request,
+                commit=self.second.hex,
+                tree_id=None,
+                filename='README',
+                row=line,
+                comment='Comment on line %s' % line,
+                user='pingou',
+            )
+            self.request.comments[-1].date_created = datetime.datetime(
+                2018, 1, date)
+        pagure.lib.query.add_pull_request_comment(
+            session=self.session,
+            request=self.request,
+            commit=None,
+            tree_id=None,
+            filename=None,
+            row=None,
+            comment='Global comment',
+            user='pingou',
+        )
+        self.session.commit()
+
+        index = pagure.lib.pr_diff_cache.get_comments_index(self.request)
+        self.assertEqual(list(index), [(self.second.hex, 'README')])
+        lines = index[(self.second.hex, 'README')]
+        self.assertEqual(sorted(lines), [3, 5])
+        self.assertEqual(
+            [comment.date_created.day for comment in lines[3]], [1, 2])
+
+    def test_format_loc_anchors(self):
+        """ Test the line anchors of the files of a pull-request use the
+        index of the file, with or without comments indexed. """
+        with self.app.application.app_context():
+            for index in [1, 2]:
+                output = pagure.ui.filters.format_loc(
+                    'readme', commit=self.second, filename='README',
+                    prequest=self.request, index=index)
+                self.assertIn('<a id="%s_1" href="#%s_1"' % (index, index),
+                              output)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
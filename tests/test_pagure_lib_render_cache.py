@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import flask
+from mock import patch, MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.query
+import pagure.lib.render_cache
+import tests
+
+
+class PagureLibRenderCachetests(tests.SimplePagureTest):
+    """ Tests for pagure.lib.render_cache """
+
+    def test_memory_cache(self):
+        """ Test the LRU eviction and the expiration of the entries. """
+        cache = pagure.lib.render_cache.MemoryCache(2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        self.assertEqual(cache.get('a'), 'A')
+        cache.set('c', 'C')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.get('c'), 'C')
+
+        with patch('time.time', MagicMock(return_value=0)):
+            cache.set('d', 'D', ttl=10)
+        with patch('time.time', MagicMock(return_value=9)):
+            self.assertEqual(cache.get('d'), 'D')
+        with patch('time.time', MagicMock(return_value=11)):
+            self.assertIsNone(cache.get('d'))
+
+    def test_tiered_cache(self):
+        """ Test keeping the entries in memory in front of a shared cache.
+        """
+        local = pagure.lib.render_cache.MemoryCache(1)
+        shared = pagure.lib.render_cache.MemoryCache(10)
+        cache = pagure.lib.render_cache.TieredCache(local, shared, ttl=60)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        self.assertIsNone(local.get('a'))
+        self.assertEqual(shared.get('a'), 'A')
+
+        # The entries retrieved from the shared cache are kept in memory
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(local.get('a'), 'A')
+        self.assertIsNone(cache.get('c'))
+
+        cache.delete('a')
+        self.assertIsNone(local.get('a'))
+        self.assertIsNone(shared.get('a'))
+        self.assertEqual(cache.get('b'), 'B')
+
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(shared.get('b'))
+
+    def test_get_cache(self):
+        """ Test retrieving the cache configured. """
+        with patch.dict('pagure.config.config', {
+                'MARKDOWN_CACHE_BACKEND': None}):
+            self.assertIsNone(
+                pagure.lib.render_cache.get_cache('MARKDOWN'))
+        with patch.dict('pagure.config.config', {
+                'MARKDOWN_CACHE_BACKEND': 'memory',
+                'MARKDOWN_CACHE_SIZE': 5}):
+            cache = pagure.lib.render_cache.get_cache('MARKDOWN')
+            self.assertEqual(cache.size, 5)
+            self.assertIs(
+                pagure.lib.render_cache.get_cache('MARKDOWN'), cache)
+        pagure.lib.render_cache.reset()
+        with patch.dict('pagure.config.config', {
+                'MARKDOWN_CACHE_BACKEND': 'tiered',
+                'MARKDOWN_CACHE_SIZE': 5}):
+            cache = pagure.lib.render_cache.get_cache('MARKDOWN')
+            self.assertEqual(cache.local.size, 5)
+            self.assertEqual(cache.shared.prefix, 'pagure:markdown:')
+
+    @patch('pagure.lib.query._convert_markdown')
+    def test_text2markdown_cached(self, convert):
+        """ Test that the html generated from markdown is cached. """
+        convert.return_value = '<p>Hello <script>world</script></p>'
+        self.assertEqual(
+            pagure.lib.query.text2markdown('Hello', extended=False),
+            '<p>Hello &lt;script&gt;world&lt;/script&gt;</p>')
+        self.assertEqual(
+            pagure.lib.query.text2markdown('Hello', extended=False),
+            '<p>Hello &lt;script&gt;world&lt;/script&gt;</p>')
+        self.assertEqual(convert.call_count, 1)
+
+        # The READMEs are rendered with different extensions
+        pagure.lib.query.text2markdown(
+            'Hello', extended=False, readme=True)
+        self.assertEqual(convert.call_count, 2)
+
+        # The html depends on the project viewed when using our extensions
+        with self._app.test_request_context('/test/issue/1'):
+            flask.g.session = self.session
+            pagure.lib.query.text2markdown('Hello')
+            pagure.lib.query.text2markdown('Hello')
+        self.assertEqual(convert.call_count, 3)
+        with self._app.test_request_context('/test2/issue/1'):
+            flask.g.session = self.session
+            pagure.lib.query.text2markdown('Hello')
+        self.assertEqual(convert.call_count, 4)
+
+        # But cannot be cached outside of a request
+        pagure.lib.query.text2markdown('Hello')
+        pagure.lib.query.text2markdown('Hello')
+        self.assertEqual(convert.call_count, 6)
+
+        # Nor when the project viewed cannot be found from the url
+        with self._app.test_request_context('/fork/pingou'):
+            flask.g.session = self.session
+            pagure.lib.query.text2markdown('Hello')
+            pagure.lib.query.text2markdown('Hello')
+        self.assertEqual(convert.call_count, 8)
+
+        # Failed conversions are not cached
+        convert.side_effect = ValueError('Invalid markdown')
+        self.assertEqual(
+            pagure.lib.query.text2markdown('Oops', extended=False), 'Oops')
+        pagure.lib.query.text2markdown('Oops', extended=False)
+        self.assertEqual(convert.call_count, 10)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
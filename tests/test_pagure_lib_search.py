@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.query
+import pagure.lib.search
+from pagure.lib import model
+from pagure.lib.search import Clause
+import tests
+
+
+@patch.dict('pagure.config.config', {'SEARCH_INDEX_BACKEND': 'terms'})
+class PagureLibSearchtests(tests.Modeltests):
+    """ Tests for pagure.lib.search """
+
+    def setUp(self):
+        """ Create a project with a few issues. """
+        super(PagureLibSearchtests, self).setUp()
+
+        tests.create_projects(self.session)
+        self.repo = pagure.lib.query.get_authorized_project(
+            self.session, 'test')
+        with patch.dict(
+                'pagure.config.config', {'SEARCH_INDEX_BACKEND': 'terms'}):
+            for title, content in [
+                    ('Crash when saving', 'The server returns an error'),
+                    ('Add a dark theme', 'The theme should be dark, really'),
+                    ('Translations', 'Saving the translations crashes'),
+            ]:
+                pagure.lib.query.new_issue(
+                    session=self.session,
+                    repo=self.repo,
+                    title=title,
+                    content=content,
+                    user='pingou',
+                )
+                self.session.commit()
+
+    def _search(self, pattern, **kwargs):
+        issues = pagure.lib.query.search_issues(
+            self.session, repo=self.repo, search_pattern=pattern, **kwargs)
+        return [issue.id for issue in issues]
+
+    def test_parse_pattern(self):
+        """ Test splitting the search patterns into clauses. """
+        self.assertEqual(
+            pagure.lib.search.parse_pattern(
+                'Foo "bar baz" title:crash* content:"a-b"'),
+            [
+                Clause(['foo']),
+                Clause(['bar', 'baz']),
+                Clause(['crash'], field='title', prefix=True),
+                Clause(['a', 'b'], field='content'),
+            ]
+        )
+        self.assertEqual(pagure.lib.search.parse_pattern('... !'), [])
+        self.assertIsNone(pagure.lib.search.parse_pattern('*PR'))
+
+    def test_tokenize_search_string(self):
+        """ Test that the phrases and search fields are kept when the
+        full-text search is enabled. """
+        self.assertEqual(
+            pagure.lib.query.tokenize_search_string(
+                'test:"key with spaces" "foo bar" title:"a b" baz'),
+            ({'test': 'key with spaces'}, '"foo bar" title:"a b" baz')
+        )
+
+    def test_index_issues(self):
+        """ Test that the issues are indexed as they are created and
+        commented on. """
+        docs = self.session.query(model.SearchDocument).order_by(
+            model.SearchDocument.id).all()
+        self.assertEqual(len(docs), 3)
+        self.assertEqual(docs[0].title, ' crash when saving ')
+        self.assertEqual(docs[0].project_id, self.repo.id)
+
+        terms = dict(
+            (term.term, (term.title_count, term.content_count))
+            for term in docs[1].terms)
+        self.assertEqual(terms['dark'], (1, 1))
+        self.assertEqual(terms['theme'], (1, 1))
+        self.assertEqual(terms['really'], (0, 1))
+
+        self.assertEqual(self._search('server'), [1])
+        issue = pagure.lib.query.search_issues(
+            self.session, repo=self.repo, issueid=2)
+        pagure.lib.query.add_issue_comment(
+            self.session, issue, 'Same with the server', user='foo',
+            notify=False)
+        self.session.commit()
+        self.assertEqual(self._search('server'), [2, 1])
+
+        # Editing the title re-indexes the issue
+        issue.title = 'Add a light theme'
+        self.session.add(issue)
+        self.session.commit()
+        self.assertEqual(self._search('title:light'), [2])
+        self.assertEqual(self._search('title:dark'), [])
+
+    def test_search_issues(self):
+        """ Test searching the issues via the index. """
+        self.assertEqual(self._search('crash'), [1])
+        self.assertEqual(self._search('crash*'), [3, 1])
+        self.assertEqual(self._search('saving crash*'), [3, 1])
+        self.assertEqual(self._search('"really dark"'), [])
+        self.assertEqual(self._search('"dark really"'), [2])
+        self.assertEqual(self._search('title:saving'), [1])
+        self.assertEqual(self._search('content:saving'), [3])
+        self.assertEqual(self._search('nothing'), [])
+        self.assertEqual(
+            pagure.lib.query.search_issues(
+                self.session, repo=self.repo, search_pattern='saving',
+                count=True),
+            2)
+
+    @patch.dict('pagure.config.config', {'SEARCH_INDEX_BACKEND': None})
+    def test_search_issues_disabled(self):
+        """ Test that only the titles are searched when the index is
+        disabled. """
+        self.assertEqual(self._search('server'), [])
+        self.assertEqual(self._search('Crash wh'), [1])
+
+    def test_search_issues_relevance(self):
+        """ Test ranking the issues found by relevance. """
+        self.assertEqual(
+            self._search('saving', order_key='relevance'), [1, 3])
+        self.assertEqual(
+            self._search('saving', order_key='relevance', order='asc'),
+            [3, 1])
+
+    def test_reindex(self):
+        """ Test re-indexing all the issues of a project. """
+        self.session.query(model.SearchTerm).delete()
+        self.session.query(model.SearchDocument).delete()
+        self.session.commit()
+        self.assertEqual(self._search('crash'), [])
+
+        self.assertEqual(
+            pagure.lib.search.reindex(self.session, project=self.repo), 3)
+        self.assertEqual(self._search('crash'), [1])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import sqlalchemy
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.query
+import pagure.lib.serializers
+import tests
+
+
+class PagureLibSerializerstests(tests.Modeltests):
+    """ Tests for pagure.lib.serializers """
+
+    def setUp(self):
+        """ Create a few projects, forks and pull-requests. """
+        super(PagureLibSerializerstests, self).setUp()
+
+        tests.create_projects(self.session)
+        self.repo = pagure.lib.query.get_authorized_project(
+            self.session, 'test')
+        self.fork = pagure.lib.query.get_authorized_project(
+            self.session, 'test2')
+        self.fork.parent_id = self.repo.id
+        self.fork.is_fork = True
+        self.session.add(self.fork)
+        self.session.commit()
+
+        for idx in range(2):
+            self._new_pull_request('PR #%s' % (idx + 1))
+
+    def _new_pull_request(self, title):
+        request = pagure.lib.query.new_pull_request(
+            self.session,
+            repo_from=self.fork,
+            branch_from='feature',
+            repo_to=self.repo,
+            branch_to='master',
+            title=title,
+            user='pingou',
+        )
+        pagure.lib.query.add_pull_request_comment(
+            self.session, request, commit=None, tree_id=None,
+            filename=None, row=None, comment='Comment on %s' % title,
+            user='foo')
+        self.session.commit()
+
+    def _count_queries(self, func):
+        engine = self.session.get_bind()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        self.session.expire_all()
+        sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+        try:
+            output = func()
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute', count)
+        return output, len(statements)
+
+    def test_pull_request(self):
+        """ Test that the serializer returns the same output as the models
+        and shares the users and projects. """
+        requests = pagure.lib.query.search_pull_requests(
+            self.session, project_id=self.repo.id, order='asc')
+        serializer = pagure.lib.serializers.Serializer(public=True, api=True)
+        output = [serializer.pull_request(request) for request in requests]
+        self.assertEqual(
+            output,
+            [request.to_json(public=True, api=True) for request in requests])
+
+        self.assertEqual(output[0]['title'], 'PR #1')
+        self.assertEqual(output[0]['repo_from']['parent']['name'], 'test')
+        self.assertEqual(
+            output[0]['comments'][0]['comment'], 'Comment on PR #1')
+        self.assertIs(output[0]['project'], output[1]['project'])
+        self.assertIs(output[0]['repo_from']['parent'], output[0]['project'])
+        self.assertIs(output[0]['user'], output[1]['user'])
+        self.assertIs(output[0]['user'], output[0]['project']['user'])
+
+    def test_pull_request_compact(self):
+        """ Test serializing the projects nested as stubs. """
+        request = pagure.lib.query.search_pull_requests(
+            self.session, project_id=self.repo.id, requestid=1)
+        serializer = pagure.lib.serializers.Serializer(
+            public=True, api=True, compact=True)
+        output = serializer.pull_request(request)
+        self.assertEqual(
+            output['project'],
+            {
+                'id': 1,
+                'name': 'test',
+                'namespace': None,
+                'fullname': 'test',
+                'url_path': 'test',
+            }
+        )
+        self.assertEqual(
+            output['repo_from'],
+            {
+                'id': 2,
+                'name': 'test2',
+                'namespace': None,
+                'fullname': 'forks/pingou/test2',
+                'url_path': 'fork/pingou/test2',
+            }
+        )
+        self.assertEqual(
+            output['user'], {'fullname': 'PY C', 'name': 'pingou'})
+
+    def test_project(self):
+        """ Test serializing projects, with their parent in full or as a
+        stub. """
+        output = pagure.lib.serializers.Serializer(public=True).project(
+            self.fork)
+        self.assertEqual(output, self.fork.to_json(public=True))
+        self.assertEqual(output['access_users'], {
+            'admin': [], 'commit': [], 'owner': ['pingou'], 'ticket': []})
+        self.assertEqual(output['parent']['name'], 'test')
+        self.assertIn('access_users', output['parent'])
+
+        output = pagure.lib.serializers.Serializer(
+            public=True, compact=True).project(self.fork)
+        self.assertIn('access_users', output)
+        self.assertEqual(output['parent']['fullname'], 'test')
+        self.assertNotIn('access_users', output['parent'])
+
+        # The settings and emails are only returned when not public
+        output = pagure.lib.serializers.Serializer().project(self.repo)
+        self.assertIn('settings', output)
+        self.assertEqual(output['user']['emails'], ['bar@pingou.com',
+                                                    'foo@pingou.com'])
+
+    def test_pull_request_load_plan(self):
+        """ Test that the number of queries does not depend on the number
+        of pull-requests serialized. """
+        def serialize(compact):
+            plan = pagure.lib.serializers.pull_request_load_plan(
+                compact=compact)
+            serializer = pagure.lib.serializers.Serializer(
+                public=True, api=True, compact=compact)
+            return [
+                serializer.pull_request(request)
+                for request in pagure.lib.query.search_pull_requests(
+                    self.session, project_id=self.repo.id, load_plan=plan)
+            ]
+
+        expected = serialize(False)
+        output, queries = self._count_queries(lambda: serialize(False))
+        self.assertEqual(output, expected)
+        stub_output, stub_queries = self._count_queries(
+            lambda: serialize(True))
+        self.assertLess(stub_queries, queries)
+
+        for idx in range(3):
+            self._new_pull_request('Other PR')
+
+        output, new_queries = self._count_queries(lambda: serialize(False))
+        self.assertEqual(len(output), 5)
+        self.assertEqual(new_queries, queries)
+        output, new_queries = self._count_queries(lambda: serialize(True))
+        self.assertEqual(new_queries, stub_queries)
+
+    def test_issue_load_plan(self):
+        """ Test serializing issues with their project. """
+        for idx in range(3):
+            pagure.lib.query.new_issue(
+                session=self.session, repo=self.repo, title='Issue',
+                content='content', user='foo', notify=False)
+        self.session.commit()
+
+        def serialize():
+            plan = pagure.lib.serializers.issue_load_plan(
+                with_project=True, compact=True)
+            serializer = pagure.lib.serializers.Serializer(
+                public=True, api=True, compact=True)
+            return [
+                serializer.issue(issue, with_project=True)
+                for issue in pagure.lib.query.search_issues(
+                    self.session, repo=self.repo, load_plan=plan)
+            ]
+
+        output, queries = self._count_queries(serialize)
+        self.assertEqual(len(output), 3)
+        self.assertEqual(output[0]['project']['fullname'], 'test')
+        self.assertIs(output[0]['project'], output[1]['project'])
+
+        pagure.lib.query.new_issue(
+            session=self.session, repo=self.repo, title='Issue',
+            content='content', user='pingou', notify=False)
+        self.session.commit()
+        output, new_queries = self._count_queries(serialize)
+        self.assertEqual(len(output), 4)
+        self.assertEqual(new_queries, queries)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -423,16 +423,16 @@ class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
 
         project = pagure.lib.query._get_project(self.session, 'test')
         call_wh.assert_called_once_with(
-            ANY, u'topic', {u'payload': [u'a', u'b', u'c']},
+            ANY, ANY, u'topic', {u'payload': [u'a', u'b', u'c']},
             [u'http://foo.com/api/flag', u'http://bar.org/bar']
         )
 
     @patch('time.time', MagicMock(return_value=2))
     @patch('uuid.uuid4', MagicMock(return_value='not_so_random'))
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_webhook_notification_no_webhook(self, post):
         """ Test the webhook_notification method. """
-        post.return_value = False
+        post.return_value = MagicMock(status_code=200)
 
         output = pagure.lib.tasks_services.webhook_notification(
             topic='topic',
@@ -468,7 +468,7 @@ class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
                     'X-Pagure-Topic': b'topic',
                     'Content-Type': 'application/json'
                 },
-                timeout=60
+                timeout=15
             ),
             call(
                 'http://foo.com/api/flag',
@@ -492,15 +492,30 @@ class PagureLibTaskServicesWithWebHooktests(tests.Modeltests):
                     'X-Pagure-Topic': b'topic',
                     'Content-Type': 'application/json'
                 },
-                timeout=60
+                timeout=15
             )
         ]
 
         print(post.mock_calls)
 
+        # The URLs are called in parallel, so in any order
         self.assertEqual(
-            calls,
-            post.mock_calls
+            sorted(calls, key=str),
+            sorted(post.call_args_list, key=str)
+        )
+
+        # The deliveries were recorded
+        deliveries = self.session.query(
+            pagure.lib.model.WebhookDelivery).order_by(
+            pagure.lib.model.WebhookDelivery.url).all()
+        self.assertEqual(
+            [(d.url, d.attempt, d.success, d.status_code, d.msg_id)
+             for d in deliveries],
+            [
+                ('http://bar.org/bar', 1, True, 200, '2018-not_so_random'),
+                ('http://foo.com/api/flag', 1, True, 200,
+                 '2018-not_so_random'),
+            ]
         )
 
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import pygit2
+from mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.query
+import pagure.ui.repo
+import tests
+
+
+@patch.dict('pagure.config.config', {'VIEW_CACHE_BACKEND': 'memory'})
+class PagureLibViewCachetests(tests.Modeltests):
+    """ Tests for pagure.lib.view_cache """
+
+    def setUp(self):
+        """ Create a project with some content. """
+        super(PagureLibViewCachetests, self).setUp()
+
+        tests.create_projects(self.session)
+        tests.create_projects_git(os.path.join(self.path, 'repos'), bare=True)
+        self.gitrepo = os.path.join(self.path, 'repos', 'test.git')
+        tests.add_content_git_repo(self.gitrepo)
+
+    @patch(
+        'pagure.ui.repo.get_preferred_readme',
+        wraps=pagure.ui.repo.get_preferred_readme)
+    def test_view_repo(self, get_readme):
+        """ Test that the front page of the projects is cached per commit
+        when viewed anonymously. """
+        output = self.app.get('/test')
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers['Cache-Control'], 'no-cache')
+        etag = output.headers['ETag']
+        html = output.get_data(as_text=True)
+        self.assertIn('<title>Overview - test - Pagure</title>', html)
+        self.assertEqual(get_readme.call_count, 1)
+
+        output = self.app.get('/test')
+        self.assertEqual(output.status_code, 200)
+        self.assertEqual(output.headers['ETag'], etag)
+        self.assertEqual(output.get_data(as_text=True), html)
+        self.assertEqual(get_readme.call_count, 1)
+
+        # The browsers having the page are told it did not change
+        output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 304)
+        self.assertEqual(output.get_data(as_text=True), '')
+
+        # The pages of the authenticated users are not cached
+        user = tests.FakeUser(username='pingou')
+        with tests.user_set(self.app.application, user):
+            output = self.app.get('/test', headers={'If-None-Match': etag})
+            self.assertEqual(output.status_code, 200)
+            self.assertNotIn('ETag', output.headers)
+        self.assertEqual(get_readme.call_count, 2)
+
+        # Pushing to the branch changes the page viewed
+        repo = pygit2.Repository(self.gitrepo)
+        head = repo[repo.head.target]
+        builder = repo.TreeBuilder(head.tree)
+        builder.insert(
+            'new_file', repo.create_blob(b'foo\n'), pygit2.GIT_FILEMODE_BLOB)
+        repo.create_commit(
+            'refs/heads/master', head.author, head.committer, 'New file',
+            builder.write(), [head.oid.hex])
+        output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+        self.assertEqual(get_readme.call_count, 3)
+
+        # So does a new issue, as the number of open issues is displayed
+        etag = output.headers['ETag']
+        pagure.lib.query.new_issue(
+            self.session,
+            pagure.lib.query.get_authorized_project(self.session, 'test'),
+            'Test issue', 'content', user='pingou')
+        self.session.commit()
+        output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+        # And starring the project
+        etag = output.headers['ETag']
+        pagure.lib.query.update_star_project(
+            self.session,
+            pagure.lib.query.get_authorized_project(self.session, 'test'),
+            '1', 'pingou')
+        self.session.commit()
+        output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+    def test_view_repo_version(self):
+        """ Test that the pages rendered by another version of pagure or of
+        its templates are not served. """
+        output = self.app.get('/test')
+        self.assertEqual(output.status_code, 200)
+        etag = output.headers['ETag']
+
+        with patch('pagure.__version__', '0.0.1'):
+            output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+        with patch.dict('pagure.config.config', {'VIEW_CACHE_VERSION': '2'}):
+            output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+        output = self.app.get('/test', headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 304)
+
+    @patch.dict('pagure.config.config', {'VIEW_CACHE_BACKEND': None})
+    def test_view_repo_disabled(self):
+        """ Test that nothing is cached when the cache is not configured.
+        """
+        output = self.app.get('/test')
+        self.assertEqual(output.status_code, 200)
+        self.assertNotIn('ETag', output.headers)
+
+    def test_view_tree_and_file(self):
+        """ Test that the trees and files are cached per commit and path.
+        """
+        commit = pygit2.Repository(self.gitrepo).head.target.hex
+
+        output = self.app.get('/test/tree/%s' % commit)
+        self.assertEqual(output.status_code, 200)
+        etag = output.headers['ETag']
+
+        output = self.app.get('/test/blob/%s/f/folder1' % commit)
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+        self.assertIn('folder2', output.get_data(as_text=True))
+        etag = output.headers['ETag']
+
+        output = self.app.get(
+            '/test/blob/%s/f/folder1' % commit,
+            headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 304)
+
+        output = self.app.get(
+            '/test/blob/%s/f/folder1/folder2' % commit,
+            headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+        output = self.app.get('/test/blob/%s/f/unknown' % commit)
+        self.assertEqual(output.status_code, 404)
+
+        # The branches are listed in the pages, so is a new one
+        output = self.app.get('/test/blob/%s/f/folder1' % commit)
+        self.assertEqual(output.status_code, 200)
+        etag = output.headers['ETag']
+        repo = pygit2.Repository(self.gitrepo)
+        repo.create_branch('feature', repo[repo.head.target])
+        output = self.app.get(
+            '/test/blob/%s/f/folder1' % commit,
+            headers={'If-None-Match': etag})
+        self.assertEqual(output.status_code, 200)
+        self.assertNotEqual(output.headers['ETag'], etag)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
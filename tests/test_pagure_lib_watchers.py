@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import unittest
+import sys
+import os
+
+import mock
+import sqlalchemy
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.model
+import pagure.lib.query
+import pagure.lib.render_cache
+import pagure.lib.watchers
+import tests
+
+
+@mock.patch(
+    'pagure.lib.git.update_git', mock.MagicMock(return_value=True))
+@mock.patch(
+    'pagure.lib.notify.send_email', mock.MagicMock(return_value=True))
+class PagureLibWatcherstests(tests.Modeltests):
+    """ Tests for pagure.lib.watchers """
+
+    def setUp(self):
+        """ Create a project with a group, a contributor and an issue. """
+        super(PagureLibWatcherstests, self).setUp()
+        pagure.lib.render_cache.reset()
+        self.addCleanup(pagure.lib.render_cache.reset)
+
+        tests.create_projects(self.session)
+        item = pagure.lib.model.User(
+            user='bar',
+            fullname='bar foo',
+            password='foo',
+            default_email='bar@bar.com',
+        )
+        self.session.add(item)
+        self.session.commit()
+
+        pagure.lib.query.add_group(
+            self.session,
+            group_name='grp',
+            display_name='grp group',
+            description=None,
+            group_type='bar',
+            user='pingou',
+            is_admin=False,
+            blacklist=[],
+        )
+        self.session.commit()
+
+        self.project = pagure.lib.query._get_project(self.session, 'test')
+        pagure.lib.query.add_group_to_project(
+            session=self.session,
+            project=self.project,
+            new_group='grp',
+            user='pingou',
+        )
+        pagure.lib.query.add_user_to_project(
+            self.session, self.project, new_user='foo', user='pingou',
+            access='ticket')
+        self.session.commit()
+
+        self.issue = pagure.lib.query.new_issue(
+            session=self.session,
+            repo=self.project,
+            title='test issue',
+            content='content test issue',
+            user='foo',
+        )
+        self.session.commit()
+
+    def _count_queries(self, func):
+        engine = self.session.get_bind()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        # Only count the queries retrieving the users
+        self.session.expire_all()
+        self.assertEqual(self.issue.project.name, 'test')
+        sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+        try:
+            output = func()
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute', count)
+        return output, len(statements)
+
+    def _participants(self):
+        return pagure.lib.watchers.get_participants(self.session, self.issue)
+
+    def test_get_participants(self):
+        """ Test retrieving the users related to an issue. """
+        pagure.lib.query.add_issue_comment(
+            self.session, self.issue, 'comment', user='bar', notify=False)
+        pagure.lib.query.set_watch_obj(self.session, 'pingou', self.issue,
+                                       False)
+        pagure.lib.query.update_watch_status(
+            self.session, self.project, 'bar', '2')
+        self.session.commit()
+
+        participants = self._participants()
+        self.assertEqual(
+            participants.owner,
+            pagure.lib.watchers.Recipient(1, 'pingou', 'bar@pingou.com'))
+        self.assertEqual(
+            [user.username for user in participants.users], ['foo'])
+        self.assertEqual(participants.committers, [])
+        self.assertEqual(
+            [user.username for user in participants.group_creators],
+            ['pingou'])
+        self.assertEqual(
+            [user.username for user in participants.group_members],
+            ['pingou'])
+        self.assertEqual(participants.author.username, 'foo')
+        self.assertIsNone(participants.assignee)
+        self.assertEqual(
+            [user.username for user in participants.commenters], ['bar'])
+        self.assertEqual(
+            [(user.username, watch) for user, watch in participants.watchers],
+            [('pingou', False)])
+        self.assertEqual(
+            [(user.email, issues, commits)
+             for user, issues, commits in participants.project_watchers],
+            [('bar@bar.com', False, True)])
+
+    def test_get_participants_queries(self):
+        """ Test that the number of queries does not depend on the number
+        of users related to the issue. """
+        _, queries = self._count_queries(self._participants)
+        self.assertEqual(queries, 2)
+
+        for username in ['pingou', 'bar']:
+            pagure.lib.query.add_issue_comment(
+                self.session, self.issue, 'comment', user=username,
+                notify=False)
+            pagure.lib.query.set_watch_obj(
+                self.session, username, self.issue, True)
+            pagure.lib.query.update_watch_status(
+                self.session, self.project, username, '3')
+        self.session.commit()
+
+        participants, queries = self._count_queries(self._participants)
+        self.assertEqual(queries, 2)
+        self.assertEqual(len(participants.commenters), 2)
+        self.assertEqual(len(participants.project_watchers), 2)
+
+    @mock.patch.dict('pagure.config.config', {
+        'WATCHERS_CACHE_BACKEND': 'memory'})
+    def test_project_cache(self):
+        """ Test that the users of the project are cached until they
+        change. """
+        _, queries = self._count_queries(self._participants)
+        participants, cached_queries = self._count_queries(
+            self._participants)
+        self.assertEqual(cached_queries, queries - 1)
+        self.assertEqual(
+            [user.username for user in participants.group_members],
+            ['pingou'])
+
+        # Adding a user to a group of the project drops its entry
+        group = pagure.lib.query.search_groups(
+            self.session, group_name='grp')
+        pagure.lib.query.add_user_to_group(
+            self.session, username='bar', group=group, user='pingou',
+            is_admin=False)
+        self.session.commit()
+        participants, new_queries = self._count_queries(self._participants)
+        self.assertEqual(new_queries, queries)
+        self.assertEqual(
+            sorted(user.username for user in participants.group_members),
+            ['bar', 'pingou'])
+
+        # So does watching the project
+        pagure.lib.query.update_watch_status(
+            self.session, self.project, 'bar', '1')
+        self.session.commit()
+        participants = self._participants()
+        self.assertEqual(
+            [user.username for user, _, _ in participants.project_watchers],
+            ['bar'])
+
+        # And removing a user from the project
+        project = pagure.lib.query._get_project(self.session, 'test')
+        project.users.remove(pagure.lib.query.get_user(self.session, 'foo'))
+        self.session.add(project)
+        self.session.commit()
+        self.assertEqual(self._participants().users, [])
+
+        # The changes rolled back are not kept either
+        pagure.lib.query.add_user_to_project(
+            self.session, project, new_user='bar', user='pingou')
+        self.session.flush()
+        self.assertEqual(
+            [user.username for user in self._participants().users], ['bar'])
+        self.session.rollback()
+        self.assertEqual(self._participants().users, [])
+
+    def test_project_cache_tiered(self):
+        """ Test that the users of the project kept in the memory of the
+        other processes are not used once they changed. """
+        shared = pagure.lib.render_cache.MemoryCache(10)
+        cache = pagure.lib.render_cache.TieredCache(
+            pagure.lib.render_cache.MemoryCache(10), shared)
+        other = pagure.lib.render_cache.TieredCache(
+            pagure.lib.render_cache.MemoryCache(10), shared)
+
+        # Another process caches the users of the project
+        with mock.patch(
+                'pagure.lib.render_cache.get_cache', return_value=other):
+            _, queries = self._count_queries(self._participants)
+            _, cached_queries = self._count_queries(self._participants)
+        self.assertEqual(cached_queries, queries - 1)
+
+        # This process changes them
+        with mock.patch(
+                'pagure.lib.render_cache.get_cache', return_value=cache):
+            project = pagure.lib.query._get_project(self.session, 'test')
+            project.users.remove(
+                pagure.lib.query.get_user(self.session, 'foo'))
+            self.session.add(project)
+            self.session.commit()
+
+        # The other process no longer uses the entry kept in its memory
+        with mock.patch(
+                'pagure.lib.render_cache.get_cache', return_value=other):
+            participants, new_queries = self._count_queries(
+                self._participants)
+            self.assertEqual(new_queries, queries)
+            self.assertEqual(participants.users, [])
+            _, cached_queries = self._count_queries(self._participants)
+            self.assertEqual(cached_queries, queries - 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+ (c) 2018 - Copyright Red Hat Inc
+
+ Authors:
+   Pierre-Yves Chibon <pingou@pingoured.fr>
+
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import os
+import sys
+import unittest
+
+import requests
+from mock import patch, MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.model
+import pagure.lib.query
+import pagure.lib.webhook_delivery
+import tests
+
+
+class PagureLibWebhookDeliverytests(tests.Modeltests):
+    """ Tests for pagure.lib.webhook_delivery """
+
+    def setUp(self):
+        """ Set up the environnment, ran before every tests. """
+        super(PagureLibWebhookDeliverytests, self).setUp()
+        tests.create_projects(self.session)
+        self.project = pagure.lib.query._get_project(self.session, 'test')
+        settings = self.project.settings
+        settings['Web-hooks'] = 'http://foo.com/api/flag\nhttp://bar.org/bar'
+        self.project.settings = settings
+        self.session.add(self.project)
+        self.session.commit()
+
+    def _deliver_all(self):
+        return pagure.lib.webhook_delivery.deliver_all(
+            self.session, self.project, 'topic', 'msg_id', '{}', {},
+            ['http://bar.org/bar', 'http://foo.com/api/flag'])
+
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_deliver_retries(self, post, sleep):
+        """ Test that failed deliveries are retried with a backoff. """
+
+        def _post(url, **kwargs):
+            if url == 'http://bar.org/bar':
+                return MagicMock(status_code=200)
+            if post.call_count < 4:
+                raise requests.exceptions.ConnectionError('Connection refused')
+            return MagicMock(status_code=502, __bool__=lambda self: False)
+
+        post.side_effect = _post
+        deliveries = self._deliver_all()
+
+        self.assertEqual(
+            sorted(
+                (d.url, d.attempt, d.success, d.status_code)
+                for d in deliveries),
+            [
+                ('http://bar.org/bar', 1, True, 200),
+                ('http://foo.com/api/flag', 1, False, None),
+                ('http://foo.com/api/flag', 2, False, None),
+                ('http://foo.com/api/flag', 3, False, 502),
+            ]
+        )
+        self.assertEqual(
+            [c[0][0] for c in sleep.call_args_list], [1, 2])
+
+        # Client errors are not retried
+        post.side_effect = None
+        post.return_value = MagicMock(
+            status_code=404, __bool__=lambda self: False)
+        deliveries = self._deliver_all()
+        self.assertEqual(
+            sorted((d.url, d.attempt, d.status_code) for d in deliveries),
+            [
+                ('http://bar.org/bar', 1, 404),
+                ('http://foo.com/api/flag', 1, 404),
+            ]
+        )
+
+    @patch.dict(
+        'pagure.config.config', {'WEBHOOK_CIRCUIT_BREAKER_THRESHOLD': 3})
+    @patch('time.sleep', MagicMock())
+    @patch('requests.Session.post')
+    def test_circuit_breaker(self, post):
+        """ Test that URLs failing repeatedly are no longer called. """
+        post.return_value = MagicMock(
+            status_code=500, __bool__=lambda self: False)
+        self._deliver_all()
+        self.assertEqual(post.call_count, 6)
+        self.assertEqual(
+            pagure.lib.webhook_delivery.get_disabled_urls(
+                self.session, self.project),
+            ['http://bar.org/bar', 'http://foo.com/api/flag'])
+
+        # No more calls while the circuit is open
+        post.reset_mock()
+        self.assertEqual(self._deliver_all(), [])
+        self.assertEqual(post.call_count, 0)
+
+        # Once the cooldown is over, the URLs are tried again
+        for delivery in self.session.query(
+                pagure.lib.model.WebhookDelivery):
+            delivery.date_created -= datetime.timedelta(hours=1)
+        self.session.commit()
+        post.return_value = MagicMock(status_code=200)
+        self.assertEqual(len(self._deliver_all()), 2)
+        self.assertEqual(
+            pagure.lib.webhook_delivery.get_disabled_urls(
+                self.session, self.project), [])
+        self.assertEqual(
+            len(pagure.lib.webhook_delivery.get_deliveries(
+                self.session, self.project, limit=5)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
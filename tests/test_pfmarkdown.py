@@ -2,12 +2,21 @@
 from __future__ import unicode_literals
 
 import unittest
+import sys
+import os
 from xml.etree import ElementTree
 
+import flask
+import sqlalchemy
 from mock import patch, Mock
 
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..'))
+
+import pagure.lib.query
 from pagure import pfmarkdown
 from pagure.lib import model
+import tests
 
 
 @patch('pagure.pfmarkdown.flask.url_for', Mock(return_value='http://eh/'))
@@ -54,5 +63,87 @@ class TestObjAnchorTag(unittest.TestCase):
         self.assertEqual(expected_markup, ElementTree.tostring(element))
 
 
+@patch.dict('pagure.config.config', {'MARKDOWN_CACHE_BACKEND': None})
+class TestReferences(tests.Modeltests):
+    """
+    A set of tests for the lookup of the references in the documents
+    """
+
+    def setUp(self):
+        """ Create a project with a few issues and a pull-request. """
+        super(TestReferences, self).setUp()
+
+        tests.create_projects(self.session)
+        repo = pagure.lib.query.get_authorized_project(self.session, 'test')
+        for idx in range(3):
+            pagure.lib.query.new_issue(
+                session=self.session,
+                repo=repo,
+                title='Issue #%s' % (idx + 1),
+                content='content',
+                user='pingou',
+                notify=False,
+            )
+        pagure.lib.query.new_pull_request(
+            self.session,
+            repo_from=repo,
+            branch_from='feature',
+            repo_to=repo,
+            branch_to='master',
+            title='PR #4',
+            user='pingou',
+        )
+        self.session.commit()
+
+    def _render(self, text):
+        """ Render the specified text as when viewing an issue of the
+        project test and return the html and the number of queries made.
+        """
+        engine = self.session.get_bind()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.application.test_request_context('/test/issue/1'):
+            flask.g.session = self.session
+            sqlalchemy.event.listen(engine, 'before_cursor_execute', count)
+            try:
+                html = pagure.lib.query.text2markdown(text)
+            finally:
+                sqlalchemy.event.remove(
+                    engine, 'before_cursor_execute', count)
+        return html, len(statements)
+
+    def test_links(self):
+        """ Test that the references are linked to. """
+        html, _ = self._render(
+            '#1 is related to test#2, PR#4 and #10\n\n'
+            '@pingou @foo @unknown')
+        self.assertIn(
+            '<a href="/test/issue/1" title="[Open] Issue #1">#1</a>', html)
+        self.assertIn(
+            '<a href="/test/issue/2" title="[Open] Issue #2">test#2</a>',
+            html)
+        self.assertIn(
+            '<a href="/test/pull-request/4" title="[Open] PR #4">PR#4</a>',
+            html)
+        self.assertIn('and #10', html)
+        self.assertIn('/user/pingou">@pingou</a>', html)
+        self.assertIn('/user/foo">@foo</a>', html)
+        self.assertIn(' @unknown', html)
+
+    def test_queries(self):
+        """ Test that the number of queries does not depend on the number of
+        references. """
+        html, queries = self._render('See #1, PR#4 and @pingou')
+        self.assertEqual(html.count('<a href'), 3)
+
+        html, new_queries = self._render(
+            '#1\n\nSee #1, #2, #3, PR#4, test#3, #5, @pingou, @foo and @bar')
+        self.assertEqual(html.count('<a href'), 8)
+        self.assertEqual(new_queries, queries)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -16,6 +16,7 @@ Tests for the Pagure streaming server.
 
 from __future__ import unicode_literals
 
+import asyncio
 import logging
 import os
 import sys
@@ -29,8 +30,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(
 sys.path.insert(0, os.path.join(os.path.dirname(
     os.path.abspath(__file__)), '../pagure-ev'))
 
-if six.PY3:
-    raise unittest.case.SkipTest('Skipping on python3')
+if six.PY2:
+    raise unittest.case.SkipTest('Skipping on python2')
 
 import pagure.lib.query                             # pylint: disable=wrong-import-position
 from pagure.exceptions import PagureEvException     # pylint: disable=wrong-import-position
@@ -50,6 +51,7 @@ class StreamingServerTests(tests.Modeltests):
 
         # Make sure the server uses the existing session
         pss.SESSION = self.session
+        pss.PATH_CACHE.clear()
 
         # Mock send_email, we never want to send or see emails here.
         self.mailpatcher = mock.patch('pagure.lib.notify.send_email')
@@ -249,6 +251,105 @@ class StreamingServerTests(tests.Modeltests):
         # NOTE: we cannot test the 'Invalid object provided' exception
         # as it's a backup (current code will never hit it)
 
+    def test_resolve_path(self):
+        """Tests for resolve_path."""
+        issue = pagure.lib.query.search_issues(
+            self.session, self.repo, issueid=1)
+        with mock.patch(
+                'pagure_stream_server.get_obj_from_path',
+                wraps=pss.get_obj_from_path) as get_obj:
+            self.assertEqual(pss.resolve_path('/test/issue/1'), issue.uid)
+            self.assertEqual(pss.resolve_path('/test/issue/1'), issue.uid)
+            self.assertEqual(get_obj.call_count, 1)
+
+            # Errors are not cached
+            for idx in range(2):
+                self.assertRaises(
+                    PagureEvException, pss.resolve_path, '/test/issue/2')
+            self.assertEqual(get_obj.call_count, 3)
+
+
+class StreamingServerHubTests(unittest.TestCase):
+    """Tests for the fan-out of the messages of the streaming server."""
+
+    def setUp(self):
+        """Set up the hub, run before every test."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.hub = pss.Hub(self.loop)
+
+    def test_dispatch(self):
+        """Test that the messages are pushed to the clients of the object
+        they concern only."""
+        clients = [self.hub.subscribe('abc'), self.hub.subscribe('abc')]
+        other = self.hub.subscribe('def')
+
+        self.hub.dispatch(b'pagure.abc', b'{"comment": "added"}')
+        for client in clients:
+            self.assertEqual(
+                client.queue.get_nowait(), '{"comment": "added"}')
+        self.assertTrue(other.queue.empty())
+
+        self.hub.unsubscribe('abc', clients[0])
+        self.hub.unsubscribe('abc', clients[1])
+        self.hub.dispatch(b'pagure.abc', b'{"comment": "added"}')
+        self.assertEqual(list(self.hub.clients), ['def'])
+
+        stats = self.hub.stats()
+        self.assertEqual(stats['clients'], 1)
+        self.assertEqual(stats['objects'], 1)
+        self.assertEqual(stats['connections_total'], 3)
+        self.assertEqual(stats['messages_received'], 2)
+
+    @mock.patch('pagure_stream_server.CLIENT_QUEUE_SIZE', 2)
+    def test_dispatch_slow_client(self):
+        """Test that the clients not reading their messages are dropped."""
+        client = self.hub.subscribe('abc')
+        for idx in range(3):
+            self.hub.dispatch(b'pagure.abc', b'{}')
+        self.assertIsNone(client.queue.get_nowait())
+        self.assertEqual(self.hub.clients, {})
+        self.assertEqual(self.hub.stats()['messages_dropped'], 1)
+
+    @mock.patch(
+        'pagure_stream_server._resolve_path_in_thread',
+        mock.MagicMock(return_value='abc'))
+    def test_handle_client(self):
+        """Test streaming the messages to a client."""
+        pss.HUB = self.hub
+        self.addCleanup(setattr, pss, 'HUB', None)
+
+        async def _client():
+            server = await asyncio.start_server(
+                pss.handle_client, host='127.0.0.1', port=0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /test/issue/1 HTTP/1.1\n\n')
+            headers = await reader.readuntil(b'\n\n')
+            self.hub.dispatch(b'pagure.abc', b'{"comment": "added"}')
+            data = await reader.readuntil(b'\n\n')
+            self.assertEqual(self.hub.stats()['clients'], 1)
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            # Stop the coroutine handling the client
+            tasks = [
+                task for task in asyncio.all_tasks()
+                if task.get_coro().__name__ == 'handle_client'
+            ]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            return headers, data
+
+        headers, data = self.loop.run_until_complete(
+            asyncio.wait_for(_client(), timeout=10))
+        self.assertTrue(headers.startswith(b'HTTP/1.0 200 OK\n'))
+        self.assertIn(b'Content-Type: text/event-stream', headers)
+        self.assertEqual(data, b'data: {"comment": "added"}\n\n')
+        self.assertEqual(self.hub.stats()['messages_sent'], 1)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
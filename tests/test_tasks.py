@@ -10,19 +10,24 @@ MockUser = namedtuple('MockUser', ['fullname', 'default_email'])
 
 
 class MockCommit(object):
-    def __init__(self, name, email, time='1970-01-01 00:00'):
+    def __init__(self, name, email, time=0):
         self.author = Mock(email=email)
         self.author.name = name
         self.commit_time = time
 
 
 @patch('pagure.lib.query.create_session', new=Mock())
+@patch('pagure.lib.commit_stats.load_commit_stats', new=Mock(return_value=None))
+@patch('pagure.lib.commit_stats.save_commit_stats', new=Mock())
 class TestCommitsAuthorStats(unittest.TestCase):
 
     def setUp(self):
-        self.search_user_patcher = patch('pagure.lib.query.search_user')
+        self.search_user_patcher = patch(
+            'pagure.lib.query.search_users_by_emails')
         mock_search_user = self.search_user_patcher.start()
-        mock_search_user.side_effect = lambda _, email: self.authors.get(email)
+        mock_search_user.side_effect = lambda _, emails: dict(
+            (email, self.authors[email])
+            for email in emails if email in self.authors)
 
         self.pygit_patcher = patch('pygit2.Repository')
         mock_repo = self.pygit_patcher.start().return_value
@@ -52,7 +57,7 @@ class TestCommitsAuthorStats(unittest.TestCase):
 
     def test_no_change(self):
         self.commits = [
-            MockCommit('Alice', 'alice@example.com', '2018-01-01 00:00'),
+            MockCommit('Alice', 'alice@example.com', 1514764800),
         ]
         self.authors = {
             'alice@example.com': MockUser('Alice', 'alice@example.com'),
@@ -63,13 +68,13 @@ class TestCommitsAuthorStats(unittest.TestCase):
 
         self.assertEqual(num_commits, 1)
         self.assertEqual(num_authors, 1)
-        self.assertEqual(last_time, '2018-01-01 00:00')
+        self.assertEqual(last_time, 1514764800)
         self.assertEqual(authors, [(1, [('Alice', 'alice@example.com')])])
 
     def test_rename_user_and_merge(self):
         self.commits = [
             MockCommit('Alice', 'alice@example.com'),
-            MockCommit('Bad name', 'alice@example.com', '2018-01-01 00:00'),
+            MockCommit('Bad name', 'alice@example.com', 1514764800),
         ]
         self.authors = {
             'alice@example.com': MockUser('Alice', 'alice@example.com'),
@@ -80,12 +85,12 @@ class TestCommitsAuthorStats(unittest.TestCase):
 
         self.assertEqual(num_commits, 2)
         self.assertEqual(num_authors, 1)
-        self.assertEqual(last_time, '2018-01-01 00:00')
+        self.assertEqual(last_time, 1514764800)
         self.assertEqual(authors, [(2, [('Alice', 'alice@example.com')])])
 
     def test_preserve_unknown_author(self):
         self.commits = [
-            MockCommit('Alice', 'alice@example.com', '2018-01-01 00:00'),
+            MockCommit('Alice', 'alice@example.com', 1514764800),
         ]
         self.authors = {}
 
@@ -94,7 +99,7 @@ class TestCommitsAuthorStats(unittest.TestCase):
 
         self.assertEqual(num_commits, 1)
         self.assertEqual(num_authors, 1)
-        self.assertEqual(last_time, '2018-01-01 00:00')
+        self.assertEqual(last_time, 1514764800)
         self.assertEqual(authors, [(1, [('Alice', 'alice@example.com')])])
 
     def test_handle_empty_email(self):
@@ -102,7 +107,7 @@ class TestCommitsAuthorStats(unittest.TestCase):
             # Two commits for Alice to ensure order of the result.
             MockCommit('Alice', None),
             MockCommit('Alice', None),
-            MockCommit('Bob', '', '2018-01-01 00:00'),
+            MockCommit('Bob', '', 1514764800),
         ]
         self.authors = {}
 
@@ -111,7 +116,7 @@ class TestCommitsAuthorStats(unittest.TestCase):
 
         self.assertEqual(num_commits, 3)
         self.assertEqual(num_authors, 2)
-        self.assertEqual(last_time, '2018-01-01 00:00')
+        self.assertEqual(last_time, 1514764800)
         self.assertEqual(authors, [(2, [('Alice', None)]),
                                    (1, [('Bob', '')])])
 